@@ -0,0 +1,69 @@
+"""
+Measures the per-batch CPU time of building padded arrays for a batch of reading comprehension
+instances with word and character indices, comparing the old path (copying the instances,
+``IndexedDataset.pad_instances`` and ``as_training_data``) with
+``IndexedDataset.as_padded_training_data``, which collates the batch without modifying it.
+
+Example::
+
+    python benchmarks/collation_benchmark.py --batch_size 32 --passage_length 300
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from copy import deepcopy
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.data.dataset import IndexedDataset
+from deep_qa.data.instances.reading_comprehension import IndexedCharacterSpanInstance
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def make_instances(batch_size: int, passage_length: int, question_length: int, word_length: int):
+    random.seed(13370)
+    def make_words(max_length):
+        return [[random.randint(1, 60) for _ in range(random.randint(1, word_length))]
+                for _ in range(random.randint(max_length // 3, max_length))]
+    return [IndexedCharacterSpanInstance(make_words(question_length), make_words(passage_length), (0, 1))
+            for _ in range(batch_size)]
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks batch collation")
+    argparser.add_argument('--batch_size', type=int, default=32)
+    argparser.add_argument('--passage_length', type=int, default=300)
+    argparser.add_argument('--question_length', type=int, default=20)
+    argparser.add_argument('--word_length', type=int, default=12)
+    argparser.add_argument('--num_batches', type=int, default=20)
+    args = argparser.parse_args()
+
+    instances = make_instances(args.batch_size, args.passage_length, args.question_length, args.word_length)
+    dataset = IndexedDataset(instances)
+    padding_lengths = {key: None for key in dataset.padding_lengths()}
+
+    start = time.time()
+    for _ in range(args.num_batches):
+        copied = IndexedDataset(deepcopy(instances))
+        copied.pad_instances(padding_lengths)
+        copied.as_training_data()
+    padding_time = (time.time() - start) / args.num_batches
+
+    start = time.time()
+    for _ in range(args.num_batches):
+        dataset.as_padded_training_data(padding_lengths)
+    collation_time = (time.time() - start) / args.num_batches
+
+    print("copy + pad + as_training_data: %.4f sec/batch" % padding_time)
+    print("as_padded_training_data:       %.4f sec/batch (%.1fx)" % (collation_time,
+                                                                      padding_time / collation_time))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
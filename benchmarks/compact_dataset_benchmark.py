@@ -0,0 +1,111 @@
+"""
+Compares the memory used by a list-based ``IndexedDataset`` and by a ``CompactIndexedDataset``
+holding the same synthetic reading comprehension instances (with character indices, which is the
+worst case for python lists), along with the time it takes to make a batch from each.
+
+We report both the memory each dataset uses once it's built and the peak memory while building
+it.  Compacting a list-based dataset after the fact needs all of the lists first, so its peak is
+higher than the list-based dataset's; only building the compact dataset chunk by chunk (which is
+what ``TextDataset.to_indexed_dataset(..., compact=True)`` does while indexing) lowers the peak.
+
+Example::
+
+    python benchmarks/compact_dataset_benchmark.py --num_instances 20000 --passage_length 300
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.data.dataset import CompactIndexedDataset, IndexedDataset
+from deep_qa.data.instances.reading_comprehension import IndexedCharacterSpanInstance
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def make_instance_chunks(num_instances: int,
+                         passage_length: int,
+                         question_length: int,
+                         word_length: int,
+                         chunk_size: int=1000):
+    """
+    Yields the synthetic instances in chunks, making each chunk only when it's asked for, like
+    indexing does.
+    """
+    random.seed(13370)
+    def make_words(max_length):
+        return [[random.randint(1, 60) for _ in range(random.randint(1, word_length))]
+                for _ in range(random.randint(max_length // 3, max_length))]
+    for start in range(0, num_instances, chunk_size):
+        yield [IndexedCharacterSpanInstance(make_words(question_length), make_words(passage_length), (0, 1))
+               for _ in range(min(chunk_size, num_instances - start))]
+
+
+def measure_memory(build_dataset):
+    """
+    Returns the dataset that ``build_dataset()`` makes, the bytes it holds on to, and the peak
+    bytes used while making it.
+    """
+    gc.collect()
+    tracemalloc.start()
+    dataset = build_dataset()
+    gc.collect()
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dataset, current_bytes, peak_bytes
+
+
+def time_batches(dataset: IndexedDataset, batch_size: int, num_batches: int) -> float:
+    start = time.time()
+    for batch_number in range(num_batches):
+        indices = range(batch_number * batch_size, (batch_number + 1) * batch_size)
+        dataset.select(indices).as_padded_training_data()
+    return (time.time() - start) / num_batches
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks compact indexed dataset storage")
+    argparser.add_argument('--num_instances', type=int, default=5000)
+    argparser.add_argument('--passage_length', type=int, default=300)
+    argparser.add_argument('--question_length', type=int, default=20)
+    argparser.add_argument('--word_length', type=int, default=12)
+    argparser.add_argument('--batch_size', type=int, default=32)
+    argparser.add_argument('--num_batches', type=int, default=20)
+    args = argparser.parse_args()
+    num_batches = min(args.num_batches, args.num_instances // args.batch_size)
+
+    def instance_chunks():
+        return make_instance_chunks(args.num_instances, args.passage_length,
+                                    args.question_length, args.word_length)
+    def compact_afterwards():
+        return CompactIndexedDataset([instance for chunk in instance_chunks() for instance in chunk])
+    dataset, list_bytes, list_peak = measure_memory(
+            lambda: IndexedDataset([instance for chunk in instance_chunks() for instance in chunk]))
+    _, _, compacted_afterwards_peak = measure_memory(compact_afterwards)
+    compact_dataset, compact_bytes, compact_peak = measure_memory(
+            lambda: CompactIndexedDataset.from_chunks(instance_chunks()))
+
+    list_batch_time = time_batches(dataset, args.batch_size, num_batches)
+    compact_batch_time = time_batches(compact_dataset, args.batch_size, num_batches)
+
+    print("storage\t\t\tMB\tbytes/instance\tpeak MB\tsec/batch")
+    print("lists\t\t\t%.1f\t%.0f\t\t%.1f\t%.4f" % (list_bytes / 2**20, list_bytes / args.num_instances,
+                                                   list_peak / 2**20, list_batch_time))
+    print("compacted afterwards\t-\t-\t\t%.1f\t-" % (compacted_afterwards_peak / 2**20))
+    print("compacted by chunk\t%.1f\t%.0f\t\t%.1f\t%.4f" % (compact_bytes / 2**20,
+                                                             compact_bytes / args.num_instances,
+                                                             compact_peak / 2**20, compact_batch_time))
+    print("memory reduction: %.1fx (peak while building: %.1fx)" % (list_bytes / compact_bytes,
+                                                                   list_peak / compact_peak))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
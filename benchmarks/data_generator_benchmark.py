@@ -0,0 +1,108 @@
+"""
+Runs a ``DataGenerator`` with ``sort_every_epoch`` over synthetic reading comprehension instances
+for several epochs, reporting the time and the (traced) python memory for each epoch, so you can
+check that memory stays constant from epoch to epoch.  With ``--copy_every_epoch`` we also deep
+copy the dataset at the start of each epoch, the way the generator used to, for comparison.
+
+To see how much prefetching helps, pass ``--step_seconds`` to simulate a training step of that
+length after each batch, along with ``--prefetch_batches`` (and ``--num_workers``); we report the
+fraction of the time spent waiting for data.
+
+Example::
+
+    python benchmarks/data_generator_benchmark.py --num_instances 5000 --num_epochs 5
+    python benchmarks/data_generator_benchmark.py --step_seconds 0.01 --prefetch_batches 4 --num_workers 2
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.common.params import Params
+from deep_qa.data import DataGenerator, IndexedDataset
+from deep_qa.data.instances.reading_comprehension import IndexedCharacterSpanInstance
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class BenchmarkTextTrainer:
+    """
+    The parts of a ``TextTrainer`` that a ``DataGenerator`` uses.
+    """
+    batch_size = 32
+
+    @staticmethod
+    def get_instance_sorting_keys():
+        return ['num_passage_words', 'num_question_words']
+
+    @staticmethod
+    def get_padding_lengths():
+        return {'num_passage_words': None, 'num_question_words': None, 'num_word_characters': None}
+
+    @staticmethod
+    def get_padding_memory_scaling(padding_lengths):
+        return padding_lengths['num_passage_words'] * padding_lengths['num_word_characters']
+
+
+def make_instances(num_instances: int, passage_length: int, question_length: int, word_length: int):
+    random.seed(13370)
+    def make_words(max_length):
+        return [[random.randint(1, 60) for _ in range(random.randint(1, word_length))]
+                for _ in range(random.randint(max_length // 3, max_length))]
+    return [IndexedCharacterSpanInstance(make_words(question_length), make_words(passage_length), (0, 1))
+            for _ in range(num_instances)]
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks DataGenerator memory across epochs")
+    argparser.add_argument('--num_instances', type=int, default=2000)
+    argparser.add_argument('--passage_length', type=int, default=300)
+    argparser.add_argument('--question_length', type=int, default=20)
+    argparser.add_argument('--word_length', type=int, default=12)
+    argparser.add_argument('--num_epochs', type=int, default=3)
+    argparser.add_argument('--copy_every_epoch', action='store_true',
+                           help="deep copy the dataset before every epoch, like older versions did")
+    argparser.add_argument('--step_seconds', type=float, default=0.0,
+                           help="how long to sleep after each batch, to simulate a training step")
+    argparser.add_argument('--prefetch_batches', type=int, default=0)
+    argparser.add_argument('--num_workers', type=int, default=1)
+    args = argparser.parse_args()
+
+    tracemalloc.start()
+    dataset = IndexedDataset(make_instances(args.num_instances, args.passage_length,
+                                            args.question_length, args.word_length))
+    dataset_bytes = tracemalloc.get_traced_memory()[0]
+    generator = DataGenerator(BenchmarkTextTrainer(), Params({'dynamic_padding': True,
+                                                              'padding_noise': 0.1,
+                                                              'sort_every_epoch': True,
+                                                              'prefetch_batches': args.prefetch_batches,
+                                                              'num_workers': args.num_workers}))
+    batches = generator.create_generator(dataset)
+    num_batches = generator.last_num_batches
+    print("dataset: %.1f MB, %d batches per epoch" % (dataset_bytes / 2**20, num_batches))
+    print("epoch\tseconds\tMB\tpeak MB so far")
+    for epoch in range(args.num_epochs):
+        start = time.time()
+        if args.copy_every_epoch:
+            epoch_copy = deepcopy(dataset)  # pylint: disable=unused-variable
+        for _ in range(num_batches):
+            next(batches)
+            time.sleep(args.step_seconds)
+        elapsed = time.time() - start
+        current, peak = tracemalloc.get_traced_memory()
+        print("%d\t%.2f\t%.1f\t%.1f" % (epoch, elapsed, current / 2**20, peak / 2**20))
+    metrics = generator.last_wait_statistics.get_metrics()
+    print("waited %.2f seconds for data (%.1f%% of the time)" % (metrics['data_wait_seconds'],
+                                                                 100 * metrics['data_wait_fraction']))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
@@ -0,0 +1,82 @@
+"""
+Compares saving and loading a large ``DataIndexer`` with ``dill`` (how ``TextTrainer`` used to save
+it) and with ``DataIndexer.save`` / ``DataIndexer.load``, and indexing tokens one at a time with
+``get_word_index`` versus in a batch with ``get_word_indices``.  ``DataIndexer.load`` doesn't build
+the word-to-index dictionaries until they're first needed, so we time that separately.
+
+Example::
+
+    python benchmarks/data_indexer_benchmark.py --vocab_size 2000000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+import dill as pickle
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.data.data_indexer import DataIndexer
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks DataIndexer serialization and lookup")
+    argparser.add_argument('--vocab_size', type=int, default=1000000)
+    argparser.add_argument('--num_tokens', type=int, default=1000000)
+    args = argparser.parse_args()
+
+    data_indexer = DataIndexer()
+    for i in range(args.vocab_size):
+        data_indexer.add_word_to_index("word%d" % i)
+    random.seed(13370)
+    tokens = ["word%d" % random.randint(0, 2 * args.vocab_size) for _ in range(args.num_tokens)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_filename = os.path.join(directory, 'data_indexer.pkl')
+        start = time.time()
+        with open(pickle_filename, 'wb') as pickle_file:
+            pickle.dump(data_indexer, pickle_file)
+        pickle_save_time = time.time() - start
+        start = time.time()
+        with open(pickle_filename, 'rb') as pickle_file:
+            pickle.load(pickle_file)
+        pickle_load_time = time.time() - start
+
+        vocab_filename = os.path.join(directory, 'data_indexer.vocab')
+        start = time.time()
+        data_indexer.save(vocab_filename)
+        save_time = time.time() - start
+        start = time.time()
+        loaded = DataIndexer.load(vocab_filename)
+        load_time = time.time() - start
+        start = time.time()
+        loaded.get_word_indices(tokens[:1])
+        first_lookup_time = time.time() - start
+        print("file sizes: pickle %.1f MB, vocab %.1f MB" % (os.path.getsize(pickle_filename) / 2**20,
+                                                             os.path.getsize(vocab_filename) / 2**20))
+
+    start = time.time()
+    [data_indexer.get_word_index(token) for token in tokens]  # pylint: disable=expression-not-assigned
+    single_time = time.time() - start
+    start = time.time()
+    data_indexer.get_word_indices(tokens)
+    batch_time = time.time() - start
+
+    print("dill:             save %.3f sec, load %.3f sec" % (pickle_save_time, pickle_load_time))
+    print("DataIndexer.save: save %.3f sec, load %.3f sec (%.1fx faster load)" % (save_time, load_time,
+                                                                                 pickle_load_time / load_time))
+    print("                  first lookup after loading (builds the word index): %.3f sec" % first_lookup_time)
+    print("get_word_index:   %.3f sec for %d tokens" % (single_time, len(tokens)))
+    print("get_word_indices: %.3f sec (%.1fx)" % (batch_time, single_time / batch_time))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares building an embedding matrix for a model's vocabulary by parsing a gzipped text embedding
+file (the way ``PretrainedEmbeddings.get_embedding_layer`` used to, on every model build) with
+looking the vocabulary up in a memory-mapped ``EmbeddingStore``.  We also report the one-off cost of
+converting the text file into a store.  The embedding file is synthetic, with GloVe-like lines.
+
+Example::
+
+    python benchmarks/embedding_store_benchmark.py --num_embeddings 2000000 --embedding_dim 300
+"""
+import argparse
+import gzip
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.data.embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def write_embeddings_file(filename: str, num_embeddings: int, embedding_dim: int):
+    numpy.random.seed(13370)
+    with gzip.open(filename, 'wb', compresslevel=1) as embeddings_file:
+        for start in range(0, num_embeddings, 10000):
+            vectors = numpy.random.uniform(-1, 1, size=(min(10000, num_embeddings - start), embedding_dim))
+            lines = ["word%d %s\n" % (start + i, " ".join("%.5f" % x for x in vector))
+                     for i, vector in enumerate(vectors)]
+            embeddings_file.write("".join(lines).encode('utf-8'))
+
+
+def parse_text_file(filename: str, words_to_keep):
+    embeddings = {}
+    with gzip.open(filename, 'rb') as embeddings_file:
+        for line in embeddings_file:
+            fields = line.decode('utf-8').strip().split(' ')
+            if fields[0] in words_to_keep:
+                embeddings[fields[0]] = numpy.asarray(fields[1:], dtype='float32')
+    return embeddings
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks reading pre-trained embeddings")
+    argparser.add_argument('--num_embeddings', type=int, default=400000)
+    argparser.add_argument('--embedding_dim', type=int, default=100)
+    argparser.add_argument('--vocab_size', type=int, default=50000)
+    args = argparser.parse_args()
+
+    random.seed(13370)
+    vocab = ["word%d" % random.randint(0, 2 * args.num_embeddings) for _ in range(args.vocab_size)]
+    with tempfile.TemporaryDirectory() as directory:
+        embeddings_filename = os.path.join(directory, 'embeddings.txt.gz')
+        write_embeddings_file(embeddings_filename, args.num_embeddings, args.embedding_dim)
+
+        start = time.time()
+        parse_text_file(embeddings_filename, set(vocab))
+        parse_time = time.time() - start
+
+        start = time.time()
+        EmbeddingStore.convert(embeddings_filename, embeddings_filename + '.store')
+        convert_time = time.time() - start
+
+        start = time.time()
+        store = EmbeddingStore.from_file(embeddings_filename)
+        _, found = store.get_vectors(vocab)
+        lookup_time = time.time() - start
+
+    print("%d embeddings of dimension %d, %d vocabulary words (%d found)"
+          % (args.num_embeddings, args.embedding_dim, args.vocab_size, found.sum()))
+    print("parse text file (every model build): %.3f sec" % parse_time)
+    print("convert to a store (once):           %.3f sec" % convert_time)
+    print("open store and gather (every build): %.3f sec (%.1fx)" % (lookup_time, parse_time / lookup_time))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
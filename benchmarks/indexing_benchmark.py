@@ -0,0 +1,77 @@
+"""
+Measures how much faster ``TextDataset.to_indexed_dataset`` gets with more indexing workers, on a
+synthetic text classification dataset.  For each worker count we report the wall-clock time and
+the speedup over indexing in a single process, and we check that the output is identical.
+
+Example::
+
+    python benchmarks/indexing_benchmark.py --num_instances 200000 --max_workers 8
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.common.checks import ensure_pythonhashseed_set
+from deep_qa.data.data_indexer import DataIndexer
+from deep_qa.data.dataset import TextDataset
+from deep_qa.data.instances.text_classification.text_classification_instance import TextClassificationInstance
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def make_dataset(num_instances: int, vocab_size: int, sentence_length: int) -> TextDataset:
+    random.seed(13370)
+    vocabulary = ["word%d" % i for i in range(vocab_size)]
+    instances = []
+    for i in range(num_instances):
+        length = random.randint(sentence_length // 2, sentence_length * 2)
+        text = " ".join(random.choice(vocabulary) for _ in range(length))
+        instances.append(TextClassificationInstance(text, i % 2 == 0, i))
+    return TextDataset(instances)
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks parallel dataset indexing")
+    argparser.add_argument('--num_instances', type=int, default=50000)
+    argparser.add_argument('--vocab_size', type=int, default=20000)
+    argparser.add_argument('--sentence_length', type=int, default=20)
+    argparser.add_argument('--max_workers', type=int, default=multiprocessing.cpu_count())
+    args = argparser.parse_args()
+
+    dataset = make_dataset(args.num_instances, args.vocab_size, args.sentence_length)
+    data_indexer = DataIndexer()
+    data_indexer.fit_word_dictionary(dataset)
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != args.max_workers:
+        worker_counts.append(args.max_workers)
+
+    serial_time = None
+    serial_instances = None
+    print("workers\tseconds\tspeedup")
+    for num_workers in worker_counts:
+        start = time.time()
+        indexed_dataset = dataset.to_indexed_dataset(data_indexer, num_workers=num_workers)
+        elapsed = time.time() - start
+        instances = [instance.__dict__ for instance in indexed_dataset.instances]
+        if serial_time is None:
+            serial_time = elapsed
+            serial_instances = instances
+        elif instances != serial_instances:
+            raise RuntimeError("Indexing with %d workers gave different output!" % num_workers)
+        print("%d\t%.2f\t%.2fx" % (num_workers, elapsed, serial_time / elapsed))
+
+
+if __name__ == "__main__":
+    ensure_pythonhashseed_set()
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
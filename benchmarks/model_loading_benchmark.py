@@ -0,0 +1,68 @@
+"""
+Compares loading a trained model the normal way (compiling it, as if we were going to train it
+more) with loading it only for inference (``load_model(..., for_inference=True)``).  Each load runs
+in a fresh process, so we can report the load time, the size of the tensorflow graph and the peak
+memory of the process for each mode.
+
+Example::
+
+    python benchmarks/model_loading_benchmark.py /path/to/trained_model_params.json --repeats 3
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def load_and_measure(param_file: str, for_inference: bool):
+    # We import these here so that only the worker processes load tensorflow.
+    import tensorflow
+    from keras import backend as K
+    from deep_qa.run import load_model
+    start = time.time()
+    load_model(param_file, for_inference=for_inference)
+    load_time = time.time() - start
+    graph = K.get_session().graph
+    with graph.as_default():
+        num_variables = len(tensorflow.global_variables())
+    # ru_maxrss is in kilobytes on linux.
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return load_time, len(graph.get_operations()), num_variables, peak_memory
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks loading a model for inference")
+    argparser.add_argument('param_file', type=str, help='parameter file of a trained model')
+    argparser.add_argument('--repeats', type=int, default=3)
+    args = argparser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for for_inference in [False, True]:
+        runs = []
+        for _ in range(args.repeats):
+            with context.Pool(1) as pool:
+                runs.append(pool.apply(load_and_measure, (args.param_file, for_inference)))
+        results[for_inference] = [min(run[i] for run in runs) for i in range(4)]
+
+    print("%-16s %10s %10s %10s %14s" % ("mode", "load sec", "graph ops", "variables", "peak RSS (MB)"))
+    for for_inference, name in [(False, "compiled"), (True, "for_inference")]:
+        print("%-16s %10.2f %10d %10d %14.1f" % ((name,) + tuple(results[for_inference])))
+    compiled, inference = results[False], results[True]
+    print("for_inference saves %.2f sec (%.1fx), %d graph ops and %.1f MB of peak memory"
+          % (compiled[0] - inference[0], compiled[0] / inference[0], compiled[1] - inference[1],
+             compiled[3] - inference[3]))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
@@ -0,0 +1,244 @@
+"""
+Times each stage of the training pipeline, for each family of instances, on synthetic data (see
+``benchmarks/synthetic_data.py``), so we can tell whether a change made reading, tokenizing,
+indexing, padding or training slower.  For each family we construct the model that reads it, and
+time:
+
+- ``read``: ``load_dataset_from_files`` (``TextDataset.read_from_file``, plus background files);
+- ``tokenize``: the model tokenizer's ``prepare_instances`` on the whole dataset, which splits all
+  of its strings into words in a batch and puts them in the token cache, so the next two stages
+  don't include splitting words (as long as the dataset's strings fit in the cache, and except
+  for tokenizers that don't split in batches, like the character tokenizer);
+- ``fit_vocabulary``: ``set_model_state_from_dataset`` (``DataIndexer.fit_word_dictionary``);
+- ``index``: ``to_indexed_dataset`` and ``set_model_state_from_indexed_dataset``;
+- ``batches``: one epoch of batches from the model's ``DataGenerator``;
+- ``build_model``: building and compiling the Keras model;
+- ``first_train_step``: the first ``train_on_batch``, which also builds the training function;
+- ``train_step``: the mean time of ``--train_steps`` more steps on the first batch.
+
+We take the fastest of ``--repeats`` runs for each stage, print a table, and can write the
+results as JSON (``--output``).  With ``--compare``, we compare the results with a baseline JSON
+file from an earlier run and exit with a non-zero status if any stage got slower than the
+tolerance allows, so this can run in CI.
+
+Example::
+
+    python benchmarks/pipeline_benchmark.py --num_instances 2000 --output baseline.json
+    python benchmarks/pipeline_benchmark.py --num_instances 2000 --compare baseline.json
+    python benchmarks/pipeline_benchmark.py --families character_span tagging --skip_training
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from copy import deepcopy
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.common.params import Params
+from synthetic_data import SyntheticText, WRITERS
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+STAGES = ['read', 'tokenize', 'fit_vocabulary', 'index', 'batches',
+          'build_model', 'first_train_step', 'train_step']
+
+# The model we use for each family of instances, with (small) settings that are enough to train.
+FAMILIES = {
+        'question_passage': ('AttentionSumReader', {
+                'encoder': {'default': {'type': 'bi_gru', 'units': 32}},
+                'seq2seq_encoder': {'default': {'encoder_params': {'type': 'bi_gru', 'units': 32},
+                                                'wrapper_params': {}}},
+                }),
+        'character_span': ('BidirectionalAttentionFlow', {
+                'tokenizer': {'type': 'words and characters'},
+                'embeddings': {'words': {'dimension': 50}, 'characters': {'dimension': 8}},
+                }),
+        'background': ('MemoryNetwork', {
+                'knowledge_selector': {'type': 'dot_product'},
+                'memory_updater': {'type': 'sum'},
+                'entailment_input_combiner': {'type': 'memory_only'},
+                }),
+        'tuple_inference': ('TupleInferenceModel', {
+                'tuple_matcher': {'num_hidden_layers': 1, 'hidden_layer_width': 16,
+                                  'hidden_layer_activation': 'tanh'},
+                'num_question_tuples': 10,
+                'num_background_tuples': 40,
+                'num_tuple_slots': 4,
+                'num_sentence_words': 6,
+                'num_answer_options': 4,
+                }),
+        'sentence_selection': ('SiameseSentenceSelector', {
+                'encoder': {'default': {'type': 'gru', 'units': 32}},
+                'seq2seq_encoder': {'default': {'encoder_params': {'type': 'bi_gru', 'units': 32},
+                                                'wrapper_params': {}}},
+                }),
+        'tagging': ('SimpleTagger', {
+                'instance_type': 'PreTokenizedTaggingInstance',
+                'tokenizer': {'processor': {'word_splitter': 'no_op'}},
+                }),
+        }
+
+
+def get_model_params(family: str, train_files, directory: str, args) -> Params:
+    _, family_params = FAMILIES[family]
+    params = {
+            'model_serialization_prefix': os.path.join(directory, family + '_'),
+            'save_models': False,
+            'train_files': train_files,
+            'num_epochs': 1,
+            'batch_size': args.batch_size,
+            'embeddings': {'words': {'dimension': 50}},
+            'encoder': {'default': {'type': 'bow'}},
+            'data_generator': {'dynamic_padding': args.dynamic_padding},
+            }
+    params.update(deepcopy(family_params))
+    return Params(params)
+
+
+def time_family(family: str, train_files, directory: str, args):
+    # pylint: disable=protected-access
+    from keras import backend as K
+    from deep_qa.models import concrete_models
+    model_class = concrete_models[FAMILIES[family][0]]
+    seconds = {}
+    def timed(stage, function):
+        start = time.time()
+        result = function()
+        seconds[stage] = time.time() - start
+        return result
+
+    model = model_class(get_model_params(family, train_files, directory, args))
+    dataset = timed('read', lambda: model.load_dataset_from_files(train_files))
+    timed('tokenize', lambda: model.tokenizer.prepare_instances(dataset.instances))
+    timed('fit_vocabulary', lambda: model.set_model_state_from_dataset(dataset))
+    def index():
+        indexed_dataset = dataset.to_indexed_dataset(**model._dataset_indexing_kwargs())
+        model.set_model_state_from_indexed_dataset(indexed_dataset)
+        return indexed_dataset
+    indexed_dataset = timed('index', index)
+    def make_batches():
+        batches = model.create_data_arrays(indexed_dataset)
+        first_batch = next(batches)
+        for _ in range(model.data_generator.last_num_batches - 1):
+            next(batches)
+        return first_batch
+    inputs, labels = timed('batches', make_batches)
+    result = {'num_instances': len(indexed_dataset.instances),
+              'num_batches': model.data_generator.last_num_batches,
+              'seconds': seconds}
+    if args.skip_training:
+        return result
+    # This is what Trainer.train() does before it starts fitting.
+    timed('build_model', model._Trainer__build_and_compile_model)
+    timed('first_train_step', lambda: model.model.train_on_batch(inputs, labels))
+    start = time.time()
+    for _ in range(args.train_steps):
+        model.model.train_on_batch(inputs, labels)
+    seconds['train_step'] = (time.time() - start) / max(args.train_steps, 1)
+    K.clear_session()
+    return result
+
+
+def run_benchmarks(args):
+    results = {'config': {'num_instances': args.num_instances,
+                          'batch_size': args.batch_size,
+                          'dynamic_padding': args.dynamic_padding,
+                          'vocab_size': args.vocab_size},
+               'families': {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for family in args.families:
+            family_directory = os.path.join(directory, family)
+            os.makedirs(family_directory)
+            text = SyntheticText(args.vocab_size)
+            train_files = WRITERS[family](family_directory, args.num_instances, text)
+            runs = [time_family(family, train_files, family_directory, args) for _ in range(args.repeats)]
+            family_result = runs[0]
+            family_result['seconds'] = {stage: min(run['seconds'][stage] for run in runs)
+                                        for stage in runs[0]['seconds']}
+            results['families'][family] = family_result
+    return results
+
+
+def print_results(results):
+    print("%-20s %s" % ("family", " ".join("%16s" % stage for stage in STAGES)))
+    for family, family_result in results['families'].items():
+        times = ["%16s" % ("%.3f" % family_result['seconds'][stage] if stage in family_result['seconds'] else "-")
+                 for stage in STAGES]
+        print("%-20s %s" % (family, " ".join(times)))
+
+
+def compare_results(results, baseline, tolerance: float, min_difference: float):
+    """
+    Prints how each stage's time changed from the baseline, and returns the ``(family, stage)``
+    pairs that got slower by more than ``tolerance`` (a fraction of the baseline time) and more
+    than ``min_difference`` seconds, which keeps noise in very fast stages from counting.
+    """
+    if results['config'] != baseline.get('config'):
+        logger.warning("The baseline was run with a different configuration (%s, now %s)",
+                       baseline.get('config'), results['config'])
+    regressions = []
+    print("%-20s %-18s %10s %10s %8s" % ("family", "stage", "baseline", "current", "change"))
+    for family, family_result in results['families'].items():
+        baseline_seconds = baseline['families'].get(family, {}).get('seconds', {})
+        for stage in STAGES:
+            if stage not in family_result['seconds'] or stage not in baseline_seconds:
+                continue
+            old, new = baseline_seconds[stage], family_result['seconds'][stage]
+            change = (new - old) / old if old > 0 else 0.0
+            is_regression = change > tolerance and new - old > min_difference
+            if is_regression:
+                regressions.append((family, stage))
+            print("%-20s %-18s %10.3f %10.3f %+7.1f%%%s" % (family, stage, old, new, 100 * change,
+                                                           "  REGRESSION" if is_regression else ""))
+    return regressions
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Times each stage of the pipeline on synthetic data")
+    argparser.add_argument('--families', nargs='+', choices=sorted(FAMILIES), default=sorted(FAMILIES))
+    argparser.add_argument('--num_instances', type=int, default=1000)
+    argparser.add_argument('--vocab_size', type=int, default=20000)
+    argparser.add_argument('--batch_size', type=int, default=32)
+    argparser.add_argument('--dynamic_padding', action='store_true')
+    argparser.add_argument('--train_steps', type=int, default=5)
+    argparser.add_argument('--skip_training', action='store_true',
+                           help="only time the data stages, without building a model")
+    argparser.add_argument('--repeats', type=int, default=1)
+    argparser.add_argument('--output', type=str, help="write the results to this JSON file")
+    argparser.add_argument('--results', type=str,
+                           help="read results from this JSON file instead of running the benchmarks")
+    argparser.add_argument('--compare', type=str, help="a baseline JSON file to compare the results to")
+    argparser.add_argument('--tolerance', type=float, default=0.2,
+                           help="how much slower (as a fraction) a stage can get before we flag it")
+    argparser.add_argument('--min_difference', type=float, default=0.05,
+                           help="ignore slowdowns of fewer seconds than this")
+    args = argparser.parse_args()
+
+    if args.results:
+        with open(args.results) as results_file:
+            results = json.load(results_file)
+    else:
+        results = run_benchmarks(args)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print()
+        regressions = compare_results(results, baseline, args.tolerance, args.min_difference)
+        if regressions:
+            print("%d stage(s) got slower: %s" % (len(regressions),
+                                                  ", ".join("%s/%s" % regression for regression in regressions)))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
@@ -0,0 +1,76 @@
+"""
+Measures the per-epoch cost of a noisy sort of an ``IndexedDataset`` by padding length, comparing
+the old approach (asking every instance for its padding lengths, adding noise to a dict per
+instance and sorting python lists) with ``IndexedDataset.get_padding_sort_order``, which uses the
+dataset's padding length matrix and ``numpy.lexsort``.  We also report the one-off cost of
+computing the matrix.
+
+Example::
+
+    python benchmarks/sorting_benchmark.py --num_instances 1000000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.common.util import add_noise_to_dict_values
+from deep_qa.data.dataset import IndexedDataset
+from deep_qa.data.instances.reading_comprehension import IndexedCharacterSpanInstance
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def make_instances(num_instances: int, passage_length: int, question_length: int):
+    random.seed(13370)
+    return [IndexedCharacterSpanInstance([1] * random.randint(1, question_length),
+                                         [1] * random.randint(1, passage_length),
+                                         (0, 1))
+            for _ in range(num_instances)]
+
+
+def old_sort_order(dataset: IndexedDataset, sorting_keys, padding_noise: float):
+    instances_with_lengths = []
+    for index, instance in enumerate(dataset.instances):
+        padding_lengths = add_noise_to_dict_values(instance.get_padding_lengths(), padding_noise)
+        instances_with_lengths.append(([padding_lengths[key] for key in sorting_keys], index))
+    instances_with_lengths.sort(key=lambda x: x[0])
+    return [index for _, index in instances_with_lengths]
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks sorting a dataset by padding length")
+    argparser.add_argument('--num_instances', type=int, default=200000)
+    argparser.add_argument('--passage_length', type=int, default=300)
+    argparser.add_argument('--question_length', type=int, default=20)
+    argparser.add_argument('--padding_noise', type=float, default=0.1)
+    args = argparser.parse_args()
+    sorting_keys = ['num_passage_words', 'num_question_words']
+
+    dataset = IndexedDataset(make_instances(args.num_instances, args.passage_length, args.question_length))
+
+    start = time.time()
+    old_sort_order(dataset, sorting_keys, args.padding_noise)
+    old_time = time.time() - start
+
+    start = time.time()
+    dataset.get_padding_length_matrix()
+    matrix_time = time.time() - start
+
+    start = time.time()
+    dataset.get_padding_sort_order(sorting_keys, args.padding_noise)
+    new_time = time.time() - start
+
+    print("padding length matrix (once):       %.3f sec" % matrix_time)
+    print("old sort (per epoch):               %.3f sec" % old_time)
+    print("get_padding_sort_order (per epoch): %.3f sec (%.1fx)" % (new_time, old_time / new_time))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
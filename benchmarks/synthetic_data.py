@@ -0,0 +1,175 @@
+"""
+Writes synthetic data files for each family of instances, in the formats their
+``read_from_line`` methods expect, so the benchmarks can run without downloading datasets.  The
+text isn't meaningful, but it has roughly the statistics that matter for speed: word frequencies
+follow a Zipf distribution, words are a few syllables long, and sentence, question and passage
+lengths are log-normally distributed (so there's a long tail of long instances, like in real
+data).
+
+Each ``write_*`` function takes a directory, a number of instances and a ``SyntheticText``, and
+returns the list of files to pass as ``train_files`` to the corresponding model.
+"""
+import math
+import os
+from typing import Dict, List
+
+import numpy
+
+SYLLABLES = ['ka', 'ri', 'to', 'me', 'sa', 'lo', 'ne', 'vi', 'du', 'pa', 'ge', 'mo', 'shi', 'ta',
+             'ro', 'li', 'fe', 'na', 'bo', 'zu']
+
+
+class SyntheticText:
+    """
+    Generates pseudo-words and sentences from a Zipfian vocabulary of ``vocab_size`` words.
+    """
+    def __init__(self, vocab_size: int=20000, seed: int=13370):
+        self.random = numpy.random.RandomState(seed)
+        self.vocab = [self._make_word(i) for i in range(vocab_size)]
+        weights = 1.0 / numpy.arange(1, vocab_size + 1)
+        self.probabilities = weights / weights.sum()
+
+    @staticmethod
+    def _make_word(index: int) -> str:
+        syllables = [SYLLABLES[index % len(SYLLABLES)]]
+        index //= len(SYLLABLES)
+        while index > 0:
+            syllables.append(SYLLABLES[index % len(SYLLABLES)])
+            index //= len(SYLLABLES)
+        return ''.join(syllables)
+
+    def length(self, mean: float, sigma: float=0.5, maximum: int=None) -> int:
+        """
+        A log-normally distributed length with (approximately) the given mean.
+        """
+        length = int(round(self.random.lognormal(math.log(mean) - sigma ** 2 / 2, sigma)))
+        length = max(1, length)
+        return min(length, maximum) if maximum else length
+
+    def words(self, num_words: int) -> List[str]:
+        indices = self.random.choice(len(self.vocab), size=num_words, p=self.probabilities)
+        return [self.vocab[index] for index in indices]
+
+    def sentence(self, mean_length: float) -> str:
+        return ' '.join(self.words(self.length(mean_length))) + ' .'
+
+    def randint(self, high: int) -> int:
+        return int(self.random.randint(high))
+
+
+def write_lines(filename: str, lines: List[str]):
+    with open(filename, 'w', encoding='utf-8') as output_file:
+        for line in lines:
+            output_file.write(line + '\n')
+
+
+def write_question_passage_files(directory: str, num_instances: int, text: SyntheticText) -> List[str]:
+    """
+    ``McQuestionPassageInstances`` (``[index][tab][passage][tab][question][tab][options][tab][label]``).
+    """
+    lines = []
+    for index in range(num_instances):
+        passage = ' '.join(text.sentence(20) for _ in range(text.length(8)))
+        options = [' '.join(text.words(text.length(2, maximum=5))) for _ in range(text.length(4, 0.3))]
+        lines.append('%d\t%s\t%s\t%s\t%d' % (index, passage, text.sentence(12), '###'.join(options),
+                                             text.randint(len(options))))
+    filename = os.path.join(directory, 'question_passage.tsv')
+    write_lines(filename, lines)
+    return [filename]
+
+
+def write_character_span_files(directory: str, num_instances: int, text: SyntheticText) -> List[str]:
+    """
+    ``CharacterSpanInstances`` (``[index][tab][question][tab][passage][tab][begin,end]``), with the
+    answer span covering whole words of the passage.
+    """
+    lines = []
+    for index in range(num_instances):
+        passage_words = text.words(text.length(150, 0.6))
+        span_begin = text.randint(len(passage_words))
+        span_end = min(len(passage_words), span_begin + text.length(3, maximum=10))
+        char_begin = len(' '.join(passage_words[:span_begin])) + (1 if span_begin > 0 else 0)
+        char_end = char_begin + len(' '.join(passage_words[span_begin:span_end]))
+        lines.append('%d\t%s\t%s\t%d,%d' % (index, text.sentence(12), ' '.join(passage_words),
+                                            char_begin, char_end))
+    filename = os.path.join(directory, 'character_span.tsv')
+    write_lines(filename, lines)
+    return [filename]
+
+
+def write_background_files(directory: str, num_instances: int, text: SyntheticText) -> List[str]:
+    """
+    True/false ``TextClassificationInstances`` (``[index][tab][sentence][tab][label]``) and a
+    background file (``[index][tab][background sentence][tab]...``), which the model reads into
+    ``BackgroundInstances``.
+    """
+    lines = []
+    background_lines = []
+    for index in range(num_instances):
+        lines.append('%d\t%s\t%d' % (index, text.sentence(15), text.randint(2)))
+        background = [text.sentence(20) for _ in range(text.length(10, maximum=50))]
+        background_lines.append('%d\t%s' % (index, '\t'.join(background)))
+    filename = os.path.join(directory, 'background_train.tsv')
+    background_filename = os.path.join(directory, 'background.tsv')
+    write_lines(filename, lines)
+    write_lines(background_filename, background_lines)
+    return [filename, background_filename]
+
+
+def _text_tuple(text: SyntheticText, num_slots: int) -> str:
+    return '<>'.join(' '.join(text.words(text.length(2, maximum=6))) for _ in range(num_slots))
+
+
+def write_tuple_inference_files(directory: str, num_instances: int, text: SyntheticText) -> List[str]:
+    """
+    ``TupleInferenceInstances`` (``[index][tab][answer tuples][tab][background tuples][tab][label]``),
+    with ``$$$`` between tuples, ``###`` between answer options and ``<>`` between tuple slots.
+    """
+    lines = []
+    for index in range(num_instances):
+        num_options = 4
+        answers = ['$$$'.join(_text_tuple(text, 2 + text.randint(3)) for _ in range(text.length(3, maximum=10)))
+                   for _ in range(num_options)]
+        background = '$$$'.join(_text_tuple(text, 2 + text.randint(3)) for _ in range(text.length(20)))
+        lines.append('%d\t%s\t%s\t%d' % (index, '###'.join(answers), background, text.randint(num_options)))
+    filename = os.path.join(directory, 'tuple_inference.tsv')
+    write_lines(filename, lines)
+    return [filename]
+
+
+def write_sentence_selection_files(directory: str, num_instances: int, text: SyntheticText) -> List[str]:
+    """
+    ``SentenceSelectionInstances`` (``[index][tab][question][tab][sentence###sentence...][tab][label]``).
+    """
+    lines = []
+    for index in range(num_instances):
+        sentences = [text.sentence(22) for _ in range(text.length(6))]
+        lines.append('%d\t%s\t%s\t%d' % (index, text.sentence(12), '###'.join(sentences),
+                                         text.randint(len(sentences))))
+    filename = os.path.join(directory, 'sentence_selection.tsv')
+    write_lines(filename, lines)
+    return [filename]
+
+
+def write_tagging_files(directory: str, num_instances: int, text: SyntheticText) -> List[str]:
+    """
+    ``PreTokenizedTaggingInstances`` (``[token]###[tag][tab][token]###[tag]...``).
+    """
+    tags = ['N', 'V', 'ADJ', 'ADV', 'DET', 'PREP', 'O']
+    lines = []
+    for _ in range(num_instances):
+        words = text.words(text.length(25))
+        lines.append('\t'.join('%s###%s' % (word, tags[text.randint(len(tags))]) for word in words))
+    filename = os.path.join(directory, 'tagging.tsv')
+    write_lines(filename, lines)
+    return [filename]
+
+
+WRITERS = {
+        'question_passage': write_question_passage_files,
+        'character_span': write_character_span_files,
+        'background': write_background_files,
+        'tuple_inference': write_tuple_inference_files,
+        'sentence_selection': write_sentence_selection_files,
+        'tagging': write_tagging_files,
+        }  # type: Dict[str, callable]
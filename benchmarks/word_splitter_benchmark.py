@@ -0,0 +1,64 @@
+"""
+Measures the throughput, in sentences per second, of a ``WordSplitter`` on a synthetic corpus
+with a realistic mix of plain words, punctuation, contractions and special cases, using both
+``split_words`` and ``split_words_batch``.
+
+Example::
+
+    python benchmarks/word_splitter_benchmark.py --splitter simple --num_sentences 200000
+    python benchmarks/word_splitter_benchmark.py --splitter spacy --num_processes 4
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.data.tokenizers.word_splitter import word_splitters
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+WORDS = ["the", "a", "question", "answer", "passage", "model", "which", "of", "these", "is",
+         "mr.", "e.g.", "isn't", "joe's", "would've", "they're", "(like", "this)", "\"quoted\"",
+         "end.", "comma,", "what?", "$100", "50%"]
+
+
+def make_corpus(num_sentences: int, sentence_length: int):
+    random.seed(13370)
+    return [" ".join(random.choice(WORDS) for _ in range(random.randint(sentence_length // 2,
+                                                                         sentence_length * 2)))
+            for _ in range(num_sentences)]
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmarks word splitter throughput")
+    argparser.add_argument('--splitter', type=str, default='simple', choices=list(word_splitters.keys()))
+    argparser.add_argument('--num_sentences', type=int, default=100000)
+    argparser.add_argument('--sentence_length', type=int, default=20)
+    argparser.add_argument('--num_processes', type=int, default=None,
+                           help="passed to splitters that can split batches in several processes")
+    args = argparser.parse_args()
+
+    corpus = make_corpus(args.num_sentences, args.sentence_length)
+    word_splitter_kwargs = {} if args.num_processes is None else {'num_processes': args.num_processes}
+    word_splitter = word_splitters[args.splitter](**word_splitter_kwargs)
+
+    start = time.time()
+    for sentence in corpus:
+        word_splitter.split_words(sentence)
+    elapsed = time.time() - start
+    print("split_words:       %10.0f sentences/sec" % (len(corpus) / elapsed))
+
+    start = time.time()
+    word_splitter.split_words_batch(corpus)
+    elapsed = time.time() - start
+    print("split_words_batch: %10.0f sentences/sec" % (len(corpus) / elapsed))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.WARNING)
+    main()
@@ -1,2 +1,2 @@
 from .run import run_model, evaluate_model, load_model, score_dataset, score_dataset_with_ensemble
-from .run import compute_accuracy
+from .run import analyze_padding, calibrate_memory_usage, compute_accuracy, serve_model
@@ -1,5 +1,9 @@
 from itertools import zip_longest
 from typing import Any, Dict, List
+import bz2
+import codecs
+import gzip
+import lzma
 import random
 
 
@@ -64,3 +68,23 @@ def clean_layer_name(input_name: str,
         input_name = '_'.join(input_name.split('_')[:-1])
 
     return input_name
+
+
+def open_text_file(filename: str, encoding: str='utf-8'):
+    """
+    Opens ``filename`` for (lazy, line-by-line) reading as text, transparently decompressing it
+    if it is a gzip, bz2 or xz file.  We detect compression from the first few bytes of the file,
+    not from the file extension.  The returned file object behaves the same as one returned by
+    ``codecs.open(filename, 'r', encoding)``, and can be used as a context manager.
+    """
+    with open(filename, 'rb') as raw_file:
+        magic_bytes = raw_file.read(6)
+    if magic_bytes.startswith(b'\x1f\x8b'):
+        raw_file = gzip.open(filename, 'rb')
+    elif magic_bytes.startswith(b'BZh'):
+        raw_file = bz2.open(filename, 'rb')
+    elif magic_bytes.startswith(b'\xfd7zXZ\x00'):
+        raw_file = lzma.open(filename, 'rb')
+    else:
+        raw_file = open(filename, 'rb')
+    return codecs.getreader(encoding)(raw_file)
@@ -15,9 +15,13 @@ import numpy
 import spacy
 from sklearn.neighbors import LSHForest
 
+from deep_qa.data.embedding_store import EmbeddingStore
+
 
 class BowLsh:
     def __init__(self, serialization_prefix='lsh', use_idf=True):
+        self.embedding_store = None
+        # The vectors we've looked up in the embedding store, and random vectors for unknown words.
         self.embeddings = {}
         self.lsh = None
         self.embedding_dim = None
@@ -33,19 +37,10 @@ class BowLsh:
             self.idf_values = {}  # word -> idf_value
 
     def read_embeddings_file(self, embeddings_file: str):
-        with gzip.open(embeddings_file, 'rb') as embeddings_file:
-            for line in embeddings_file:
-                fields = line.decode('utf-8').strip().split(' ')
-                self.embedding_dim = len(fields) - 1
-                word = fields[0]
-                vector = numpy.asarray(fields[1:], dtype='float32')
-                vector_min = min(vector)
-                vector_max = max(vector)
-                if vector_min < self.vector_min:
-                    self.vector_min = vector_min
-                if vector_max > self.vector_max:
-                    self.vector_max = vector_max
-                self.embeddings[word] = vector
+        self.embedding_store = EmbeddingStore.from_file(embeddings_file)
+        self.embedding_dim = self.embedding_store.embedding_dim
+        self.vector_min = self.embedding_store.vector_min
+        self.vector_max = self.embedding_store.vector_max
 
     def load_model(self):
         pickled_embeddings_file = open("%s/embeddings.pkl" % self.serialization_prefix, 'rb')
@@ -62,6 +57,10 @@ class BowLsh:
                     self.vector_min = vector_min
                 if vector_max > self.vector_max:
                     self.vector_max = vector_max
+        store_directory_filename = "%s/embedding_store.txt" % self.serialization_prefix
+        if os.path.exists(store_directory_filename):
+            with open(store_directory_filename) as store_directory_file:
+                self.read_embeddings_file(store_directory_file.read().strip())
         self.lsh = pickle.load(pickled_lsh_file)
         self.indexed_background = pickle.load(indexed_background_file)
         if self.use_idf:
@@ -79,7 +78,11 @@ class BowLsh:
         pickled_lsh_file = open("%s/lsh.pkl" % self.serialization_prefix, "wb")
         indexed_background_file = open("%s/background.pkl" % self.serialization_prefix, "wb")
         print("\tDumping embeddings", file=sys.stderr)
+        # We only pickle the vectors we've used; queries can look up the rest in the store.
         pickle.dump(self.embeddings, pickled_embeddings_file)
+        if self.embedding_store is not None and os.path.isdir(self.embedding_store.directory):
+            with open("%s/embedding_store.txt" % self.serialization_prefix, "w") as store_directory_file:
+                print(os.path.abspath(self.embedding_store.directory), file=store_directory_file)
         print("\tDumping sentences", file=sys.stderr)
         pickle.dump(self.indexed_background, indexed_background_file)
         pickled_embeddings_file.close()
@@ -98,6 +101,10 @@ class BowLsh:
         pickled_lsh_file.close()
 
     def get_word_vector(self, word, random_for_unk=False):
+        if word not in self.embeddings and self.embedding_store is not None:
+            row = self.embedding_store.get_row(word)
+            if row >= 0:
+                self.embeddings[word] = numpy.array(self.embedding_store.vectors[row])
         if word in self.embeddings:
             vector = self.embeddings[word]
         else:
@@ -1,5 +1,4 @@
 from collections import OrderedDict
-import gzip
 import logging
 from typing import List
 
@@ -12,6 +11,7 @@ import tqdm
 from ...common.models import get_submodel
 from ...common.params import replace_none, Params
 from ...common import util
+from ...data.embedding_store import EmbeddingStore
 from ...data.instances.sentence_selection.sentence_selection_instance import SentenceSelectionInstance
 from ...models import concrete_models
 
@@ -67,7 +67,8 @@ class BagOfWordsRetrievalEncoder(RetrievalEncoder):
     Parameters
     ----------
     embeddings_file: str
-        A GloVe-formatted gzipped file containing pre-trained word embeddings.
+        A GloVe-formatted gzipped file containing pre-trained word embeddings, or an
+        :class:`~deep_qa.data.embedding_store.EmbeddingStore` directory.
 
     TODO(matt): I wrote this from an earlier version of ``bow_lsh.py``, before Pradeep implemented
     his IDF feature.  We should update this class to also have an option for IDF encoding, and then
@@ -80,25 +81,19 @@ class BagOfWordsRetrievalEncoder(RetrievalEncoder):
         # These fields will get set in the call to `read_embeddings_file`.
         self.vector_max = -float("inf")
         self.vector_min = float("inf")
+        self.embedding_store = None
+        # The vectors we've looked up in the store so far, and the random vectors we've made up for
+        # unknown words.
         self.embeddings = {}
         self.embedding_dim = None
         self.read_embeddings_file(embeddings_file)
 
     def read_embeddings_file(self, embeddings_file: str):
         logger.info("Reading embeddings file: %s", embeddings_file)
-        with gzip.open(embeddings_file, 'rb') as embeddings_file:
-            for line in embeddings_file:
-                fields = line.decode('utf-8').strip().split(' ')
-                self.embedding_dim = len(fields) - 1
-                word = fields[0]
-                vector = numpy.asarray(fields[1:], dtype='float32')
-                vector_min = min(vector)
-                vector_max = max(vector)
-                if vector_min < self.vector_min:
-                    self.vector_min = vector_min
-                if vector_max > self.vector_max:
-                    self.vector_max = vector_max
-                self.embeddings[word] = vector
+        self.embedding_store = EmbeddingStore.from_file(embeddings_file)
+        self.embedding_dim = self.embedding_store.embedding_dim
+        self.vector_min = self.embedding_store.vector_min
+        self.vector_max = self.embedding_store.vector_max
 
     @overrides
     def encode_query(self, query: str) -> numpy.array:
@@ -115,6 +110,11 @@ class BagOfWordsRetrievalEncoder(RetrievalEncoder):
     def _get_word_vector(self, word, random_for_unk=False):
         if word in self.embeddings:
             return self.embeddings[word]
+        row = self.embedding_store.get_row(word)
+        if row >= 0:
+            vector = numpy.array(self.embedding_store.vectors[row])
+            self.embeddings[word] = vector
+            return vector
         else:
             # If this is for the background data, we'd want to make new vectors (uniformly sampling
             # from the range (vector_min, vector_max)). If this is for the queries, we'll return a zero vector
@@ -159,7 +159,7 @@ class SentenceSelectionRetrievalEncoder(RetrievalEncoder):
         model_type = params.pop_choice('model_class', concrete_models.keys())
         model_class = concrete_models[model_type]
         self.model = model_class(model_params)
-        self.model.load_model()
+        self.model.load_model(for_inference=True)
         # Ok, this is pretty hacky, but calling `self._get_encoder(name)` on a TextTrainer with
         # "use default encoder" as the fallback behavior could give you an encoder that doesn't
         # have the name you expect.
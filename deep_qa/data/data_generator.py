@@ -1,15 +1,25 @@
-from typing import List
+from collections import deque
+from contextlib import contextmanager
+import functools
 import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import random
-from copy import deepcopy
+import time
+from typing import Dict, Iterator, List, Tuple
+
+import numpy
 
 from ..common.params import Params
 from ..common.util import group_by_count
 from . import IndexedDataset
-from .instances import IndexedInstance
+from .memory_calibration import MemoryCalibrator
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+# The dataset that worker processes collate batches from, when prefetching with several processes.
+_worker_dataset = None  # pylint: disable=invalid-name
+
 
 class DataGenerator:
     """
@@ -76,7 +86,16 @@ class DataGenerator:
         without running out of memory.  Then (2) turn on ``adaptive_batch_sizes``, and set this
         parameter so that you get the right batch size for your biggest instances.  If you set the
         log level to ``DEBUG`` in ``scripts/run_model.py``, you can see the batch sizes that are
-        computed.
+        computed.  Alternatively, leave this unset and use ``memory_calibration`` to have it set
+        for you.
+    memory_calibration: Dict[str, Any], optional (default=None)
+        If given (and ``adaptive_batch_sizes`` is ``True``), we calibrate
+        ``adaptive_memory_usage_constant`` automatically before training, by running a few probe
+        training steps on the instances with the largest padding lengths, for a given memory
+        budget.  These are the parameters of a
+        :class:`~deep_qa.data.memory_calibration.MemoryCalibrator`.  You can also run the
+        calibration on its own, and write the constant back into your parameter file, with
+        ``python scripts/run_model.py [param_file] calibrate``.
     maximum_batch_size: int, optional (default=1000000)
         If we're using adaptive batch sizes, you can use this to be sure you do not create batches
         larger than this, even if you have enough memory to handle it on your GPU.  You might
@@ -88,6 +107,20 @@ class DataGenerator:
         largest batch that you have in the data `first`, so that if you're going to run out of
         memory, you know it early, instead of waiting through the whole batch to find out at the
         end that you're going to crash.
+    prefetch_batches: int, optional (default=0)
+        If greater than zero, we collate up to this many upcoming batches in the background while
+        the model trains on the current one, instead of building each batch only when it's asked
+        for.  The order of the batches is exactly the same as without prefetching: we still decide
+        which instances go in which batch, in order, in the thread that reads from the generator,
+        and the background workers only build the arrays.
+    num_workers: int, optional (default=1)
+        Only relevant if ``prefetch_batches`` is greater than zero.  If this is one, we collate
+        batches in a background thread; if it's more than one, we use a pool of this many
+        processes, each with its own copy of the dataset.  Processes avoid contention for python's
+        global interpreter lock, but the arrays have to be sent back to the training process.
+        Each generator stops its workers when it's closed or garbage collected, but Keras just
+        stops reading from the generators it's given, so call :func:`close` when you're done with
+        them.
     """
     def __init__(self, text_trainer, params: Params):
         self.text_trainer = text_trainer
@@ -97,13 +130,25 @@ class DataGenerator:
         self.adaptive_batch_sizes = params.pop('adaptive_batch_sizes', False)
         self.adaptive_memory_usage_constant = params.pop('adaptive_memory_usage_constant', False)
         self.maximum_batch_size = params.pop('maximum_batch_size', 1000000)
+        memory_calibration = params.pop('memory_calibration', None)
+        self.memory_calibrator = MemoryCalibrator(memory_calibration) if memory_calibration is not None else None
         self.biggest_batch_first = params.pop('biggest_batch_first', False)
+        self.prefetch_batches = params.pop('prefetch_batches', 0)
+        self.num_workers = params.pop('num_workers', 1)
 
         #: This field can be read after calling ``create_generator`` to get the number of steps you
         #: should take per epoch in ``model.fit_generator`` or ``model.evaluate_generator`` for
         #: this data.
         self.last_num_batches = None
 
+        #: This field can be read after calling ``create_generator`` to see how long whatever is
+        #: reading from the generator (e.g., the training loop) has waited for batches.  See
+        #: :class:`DataWaitStatistics`.
+        self.last_wait_statistics = None
+
+        # The background workers of the generators we've created that are still prefetching.
+        self._prefetch_pools = []
+
     def create_generator(self, dataset: IndexedDataset):
         """
         Main external API call: converts an ``IndexedDataset`` into a data generator suitable for
@@ -111,28 +156,154 @@ class DataGenerator:
         """
         grouped_instances = self.__create_batches(dataset)
         self.last_num_batches = len(grouped_instances)
-        def generator():
+        wait_statistics = DataWaitStatistics()
+        self.last_wait_statistics = wait_statistics
+        # The sizes of the batches the schedule has handed out but the generator hasn't yielded
+        # yet (with prefetching, the schedule runs ahead of the generator).
+        batch_sizes = deque()
+        def batch_schedule():
+            # Yields each batch (as a list of indices), and whether it's the last one in an epoch.
+            groups = grouped_instances
             while True:
+                for i, group in enumerate(groups):
+                    batch_sizes.append(self.__count_tokens(dataset, group))
+                    yield group, i == len(groups) - 1
                 if self.sort_every_epoch:
-                    unpadded_dataset = deepcopy(dataset)
-                    groups = self.__create_batches(unpadded_dataset)
-                else:
-                    groups = grouped_instances
-                for group in groups:
-                    batch = IndexedDataset(group)
-                    batch.pad_instances(self.text_trainer.get_padding_lengths(), verbose=False)
-                    yield batch.as_training_data()
+                    # Collation doesn't modify the instances, and re-sorting just gives us a new
+                    # order of indices, so we never need to copy the dataset here.
+                    groups = self.__create_batches(dataset)
+        def generator():
+            # We only ever build one batch of instances at a time (or ``prefetch_batches`` of
+            # them), which matters for datasets that don't store their instances as python objects
+            # (like a ``CompactIndexedDataset``).
+            if self.prefetch_batches > 0:
+                batches = self.__prefetch(dataset, batch_schedule())
+            else:
+                batches = self.__collate(dataset, batch_schedule())
+            while True:
+                with wait_statistics.waiting():
+                    batch, end_of_epoch = next(batches)
+                wait_statistics.record_batch(*batch_sizes.popleft())
+                if end_of_epoch:
+                    wait_statistics.end_epoch()
+                yield batch
         return generator()
 
-    def __create_batches(self, dataset: IndexedDataset) -> List[List[IndexedInstance]]:
+    def create_scoring_batches(self, dataset: IndexedDataset) -> Iterator[Tuple[List[int], Tuple]]:
+        """
+        Converts an ``IndexedDataset`` into batches for scoring (or any other single pass over the
+        data), yielding ``(indices, (inputs, labels))`` for each batch, where ``indices`` are the
+        positions in ``dataset.instances`` of the instances in the batch.  We group instances into
+        batches the same way :func:`create_generator` does, but without padding noise or
+        shuffling, so with ``dynamic_padding`` the batches go from shortest to longest, and each
+        is only padded to its own longest instance.  Prefetching works as in
+        :func:`create_generator`.
+        """
+        grouped_instances = self.__create_batches(dataset, for_scoring=True)
+        self.last_num_batches = len(grouped_instances)
+        schedule = ((group, i == len(grouped_instances) - 1) for i, group in enumerate(grouped_instances))
+        if self.prefetch_batches > 0:
+            batches = self.__prefetch(dataset, schedule)
+        else:
+            batches = self.__collate(dataset, schedule)
+        for group, (batch, _) in zip(grouped_instances, batches):
+            yield group, batch
+
+    def get_epoch_batches(self, dataset: IndexedDataset) -> List[List[int]]:
+        """
+        Returns the batches that :func:`create_generator` would make for one epoch of ``dataset``,
+        as lists of indices into ``dataset.instances``, without collating them.  This is useful
+        for looking at how a particular setting groups the data (see
+        :func:`~deep_qa.data.padding_analysis.analyze_padding`).
+        """
+        return self.__create_batches(dataset)
+
+    def needs_memory_calibration(self) -> bool:
+        """
+        Returns ``True`` if we were asked to calibrate ``adaptive_memory_usage_constant`` and we
+        haven't yet.
+        """
+        return (self.adaptive_batch_sizes and self.memory_calibrator is not None
+                and not self.adaptive_memory_usage_constant)
+
+    def calibrate_memory_usage(self, model, dataset: IndexedDataset) -> int:
+        """
+        Sets ``adaptive_memory_usage_constant`` by running probe training steps of ``model`` on the
+        largest instances in ``dataset`` (see :class:`~deep_qa.data.memory_calibration.MemoryCalibrator`),
+        and returns it.  This has to happen before you call :func:`create_generator`.
+        """
+        self.adaptive_memory_usage_constant = self.memory_calibrator.calibrate(self.text_trainer, model, dataset)
+        return self.adaptive_memory_usage_constant
+
+    def close(self):
+        """
+        Stops the background workers of every generator we've created that's still prefetching
+        batches.  Those generators can't be used after this; generators you create later start
+        their own workers.
+        """
+        for pool in self._prefetch_pools:
+            pool.terminate()
+            pool.join()
+        self._prefetch_pools = []
+
+    def __collate(self, dataset: IndexedDataset, schedule: Iterator[Tuple[List[int], bool]]):
+        for group, end_of_epoch in schedule:
+            yield _collate_batch(dataset, group, self.text_trainer.get_padding_lengths()), end_of_epoch
+
+    def __prefetch(self, dataset: IndexedDataset, schedule: Iterator[Tuple[List[int], bool]]):
+        """
+        Collates the batches in ``schedule`` in the background, keeping up to ``prefetch_batches``
+        of them in flight, and yields them in order.  Note that we advance ``schedule`` (which
+        decides which instances go in each batch, using ``random``) in the calling thread, so the
+        batches are the same as without prefetching.
+        """
+        if self.num_workers > 1:
+            pool = multiprocessing.Pool(self.num_workers,
+                                        initializer=_initialize_collation_worker,
+                                        initargs=(dataset,))
+            collate = _collate_batch_with_worker
+        else:
+            pool = ThreadPool(1)
+            collate = functools.partial(_collate_batch, dataset)
+        self._prefetch_pools.append(pool)
+        pending = deque()
+        try:
+            for group, end_of_epoch in schedule:
+                padding_lengths = self.text_trainer.get_padding_lengths()
+                pending.append((pool.apply_async(collate, (group, padding_lengths)), end_of_epoch))
+                if len(pending) < self.prefetch_batches:
+                    continue
+                result, end_of_epoch = pending.popleft()
+                yield result.get(), end_of_epoch
+            # The schedule only ends when we're scoring, not when we're training.
+            while pending:
+                result, end_of_epoch = pending.popleft()
+                yield result.get(), end_of_epoch
+        finally:
+            pool.terminate()
+            if pool in self._prefetch_pools:
+                self._prefetch_pools.remove(pool)
+
+    def __create_batches(self, dataset: IndexedDataset, for_scoring: bool=False) -> List[List[int]]:
+        """
+        Returns the batches for an epoch, as lists of indices into ``dataset.instances``.  We don't
+        modify ``dataset``.  If ``for_scoring`` is ``True``, we don't add noise to the padding
+        lengths, and we return the batches in sorted order instead of shuffling them.
+        """
         if self.dynamic_padding:
-            dataset.sort_by_padding(self.text_trainer.get_instance_sorting_keys(), self.padding_noise)
-        instances = dataset.instances
+            padding_noise = 0.0 if for_scoring else self.padding_noise
+            order = dataset.get_padding_sort_order(self.text_trainer.get_instance_sorting_keys(), padding_noise)
+        else:
+            order = list(range(len(dataset.instances)))
         if self.adaptive_batch_sizes:
-            grouped_instances = self.__adaptive_grouping(instances)
+            keys, matrix = dataset.get_padding_length_matrix()
+            grouped_instances = self.__adaptive_grouping(keys, matrix[order].tolist())
+            grouped_instances = [[order[position] for position in group] for group in grouped_instances]
         else:
-            grouped_instances = group_by_count(instances, self.text_trainer.batch_size, None)
-            grouped_instances[-1] = [instance for instance in grouped_instances[-1] if instance is not None]
+            grouped_instances = group_by_count(order, self.text_trainer.batch_size, None)
+            grouped_instances[-1] = [index for index in grouped_instances[-1] if index is not None]
+        if for_scoring:
+            return grouped_instances
         if self.biggest_batch_first:
             # We'll actually pop the last _two_ batches, because the last one might not
             # be full.
@@ -145,28 +316,174 @@ class DataGenerator:
             random.shuffle(grouped_instances)
         return grouped_instances
 
-    def __adaptive_grouping(self, instances: List[IndexedInstance]):
+    def __adaptive_grouping(self, keys: List[str], instance_padding_lengths: List[List[int]]):
+        """
+        Groups instances into batches, given the padding lengths of each instance (in the order
+        we want to group them in, with one length per key in ``keys``).  Returns lists of
+        positions in ``instance_padding_lengths``.
+        """
         batches = []
         current_batch = []
-        current_lengths = {}
+        current_lengths = None
         logger.debug("Creating adatpive groups")
-        for instance in instances:
-            current_batch.append(instance)
-            instance_lengths = instance.get_padding_lengths()
-            for key in instance_lengths:
-                current_lengths[key] = max(instance_lengths[key], current_lengths.get(key, -1))
-            big_o_memory_constant = self.text_trainer.get_padding_memory_scaling(current_lengths)
+        for index, instance_lengths in enumerate(instance_padding_lengths):
+            current_batch.append(index)
+            if current_lengths is None:
+                current_lengths = instance_lengths
+            else:
+                current_lengths = [max(lengths) for lengths in zip(current_lengths, instance_lengths)]
+            big_o_memory_constant = self.text_trainer.get_padding_memory_scaling(dict(zip(keys, current_lengths)))
             if (len(current_batch) * big_o_memory_constant > self.adaptive_memory_usage_constant
                         or len(current_batch) > self.maximum_batch_size):
                 current_batch.pop()
                 if logger.getEffectiveLevel() <= logging.DEBUG:
-                    padding_lengths = IndexedDataset(current_batch).padding_lengths()
+                    padding_lengths = self.__batch_padding_lengths(current_batch, keys, instance_padding_lengths)
                     logger.debug("Batch size: %d; padding: %s", len(current_batch), padding_lengths)
                 batches.append(current_batch)
-                current_batch = [instance]
+                current_batch = [index]
                 current_lengths = instance_lengths
         if logger.getEffectiveLevel() <= logging.DEBUG:
-            padding_lengths = IndexedDataset(current_batch).padding_lengths()
+            padding_lengths = self.__batch_padding_lengths(current_batch, keys, instance_padding_lengths)
             logger.debug("Batch size: %d; padding: %s", len(current_batch), padding_lengths)
         batches.append(current_batch)
         return batches
+
+    def __count_tokens(self, dataset: IndexedDataset, group: List[int]) -> Tuple[int, int, int]:
+        """
+        Returns the number of instances in a batch, the number of tokens in them, and the number of
+        positions in the padded batch (see :func:`count_batch_tokens`).
+        """
+        keys, matrix = dataset.get_padding_length_matrix()
+        num_tokens, num_padded_tokens = count_batch_tokens(keys, matrix, group,
+                                                           self.text_trainer.get_instance_sorting_keys(),
+                                                           self.text_trainer.get_padding_lengths())
+        return len(group), num_tokens, num_padded_tokens
+
+    @staticmethod
+    def __batch_padding_lengths(batch: List[int], keys: List[str], instance_padding_lengths: List[List[int]]):
+        return dict(zip(keys, [max(lengths) for lengths in zip(*[instance_padding_lengths[i] for i in batch])]))
+
+
+class DataWaitStatistics:
+    """
+    Keeps track of how long the consumer of a ``DataGenerator``'s generator (typically Keras'
+    ``fit_generator``) waits for batches, and how long it spends between batches (typically
+    training on them).  If the wait time is a large fraction of the total, training is bound by
+    data loading, and prefetching will help.  Note that Keras reads from generators in its own
+    thread, with its own queue (``max_q_size``), so this measures the wait in that thread.
+
+    We also count the instances and tokens in the batches, and how many of the positions in the
+    padded batches are padding, counting along the model's instance sorting keys.
+    """
+    def __init__(self):
+        self.num_batches = 0
+        self.wait_time = 0.0
+        self.step_time = 0.0
+        self.num_epochs = 0
+        self.num_instances = 0
+        self.num_tokens = 0
+        self.num_padded_tokens = 0
+        self._last_batch_time = None
+        self._epoch_start = (0, 0.0, 0.0)
+
+    @contextmanager
+    def waiting(self):
+        start = time.time()
+        if self._last_batch_time is not None:
+            self.step_time += start - self._last_batch_time
+        yield
+        self._last_batch_time = time.time()
+        self.wait_time += self._last_batch_time - start
+        self.num_batches += 1
+
+    def record_batch(self, num_instances: int, num_tokens: int, num_padded_tokens: int):
+        """
+        Records the size of a batch we yielded: the number of instances, the number of tokens in
+        them, and the number of positions in the padded batch.
+        """
+        self.num_instances += num_instances
+        self.num_tokens += num_tokens
+        self.num_padded_tokens += num_padded_tokens
+
+    def end_epoch(self):
+        """
+        Logs the statistics for the epoch that just finished.
+        """
+        self.num_epochs += 1
+        num_batches = self.num_batches - self._epoch_start[0]
+        wait_time = self.wait_time - self._epoch_start[1]
+        step_time = self.step_time - self._epoch_start[2]
+        total_time = wait_time + step_time
+        logger.info("Epoch %d: waited %.2f seconds for %d batches (%.1f%% of the time)",
+                    self.num_epochs, wait_time, num_batches,
+                    100.0 * wait_time / total_time if total_time > 0 else 0.0)
+        self._epoch_start = (self.num_batches, self.wait_time, self.step_time)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Returns the totals so far, as a dictionary.
+        """
+        total_time = self.wait_time + self.step_time
+        return {
+                'num_batches': self.num_batches,
+                'data_wait_seconds': self.wait_time,
+                'step_seconds': self.step_time,
+                'data_wait_fraction': self.wait_time / total_time if total_time > 0 else 0.0,
+                'num_instances': self.num_instances,
+                'num_tokens': self.num_tokens,
+                'padding_fraction': (1.0 - self.num_tokens / self.num_padded_tokens
+                                     if self.num_padded_tokens > 0 else 0.0),
+                }
+
+
+def count_batch_tokens(keys: List[str],
+                       padding_length_matrix: numpy.ndarray,
+                       group: List[int],
+                       sorting_keys: List[str],
+                       padding_lengths: Dict[str, int]) -> Tuple[int, int]:
+    """
+    Returns the number of tokens in a batch of instances and the number of positions in the batch
+    once it's padded.  We count positions along the model's instance sorting keys, except
+    ``num_word_characters``, which is the length of a word, not a number of tokens.  We pad each of
+    these dimensions to its length in ``padding_lengths``, or to the longest instance in the batch
+    if that is ``None`` (or missing), like :func:`IndexedDataset.as_padded_training_data` does, and
+    tokens past the padding length get truncated.
+
+    Parameters
+    ----------
+    keys: List[str]
+        The padding length keys, as returned by :func:`IndexedDataset.get_padding_length_matrix`.
+    padding_length_matrix: numpy.ndarray
+        The padding lengths of each instance in the dataset, with one column per key.
+    group: List[int]
+        The rows of ``padding_length_matrix`` in the batch.
+    sorting_keys: List[str]
+        The model's instance sorting keys.
+    padding_lengths: Dict[str, int]
+        The model's padding lengths.
+    """
+    num_tokens = 0
+    num_padded_tokens = 0
+    for key in sorting_keys:
+        if key == 'num_word_characters' or key not in keys:
+            continue
+        lengths = padding_length_matrix[group, keys.index(key)]
+        padding_length = padding_lengths.get(key)
+        if padding_length is None:
+            padding_length = int(lengths.max())
+        num_tokens += int(numpy.minimum(lengths, padding_length).sum())
+        num_padded_tokens += padding_length * len(group)
+    return num_tokens, num_padded_tokens
+
+
+def _collate_batch(dataset: IndexedDataset, group: List[int], padding_lengths: Dict[str, int]):
+    return dataset.select(group).as_padded_training_data(padding_lengths)
+
+
+def _initialize_collation_worker(dataset: IndexedDataset):
+    global _worker_dataset  # pylint: disable=global-statement,invalid-name
+    _worker_dataset = dataset
+
+
+def _collate_batch_with_worker(group: List[int], padding_lengths: Dict[str, int]):
+    return _collate_batch(_worker_dataset, group, padding_lengths)
@@ -1,9 +1,18 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
 import codecs
+import hashlib
+import itertools
+import json
 import logging
+import math
+import multiprocessing
+from typing import Dict, Iterable, List, Union
+import zlib
 
 import tqdm
 
+from ..common.checks import ConfigurationError
+
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
@@ -19,6 +28,10 @@ class DataIndexer:
     for 'a' as a word, and 'a' as a character, for instance.  Most of the methods on this class
     allow you to pass in a namespace; by default we use the 'words' namespace, and you can omit the
     namespace argument everywhere and just use the default.
+
+    Namespaces can also be `hashed` (see :func:`set_hashing`), in which case we don't need to fit
+    a vocabulary for them: words that aren't in the index are mapped to one of a fixed number of
+    buckets by a hash of the word, instead of to the OOV token.
     """
     def __init__(self):
         # Typically all input words to this code are lower-cased, so we could simply use "PADDING"
@@ -26,25 +39,103 @@ class DataIndexer:
         # it is used later in a setting where not all input is lowercase.
         self._padding_token = "@@PADDING@@"
         self._oov_token = "@@UNKOWN@@"
-        self.word_indices = defaultdict(lambda: {self._padding_token: 0, self._oov_token: 1})
-        self.reverse_word_indices = defaultdict(lambda: {0: self._padding_token, 1: self._oov_token})
+        self._word_indices = defaultdict(lambda: {self._padding_token: 0, self._oov_token: 1})
+        # The reverse mapping only needs a list per namespace, with the word with index ``i`` at
+        # position ``i``, which is a lot smaller than a dictionary.
+        self.reverse_word_indices = defaultdict(lambda: [self._padding_token, self._oov_token])
+        # Namespaces that we've loaded (with ``load``) but haven't built word-to-index dictionaries
+        # for yet.  Hashing every word in a large vocabulary takes most of the time it takes to
+        # load one, and we don't need the dictionaries unless we're indexing text.
+        self._unindexed_namespaces = set()
+        # Maps hashed namespaces to their ``(num_buckets, num_exact_words)``.
+        self._hashed_namespaces = {}
         self._finalized = False
 
+    @property
+    def word_indices(self) -> Dict[str, Dict[str, int]]:
+        """
+        Maps each namespace to a dictionary from words to their indices.
+        """
+        for namespace in self._unindexed_namespaces:
+            words = self.reverse_word_indices[namespace]
+            # If a word appears twice (which ``set_from_file`` allows), the later index wins, just
+            # like it did when the words were added.
+            self._word_indices[namespace] = dict(zip(words, range(len(words))))
+        self._unindexed_namespaces = set()
+        return self._word_indices
+
+    def __getstate__(self):
+        # The default factories of our defaultdicts are lambdas, which the standard ``pickle``
+        # module can't handle (``dill`` can, but we also need to send DataIndexers to worker
+        # processes with ``multiprocessing``).  So we pickle plain dicts, and re-create the
+        # defaultdicts in ``__setstate__``.
+        state = dict(self.__dict__)
+        state['_word_indices'] = dict(self.word_indices)
+        state['_unindexed_namespaces'] = set()
+        state['reverse_word_indices'] = dict(self.reverse_word_indices)
+        return state
+
+    def __setstate__(self, state):
+        # DataIndexers pickled by older versions have ``word_indices`` instead of
+        # ``_word_indices``, and dictionaries in ``reverse_word_indices``.
+        if 'word_indices' in state:
+            state['_word_indices'] = state.pop('word_indices')
+        state.setdefault('_unindexed_namespaces', set())
+        state.setdefault('_hashed_namespaces', {})
+        self.__dict__.update(state)
+        self._word_indices = defaultdict(lambda: {self._padding_token: 0, self._oov_token: 1},
+                                         state['_word_indices'])
+        reverse_word_indices = {namespace: _index_dict_to_list(words) if isinstance(words, dict) else words
+                                for namespace, words in state['reverse_word_indices'].items()}
+        self.reverse_word_indices = defaultdict(lambda: [self._padding_token, self._oov_token],
+                                                reverse_word_indices)
+
     def set_from_file(self, filename: str, oov_token: str="@@UNKNOWN@@", namespace: str="words"):
         self._oov_token = oov_token
         self.word_indices[namespace] = {self._padding_token: 0}
-        self.reverse_word_indices[namespace] = {0: self._padding_token}
+        self.reverse_word_indices[namespace] = [self._padding_token]
         with codecs.open(filename, 'r', 'utf-8') as input_file:
             for i, line in enumerate(input_file.readlines()):
                 token = line[:-1]  # remove the newline
                 self.word_indices[namespace][token] = i + 1
-                self.reverse_word_indices[namespace][i + 1] = token
+                self.reverse_word_indices[namespace].append(token)
+
+    def set_hashing(self, namespace: str, num_buckets: int, num_exact_words: int=0):
+        """
+        Makes ``namespace`` a hashed namespace.  Indices 0 and 1 are still the padding and OOV
+        tokens, the next ``num_exact_words`` indices are for words that we add to the index as
+        usual (e.g., the most frequent words, when we fit the vocabulary), and the
+        ``num_buckets`` indices after that are hash buckets, which every other word gets mapped
+        to.  So the vocabulary size is fixed at ``2 + num_exact_words + num_buckets``, and if
+        ``num_exact_words`` is zero, there's no need to fit a vocabulary at all.
+
+        The hash is stable across processes and runs (unlike python's ``hash``), so a model indexes
+        the same word the same way every time it's loaded.  This must be called before we add any
+        words to ``namespace``.
+        """
+        if len(self.reverse_word_indices[namespace]) > 2:
+            raise ConfigurationError("Can't start hashing namespace %s, which already has words in it"
+                                     % namespace)
+        if num_buckets < 1:
+            raise ConfigurationError("Hashed namespaces need at least one bucket")
+        self._hashed_namespaces[namespace] = (num_buckets, num_exact_words)
+
+    def needs_fitting(self, namespaces: Iterable[str]) -> bool:
+        """
+        Returns ``False`` if every namespace in ``namespaces`` is hashed without any exact words,
+        so that :func:`fit_word_dictionary` wouldn't change how we index anything in them.
+        """
+        return any(self._hashed_namespaces.get(namespace, (0, 1))[1] > 0 for namespace in namespaces)
 
     def finalize(self):
         logger.info("Finalizing data indexer")
         self._finalized = True
 
-    def fit_word_dictionary(self, dataset, min_count: int=1):
+    def fit_word_dictionary(self,
+                            dataset,
+                            min_count: int=1,
+                            max_vocab_size: Union[int, Dict[str, int]]=None,
+                            num_workers: int=1):
         """
         Given a ``Dataset``, this method decides which words are given an index, and which ones are
         mapped to an OOV token (in this case "UNK").  This method must be called before any dataset
@@ -52,7 +143,10 @@ class DataIndexer:
         basically map every token onto "UNK".
 
         We call ``instance.words()`` for each instance in the dataset, and then keep all words that
-        appear at least ``min_count`` times.
+        appear at least ``min_count`` times (and, optionally, only the ``max_vocab_size`` most
+        frequent of those).  Words are added to the index in the order in which they first appear
+        in the dataset, so the resulting indices are deterministic, no matter how many workers we
+        use for counting.
 
         Parameters
         ----------
@@ -62,6 +156,17 @@ class DataIndexer:
         min_count: int, optional (default=1)
             The minimum number of occurences a word must have in the dataset
             in order to be assigned an index.
+
+        max_vocab_size: int or Dict[str, int], optional (default=None)
+            If given, we keep at most this many words in each namespace (not counting the padding
+            and OOV tokens), preferring more frequent words, and breaking ties by which word
+            appeared first.  If this is a dictionary, it gives a limit for each namespace, and
+            namespaces that are not in the dictionary are not limited.  Hashed namespaces are
+            always limited to their ``num_exact_words``.
+
+        num_workers: int, optional (default=1)
+            If greater than one, we split the dataset into shards and count words in each shard in
+            a separate process, then merge the counts.
         """
         logger.info("Fitting word dictionary with min count of %d, finalized is %s",
                     min_count, self._finalized)
@@ -69,16 +174,42 @@ class DataIndexer:
             logger.warning("Trying to fit a finalized DataIndexer.  This is a no-op.  Did you "
                            "really want to do this?")
             return
-        namespace_word_counts = defaultdict(lambda: defaultdict(int))
-        for instance in tqdm.tqdm(dataset.instances):
-            namespace_dict = instance.words()
-            for namespace in namespace_dict:
-                for word in namespace_dict[namespace]:
-                    namespace_word_counts[namespace][word] += 1
-        for namespace in tqdm.tqdm(namespace_word_counts):
-            for word, count in namespace_word_counts[namespace].items():
-                if count >= min_count:
-                    self.add_word_to_index(word, namespace)
+        instances = dataset.instances
+        if num_workers > 1 and len(instances) > num_workers:
+            shard_size = math.ceil(len(instances) / (num_workers * _SHARDS_PER_WORKER))
+            shards = [instances[start:start + shard_size] for start in range(0, len(instances), shard_size)]
+            from .instances.instance import TextInstance
+            with multiprocessing.Pool(num_workers,
+                                      initializer=_initialize_counting_worker,
+                                      initargs=(TextInstance.tokenizer,)) as pool:
+                shard_counts = list(tqdm.tqdm(pool.imap(_count_words, shards), total=len(shards)))
+        else:
+            with tqdm.tqdm(total=len(instances)) as progress_bar:
+                shard_counts = [_count_words(instances, progress_bar)]
+
+        # Merging the counters in shard order keeps words in the order in which they first appear
+        # in the whole dataset, which is what makes word indices deterministic.
+        namespace_word_counts = {}
+        for counts in shard_counts:
+            for namespace, word_counts in counts.items():
+                namespace_word_counts.setdefault(namespace, Counter()).update(word_counts)
+
+        for namespace, word_counts in namespace_word_counts.items():
+            words = [word for word, count in word_counts.items() if count >= min_count]
+            if isinstance(max_vocab_size, dict):
+                namespace_max_size = max_vocab_size.get(namespace, None)
+            else:
+                namespace_max_size = max_vocab_size
+            if namespace in self._hashed_namespaces:
+                num_exact_words = self._hashed_namespaces[namespace][1]
+                namespace_max_size = min(namespace_max_size or num_exact_words, num_exact_words)
+            if namespace_max_size is not None and len(words) > namespace_max_size:
+                # ``sorted`` is stable, so ties stay in order of first appearance.
+                most_frequent = sorted(words, key=word_counts.__getitem__, reverse=True)
+                kept_words = set(most_frequent[:namespace_max_size])
+                words = [word for word in words if word in kept_words]
+            for word in words:
+                self.add_word_to_index(word, namespace)
 
     def add_word_to_index(self, word: str, namespace: str='words') -> int:
         """
@@ -90,9 +221,12 @@ class DataIndexer:
                            "Did you really want to do this?")
             return self.word_indices[namespace].get(word, -1)
         if word not in self.word_indices[namespace]:
-            index = len(self.word_indices[namespace])
+            index = len(self.reverse_word_indices[namespace])
+            if namespace in self._hashed_namespaces and index >= 2 + self._hashed_namespaces[namespace][1]:
+                # We're out of room for exact words, so this one stays hashed.
+                return self.get_word_index(word, namespace)
             self.word_indices[namespace][word] = index
-            self.reverse_word_indices[namespace][index] = word
+            self.reverse_word_indices[namespace].append(word)
             return index
         else:
             return self.word_indices[namespace][word]
@@ -101,13 +235,174 @@ class DataIndexer:
         return self.word_indices[namespace].keys()
 
     def get_word_index(self, word: str, namespace: str='words'):
-        if word in self.word_indices[namespace]:
-            return self.word_indices[namespace][word]
+        word_indices = self.word_indices[namespace]
+        if word in word_indices:
+            return word_indices[word]
+        elif namespace in self._hashed_namespaces:
+            num_buckets, num_exact_words = self._hashed_namespaces[namespace]
+            return 2 + num_exact_words + _hash_word(word) % num_buckets
         else:
-            return self.word_indices[namespace][self._oov_token]
+            return word_indices[self._oov_token]
+
+    def get_word_indices(self, words: Iterable[str], namespace: str='words') -> List[int]:
+        """
+        Returns ``[self.get_word_index(word, namespace) for word in words]``, but with a single
+        dictionary lookup per word, which makes a big difference when indexing a lot of text.
+        """
+        word_indices = self.word_indices[namespace]
+        if namespace in self._hashed_namespaces:
+            num_buckets, num_exact_words = self._hashed_namespaces[namespace]
+            first_bucket = 2 + num_exact_words
+            return [word_indices[word] if word in word_indices else first_bucket + _hash_word(word) % num_buckets
+                    for word in words]
+        if self._oov_token not in word_indices:
+            # Vocabularies read with ``set_from_file`` might not have an OOV token, in which case
+            # we fail on unknown words just like ``get_word_index`` does.
+            return [self.get_word_index(word, namespace) for word in words]
+        return list(map(word_indices.get, words, itertools.repeat(word_indices[self._oov_token])))
 
     def get_word_from_index(self, index: int, namespace: str='words'):
-        return self.reverse_word_indices[namespace][index]
+        words = self.reverse_word_indices[namespace]
+        if namespace in self._hashed_namespaces and index >= len(words):
+            num_buckets, num_exact_words = self._hashed_namespaces[namespace]
+            if 2 + num_exact_words <= index < 2 + num_exact_words + num_buckets:
+                return "@@HASH_BUCKET_%d@@" % (index - 2 - num_exact_words)
+            if index < 2 + num_exact_words:
+                # Nothing gets mapped to exact word slots that we never filled.
+                return self._padding_token
+        return words[index]
 
     def get_vocab_size(self, namespace: str='words'):
-        return len(self.word_indices[namespace])
+        if namespace in self._hashed_namespaces:
+            num_buckets, num_exact_words = self._hashed_namespaces[namespace]
+            return 2 + num_exact_words + num_buckets
+        return len(self.reverse_word_indices[namespace])
+
+    def get_fingerprint(self) -> str:
+        """
+        Returns a hash of the complete state of this ``DataIndexer`` (the special tokens, and every
+        word-to-index mapping in every namespace, and whether we are finalized).  Two
+        ``DataIndexers`` with the same fingerprint will index any dataset identically, so this is
+        suitable for use as part of a cache key for indexed data.
+        """
+        hasher = hashlib.sha1()
+        hasher.update(json.dumps([self._padding_token, self._oov_token, self._finalized]).encode('utf-8'))
+        if self._hashed_namespaces:
+            hasher.update(json.dumps(sorted(self._hashed_namespaces.items())).encode('utf-8'))
+        for namespace in sorted(self.word_indices.keys()):
+            words = sorted(self.word_indices[namespace].items(), key=lambda item: item[1])
+            hasher.update(json.dumps([namespace, words]).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def save(self, filename: str):
+        """
+        Saves this ``DataIndexer`` to ``filename``, in a format that :func:`load` can read much
+        faster than unpickling.  The file starts with a line of json describing the special tokens
+        and the namespaces, followed by the words in each namespace, in index order, as one block
+        of utf-8 text per namespace.
+        """
+        namespaces = []
+        blocks = []
+        for namespace, words in self.reverse_word_indices.items():
+            # Words are separated by a character that doesn't appear in any of them (which, for
+            # any real vocabulary, is a newline).
+            separator = _find_separator(words)
+            block = separator.join(words).encode('utf-8')
+            namespaces.append({'name': namespace,
+                               'size': len(words),
+                               'num_bytes': len(block),
+                               'separator': separator})
+            blocks.append(block)
+        header = {
+                'format': 'deep_qa.DataIndexer',
+                'version': DATA_INDEXER_FORMAT_VERSION,
+                'padding_token': self._padding_token,
+                'oov_token': self._oov_token,
+                'finalized': self._finalized,
+                'hashed_namespaces': self._hashed_namespaces,
+                'namespaces': namespaces,
+                }
+        with open(filename, 'wb') as output_file:
+            output_file.write(json.dumps(header).encode('utf-8') + b'\n')
+            for block in blocks:
+                output_file.write(block)
+
+    @classmethod
+    def load(cls, filename: str) -> 'DataIndexer':
+        """
+        Loads a ``DataIndexer`` saved with :func:`save`.
+        """
+        with open(filename, 'rb') as input_file:
+            header = json.loads(input_file.readline().decode('utf-8'))
+            if header.get('format') != 'deep_qa.DataIndexer':
+                raise ConfigurationError("%s is not a saved DataIndexer" % filename)
+            if header['version'] != DATA_INDEXER_FORMAT_VERSION:
+                raise ConfigurationError("%s has DataIndexer format version %s, but we can only read version %d"
+                                         % (filename, header['version'], DATA_INDEXER_FORMAT_VERSION))
+            data_indexer = cls()
+            data_indexer._padding_token = header['padding_token']
+            data_indexer._oov_token = header['oov_token']
+            data_indexer._finalized = header['finalized']
+            data_indexer._hashed_namespaces = {namespace: tuple(hashing) for namespace, hashing
+                                               in header.get('hashed_namespaces', {}).items()}
+            for namespace in header['namespaces']:
+                words = input_file.read(namespace['num_bytes']).decode('utf-8').split(namespace['separator'])
+                if len(words) != namespace['size']:
+                    raise ConfigurationError("%s is truncated or corrupted" % filename)
+                data_indexer.reverse_word_indices[namespace['name']] = words
+                data_indexer._unindexed_namespaces.add(namespace['name'])
+        return data_indexer
+
+
+# When counting words in parallel, we split the data into this many shards per worker.
+_SHARDS_PER_WORKER = 4
+
+# How many instances we hand to ``Tokenizer.prepare_instances`` at a time, when counting words here
+# or when indexing a dataset.  This bounds the extra memory used by batch tokenization, and keeps
+# the progress bars moving.
+TOKENIZATION_CHUNK_SIZE = 10000
+
+
+# The version of the file format written by ``DataIndexer.save``.  Increase this if you change the
+# format, so old files fail loudly instead of loading incorrectly.
+DATA_INDEXER_FORMAT_VERSION = 1
+
+# The characters we try, in order, to separate words in a saved ``DataIndexer``.
+_SEPARATORS = ['\n', '\x00', '\x1e', '\x1f']
+
+
+def _find_separator(words: List[str]) -> str:
+    for separator in _SEPARATORS:
+        if not any(separator in word for word in words):
+            return separator
+    raise ConfigurationError("Can't save a vocabulary whose words contain all of %s" % str(_SEPARATORS))
+
+
+def _hash_word(word: str) -> int:
+    return zlib.crc32(word.encode('utf-8'))
+
+
+def _index_dict_to_list(index_to_word: Dict[int, str]) -> List[str]:
+    words = [None] * (max(index_to_word) + 1)
+    for index, word in index_to_word.items():
+        words[index] = word
+    return words
+
+
+def _initialize_counting_worker(tokenizer):
+    from .instances.instance import TextInstance
+    TextInstance.tokenizer = tokenizer
+
+
+def _count_words(instances: List, progress_bar: tqdm.tqdm=None) -> Dict[str, Counter]:
+    from .instances.instance import TextInstance
+    namespace_word_counts = {}
+    for start in range(0, len(instances), TOKENIZATION_CHUNK_SIZE):
+        chunk = instances[start:start + TOKENIZATION_CHUNK_SIZE]
+        TextInstance.tokenizer.prepare_instances(chunk)
+        for instance in chunk:
+            for namespace, words in instance.words().items():
+                namespace_word_counts.setdefault(namespace, Counter()).update(words)
+        if progress_bar is not None:
+            progress_bar.update(len(chunk))
+    return namespace_word_counts
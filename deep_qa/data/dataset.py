@@ -1,17 +1,27 @@
-import codecs
+from collections import Counter
+from copy import deepcopy
 import itertools
 import logging
-from typing import Dict, List
+import math
+import multiprocessing
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
 
 import numpy
+from overrides import overrides
 import tqdm
 
-from ..common.util import add_noise_to_dict_values
-from .data_indexer import DataIndexer
+from ..common.util import open_text_file
+from .data_indexer import DataIndexer, TOKENIZATION_CHUNK_SIZE
+from .instances.collation import collate_instances
 from .instances.instance import Instance, TextInstance, IndexedInstance
+from .ragged_arrays import RaggedArrays, flatten_chunks, restore_value
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+# When indexing in parallel, we split the data into this many shards per worker, so that workers
+# that get easy shards don't sit idle while others finish.
+_SHARDS_PER_WORKER = 4
+
 
 class Dataset:
     """
@@ -63,31 +73,220 @@ class TextDataset(Dataset):
     def __init__(self, instances: List[TextInstance]):
         super(TextDataset, self).__init__(instances)
 
-    def to_indexed_dataset(self, data_indexer: DataIndexer) -> 'IndexedDataset':
+    def to_indexed_dataset(self,
+                           data_indexer: DataIndexer,
+                           num_workers: int=1,
+                           compact: bool=False) -> 'IndexedDataset':
         '''
         Converts the Dataset into an IndexedDataset, given a DataIndexer.
+
+        If ``num_workers`` is greater than one, we shard the instances across a pool of that many
+        processes, each of which has its own copy of ``data_indexer`` and of the ``TextInstance``
+        tokenizer, and we reassemble the results in order.  This gives exactly the same output as
+        indexing serially, including any words that get added to ``data_indexer`` during indexing
+        (like the stop token in ``CharacterSpanInstances``).
+
+        If ``compact`` is ``True``, we return a :class:`CompactIndexedDataset`, which we build
+        chunk by chunk (or shard by shard) as we index, so we never hold the whole dataset as
+        python lists.
         '''
-        indexed_instances = [instance.to_indexed_instance(data_indexer) for instance in tqdm.tqdm(self.instances)]
+        if num_workers > 1 and len(self.instances) > num_workers:
+            indexed_dataset = self.__index_in_parallel(data_indexer, num_workers, compact)
+            if indexed_dataset is not None:
+                return indexed_dataset
+        with tqdm.tqdm(total=len(self.instances)) as progress_bar:
+            if compact:
+                chunks = (_index_instances(self.instances[start:start + TOKENIZATION_CHUNK_SIZE],
+                                           data_indexer,
+                                           progress_bar)
+                          for start in range(0, len(self.instances), TOKENIZATION_CHUNK_SIZE))
+                return CompactIndexedDataset.from_chunks(chunks)
+            indexed_instances = _index_instances(self.instances, data_indexer, progress_bar)
         return IndexedDataset(indexed_instances)
 
+    def __index_in_parallel(self, data_indexer: DataIndexer, num_workers: int, compact: bool) -> 'IndexedDataset':
+        """
+        Indexes shards of ``self.instances`` in a process pool.  Each shard is indexed starting
+        from the state ``data_indexer`` is in right now, and the worker reports back any words it
+        had to add to the index while doing so.  We then add those words to ``data_indexer`` in
+        shard order, which is the same order indexing serially would have added them.  If the
+        workers didn't agree on the indices of those words (which could only happen if different
+        shards add different words), we return ``None``, and the caller falls back to indexing
+        serially.
+        """
+        shard_size = math.ceil(len(self.instances) / (num_workers * _SHARDS_PER_WORKER))
+        shards = [self.instances[start:start + shard_size]
+                  for start in range(0, len(self.instances), shard_size)]
+        logger.info("Indexing %d instances with %d workers", len(self.instances), num_workers)
+        added_words_by_shard = []
+        with multiprocessing.Pool(num_workers,
+                                  initializer=_initialize_indexing_worker,
+                                  initargs=(data_indexer, TextInstance.tokenizer)) as pool:
+            def indexed_shards():
+                for indexed_shard, added_namespaces, added_words in tqdm.tqdm(pool.imap(_index_shard, shards),
+                                                                             total=len(shards)):
+                    added_words_by_shard.append((added_namespaces, added_words))
+                    yield indexed_shard
+            if compact:
+                # We compact each shard as soon as we get it, instead of waiting for all of them.
+                indexed_dataset = CompactIndexedDataset.from_chunks(indexed_shards())
+            else:
+                indexed_dataset = IndexedDataset([instance for shard in indexed_shards() for instance in shard])
+
+        new_word_indices = {}
+        for added_namespaces, added_words in added_words_by_shard:
+            for namespace in added_namespaces:
+                # Looking up a word in a new namespace creates that namespace, so we do the same.
+                data_indexer.word_indices[namespace]  # pylint: disable=pointless-statement
+            for namespace, word, index in added_words:
+                if word in data_indexer.word_indices[namespace]:
+                    expected_index = data_indexer.word_indices[namespace][word]
+                else:
+                    namespace_words = new_word_indices.setdefault(namespace, {})
+                    if word not in namespace_words:
+                        namespace_words[word] = (len(data_indexer.reverse_word_indices[namespace]) +
+                                                 len(namespace_words))
+                    expected_index = namespace_words[word]
+                if index != expected_index:
+                    logger.warning("Indexing workers disagreed on the index for %s; re-indexing serially",
+                                   word)
+                    return None
+        for namespace, namespace_words in new_word_indices.items():
+            for word in sorted(namespace_words, key=namespace_words.get):
+                if data_indexer.add_word_to_index(word, namespace) != namespace_words[word]:
+                    # This happens when the workers together filled up the exact words of a hashed
+                    # namespace.  Re-indexing serially adds the same words again, which is harmless.
+                    logger.warning("Ran out of exact words in hashed namespace %s; re-indexing serially",
+                                   namespace)
+                    return None
+        return indexed_dataset
+
+    @staticmethod
+    def read_from_file(filename: str, instance_class, max_instances: int=None):
+        """
+        Reads a ``TextDataset`` from ``filename``, which has one instance per line.  See
+        :func:`~TextDataset.stream_instances_from_file` for details on how the file is read; if
+        ``max_instances`` is given, we stop reading the file after that many instances.
+        """
+        instances = TextDataset.stream_instances_from_file(filename, instance_class)
+        return TextDataset.__read_from_instances(instances, max_instances)
+
+    @staticmethod
+    def read_from_lines(lines: Iterable[str], instance_class, max_instances: int=None):
+        instances = (instance_class.read_from_line(line) for line in lines)
+        return TextDataset.__read_from_instances(instances, max_instances)
+
     @staticmethod
-    def read_from_file(filename: str, instance_class):
-        with codecs.open(filename, 'r', 'utf-8') as input_file:
-            lines = [x.strip() for x in tqdm.tqdm(input_file.readlines())]
-            return TextDataset.read_from_lines(lines, instance_class)
+    def stream_instances_from_file(filename: str, instance_class) -> Iterator[TextInstance]:
+        """
+        Lazily reads instances from ``filename``, one per line, without ever holding the whole file
+        in memory.  The file can be compressed with gzip, bz2 or xz (see
+        :func:`~deep_qa.common.util.open_text_file`).
+        """
+        with open_text_file(filename) as input_file:
+            for line in input_file:
+                yield instance_class.read_from_line(line.strip())
 
     @staticmethod
-    def read_from_lines(lines: List[str], instance_class):
-        instances = [instance_class.read_from_line(x) for x in lines]
-        labels = [(x.label, x) for x in instances]
-        labels.sort(key=lambda x: str(x[0]))
-        label_counts = [(label, len([x for x in group]))
-                        for label, group in itertools.groupby(labels, lambda x: x[0])]
+    def __read_from_instances(instances: Iterator[TextInstance], max_instances: int=None):
+        if max_instances is not None:
+            instances = itertools.islice(instances, max_instances)
+        dataset_instances = []
+        label_counts = Counter()
+        for instance in tqdm.tqdm(instances):
+            dataset_instances.append(instance)
+            label_counts[_hashable_label(instance.label)] += 1
+        label_counts = sorted(label_counts.items(), key=lambda label_count: str(label_count[0]))
         label_count_str = str(label_counts)
         if len(label_count_str) > 100:
             label_count_str = label_count_str[:100] + '...'
         logger.info("Finished reading dataset; label counts: %s", label_count_str)
-        return TextDataset(instances)
+        return TextDataset(dataset_instances)
+
+
+# The DataIndexer for this process, when it is an indexing worker in a process pool.
+_worker_data_indexer = None  # pylint: disable=invalid-name
+
+
+def _initialize_indexing_worker(data_indexer: DataIndexer, tokenizer):
+    global _worker_data_indexer  # pylint: disable=global-statement,invalid-name
+    _worker_data_indexer = data_indexer
+    TextInstance.tokenizer = tokenizer
+
+
+def _index_instances(instances: List[TextInstance],
+                     data_indexer: DataIndexer,
+                     progress_bar: tqdm.tqdm=None) -> List[IndexedInstance]:
+    """
+    Indexes ``instances`` in chunks, giving the tokenizer a chance to tokenize each chunk's text in
+    a batch (see :func:`Tokenizer.prepare_instances
+    <deep_qa.data.tokenizers.tokenizer.Tokenizer.prepare_instances>`) before we index it.
+    """
+    indexed_instances = []
+    for start in range(0, len(instances), TOKENIZATION_CHUNK_SIZE):
+        chunk = instances[start:start + TOKENIZATION_CHUNK_SIZE]
+        TextInstance.tokenizer.prepare_instances(chunk)
+        indexed_instances.extend(instance.to_indexed_instance(data_indexer) for instance in chunk)
+        if progress_bar is not None:
+            progress_bar.update(len(chunk))
+    return indexed_instances
+
+
+def _index_shard(instances: List[TextInstance]) -> Tuple[List[IndexedInstance],
+                                                        List[str],
+                                                        List[Tuple[str, str, int]]]:
+    """
+    Indexes a shard of instances in an indexing worker, returning the indexed instances, the
+    namespaces that got created in the ``DataIndexer`` while indexing, and a list of ``(namespace,
+    word, index)`` triples for any words that got added to it.  We then undo those changes, so
+    that every shard is indexed starting from the same ``DataIndexer`` state.
+    """
+    data_indexer = _worker_data_indexer
+    # We use the length of the reverse index, which is where new words go, and not the number of
+    # distinct words, which is smaller if a vocabulary file had repeated lines.
+    vocab_sizes = {namespace: len(data_indexer.reverse_word_indices[namespace])
+                   for namespace in data_indexer.word_indices}
+    indexed_instances = _index_instances(instances, data_indexer)
+    added_namespaces = []
+    added_words = []
+    for namespace in list(data_indexer.word_indices.keys()):
+        if namespace not in vocab_sizes:
+            # This namespace got created while indexing; these are defaultdicts, so getting rid of
+            # it entirely restores the original state.
+            added_namespaces.append(namespace)
+            namespace_words = data_indexer.word_indices.pop(namespace)
+            data_indexer.reverse_word_indices.pop(namespace, None)
+            original_size = 2
+        else:
+            namespace_words = data_indexer.word_indices[namespace]
+            original_size = vocab_sizes[namespace]
+        added = sorted((index, word) for word, index in namespace_words.items() if index >= original_size)
+        for index, word in added:
+            added_words.append((namespace, word, index))
+            if namespace in vocab_sizes:
+                del data_indexer.word_indices[namespace][word]
+        if namespace in vocab_sizes:
+            del data_indexer.reverse_word_indices[namespace][original_size:]
+    return indexed_instances, added_namespaces, added_words
+
+
+def _hashable_label(label):
+    # Some instances have labels that are lists (e.g., tags for sequence tagging); we count those
+    # by their string representation.
+    try:
+        hash(label)
+        return label
+    except TypeError:
+        return str(label)
+
+
+def _get_padding_length_matrix(instance_padding_lengths: List[Dict[str, int]]):
+    keys = []
+    for lengths in instance_padding_lengths:
+        if len(lengths) != len(keys) or any(key not in lengths for key in keys):
+            keys.extend(key for key in lengths if key not in keys)
+    rows = [[lengths.get(key, 0) for key in keys] for lengths in instance_padding_lengths]
+    return keys, numpy.asarray(rows, dtype='int32').reshape(len(rows), len(keys))
 
 
 class IndexedDataset(Dataset):
@@ -100,29 +299,90 @@ class IndexedDataset(Dataset):
     def __init__(self, instances: List[IndexedInstance]):
         super(IndexedDataset, self).__init__(instances)
 
+    @property
+    def instances(self) -> List[IndexedInstance]:
+        return self._instances
+
+    @instances.setter
+    def instances(self, instances: List[IndexedInstance]):
+        self._instances = instances
+        self._padding_length_keys = None
+        self._padding_length_matrix = None
+
+    def get_padding_length_matrix(self) -> Tuple[List[str], numpy.ndarray]:
+        """
+        Returns the keys of the padding lengths of the ``Instances`` in this ``Dataset``, and an
+        ``int32`` matrix with one row per ``Instance`` and one column per key, holding the
+        ``Instance's`` padding lengths (or zero, if an ``Instance`` doesn't have some key).
+
+        We compute this once, the first time it's needed, and keep it in sync when we sort the
+        dataset, so sorting, computing padding lengths and making batches don't have to call
+        :func:`IndexedInstance.get_padding_lengths` again.  If you modify the ``Instances``
+        yourself, other than with :func:`pad_instances`, set ``self.instances`` again to reset it.
+        """
+        if self._padding_length_matrix is None or len(self._padding_length_matrix) != len(self.instances):
+            instance_padding_lengths = [instance.get_padding_lengths() for instance in self.instances]
+            self._padding_length_keys, self._padding_length_matrix = \
+                    _get_padding_length_matrix(instance_padding_lengths)
+        return self._padding_length_keys, self._padding_length_matrix
+
     def sort_by_padding(self, sorting_keys: List[str], padding_noise: float=0.0):
         """
         Sorts the ``Instances`` in this ``Dataset`` by their padding lengths, using the keys in
         ``sorting_keys`` (in the order in which they are provided).
         """
-        instances_with_lengths = []
-        for instance in self.instances:
-            padding_lengths = instance.get_padding_lengths()
-            if padding_noise > 0.0:
-                padding_lengths = add_noise_to_dict_values(padding_lengths, padding_noise)
-            instance_with_lengths = [padding_lengths[key] for key in sorting_keys] + [instance]
-            instances_with_lengths.append(instance_with_lengths)
-        instances_with_lengths.sort(key=lambda x: x[:-1])
-        self.instances = [instance_with_lengths[-1] for instance_with_lengths in instances_with_lengths]
+        order = self.get_padding_sort_order(sorting_keys, padding_noise)
+        keys, matrix = self.get_padding_length_matrix()
+        self.instances = [self.instances[index] for index in order]
+        self._padding_length_keys, self._padding_length_matrix = keys, matrix[order]
+
+    def get_padding_sort_order(self, sorting_keys: List[str], padding_noise: float=0.0) -> List[int]:
+        """
+        Returns the indices of the ``Instances`` in this ``Dataset`` in the order that
+        :func:`sort_by_padding` would put them in, without modifying the ``Dataset``.
+
+        If ``padding_noise`` is greater than zero, we add uniform noise of up to that fraction of
+        each padding length before sorting, so that the order (and thus the batches) differ a bit
+        each time.  Ties keep their current order.
+        """
+        keys, matrix = self.get_padding_length_matrix()
+        columns = [matrix[:, keys.index(key)].astype('float64') for key in sorting_keys]
+        if padding_noise > 0.0:
+            # This is the same noise that ``add_noise_to_dict_values`` adds.
+            columns = [column + numpy.random.uniform(-1.0, 1.0, len(column)) * column * padding_noise
+                       for column in columns]
+        if not columns:
+            return list(range(len(matrix)))
+        # ``lexsort`` is stable and sorts by the _last_ key first.
+        return numpy.lexsort(columns[::-1]).tolist()
+
+    def instance_padding_lengths(self) -> List[Dict[str, int]]:
+        """
+        Returns the padding lengths of each ``Instance`` in this ``Dataset``, in order.
+        """
+        keys, matrix = self.get_padding_length_matrix()
+        return [dict(zip(keys, row)) for row in matrix.tolist()]
+
+    def select(self, indices: List[int]) -> 'IndexedDataset':
+        """
+        Returns a new ``IndexedDataset`` containing the ``Instances`` at ``indices`` (in that
+        order).  This is how a ``DataGenerator`` makes its batches.
+        """
+        return self._with_padding_lengths(IndexedDataset([self.instances[index] for index in indices]), indices)
 
     def padding_lengths(self):
-        padding_lengths = {}
-        lengths = [instance.get_padding_lengths() for instance in self.instances]
-        if not lengths:
-            return padding_lengths
-        for key in lengths[0]:
-            padding_lengths[key] = max(x[key] if key in x else 0 for x in lengths)
-        return padding_lengths
+        keys, matrix = self.get_padding_length_matrix()
+        if len(matrix) == 0:
+            return {}
+        return dict(zip(keys, matrix.max(axis=0).tolist()))
+
+    def _with_padding_lengths(self, dataset: 'IndexedDataset', indices: List[int]) -> 'IndexedDataset':
+        # The new dataset gets the rows of our padding length matrix for the instances it has, if
+        # we've already computed it.
+        if self._padding_length_matrix is not None:
+            dataset._padding_length_keys = self._padding_length_keys
+            dataset._padding_length_matrix = self._padding_length_matrix[numpy.asarray(indices, dtype='int64')]
+        return dataset
 
     def pad_instances(self, padding_lengths: Dict[str, int]=None, verbose: bool=True):
         """
@@ -156,12 +416,48 @@ class IndexedDataset(Dataset):
             But if you're doing this inside of a data generator, having all of this output per
             batch is a bit obnoxious.
         """
+        if verbose:
+            logger.info("Padding dataset of size %d to lengths %s", len(self.instances), str(padding_lengths))
+        lengths_to_use = self.__get_lengths_to_use(padding_lengths, verbose)
+        if verbose:
+            logger.info("Now actually padding instances to length: %s", str(lengths_to_use))
+            for instance in tqdm.tqdm(self.instances):
+                instance.pad(lengths_to_use)
+        else:
+            for instance in self.instances:
+                instance.pad(lengths_to_use)
+        # Padding changes the instances' padding lengths.
+        self.instances = self.instances
+
+    def as_padded_training_data(self, padding_lengths: Dict[str, int]=None, verbose: bool=False):
+        """
+        Returns exactly what calling :func:`pad_instances` and then :func:`as_training_data` would,
+        but `without` modifying the ``IndexedInstances`` in this dataset, and (usually) much
+        faster.
+
+        We decide how much to pad the same way :func:`pad_instances` does.  Then, if the instances
+        describe their arrays with :func:`IndexedInstance.get_fields`, we build each array for the
+        whole dataset at once, preallocating it and filling it in a single vectorized assignment
+        (see :mod:`deep_qa.data.instances.collation`).  Otherwise we pad copies of the instances.
+        """
+        if verbose:
+            logger.info("Padding dataset of size %d to lengths %s", len(self.instances), str(padding_lengths))
+        lengths_to_use = self.__get_lengths_to_use(padding_lengths, verbose)
+        training_data = collate_instances(self.instances, lengths_to_use)
+        if training_data is None:
+            if verbose:
+                logger.info("Instances can't be collated directly; padding copies of them instead")
+            padded_dataset = IndexedDataset([deepcopy(instance) for instance in self.instances])
+            padded_dataset.pad_instances(lengths_to_use, verbose=False)
+            training_data = padded_dataset.as_training_data()
+        return training_data
+
+    def __get_lengths_to_use(self, padding_lengths: Dict[str, int], verbose: bool) -> Dict[str, int]:
         # First we need to decide _how much_ to pad.  To do that, we find the max length for all
         # relevant padding decisions from the instances themselves.  Then we check whether we were
         # given a max length for a particular dimension.  If we were, we use that instead of the
         # instance-based one.
         if verbose:
-            logger.info("Padding dataset of size %d to lengths %s", len(self.instances), str(padding_lengths))
             logger.info("Getting max lengths from instances")
         instance_padding_lengths = self.padding_lengths()
         if verbose:
@@ -172,13 +468,7 @@ class IndexedDataset(Dataset):
                 lengths_to_use[key] = padding_lengths[key]
             else:
                 lengths_to_use[key] = instance_padding_lengths[key]
-        if verbose:
-            logger.info("Now actually padding instances to length: %s", str(lengths_to_use))
-            for instance in tqdm.tqdm(self.instances):
-                instance.pad(lengths_to_use)
-        else:
-            for instance in self.instances:
-                instance.pad(lengths_to_use)
+        return lengths_to_use
 
     def as_training_data(self):
         """
@@ -203,3 +493,137 @@ class IndexedDataset(Dataset):
         else:
             labels = numpy.asarray(labels)
         return inputs, labels
+
+
+class CompactIndexedDataset(IndexedDataset):
+    """
+    An ``IndexedDataset`` that stores the word (and character) indices of its instances in flat
+    ``int32`` arrays plus offsets, instead of as nested python lists, which cuts the memory needed
+    for large datasets (especially with character tokenization) several times over.  See
+    :mod:`deep_qa.data.ragged_arrays` for how this works.
+
+    ``self.instances`` is a read-only sequence that rebuilds each ``IndexedInstance`` from the
+    arrays when you access it, so all of the ``IndexedDataset`` methods that read instances still
+    work.  We compute the padding length matrix (see
+    :func:`IndexedDataset.get_padding_length_matrix`) up front, so that sorting, computing padding
+    lengths and making batches don't need to rebuild any instances.  Because the instances you get
+    are new objects every time, they can't be padded in place; use
+    :func:`IndexedDataset.as_padded_training_data` instead of :func:`IndexedDataset.pad_instances`.
+
+    Making one of these from a list of instances needs all of those instances in memory first, so
+    it doesn't lower the peak memory use of indexing a dataset.  To do that, index straight into a
+    ``CompactIndexedDataset`` with ``TextDataset.to_indexed_dataset(..., compact=True)``, which
+    uses :func:`from_chunks`.
+    """
+    def __init__(self, instances: List[IndexedInstance]):
+        # pylint: disable=super-init-not-called
+        self.__set_contents(*_flatten_instance_chunks([instances]))
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[List[IndexedInstance]]):
+        """
+        Makes a ``CompactIndexedDataset`` from the instances in ``chunks``, in order, moving each
+        chunk's indices into arrays before we ask for the next one.  If ``chunks`` is a generator
+        that indexes each chunk on demand, only one chunk of instances is ever held as python lists.
+        """
+        dataset = cls.__new__(cls)
+        dataset.__set_contents(*_flatten_instance_chunks(chunks))
+        return dataset
+
+    @classmethod
+    def from_flattened(cls, skeletons: List[IndexedInstance], arrays: Dict[int, RaggedArrays]):
+        """
+        Makes a ``CompactIndexedDataset`` from instance skeletons and ragged arrays that were made
+        with :func:`~deep_qa.data.ragged_arrays.flatten_value` (e.g., by an
+        :class:`~deep_qa.data.indexed_dataset_cache.IndexedDatasetCache`).
+        """
+        dataset = cls.__new__(cls)
+        instance_padding_lengths = [restore_value(skeleton, arrays).get_padding_lengths()
+                                    for skeleton in skeletons]
+        dataset.__set_contents(skeletons, arrays, instance_padding_lengths)
+        return dataset
+
+    def __set_contents(self,
+                       skeletons: List[IndexedInstance],
+                       arrays: Dict[int, RaggedArrays],
+                       instance_padding_lengths: List[Dict[str, int]]):
+        self._skeletons = skeletons
+        self._arrays = arrays
+        self._padding_length_keys, self._padding_length_matrix = \
+                _get_padding_length_matrix(instance_padding_lengths)
+
+    @property
+    def instances(self) -> Sequence[IndexedInstance]:
+        return _CompactInstances(self._skeletons, self._arrays)
+
+    def get_memory_usage(self) -> int:
+        """
+        Returns the number of bytes used by the index arrays and the stored padding lengths (not
+        counting the instance skeletons).
+        """
+        return (sum(arrays.get_memory_usage() for arrays in self._arrays.values())
+                + self._padding_length_matrix.nbytes)
+
+    @overrides
+    def merge(self, other: 'Dataset') -> 'Dataset':
+        if type(self) is not type(other):
+            raise RuntimeError("Cannot merge datasets with different types")
+        return CompactIndexedDataset(list(self.instances) + list(other.instances))
+
+    @overrides
+    def truncate(self, max_instances: int):
+        if len(self._skeletons) <= max_instances:
+            return self
+        return self.__select_rows(list(range(max_instances)))
+
+    @overrides
+    def sort_by_padding(self, sorting_keys: List[str], padding_noise: float=0.0):
+        order = self.get_padding_sort_order(sorting_keys, padding_noise)
+        self._skeletons = [self._skeletons[index] for index in order]
+        self._padding_length_matrix = self._padding_length_matrix[order]
+
+    @overrides
+    def select(self, indices: List[int]) -> IndexedDataset:
+        instances = [restore_value(self._skeletons[index], self._arrays) for index in indices]
+        return self._with_padding_lengths(IndexedDataset(instances), indices)
+
+    @overrides
+    def pad_instances(self, padding_lengths: Dict[str, int]=None, verbose: bool=True):
+        raise RuntimeError("A CompactIndexedDataset can't be padded in place; use "
+                           "as_padded_training_data() instead")
+
+    def __select_rows(self, rows: List[int]) -> 'CompactIndexedDataset':
+        # This shares the (read-only) arrays with ``self``.
+        dataset = CompactIndexedDataset.__new__(CompactIndexedDataset)
+        dataset._skeletons = [self._skeletons[row] for row in rows]
+        dataset._arrays = self._arrays
+        dataset._padding_length_keys = self._padding_length_keys
+        dataset._padding_length_matrix = self._padding_length_matrix[rows]
+        return dataset
+
+
+def _flatten_instance_chunks(chunks: Iterable[List[IndexedInstance]]):
+    instance_padding_lengths = []
+    def chunks_with_padding_lengths():
+        for chunk in chunks:
+            instance_padding_lengths.extend(instance.get_padding_lengths() for instance in chunk)
+            yield chunk
+    skeletons, arrays = flatten_chunks(chunks_with_padding_lengths())
+    return skeletons, arrays, instance_padding_lengths
+
+
+class _CompactInstances(Sequence):
+    """
+    The read-only view of the instances in a :class:`CompactIndexedDataset`.
+    """
+    def __init__(self, skeletons: List[IndexedInstance], arrays: Dict[int, RaggedArrays]):
+        self._skeletons = skeletons
+        self._arrays = arrays
+
+    def __len__(self):
+        return len(self._skeletons)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [restore_value(skeleton, self._arrays) for skeleton in self._skeletons[index]]
+        return restore_value(self._skeletons[index], self._arrays)
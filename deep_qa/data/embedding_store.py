@@ -0,0 +1,253 @@
+"""
+A binary, memory-mapped store for pre-trained word embeddings.
+
+Pre-trained embeddings (e.g., GloVe) usually come as gzipped text files, with one word and its
+vector per line.  Parsing one of those takes minutes for the larger GloVe files, and we used to do
+it every time we built a model.  :class:`EmbeddingStore` converts such a file once into a directory
+of binary files, which we then memory-map, so opening the store is instant, and getting the
+vectors for a model's vocabulary only reads the rows we need.
+
+The store directory contains:
+
+- ``header.json``: the format version, the embedding dimension, the number of words, the range of
+  the vector values, and the size and modification time of the text file it was converted from.
+- ``vectors.npy``: a ``float32`` matrix with one row per word, in the order of the text file.
+- ``vocab.bin`` and ``offsets.npy``: the utf-8 encoded words, concatenated, and the offset of
+  each word in ``vocab.bin``.
+- ``hashes.npy`` and ``hash_rows.npy``: a 64 bit hash of every word, sorted, and the row of the
+  word with each hash, which we binary search to find a word's row without building a dictionary
+  of the whole vocabulary.
+"""
+import codecs
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Iterable, List
+import zlib
+
+import numpy
+import tqdm
+
+from ..common.checks import ConfigurationError
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+EMBEDDING_STORE_FORMAT_VERSION = 1
+
+# How many lines we parse with a single call to ``numpy.fromstring`` when converting a text file.
+_LINES_PER_CHUNK = 10000
+
+
+class EmbeddingStore:
+    """
+    A memory-mapped embedding store, as described in the module documentation.  Use
+    :func:`from_file` to get one, converting a text embedding file if necessary, or
+    :func:`convert` to do the conversion explicitly.
+
+    Parameters
+    ----------
+    directory: str
+        A directory written by :func:`convert`.
+    in_memory: bool, optional (default=False)
+        If ``True``, we read the arrays into memory instead of memory-mapping them, so the store
+        keeps working after ``directory`` is deleted.
+    """
+    def __init__(self, directory: str, in_memory: bool=False):
+        with codecs.open(os.path.join(directory, 'header.json'), 'r', 'utf-8') as header_file:
+            self.header = json.load(header_file)
+        if self.header.get('version') != EMBEDDING_STORE_FORMAT_VERSION:
+            raise ConfigurationError("Embedding store %s has version %s, but we can only read version %d"
+                                     % (directory, self.header.get('version'), EMBEDDING_STORE_FORMAT_VERSION))
+        self.directory = directory
+        self.embedding_dim = self.header['embedding_dim']
+        self.vector_min = self.header['vector_min']
+        self.vector_max = self.header['vector_max']
+        mmap_mode = None if in_memory else 'r'
+        self.vectors = numpy.load(os.path.join(directory, 'vectors.npy'), mmap_mode=mmap_mode)
+        self._offsets = numpy.load(os.path.join(directory, 'offsets.npy'), mmap_mode=mmap_mode)
+        self._hashes = numpy.load(os.path.join(directory, 'hashes.npy'), mmap_mode=mmap_mode)
+        self._hash_rows = numpy.load(os.path.join(directory, 'hash_rows.npy'), mmap_mode=mmap_mode)
+        with open(os.path.join(directory, 'vocab.bin'), 'rb') as vocab_file:
+            self._vocab = vocab_file.read()
+
+    def __len__(self):
+        return self.header['num_words']
+
+    def get_word(self, row: int) -> str:
+        return self._vocab[self._offsets[row]:self._offsets[row + 1]].decode('utf-8')
+
+    def get_rows(self, words: Iterable[str]) -> numpy.ndarray:
+        """
+        Returns the row of each word in :attr:`vectors`, or -1 for words that aren't in the store.
+        If a word appears more than once in the embedding file, we use its first vector.
+        """
+        words = list(words)
+        rows = numpy.full(len(words), -1, dtype='int64')
+        if not words or len(self) == 0:
+            return rows
+        hashes = numpy.fromiter((_hash_word(word) for word in words), dtype='uint64', count=len(words))
+        positions = numpy.searchsorted(self._hashes, hashes)
+        num_hashes = len(self._hashes)
+        for i, (word, word_hash, position) in enumerate(zip(words, hashes, positions)):
+            # Different words can (rarely) have the same hash, so we check the words themselves.
+            while position < num_hashes and self._hashes[position] == word_hash:
+                row = self._hash_rows[position]
+                if self.get_word(row) == word:
+                    rows[i] = row
+                    break
+                position += 1
+        return rows
+
+    def get_row(self, word: str) -> int:
+        return int(self.get_rows([word])[0])
+
+    def get_vectors(self, words: Iterable[str]):
+        """
+        Returns a ``(len(words), embedding_dim)`` matrix with the vector for each word, with zeros
+        for words that aren't in the store, and a boolean array saying which words we found.
+        """
+        rows = self.get_rows(words)
+        found = rows >= 0
+        vectors = numpy.zeros((len(rows), self.embedding_dim), dtype='float32')
+        vectors[found] = self.vectors[rows[found]]
+        return vectors, found
+
+    @classmethod
+    def from_file(cls, embeddings_filename: str) -> 'EmbeddingStore':
+        """
+        Returns a store for ``embeddings_filename``, which can be a store directory or a gzipped
+        text embedding file.  For a text file, we use the store in ``embeddings_filename + ".store"``,
+        converting the file first if that store doesn't exist yet or was converted from an older
+        version of the file.  If we can't write the store there, we convert into a temporary
+        directory and keep the store in memory.
+        """
+        if os.path.isdir(embeddings_filename):
+            return cls(embeddings_filename)
+        store_directory = embeddings_filename + '.store'
+        if os.path.isdir(store_directory):
+            try:
+                store = cls(store_directory)
+                if store.header['source'] == _get_source_stamp(embeddings_filename):
+                    return store
+                logger.info("Embedding store %s is out of date", store_directory)
+            except (ConfigurationError, IOError, KeyError, ValueError) as error:
+                logger.warning("Couldn't read embedding store %s (%s); converting again", store_directory, error)
+        try:
+            return cls.convert(embeddings_filename, store_directory)
+        except OSError as error:
+            logger.warning("Couldn't write embedding store %s (%s); converting into a temporary "
+                           "directory instead", store_directory, error)
+            with tempfile.TemporaryDirectory() as temporary_directory:
+                cls.convert(embeddings_filename, temporary_directory)
+                return cls(temporary_directory, in_memory=True)
+
+    @classmethod
+    def convert(cls, embeddings_filename: str, store_directory: str) -> 'EmbeddingStore':
+        """
+        Converts a gzipped text embedding file, formatted as ``[word] [dim 1] [dim 2] ...``, into a
+        store in ``store_directory``, and returns the store.
+
+        We take the embedding dimension from the first line, and skip any later lines with a
+        different number of fields.  These happen with some unicode parsing problems (e.g., a word
+        with a unicode space character that splits into more than one column).  Note that if you
+        have some kind of long header, this could result in all of your lines getting skipped.
+        """
+        logger.info("Converting %s into an embedding store in %s", embeddings_filename, store_directory)
+        os.makedirs(store_directory, exist_ok=True)
+        # We write the header last, so an interrupted conversion doesn't look like a valid store.
+        header_filename = os.path.join(store_directory, 'header.json')
+        if os.path.exists(header_filename):
+            os.remove(header_filename)
+        source = _get_source_stamp(embeddings_filename)
+        raw_vectors_filename = os.path.join(store_directory, 'vectors.raw')
+        embedding_dim = None
+        words = []
+        vector_min = float('inf')
+        vector_max = -float('inf')
+        chunk = []
+        with gzip.open(embeddings_filename, 'rb') as embeddings_file, \
+                open(raw_vectors_filename, 'wb') as raw_vectors_file:
+            for line in tqdm.tqdm(embeddings_file):
+                word, _, vector_string = line.decode('utf-8').strip().partition(' ')
+                num_dimensions = vector_string.count(' ') + 1 if vector_string else 0
+                if embedding_dim is None:
+                    embedding_dim = num_dimensions
+                    if embedding_dim <= 1:
+                        raise ConfigurationError("Found embedding size of %d; do you have a header?"
+                                                 % embedding_dim)
+                elif num_dimensions != embedding_dim:
+                    continue
+                words.append(word)
+                chunk.append(vector_string)
+                if len(chunk) == _LINES_PER_CHUNK:
+                    vector_min, vector_max = _write_chunk(chunk, embedding_dim, raw_vectors_file,
+                                                          vector_min, vector_max)
+                    chunk = []
+            if chunk:
+                vector_min, vector_max = _write_chunk(chunk, embedding_dim, raw_vectors_file,
+                                                      vector_min, vector_max)
+        if embedding_dim is None:
+            raise ConfigurationError("Embedding file %s is empty" % embeddings_filename)
+
+        # ``numpy.save`` needs the whole array in memory, so we write the .npy header ourselves,
+        # followed by the vectors we already wrote out.
+        with open(os.path.join(store_directory, 'vectors.npy'), 'wb') as vectors_file:
+            numpy.lib.format.write_array_header_1_0(vectors_file, {'descr': '<f4',
+                                                                   'fortran_order': False,
+                                                                   'shape': (len(words), embedding_dim)})
+            with open(raw_vectors_filename, 'rb') as raw_vectors_file:
+                shutil.copyfileobj(raw_vectors_file, vectors_file)
+        os.remove(raw_vectors_filename)
+
+        encoded_words = [word.encode('utf-8') for word in words]
+        with open(os.path.join(store_directory, 'vocab.bin'), 'wb') as vocab_file:
+            vocab_file.write(b''.join(encoded_words))
+        offsets = numpy.zeros(len(words) + 1, dtype='int64')
+        numpy.cumsum([len(word) for word in encoded_words], out=offsets[1:])
+        numpy.save(os.path.join(store_directory, 'offsets.npy'), offsets)
+        hashes = numpy.fromiter((_hash_word(word) for word in words), dtype='uint64', count=len(words))
+        # A stable sort keeps rows with the same hash in file order, so duplicate words resolve to
+        # their first occurrence.
+        hash_rows = numpy.argsort(hashes, kind='mergesort')
+        numpy.save(os.path.join(store_directory, 'hashes.npy'), hashes[hash_rows])
+        numpy.save(os.path.join(store_directory, 'hash_rows.npy'), hash_rows)
+
+        header = {
+                'format': 'deep_qa.EmbeddingStore',
+                'version': EMBEDDING_STORE_FORMAT_VERSION,
+                'embedding_dim': embedding_dim,
+                'num_words': len(words),
+                'vector_min': float(vector_min) if words else 0.0,
+                'vector_max': float(vector_max) if words else 0.0,
+                'source': source,
+                }
+        with codecs.open(header_filename, 'w', 'utf-8') as header_file:
+            json.dump(header, header_file)
+        return cls(store_directory)
+
+
+def _write_chunk(vector_strings: List[str],
+                 embedding_dim: int,
+                 raw_vectors_file,
+                 vector_min: float,
+                 vector_max: float):
+    # Parsing a whole chunk at once is much faster than calling ``numpy.asarray`` on each line.
+    vectors = numpy.fromstring(' '.join(vector_strings), dtype='float32', sep=' ')
+    if vectors.size != len(vector_strings) * embedding_dim:
+        raise ConfigurationError("Found a vector that isn't a list of numbers near \"%s\""
+                                 % vector_strings[0][:100])
+    raw_vectors_file.write(vectors.astype('<f4').tobytes())
+    return min(vector_min, vectors.min()), max(vector_max, vectors.max())
+
+
+def _hash_word(word: str) -> int:
+    encoded = word.encode('utf-8')
+    return (zlib.crc32(encoded) << 32) | zlib.adler32(encoded)
+
+
+def _get_source_stamp(embeddings_filename: str):
+    stat = os.stat(embeddings_filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
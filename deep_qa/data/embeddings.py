@@ -1,11 +1,11 @@
 import codecs
-import gzip
 import logging
 
 import numpy
 
 from ..layers.time_distributed_embedding import TimeDistributedEmbedding
 from .data_indexer import DataIndexer
+from .embedding_store import EmbeddingStore
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -30,67 +30,43 @@ class PretrainedEmbeddings:
         not.
 
         We use the DataIndexer to map from the word strings in the embeddings file to the indices
-        that we need, and to know which words from the embeddings file we can safely ignore.  If we
-        come across a word in DataIndexer that does not show up with the embeddings file, we give
-        it a zero vector.
-
-        The embeddings file is assumed to be gzipped, formatted as [word] [dim 1] [dim 2] ...
+        that we need.  If we come across a word in DataIndexer that does not show up with the
+        embeddings file, we give it a random vector.
+
+        The embeddings file is assumed to be gzipped, formatted as [word] [dim 1] [dim 2] ..., or
+        to be a directory containing an :class:`~deep_qa.data.embedding_store.EmbeddingStore`.  The
+        first time we see a text file, we convert it into a store next to it (see
+        :func:`EmbeddingStore.from_file`), so later calls only read the vectors for the words we
+        need.
         """
-        words_to_keep = set(data_indexer.words_in_index())
+        store = EmbeddingStore.from_file(embeddings_filename)
         vocab_size = data_indexer.get_vocab_size()
-        embeddings = {}
-        embedding_dim = None
+        embedding_dim = store.embedding_dim
 
         # TODO(matt): make this a parameter
         embedding_misses_filename = 'embedding_misses.txt'
 
-        # First we read the embeddings from the file, only keeping vectors for the words we need.
-        logger.info("Reading embeddings from file")
-        with gzip.open(embeddings_filename, 'rb') as embeddings_file:
-            for line in embeddings_file:
-                fields = line.decode('utf-8').strip().split(' ')
-                if embedding_dim is None:
-                    embedding_dim = len(fields) - 1
-                    assert embedding_dim > 1, "Found embedding size of 1; do you have a header?"
-                else:
-                    if len(fields) - 1 != embedding_dim:
-                        # Sometimes there are funny unicode parsing problems that lead to different
-                        # fields lengths (e.g., a word with a unicode space character that splits
-                        # into more than one column).  We skip those lines.  Note that if you have
-                        # some kind of long header, this could result in all of your lines getting
-                        # skipped.  It's hard to check for that here; you just have to look in the
-                        # embedding_misses_file and at the model summary to make sure things look
-                        # like they are supposed to.
-                        continue
-                word = fields[0]
-                if word in words_to_keep:
-                    vector = numpy.asarray(fields[1:], dtype='float32')
-                    embeddings[word] = vector
-
-
-        # Now we initialize the weight matrix for an embedding layer, starting with random vectors,
-        # then filling in the word vectors we just read.
+        # We initialize the weight matrix for an embedding layer, starting with random vectors,
+        # then filling in the word vectors from the store.
         logger.info("Initializing pre-trained embedding layer")
-        if log_misses:
-            logger.info("Logging embedding misses to %s", embedding_misses_filename)
-            embedding_misses_file = codecs.open(embedding_misses_filename, 'w', 'utf-8')
         embedding_matrix = PretrainedEmbeddings.initialize_random_matrix((vocab_size, embedding_dim))
 
         # The 2 here is because we know too much about the DataIndexer.  Index 0 is the padding
         # index, and the vector for that dimension is going to be 0.  Index 1 is the OOV token, and
         # we can't really set a vector for the OOV token.
-        for i in range(2, vocab_size):
-            word = data_indexer.get_word_from_index(i)
-
-            # If we don't have a pre-trained vector for this word, we'll just leave this row alone,
-            # so the word has a random initialization.
-            if word in embeddings:
-                embedding_matrix[i] = embeddings[word]
-            elif log_misses:
-                print(word, file=embedding_misses_file)
+        words = [data_indexer.get_word_from_index(i) for i in range(2, vocab_size)]
+        rows = store.get_rows(words)
+        found = rows >= 0
+        # If we don't have a pre-trained vector for a word, we leave its row alone, so the word has
+        # a random initialization.
+        embedding_matrix[2:][found] = store.vectors[rows[found]]
 
         if log_misses:
-            embedding_misses_file.close()
+            logger.info("Logging embedding misses to %s", embedding_misses_filename)
+            with codecs.open(embedding_misses_filename, 'w', 'utf-8') as embedding_misses_file:
+                for word, word_found in zip(words, found):
+                    if not word_found:
+                        print(word, file=embedding_misses_file)
 
         # The weight matrix is initialized, so we construct and return the actual Embedding layer.
         return TimeDistributedEmbedding(input_dim=vocab_size,
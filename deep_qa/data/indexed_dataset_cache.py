@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, List, Tuple
+
+import dill as pickle
+import numpy
+
+from .dataset import CompactIndexedDataset, IndexedDataset
+from .ragged_arrays import RaggedArrays, flatten_chunks, restore_value
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Bump this whenever the on-disk layout (or the way we flatten instances) changes, so that stale
+# cache entries are never read.
+CACHE_FORMAT_VERSION = 2
+
+# How many instances we flatten at a time when saving a dataset.
+_FLATTENING_CHUNK_SIZE = 10000
+
+
+class IndexedDatasetCache:
+    """
+    A persistent, on-disk cache of :class:`~deep_qa.data.dataset.IndexedDataset` objects, so that
+    running several experiments on the same data files doesn't re-tokenize and re-index the same
+    text every time.
+
+    Cache entries are keyed on (1) the contents of the data files, (2) anything else that affects
+    how the text gets indexed, like the instance class, the tokenizer parameters and a fingerprint
+    of the ``DataIndexer`` (see :func:`get_key`).  Each entry is a directory containing:
+
+    - ``instances.pkl``, a pickled "skeleton" of the indexed instances, with every list of word
+      indices replaced by a small reference into the arrays below, along with any extra model state
+      the caller wants to store with the dataset (e.g., the ``DataIndexer`` after indexing);
+    - for each nesting depth ``d`` of index lists that we saw (``d = 1`` for lists of word indices,
+      ``d = 2`` for lists of words that are lists of character indices, etc.), a flat
+      ``depth_d_values.npy`` array containing all of the indices, and ``d`` offset arrays
+      (``depth_d_offsets_k.npy``) giving the boundaries of each row at each nesting level.
+
+    The numpy arrays are loaded with ``mmap_mode='r'``, so a cache hit just reads the bytes it
+    needs for each instance, and no tokenization or indexing happens at all.
+
+    Parameters
+    ----------
+    cache_directory: str
+        The directory to store cache entries in.  It will be created if it does not exist.
+    """
+    def __init__(self, cache_directory: str):
+        self.cache_directory = cache_directory
+        os.makedirs(cache_directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(data_files: List[str], key_fields: Dict[str, Any]) -> str:
+        """
+        Computes a cache key from the contents of ``data_files`` and from ``key_fields``, which
+        must be JSON-serializable and should contain everything other than the file contents that
+        changes the resulting ``IndexedDataset``.
+        """
+        hasher = hashlib.sha1()
+        hasher.update(str(CACHE_FORMAT_VERSION).encode('utf-8'))
+        for filename in data_files:
+            with open(filename, 'rb') as data_file:
+                for chunk in iter(lambda: data_file.read(1 << 20), b''):  # pylint: disable=cell-var-from-loop
+                    hasher.update(chunk)
+            # A separator, so that moving bytes from one file to the next changes the key.
+            hasher.update(b'\0')
+        hasher.update(json.dumps(key_fields, sort_keys=True, default=str).encode('utf-8'))
+        return hasher.hexdigest()
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._entry_directory(key), 'instances.pkl'))
+
+    def load(self, key: str, compact: bool=False) -> Tuple[IndexedDataset, Any]:
+        """
+        Returns the ``IndexedDataset`` and the extra state stored under ``key``, or ``None`` if
+        there is no such entry.  If ``compact`` is ``True``, we return a
+        :class:`~deep_qa.data.dataset.CompactIndexedDataset` that reads its indices straight from
+        the memory-mapped arrays, instead of building python lists for every instance.
+        """
+        if not self.contains(key):
+            return None
+        entry_directory = self._entry_directory(key)
+        logger.info("Loading indexed dataset from cache: %s", entry_directory)
+        with open(os.path.join(entry_directory, 'instances.pkl'), 'rb') as skeleton_file:
+            depths, instances, extra_state = pickle.load(skeleton_file)
+        arrays = {}
+        for depth in depths:
+            values = numpy.load(os.path.join(entry_directory, 'depth_%d_values.npy' % depth), mmap_mode='r')
+            offsets = [numpy.load(os.path.join(entry_directory, 'depth_%d_offsets_%d.npy' % (depth, level)),
+                                  mmap_mode='r')
+                       for level in range(depth)]
+            arrays[depth] = RaggedArrays(values, offsets)
+        if compact:
+            return CompactIndexedDataset.from_flattened(instances, arrays), extra_state
+        instances = [restore_value(instance, arrays) for instance in instances]
+        return IndexedDataset(instances), extra_state
+
+    def save(self, key: str, dataset: IndexedDataset, extra_state: Any=None):
+        """
+        Stores ``dataset`` (and ``extra_state``, which must be picklable) under ``key``.  We write
+        the entry to a temporary directory and then rename it, so concurrent runs sharing a cache
+        directory never see a partially-written entry.
+        """
+        entry_directory = self._entry_directory(key)
+        logger.info("Saving indexed dataset to cache: %s", entry_directory)
+        # Flattening in chunks keeps us from holding a second copy of all of the indices as python
+        # lists, which matters most when ``dataset`` is already a ``CompactIndexedDataset``.
+        dataset_instances = dataset.instances
+        chunks = (dataset_instances[start:start + _FLATTENING_CHUNK_SIZE]
+                  for start in range(0, len(dataset_instances), _FLATTENING_CHUNK_SIZE))
+        instances, arrays_by_depth = flatten_chunks(chunks)
+        temp_directory = "%s.tmp-%d" % (entry_directory, os.getpid())
+        os.makedirs(temp_directory, exist_ok=True)
+        for depth, arrays in arrays_by_depth.items():
+            numpy.save(os.path.join(temp_directory, 'depth_%d_values.npy' % depth), arrays.values)
+            for level, offsets in enumerate(arrays.offsets):
+                numpy.save(os.path.join(temp_directory, 'depth_%d_offsets_%d.npy' % (depth, level)), offsets)
+        with open(os.path.join(temp_directory, 'instances.pkl'), 'wb') as skeleton_file:
+            pickle.dump((sorted(arrays_by_depth.keys()), instances, extra_state), skeleton_file)
+        try:
+            os.rename(temp_directory, entry_directory)
+        except OSError:
+            # Someone else wrote this entry while we were writing ours; theirs is just as good.
+            shutil.rmtree(temp_directory, ignore_errors=True)
+
+    def _entry_directory(self, key: str) -> str:
+        return os.path.join(self.cache_directory, key)
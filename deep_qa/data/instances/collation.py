@@ -0,0 +1,281 @@
+"""
+Code for building padded numpy arrays for a whole batch of ``IndexedInstances`` at once, without
+modifying the instances.
+
+The original way of getting training data out of an ``IndexedDataset`` is to call
+:func:`IndexedInstance.pad` on every instance (which builds new, padded python lists, and stores
+them on the instance), then call :func:`IndexedInstance.as_training_data` on every instance, then
+stack the resulting arrays together.  That's a lot of python list manipulation per batch,
+especially with character-level tokenization, and it modifies the instances, so callers that want
+to pad the same instances differently later have to copy them first.
+
+Instead, ``IndexedInstances`` can describe the arrays that ``as_training_data`` would return, in
+:func:`IndexedInstance.get_fields`, using the ``Field`` classes in this module.  Given those, we
+compute the padded shape of each array once for the whole batch, preallocate it, and fill it
+with a single vectorized assignment.
+"""
+import itertools
+import logging
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class Field:
+    """
+    Describes one of the arrays that an ``IndexedInstance`` returns from ``as_training_data``
+    (either an input or a label), as it would look after padding to some given padding lengths.
+    """
+    @classmethod
+    def collate(cls, fields: List['Field'], padding_lengths: Dict[str, int]) -> numpy.ndarray:
+        """
+        Builds a single array for a batch, with one row per field in ``fields`` (which are all
+        instances of ``cls``, describing the same array in different ``IndexedInstances``).
+        """
+        raise NotImplementedError
+
+
+class RaggedField(Field):
+    """
+    A (possibly nested) list of indices (or other numbers), which gets padded or truncated in each
+    dimension to the length given by a padding key.  This is what almost all model inputs look
+    like; for instance, the word indices of a question are a ``RaggedField`` with padding keys
+    ``['num_question_words']``, and the word indices of a list of answer options are a
+    ``RaggedField`` with padding keys ``['num_options', 'num_option_words']``.
+
+    Parameters
+    ----------
+    values: List
+        The nested list of values.  The nesting depth must match the number of padding keys (plus
+        one, if this is a word sequence with characters; see ``word_sequence``).
+    padding_keys: List[Union[str, int]]
+        For each dimension of ``values``, either the key in the padding lengths dictionary giving
+        the length of that dimension, or a fixed length for the dimension.
+    truncate_from_right: Union[bool, List[bool]], optional (default=True)
+        For each dimension (or for all of them, if a single ``bool``), how to pad and truncate, as
+        in :func:`IndexedInstance.pad_sequence_to_length`: if ``True``, we keep the `last` items
+        and add padding to the front; if ``False``, we keep the `first` items and add padding to
+        the end.
+    word_sequence: bool, optional (default=False)
+        If ``True``, the last dimension of ``values`` is a sequence of words, as in
+        :func:`IndexedInstance.pad_word_sequence`.  When the padding lengths contain
+        ``num_word_characters``, each word is itself a list of character indices, and we add a
+        dimension for characters, truncating words longer than ``num_word_characters`` at the end.
+    padding_value: Any, optional (default=0)
+        The value to use for padding.
+    dtype: str, optional (default='int32')
+        The dtype of the resulting array.
+    """
+    def __init__(self,
+                 values: List,
+                 padding_keys: List[Union[str, int]],
+                 truncate_from_right: Union[bool, List[bool]]=True,
+                 word_sequence: bool=False,
+                 padding_value: Any=0,
+                 dtype: str='int32'):
+        if isinstance(truncate_from_right, bool):
+            truncate_from_right = [truncate_from_right] * len(padding_keys)
+        self.values = values
+        self.padding_keys = list(padding_keys)
+        self.truncate_from_right = list(truncate_from_right)
+        self.word_sequence = word_sequence
+        self.padding_value = padding_value
+        self.dtype = dtype
+
+    def get_dimensions(self, padding_lengths: Dict[str, int]) -> List[Tuple[int, bool]]:
+        """
+        Returns a ``(length, truncate_from_right)`` pair for each dimension of this field.
+        """
+        dimensions = [(key if isinstance(key, int) else padding_lengths[key], from_right)
+                      for key, from_right in zip(self.padding_keys, self.truncate_from_right)]
+        if self.word_sequence and 'num_word_characters' in padding_lengths:
+            dimensions.append((padding_lengths['num_word_characters'], False))
+        return dimensions
+
+    @staticmethod
+    def stack(fields: List['RaggedField'],
+              padding_key: Union[str, int],
+              truncate_from_right: bool,
+              template: 'RaggedField'=None) -> 'RaggedField':
+        """
+        Combines several ``RaggedFields`` with the same structure (e.g., the inputs of each of the
+        answer options in a multiple choice instance) into one field with an extra leading
+        dimension, padded to ``padding_key``.  ``template`` gives the structure to use when
+        ``fields`` is empty.
+        """
+        template = fields[0] if fields else template
+        return RaggedField([field.values for field in fields],
+                           [padding_key] + template.padding_keys,
+                           [truncate_from_right] + template.truncate_from_right,
+                           word_sequence=template.word_sequence,
+                           padding_value=template.padding_value,
+                           dtype=template.dtype)
+
+    @classmethod
+    def collate(cls, fields: List['RaggedField'], padding_lengths: Dict[str, int]) -> numpy.ndarray:
+        dimensions = fields[0].get_dimensions(padding_lengths)
+        shape = (len(fields),) + tuple(length for length, _ in dimensions)
+        array = numpy.zeros(shape, dtype=fields[0].dtype)
+        for row, field in enumerate(fields):
+            if field.padding_value != 0:
+                array[row] = field.padding_value
+        if array.size == 0:
+            return array
+
+        # We walk the nested lists once, collecting each innermost list along with the position in
+        # the flattened array where its (untruncated, unpadded) row starts.  Then we copy all of
+        # the values in a single vectorized assignment, handling truncation of the innermost lists
+        # with a mask.
+        strides = [int(numpy.prod(shape[level + 1:])) for level in range(len(shape))]
+        starts = []
+        leaves = []
+        for row, field in enumerate(fields):
+            _find_leaves(field.values, dimensions, 0, row * strides[0], strides[1:], starts, leaves)
+        if not leaves:
+            return array
+        lengths = numpy.fromiter(map(len, leaves), dtype='int64', count=len(leaves))
+        total_length = int(lengths.sum())
+        values = numpy.fromiter(itertools.chain.from_iterable(leaves), dtype=array.dtype, count=total_length)
+        index_in_leaf = numpy.arange(total_length, dtype='int64') - numpy.repeat(numpy.cumsum(lengths) - lengths,
+                                                                                  lengths)
+        positions = numpy.repeat(numpy.asarray(starts, dtype='int64'), lengths) + index_in_leaf
+        leaf_length, truncate_from_right = dimensions[-1]
+        if truncate_from_right:
+            # Right-aligned: the last item of each leaf goes in the last column.
+            positions += numpy.repeat(leaf_length - lengths, lengths)
+        if lengths.max() > leaf_length:
+            if truncate_from_right:
+                keep = index_in_leaf >= numpy.repeat(lengths - leaf_length, lengths)
+            else:
+                keep = index_in_leaf < leaf_length
+            positions = positions[keep]
+            values = values[keep]
+        array.reshape(-1)[positions] = values
+        return array
+
+
+def _find_leaves(values: List,
+                 dimensions: List[Tuple[int, bool]],
+                 level: int,
+                 position: int,
+                 strides: List[int],
+                 starts: List[int],
+                 leaves: List[List]):
+    if level == len(dimensions) - 1:
+        starts.append(position)
+        leaves.append(values)
+        return
+    length, truncate_from_right = dimensions[level]
+    # This truncates and pads the same way ``IndexedInstance.pad_sequence_to_length`` does.
+    if len(values) > length:
+        values = values[len(values) - length:] if truncate_from_right else values[:length]
+    stride = strides[level]
+    if truncate_from_right:
+        position += (length - len(values)) * stride
+    if level == len(dimensions) - 2:
+        # This is the common case of a list of words with characters, or a list of sentences with
+        # words, so we avoid making a function call per item here.
+        starts.extend(range(position, position + len(values) * stride, stride))
+        leaves.extend(values)
+        return
+    for value in values:
+        _find_leaves(value, dimensions, level + 1, position, strides, starts, leaves)
+        position += stride
+
+
+class OneHotField(Field):
+    """
+    A vector of zeros, with ones at the given indices, like the label for a multiple choice
+    question.
+
+    Parameters
+    ----------
+    indices: List[int]
+        The indices to set to one.
+    size: Union[str, int]
+        Either the padding key giving the length of the vector (e.g., ``num_options``), or a fixed
+        length (e.g., ``2``, for true/false labels).
+    """
+    def __init__(self, indices: List[int], size: Union[str, int]):
+        self.indices = indices
+        self.size = size
+
+    @classmethod
+    def collate(cls, fields: List['OneHotField'], padding_lengths: Dict[str, int]) -> numpy.ndarray:
+        size = fields[0].size
+        if not isinstance(size, int):
+            size = padding_lengths[size]
+        array = numpy.zeros((len(fields), size))
+        rows = [row for row, field in enumerate(fields) for _ in field.indices]
+        columns = [index for field in fields for index in field.indices]
+        array[rows, columns] = 1
+        return array
+
+
+class ArrayField(Field):
+    """
+    A value that needs no padding, which we just convert to an array, like the span begin and end
+    indices in a reading comprehension label.
+    """
+    def __init__(self, value: Any, dtype: str=None):
+        self.value = value
+        self.dtype = dtype
+
+    @classmethod
+    def collate(cls, fields: List['ArrayField'], padding_lengths: Dict[str, int]) -> numpy.ndarray:
+        return numpy.asarray([field.value for field in fields], dtype=fields[0].dtype)
+
+
+class _CannotCollate(Exception):
+    pass
+
+
+def collate_instances(instances: List, padding_lengths: Dict[str, int]):
+    """
+    Builds ``(inputs, labels)`` arrays for a batch of ``IndexedInstances``, exactly as padding
+    each instance to ``padding_lengths`` and calling :func:`IndexedDataset.as_training_data` would,
+    but without modifying the instances.
+
+    If any of the instances don't describe their fields (i.e., ``get_fields`` returns ``None``), or
+    the instances in the batch are inconsistent (e.g., some have labels and some don't), we return
+    ``None``, and the caller should pad copies of the instances instead.
+    """
+    instance_fields = []
+    for instance in instances:
+        fields = instance.get_fields(padding_lengths) if hasattr(instance, 'get_fields') else None
+        if fields is None:
+            return None
+        instance_fields.append(fields)
+    try:
+        inputs = _collate_structure([fields[0] for fields in instance_fields], padding_lengths)
+        labels = _collate_structure([fields[1] for fields in instance_fields], padding_lengths)
+    except _CannotCollate as error:
+        logger.debug("Could not collate batch: %s", str(error))
+        return None
+    return inputs, labels
+
+
+def _collate_structure(values: List, padding_lengths: Dict[str, int]):
+    is_tuple = [isinstance(value, tuple) for value in values]
+    if all(is_tuple):
+        if len(set(len(value) for value in values)) != 1:
+            raise _CannotCollate("instances have different numbers of arrays")
+        return [_collate_fields(list(fields), padding_lengths) for fields in zip(*values)]
+    if any(is_tuple):
+        raise _CannotCollate("instances have different numbers of arrays")
+    return _collate_fields(values, padding_lengths)
+
+
+def _collate_fields(fields: List[Field], padding_lengths: Dict[str, int]) -> numpy.ndarray:
+    missing = [field is None for field in fields]
+    if all(missing):
+        # This is what stacking the ``None`` labels of unlabeled instances has always given.
+        return numpy.asarray([None] * len(fields))
+    if any(missing):
+        raise _CannotCollate("some instances are missing a label")
+    field_class = fields[0].__class__
+    if any(field.__class__ != field_class for field in fields):
+        raise _CannotCollate("instances have different kinds of fields")
+    return field_class.collate(fields, padding_lengths)
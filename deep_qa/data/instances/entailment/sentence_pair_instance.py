@@ -3,6 +3,7 @@ from typing import Dict, List
 import numpy
 from overrides import overrides
 
+from ..collation import ArrayField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -80,3 +81,11 @@ class IndexedSentencePairInstance(IndexedInstance):
         first_sentence_array = numpy.asarray(self.first_sentence_indices, dtype='int32')
         second_sentence_array = numpy.asarray(self.second_sentence_indices, dtype='int32')
         return (first_sentence_array, second_sentence_array), numpy.asarray(self.label)
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        first_sentence_field = RaggedField(self.first_sentence_indices, ['num_sentence_words'], word_sequence=True)
+        second_sentence_field = RaggedField(self.second_sentence_indices, ['num_sentence_words'],
+                                            word_sequence=True)
+        label_field = None if self.label is None else ArrayField(self.label)
+        return (first_sentence_field, second_sentence_field), label_field
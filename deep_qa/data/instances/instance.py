@@ -215,6 +215,23 @@ class IndexedInstance(Instance):
         """
         raise NotImplementedError
 
+    def get_fields(self, padding_lengths: Dict[str, int]):  # pylint: disable=no-self-use,unused-argument
+        """
+        Describes the arrays that :func:`as_training_data` would return after padding this
+        instance to ``padding_lengths``, `without` actually padding the instance.  This lets
+        :class:`~deep_qa.data.dataset.IndexedDataset` build the arrays for a whole batch at once,
+        directly into preallocated numpy arrays, and leaves the instance unmodified.
+
+        Returns
+        -------
+        fields : (inputs, label)
+            With the same structure as the return value of :func:`as_training_data`, but with
+            :class:`~deep_qa.data.instances.collation.Field` objects in place of arrays (and
+            ``None`` for missing labels).  If this method returns ``None``, which is the default,
+            we fall back to padding a copy of the instance and calling :func:`as_training_data`.
+        """
+        return None
+
     @staticmethod
     def _get_word_sequence_lengths(word_indices: List) -> Dict[str, int]:
         """
@@ -230,7 +247,7 @@ class IndexedInstance(Instance):
         padding_lengths = {'num_sentence_words': len(word_indices)}
         if len(word_indices) > 0 and not isinstance(word_indices[0], int):
             if isinstance(word_indices[0], list):
-                padding_lengths['num_word_characters'] = max([len(word) for word in word_indices])
+                padding_lengths['num_word_characters'] = max(map(len, word_indices))
             # There might someday be other cases we're missing here, but we'll punt for now.
         return padding_lengths
 
@@ -3,6 +3,7 @@ from typing import Dict, List
 import numpy
 from overrides import overrides
 
+from ..collation import RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -92,3 +93,12 @@ class IndexedSentenceInstance(IndexedInstance):
         # The expand dims here is because Keras' sparse categorical cross entropy expects tensors
         # of shape (batch_size, num_words, 1).
         return word_array, numpy.expand_dims(label_array, axis=2)
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        word_field = RaggedField(self.word_indices, ['num_sentence_words'], word_sequence=True)
+        if self.label is None:
+            return word_field, None
+        # The extra dimension of size one is the same as the ``expand_dims`` above.
+        label_field = RaggedField([[label] for label in self.label], ['num_sentence_words', 1])
+        return word_field, label_field
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 
 from overrides import overrides
 
@@ -34,3 +34,8 @@ class IndexedBabiInstance(IndexedQuestionAnswerInstance):
     def as_training_data(self):
         inputs, label = super(IndexedBabiInstance, self).as_training_data()
         return inputs[0], label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        input_fields, label_field = super(IndexedBabiInstance, self).get_fields(padding_lengths)
+        return input_fields[0], label_field
@@ -3,6 +3,7 @@ from typing import Dict, List
 import numpy
 from overrides import overrides
 
+from deep_qa.data.instances.collation import OneHotField, RaggedField
 from deep_qa.data.instances.instance import TextInstance, IndexedInstance
 from deep_qa.data.data_indexer import DataIndexer
 from deep_qa.common.checks import ConfigurationError
@@ -259,3 +260,16 @@ class IndexedGraphAlignInstance(IndexedInstance):
             label = numpy.zeros((len(self.answers_indexed)))
             label[self.label] = 1
         return question_options_matrix, label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        num_options = len(self.answers_indexed)
+        if num_options > padding_lengths['num_options']:
+            raise Exception("Case of too many answer options ({0} provided) isn't currently "
+                            "handled.".format(num_options))
+        answers_field = RaggedField(self.answers_indexed,
+                                    ['num_options', 'num_graphlets', 'num_alignments', 'num_features'],
+                                    truncate_from_right=False,
+                                    dtype='float32')
+        label_field = None if self.label is None else OneHotField([self.label], 'num_options')
+        return answers_field, label_field
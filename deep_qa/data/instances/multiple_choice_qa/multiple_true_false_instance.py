@@ -4,6 +4,7 @@ from typing import Dict, List
 import numpy
 from overrides import overrides
 
+from ..collation import OneHotField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...dataset import TextDataset
 from ...data_indexer import DataIndexer
@@ -154,3 +155,20 @@ class IndexedMultipleTrueFalseInstance(IndexedInstance):
             label = numpy.zeros(len(self.options))
             label[self.label] = 1
         return inputs, label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        option_fields = []
+        for option in self.options[:padding_lengths['num_options']]:
+            fields = option.get_fields(padding_lengths)
+            if fields is None:
+                return None
+            option_fields.append(fields[0])
+        # Missing options get padded with empty instances, which are all zeros.
+        if isinstance(option_fields[0], tuple):
+            input_fields = tuple(RaggedField.stack(list(fields), 'num_options', False)
+                                 for fields in zip(*option_fields))
+        else:
+            input_fields = RaggedField.stack(option_fields, 'num_options', False)
+        label_field = None if self.label is None else OneHotField([self.label], 'num_options')
+        return input_fields, label_field
@@ -3,6 +3,7 @@ from typing import Dict, List
 import numpy
 from overrides import overrides
 
+from ..collation import OneHotField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -139,3 +140,11 @@ class IndexedQuestionAnswerInstance(IndexedInstance):
             label = numpy.zeros((len(self.option_indices)))
             label[self.label] = 1
         return (question_array, option_array), label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        question_field = RaggedField(self.question_indices, ['num_sentence_words'], word_sequence=True)
+        option_field = RaggedField(self.option_indices, ['num_options', 'answer_length'],
+                                   truncate_from_right=[False, True], word_sequence=True)
+        label_field = None if self.label is None else OneHotField([self.label], 'num_options')
+        return (question_field, option_field), label_field
@@ -4,6 +4,7 @@ from typing import Dict, List
 import numpy as np
 from overrides import overrides
 
+from ..collation import OneHotField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 from ....common.checks import ConfigurationError
@@ -466,3 +467,20 @@ class IndexedTupleInferenceInstance(IndexedInstance):
             label = np.zeros((len(self.answers_indexed)))
             label[self.label] = 1
         return (question_options_matrix, background_matrix), label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        num_options = len(self.answers_indexed)
+        if num_options > padding_lengths['num_options']:
+            raise Exception("Case of too many answer options ({0} provided) isn't currently "
+                            "handled.".format(num_options))
+        answers_field = RaggedField(self.answers_indexed,
+                                    ['num_options', 'num_question_tuples', 'num_slots', 'num_sentence_words'],
+                                    truncate_from_right=[False, False, False, True],
+                                    word_sequence=True)
+        background_field = RaggedField(self.background_indexed,
+                                       ['num_background_tuples', 'num_slots', 'num_sentence_words'],
+                                       truncate_from_right=[False, False, True],
+                                       word_sequence=True)
+        label_field = None if self.label is None else OneHotField([self.label], 'num_options')
+        return (answers_field, background_field), label_field
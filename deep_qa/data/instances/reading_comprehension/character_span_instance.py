@@ -1,9 +1,10 @@
-from typing import Tuple, List
+from typing import Dict, Tuple, List
 
 import numpy
 from overrides import overrides
 
 from .question_passage_instance import QuestionPassageInstance, IndexedQuestionPassageInstance
+from ..collation import OneHotField
 from ...data_indexer import DataIndexer
 
 
@@ -97,3 +98,11 @@ class IndexedCharacterSpanInstance(IndexedQuestionPassageInstance):
             span_begin_label[self.label[0]] = 1
             span_end_label[self.label[1]] = 1
         return input_arrays, (span_begin_label, span_end_label)
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        if self.label is None:
+            return self._get_input_fields(), (None, None)
+        span_begin_field = OneHotField([self.label[0]], 'num_passage_words')
+        span_end_field = OneHotField([self.label[1]], 'num_passage_words')
+        return self._get_input_fields(), (span_begin_field, span_end_field)
@@ -3,6 +3,7 @@ import numpy as np
 
 from overrides import overrides
 from .question_passage_instance import IndexedQuestionPassageInstance, QuestionPassageInstance
+from ..collation import OneHotField, RaggedField
 from ...data_indexer import DataIndexer
 
 
@@ -163,3 +164,11 @@ class IndexedMcQuestionPassageInstance(IndexedQuestionPassageInstance):
             label = np.zeros((len(self.option_indices)))
             label[self.label] = 1
         return (question_array, passage_array, options_array), label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        question_field, passage_field = self._get_input_fields()
+        options_field = RaggedField(self.option_indices, ['num_options', 'num_option_words'],
+                                    truncate_from_right=[False, True], word_sequence=True)
+        label_field = None if self.label is None else OneHotField([self.label], 'num_options')
+        return (question_field, passage_field, options_field), label_field
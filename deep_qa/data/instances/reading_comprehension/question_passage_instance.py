@@ -3,6 +3,7 @@ from typing import Dict, List, Any
 import numpy as np
 from overrides import overrides
 
+from ..collation import ArrayField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -107,3 +108,13 @@ class IndexedQuestionPassageInstance(IndexedInstance):
         question_array = np.asarray(self.question_indices, dtype='int32')
         passage_array = np.asarray(self.passage_indices, dtype='int32')
         return (question_array, passage_array), np.asarray(self.label)
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        return self._get_input_fields(), None if self.label is None else ArrayField(self.label)
+
+    def _get_input_fields(self):
+        question_field = RaggedField(self.question_indices, ['num_question_words'], word_sequence=True)
+        passage_field = RaggedField(self.passage_indices, ['num_passage_words'],
+                                    truncate_from_right=False, word_sequence=True)
+        return question_field, passage_field
@@ -3,6 +3,7 @@ from typing import Dict, List
 import numpy as np
 from overrides import overrides
 
+from ..collation import OneHotField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -163,3 +164,11 @@ class IndexedSentenceSelectionInstance(IndexedInstance):
             for correct_index in self.label:
                 label[correct_index] = 1
         return (question_array, sentences_matrix), np.asarray(label)
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        question_field = RaggedField(self.question_indices, ['num_question_words'], word_sequence=True)
+        sentences_field = RaggedField(self.sentences_indices, ['num_sentences', 'num_sentence_words'],
+                                      truncate_from_right=[False, True], word_sequence=True)
+        label_field = None if self.label is None else OneHotField(self.label, 'num_sentences')
+        return (question_field, sentences_field), label_field
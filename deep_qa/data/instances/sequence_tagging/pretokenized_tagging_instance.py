@@ -48,7 +48,7 @@ class PreTokenizedTaggingInstance(TaggingInstance):
 
     @overrides
     def _index_label(self, label: List[str], data_indexer: DataIndexer) -> List[int]:
-        tag_indices = [data_indexer.get_word_index(tag, namespace='tags') for tag in label]
+        tag_indices = data_indexer.get_word_indices(label, namespace='tags')
         indexed_label = []
         for tag_index in tag_indices:
             # We subtract 2 here to account for the unknown and padding tokens that the DataIndexer
@@ -3,6 +3,7 @@ from typing import Dict, List, Any
 import numpy
 from overrides import overrides
 
+from ..collation import RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -81,3 +82,14 @@ class IndexedTaggingInstance(IndexedInstance):
         text_array = numpy.asarray(self.text_indices, dtype='int32')
         label_array = numpy.asarray(self.label, dtype='int32')
         return text_array, label_array
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        text_field = RaggedField(self.text_indices, ['num_sentence_words'],
+                                 truncate_from_right=False, word_sequence=True)
+        if self.label is None:
+            return text_field, None
+        # As in ``pad``, we pad the tags with the first tag.
+        label_field = RaggedField(self.label, ['num_sentence_words'], truncate_from_right=False,
+                                  padding_value=self.label[0] if self.label else 0)
+        return text_field, label_field
@@ -4,6 +4,7 @@ import numpy
 
 from overrides import overrides
 
+from ..collation import ArrayField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -90,7 +91,7 @@ class VerbSemanticsInstance(TextInstance):
     @overrides
     def to_indexed_instance(self, data_indexer: DataIndexer):
 
-        sentence_indices = [data_indexer.get_word_index(word) for word in self.sentence]
+        sentence_indices = data_indexer.get_word_indices(self.sentence)
 
         # verb indices, entity indices are one-hot vectors representing spans within the sentence
         verb_indices = [0] * len(sentence_indices)
@@ -111,7 +112,7 @@ class VerbSemanticsInstance(TextInstance):
             state_one_hot[state_index - 2] = 1
 
         tag_one_hot_list = []
-        tag_indices = [data_indexer.get_word_index(tag, namespace='tags') for tag in self.label[1]]
+        tag_indices = data_indexer.get_word_indices(self.label[1], namespace='tags')
         for tag_index in tag_indices:
             # We subtract 2 here to account for the unknown and padding tokens that the DataIndexer uses.
             tag_one_hot = [0] * (data_indexer.get_vocab_size(namespace='tags') - 2)
@@ -207,3 +208,21 @@ class IndexedVerbSemanticsInstance(IndexedInstance):
         tag_array = numpy.asarray(self.label[1], dtype='int32')
 
         return (word_array, verb_array, entity_array), (state_array, tag_array)
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        word_field = RaggedField(self.sentence, ['num_sentence_words'],
+                                 truncate_from_right=False, word_sequence=True)
+        verb_field = RaggedField(self.verb, ['num_sentence_words'], truncate_from_right=False)
+        entity_field = RaggedField(self.entity, ['num_sentence_words'], truncate_from_right=False)
+        if self.label is None:
+            return (word_field, verb_field, entity_field), (None, None)
+        states, tags = self.label
+        state_field = ArrayField(states, dtype='int32')
+        # Each tag is a one-hot vector, and, as in ``pad``, we pad the tags with the first tag, so
+        # this isn't a single padding value; we just pad the (short) list of tags here.
+        padded_tags = self.pad_sequence_to_length(tags, padding_lengths['num_sentence_words'],
+                                                  default_value=lambda: tags[0],
+                                                  truncate_from_right=False)
+        tag_field = ArrayField(padded_tags, dtype='int32')
+        return (word_field, verb_field, entity_field), (state_field, tag_field)
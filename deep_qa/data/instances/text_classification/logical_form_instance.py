@@ -4,6 +4,7 @@ import numpy
 from overrides import overrides
 
 from .text_classification_instance import TextClassificationInstance, IndexedTextClassificationInstance
+from ..collation import RaggedField
 from ...data_indexer import DataIndexer
 
 # Shift and reduce operations in our transition based composition
@@ -74,7 +75,7 @@ class LogicalFormInstance(TextClassificationInstance):
                 elements.append(token)
         if len(last_symbols) != 0 or is_malformed:
             raise RuntimeError("Malformed binary semantic parse: %s" % self.text)
-        indices = [data_indexer.get_word_index(word) for word in elements]
+        indices = data_indexer.get_word_indices(elements)
         return IndexedLogicalFormInstance(indices, transitions, self.label, self.index)
 
 
@@ -124,3 +125,8 @@ class IndexedLogicalFormInstance(IndexedTextClassificationInstance):
         word_array, label = super(IndexedLogicalFormInstance, self).as_training_data()
         transitions = numpy.asarray(self.transitions, dtype='int32')
         return (word_array, transitions), label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        word_field, label_field = super(IndexedLogicalFormInstance, self).get_fields(padding_lengths)
+        return (word_field, RaggedField(self.transitions, ['transition_length'])), label_field
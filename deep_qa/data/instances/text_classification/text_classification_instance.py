@@ -3,6 +3,7 @@ from typing import Dict, List
 import numpy
 from overrides import overrides
 
+from ..collation import OneHotField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -97,3 +98,14 @@ class IndexedTextClassificationInstance(IndexedInstance):
         else:
             label = None
         return word_array, label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        return RaggedField(self.word_indices, ['num_sentence_words'], word_sequence=True), self._get_label_field()
+
+    def _get_label_field(self):
+        if self.label is True:
+            return OneHotField([1], 2)
+        elif self.label is False:
+            return OneHotField([0], 2)
+        return None
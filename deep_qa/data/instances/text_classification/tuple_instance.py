@@ -1,9 +1,11 @@
 from collections import defaultdict
+import itertools
 from typing import Dict, List
 
 import numpy
 from overrides import overrides
 
+from ..collation import OneHotField, RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 
@@ -135,3 +137,21 @@ class IndexedTupleInstance(IndexedInstance):
         else:
             label = None
         return tuple_matrix, label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        word_indices = self.word_indices
+        desired_num_slots = padding_lengths['num_slots']
+        if len(word_indices) > desired_num_slots > 0:
+            # As in ``pad``, extra slots get concatenated onto the last slot we keep.
+            last_slot = list(itertools.chain.from_iterable(word_indices[desired_num_slots - 1:]))
+            word_indices = word_indices[:desired_num_slots - 1] + [last_slot]
+        word_field = RaggedField(word_indices, ['num_slots', 'num_sentence_words'],
+                                 truncate_from_right=[False, True], word_sequence=True)
+        if self.label is True:
+            label_field = OneHotField([1], 2)
+        elif self.label is False:
+            label_field = OneHotField([0], 2)
+        else:
+            label_field = None
+        return word_field, label_field
@@ -1,10 +1,11 @@
-import codecs
 from collections import OrderedDict
 from typing import Dict, List
 
 import numpy
 from overrides import overrides
 
+from ....common.util import open_text_file
+from ..collation import RaggedField
 from ..instance import TextInstance, IndexedInstance
 from ...data_indexer import DataIndexer
 from ...dataset import TextDataset
@@ -27,13 +28,14 @@ def read_background_from_file(dataset: TextDataset, filename: str, background_cl
     for instance in dataset.instances:
         background_instance = BackgroundInstance(instance, [])
         new_instances[instance.index] = background_instance
-    for line in codecs.open(filename, "r", "utf-8"):
-        fields = line.strip().split("\t")
-        index = int(fields[0])
-        if index in new_instances:
-            instance = new_instances[index]
-            for sequence in fields[1:]:
-                instance.background.append(background_class.read_from_line(sequence))
+    with open_text_file(filename) as background_file:
+        for line in background_file:
+            fields = line.strip().split("\t")
+            index = int(fields[0])
+            if index in new_instances:
+                instance = new_instances[index]
+                for sequence in fields[1:]:
+                    instance.background.append(background_class.read_from_line(sequence))
     return TextDataset(list(new_instances.values()))
 
 
@@ -101,6 +103,14 @@ class IndexedBackgroundInstance(IndexedInstance):
         if len(background_instances) > 0:
             IndexedBackgroundInstance.background_instance_type = background_instances[0].__class__
 
+    def __setstate__(self, state):
+        # Instances that are unpickled (e.g., from an ``IndexedDatasetCache``) don't go through
+        # ``__init__``, so we need to make sure the class-level instance types get set here too.
+        self.__dict__.update(state)
+        IndexedBackgroundInstance.contained_instance_type = self.indexed_instance.__class__
+        if len(self.background_instances) > 0:
+            IndexedBackgroundInstance.background_instance_type = self.background_instances[0].__class__
+
     @classmethod
     @overrides
     def empty_instance(cls):
@@ -184,3 +194,31 @@ class IndexedBackgroundInstance(IndexedInstance):
         else:
             final_inputs = (instance_inputs, background_array)
         return final_inputs, label
+
+    @overrides
+    def get_fields(self, padding_lengths: Dict[str, int]):
+        instance_fields = self.indexed_instance.get_fields(padding_lengths)
+        if instance_fields is None:
+            return None
+        instance_inputs, label = instance_fields
+        background_fields = []
+        for background_instance in self.background_instances[:padding_lengths['background_sentences']]:
+            background_fields.append(background_instance.get_fields(padding_lengths))
+        if not background_fields:
+            empty_background_instance = IndexedBackgroundInstance.background_instance_type.empty_instance()
+            template = empty_background_instance.get_fields(padding_lengths)
+        else:
+            template = background_fields[0]
+        if template is None or any(fields is None for fields in background_fields):
+            return None
+        if any(isinstance(fields[0], tuple) for fields in background_fields + [template]):
+            raise RuntimeError("Received a background instance that provides multiple inputs.")
+        background_field = RaggedField.stack([fields[0] for fields in background_fields],
+                                             'background_sentences',
+                                             truncate_from_right=False,
+                                             template=template[0])
+        if isinstance(instance_inputs, tuple):
+            final_inputs = (instance_inputs[0],) + (background_field,) + instance_inputs[1:]
+        else:
+            final_inputs = (instance_inputs, background_field)
+        return final_inputs, label
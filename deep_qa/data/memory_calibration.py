@@ -0,0 +1,184 @@
+"""
+Code for automatically setting the ``adaptive_memory_usage_constant`` of a
+:class:`~deep_qa.data.data_generator.DataGenerator`, instead of finding it by trial and error.
+
+Adaptive batching assumes that training on a batch of ``b`` instances with padding lengths ``p``
+uses memory :math:`M = a + c * b * O(p)`, where :math:`O(p)` is given by
+:func:`~deep_qa.training.TextTrainer.get_padding_memory_scaling`, and it keeps
+:math:`b * O(p)` under the ``adaptive_memory_usage_constant``.  To calibrate that constant, we
+take the instances with the largest padding lengths in the training data, run a few training steps
+on them with increasing batch sizes, measuring the peak memory used by each, fit :math:`a` and
+:math:`c` to those measurements, and solve for the value of :math:`b * O(p)` that uses a given
+memory budget.
+"""
+import logging
+import resource
+import sys
+from typing import List
+
+import numpy
+
+from ..common.checks import ConfigurationError
+from ..common.params import Params
+from .dataset import IndexedDataset
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class MemoryCalibrator:
+    """
+    Runs probe training steps to calibrate a ``DataGenerator``'s ``adaptive_memory_usage_constant``
+    (see the module documentation).  The probe steps modify the model's weights and the optimizer's
+    state, so we save both first, and restore them when we're done.
+
+    Parameters
+    ----------
+    memory_budget: int
+        The amount of memory, in megabytes, that we want training to use at most.  With the
+        ``process`` measure, this is the peak resident memory of the whole training process, so
+        it includes the model, the data, and python itself.
+    batch_sizes: List[int], optional (default=[1, 2, 4, 8, 16, 32, 64])
+        The batch sizes to probe, in increasing order.  We stop early if a probe uses more than
+        ``memory_budget``, so it's fine to include batch sizes larger than you expect to fit, but
+        you need at least two probes to fit the constant.
+    num_steps: int, optional (default=2)
+        How many training steps to run at each batch size.
+    memory_measure: str, optional (default='process')
+        How to measure memory.  ``process`` uses the peak resident set size of the process, which
+        is what matters on CPU training nodes.  ``tensorflow`` uses the peak memory allocated by
+        tensorflow's allocator (from ``tf.contrib.memory_stats``), which is what matters on a GPU.
+    """
+    def __init__(self, params: Params):
+        self.memory_budget = params.pop('memory_budget') * 2**20
+        self.batch_sizes = sorted(params.pop('batch_sizes', [1, 2, 4, 8, 16, 32, 64]))
+        self.num_steps = params.pop('num_steps', 2)
+        self.memory_measure = params.pop_choice('memory_measure', ['process', 'tensorflow'],
+                                                default_to_first_choice=True)
+        params.assert_empty("MemoryCalibrator")
+        if len(self.batch_sizes) < 2:
+            raise ConfigurationError("Memory calibration needs at least two batch sizes to probe")
+
+    def calibrate(self, text_trainer, model, dataset: IndexedDataset) -> int:
+        """
+        Returns the ``adaptive_memory_usage_constant`` that makes training ``model`` on batches from
+        ``dataset`` use about ``memory_budget`` memory, leaving the model as it was.
+        """
+        from keras import backend as K
+        sorting_keys = text_trainer.get_instance_sorting_keys()
+        # The biggest instances, biggest first, repeated if the dataset is smaller than our largest
+        # probe.
+        largest_instances = dataset.get_padding_sort_order(sorting_keys)[-self.batch_sizes[-1]:][::-1]
+        model._make_train_function()  # pylint: disable=protected-access
+        weights = model.get_weights()
+        training_variables = get_training_state_variables(model)
+        training_values = K.batch_get_value(training_variables)
+        num_calls = model.train_function.num_calls
+        memory_usage = self.__get_memory_usage_function()
+        scalings = []
+        memory_usages = []
+        try:
+            # A first step to get one-off costs, like building the training function, out of the way.
+            self.__train_on(text_trainer, model, dataset, largest_instances[:1], num_steps=1)
+            for batch_size in self.batch_sizes:
+                indices = [largest_instances[i % len(largest_instances)] for i in range(batch_size)]
+                _reset_peak_process_memory()
+                scaling = self.__train_on(text_trainer, model, dataset, indices, self.num_steps)
+                scalings.append(batch_size * scaling)
+                memory_usages.append(memory_usage())
+                logger.info("Batch size %d: memory scaling %d, peak memory %.1f MB",
+                            batch_size, scalings[-1], memory_usages[-1] / 2**20)
+                if memory_usages[-1] > self.memory_budget:
+                    break
+        finally:
+            model.set_weights(weights)
+            K.batch_set_value(list(zip(training_variables, training_values)))
+            model.train_function.num_calls = num_calls
+        constant = fit_memory_usage_constant(scalings, memory_usages, self.memory_budget)
+        logger.info("Calibrated adaptive_memory_usage_constant: %d", constant)
+        return constant
+
+    @staticmethod
+    def __train_on(text_trainer, model, dataset: IndexedDataset, indices: List[int], num_steps: int) -> int:
+        batch = dataset.select(indices)
+        inputs, labels = batch.as_padded_training_data(text_trainer.get_padding_lengths())
+        for _ in range(num_steps):
+            model.train_on_batch(inputs, labels)
+        return text_trainer.get_padding_memory_scaling(batch.padding_lengths())
+
+    def __get_memory_usage_function(self):
+        if self.memory_measure == 'process':
+            return get_peak_process_memory
+        import tensorflow
+        from keras import backend as K
+        max_bytes_in_use = tensorflow.contrib.memory_stats.MaxBytesInUse()
+        return lambda: int(K.get_session().run(max_bytes_in_use))
+
+
+def get_training_state_variables(model) -> List:
+    """
+    Returns the variables, other than the model's weights, that a training step on ``model``
+    changes: the optimizer's slots (like Adam's moment estimates) and other variables (like Adam's
+    ``beta1_power``), the global step, and the gradient accumulators, if the model accumulates
+    gradients.  ``model`` has to have its training function already.
+    """
+    import tensorflow
+    optimizer = model.optimizer
+    if hasattr(optimizer, 'variables'):
+        variables = list(optimizer.variables())
+    else:
+        # Older versions of tensorflow don't have ``Optimizer.variables()``, so we just get the
+        # slots.
+        variables = [optimizer.get_slot(weight, slot_name)
+                     for weight in model.trainable_weights
+                     for slot_name in optimizer.get_slot_names()]
+        variables = [variable for variable in variables if variable is not None]
+    variables.append(tensorflow.train.get_or_create_global_step())
+    variables.extend(getattr(model, 'gradient_accumulators', []))
+    return variables
+
+
+def fit_memory_usage_constant(scalings: List[int], memory_usages: List[int], memory_budget: int) -> int:
+    """
+    Fits :math:`M = a + c * s` to measurements of memory usage :math:`M` (in bytes) at memory
+    scalings :math:`s` (batch size times :func:`get_padding_memory_scaling`), and returns the
+    scaling at which we'd use ``memory_budget`` bytes.
+    """
+    if len(set(scalings)) < 2:
+        raise ConfigurationError("Memory calibration needs probes with at least two different memory "
+                                 "scalings; try more batch sizes, or a larger memory budget")
+    slope, intercept = numpy.polyfit(scalings, memory_usages, 1)
+    if slope <= 0:
+        raise ConfigurationError("Memory usage didn't grow with the batch size during calibration; "
+                                 "try probing larger batch sizes")
+    constant = int((memory_budget - intercept) / slope)
+    if constant <= 0:
+        raise ConfigurationError("The memory budget (%.1f MB) is smaller than the memory used without "
+                                 "any data (about %.1f MB)" % (memory_budget / 2**20, intercept / 2**20))
+    return constant
+
+
+def get_peak_process_memory() -> int:
+    """
+    Returns the peak resident set size of this process, in bytes, since it started or since we last
+    called :func:`_reset_peak_process_memory` (if the OS lets us reset it).
+    """
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+    # ``ru_maxrss`` is in kilobytes on linux, and in bytes on OS X.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _reset_peak_process_memory():
+    # On linux, writing "5" here resets the peak resident set size.  If we can't, the peak only
+    # ever grows, which is still fine for probes of increasing size.
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except IOError:
+        pass
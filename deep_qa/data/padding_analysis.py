@@ -0,0 +1,182 @@
+"""
+Code for comparing how much padding different batching settings of a
+:class:`~deep_qa.data.data_generator.DataGenerator` produce on a dataset, without training
+anything.  We simulate an epoch of batches with each of these strategies:
+
+- ``fixed``: batches of ``batch_size`` instances in random order, all padded to the longest
+  instance in the dataset (``dynamic_padding`` off);
+- ``sorted``: batches of ``batch_size`` instances sorted by padding length, each padded to its
+  own longest instance (``dynamic_padding`` on, with the given ``padding_noise``);
+- ``adaptive``: like ``sorted``, but with ``adaptive_batch_sizes``, so batches of short instances
+  get more instances than batches of long ones.
+
+For each strategy we count the real and padded tokens (see
+:func:`~deep_qa.data.data_generator.count_batch_tokens`) and estimate the cost of an epoch as the
+sum over batches of ``batch_size * get_padding_memory_scaling(padding_lengths)``.  That's the
+model's big-O estimate of memory, which for most of our models also tracks compute.
+"""
+import logging
+from typing import Any, Dict, List
+
+import numpy
+
+from ..common.params import Params
+from .data_generator import DataGenerator, count_batch_tokens
+from .dataset import IndexedDataset
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+STRATEGIES = ['fixed', 'sorted', 'adaptive']
+
+
+def analyze_padding(text_trainer,
+                    dataset: IndexedDataset,
+                    padding_noise: float=0.0,
+                    adaptive_memory_usage_constant: int=None,
+                    maximum_batch_size: int=1000000,
+                    num_bins: int=10) -> Dict[str, Any]:
+    """
+    Computes histograms of the padding lengths in ``dataset``, and simulates an epoch of batches
+    with each of the strategies described in the module documentation.
+
+    Parameters
+    ----------
+    text_trainer: TextTrainer
+        The model, which gives us the batch size, the instance sorting keys, the padding lengths
+        and the padding memory scaling.  Padding lengths the model sets are limits for every
+        strategy; padding lengths that are ``None`` get computed from the data.
+    dataset: IndexedDataset
+        The dataset to analyze.
+    padding_noise: float, optional (default=0.0)
+        The ``padding_noise`` to use for the ``sorted`` and ``adaptive`` strategies.
+    adaptive_memory_usage_constant: int, optional (default=None)
+        The constant for the ``adaptive`` strategy.  If this is ``None``, we use the memory of a
+        batch of ``batch_size`` instances padded like the ``fixed`` strategy does, so the largest
+        adaptive batches use the same memory as the fixed batches.
+    maximum_batch_size: int, optional (default=1000000)
+        The ``maximum_batch_size`` for the ``adaptive`` strategy.
+    num_bins: int, optional (default=10)
+        The number of bins in the padding length histograms.
+
+    Returns
+    -------
+    A dictionary with ``histograms`` (for each padding length key, the histogram ``counts`` and
+    ``bin_edges``, and the ``mean``, ``median``, ``percentile_90``, ``percentile_99`` and ``max``
+    lengths), and ``strategies`` (for each strategy, ``num_batches``, ``mean_batch_size``,
+    ``num_tokens``, ``num_padded_tokens``, ``token_ratio`` (real over padded tokens),
+    ``padding_fraction``, ``estimated_cost`` and ``relative_cost``, the estimated cost as a fraction
+    of the cost of the ``fixed`` strategy).  If the model doesn't implement
+    ``get_padding_memory_scaling``, we skip the ``adaptive`` strategy and the costs are ``None``.
+    """
+    keys, matrix = dataset.get_padding_length_matrix()
+    sorting_keys = text_trainer.get_instance_sorting_keys()
+    model_padding_lengths = text_trainer.get_padding_lengths()
+    histograms = {key: _length_histogram(matrix[:, i], num_bins) for i, key in enumerate(keys)}
+
+    # Without dynamic padding, every padding length the model doesn't set comes from the whole
+    # dataset.
+    dataset_padding_lengths = dict(zip(keys, (int(length) for length in matrix.max(axis=0))))
+    dataset_padding_lengths.update({key: length for key, length in model_padding_lengths.items()
+                                    if length is not None})
+    try:
+        fixed_batch_memory = text_trainer.batch_size * text_trainer.get_padding_memory_scaling(
+                dataset_padding_lengths)
+    except RuntimeError:
+        logger.warning("The model doesn't implement get_padding_memory_scaling, so we can't "
+                       "estimate step costs or simulate adaptive batch sizes")
+        fixed_batch_memory = None
+
+    strategy_params = {
+            'fixed': ({'dynamic_padding': False}, dataset_padding_lengths),
+            'sorted': ({'dynamic_padding': True, 'padding_noise': padding_noise}, model_padding_lengths),
+            }
+    if fixed_batch_memory is not None:
+        strategy_params['adaptive'] = ({'dynamic_padding': True,
+                                        'padding_noise': padding_noise,
+                                        'adaptive_batch_sizes': True,
+                                        'adaptive_memory_usage_constant': (adaptive_memory_usage_constant
+                                                                           or fixed_batch_memory),
+                                        'maximum_batch_size': maximum_batch_size},
+                                       model_padding_lengths)
+    results = {}
+    for strategy in STRATEGIES:
+        if strategy not in strategy_params:
+            continue
+        generator_params, padding_lengths = strategy_params[strategy]
+        batches = DataGenerator(text_trainer, Params(generator_params)).get_epoch_batches(dataset)
+        results[strategy] = _simulate_batches(text_trainer, keys, matrix, batches, sorting_keys,
+                                              padding_lengths, fixed_batch_memory is not None)
+    fixed_cost = results['fixed']['estimated_cost']
+    for strategy_result in results.values():
+        cost = strategy_result['estimated_cost']
+        strategy_result['relative_cost'] = cost / fixed_cost if cost is not None and fixed_cost else None
+    return {'histograms': histograms, 'strategies': results}
+
+
+def format_padding_analysis(analysis: Dict[str, Any]) -> str:
+    """
+    Formats the output of :func:`analyze_padding` as tables, for printing.
+    """
+    lines = ["%-24s %10s %10s %10s %10s %10s" % ("padding length", "mean", "median", "90%", "99%", "max")]
+    for key, histogram in sorted(analysis['histograms'].items()):
+        lines.append("%-24s %10.1f %10.1f %10.1f %10.1f %10d" % (key, histogram['mean'], histogram['median'],
+                                                                 histogram['percentile_90'],
+                                                                 histogram['percentile_99'], histogram['max']))
+    lines.append("")
+    lines.append("%-10s %8s %10s %12s %12s %12s %10s %14s" % ("strategy", "batches", "batch size", "tokens",
+                                                              "padded", "real/padded", "padding",
+                                                              "relative cost"))
+    for strategy in STRATEGIES:
+        if strategy not in analysis['strategies']:
+            continue
+        result = analysis['strategies'][strategy]
+        relative_cost = result['relative_cost']
+        lines.append("%-10s %8d %10.1f %12d %12d %12.3f %9.1f%% %14s" % (
+                strategy, result['num_batches'], result['mean_batch_size'], result['num_tokens'],
+                result['num_padded_tokens'], result['token_ratio'], 100 * result['padding_fraction'],
+                "-" if relative_cost is None else "%.3f" % relative_cost))
+    return "\n".join(lines)
+
+
+def _simulate_batches(text_trainer,
+                      keys: List[str],
+                      matrix: numpy.ndarray,
+                      batches: List[List[int]],
+                      sorting_keys: List[str],
+                      padding_lengths: Dict[str, int],
+                      estimate_cost: bool) -> Dict[str, Any]:
+    num_tokens = 0
+    num_padded_tokens = 0
+    estimated_cost = 0 if estimate_cost else None
+    for batch in batches:
+        batch_tokens, batch_padded_tokens = count_batch_tokens(keys, matrix, batch, sorting_keys, padding_lengths)
+        num_tokens += batch_tokens
+        num_padded_tokens += batch_padded_tokens
+        if estimate_cost:
+            batch_lengths = matrix[batch].max(axis=0)
+            batch_padding_lengths = {key: (int(batch_lengths[i]) if padding_lengths.get(key) is None
+                                           else padding_lengths[key])
+                                     for i, key in enumerate(keys)}
+            estimated_cost += len(batch) * text_trainer.get_padding_memory_scaling(batch_padding_lengths)
+    return {
+            'num_batches': len(batches),
+            'mean_batch_size': float(numpy.mean([len(batch) for batch in batches])),
+            'num_tokens': num_tokens,
+            'num_padded_tokens': num_padded_tokens,
+            'token_ratio': num_tokens / num_padded_tokens if num_padded_tokens > 0 else 1.0,
+            'padding_fraction': 1.0 - num_tokens / num_padded_tokens if num_padded_tokens > 0 else 0.0,
+            'estimated_cost': estimated_cost,
+            }
+
+
+def _length_histogram(lengths: numpy.ndarray, num_bins: int) -> Dict[str, Any]:
+    counts, bin_edges = numpy.histogram(lengths, bins=num_bins)
+    return {
+            'counts': counts.tolist(),
+            'bin_edges': bin_edges.tolist(),
+            'mean': float(lengths.mean()),
+            'median': float(numpy.percentile(lengths, 50)),
+            'percentile_90': float(numpy.percentile(lengths, 90)),
+            'percentile_99': float(numpy.percentile(lengths, 99)),
+            'max': int(lengths.max()),
+            }
@@ -0,0 +1,221 @@
+"""
+Code for storing the nested lists of word (and character) indices in ``IndexedInstances`` as flat
+numpy arrays plus offsets, instead of as python lists.
+
+A list of ``n`` word indices takes roughly ``8 * n + 64`` bytes as python objects, and with
+character tokenization every word is itself a list; the same indices take ``4 * n`` bytes in an
+``int32`` array.  We split each instance into a "skeleton" (a copy of the instance with every list
+of indices replaced by a small :class:`RaggedReference`) and a set of :class:`RaggedArrays`, one for
+each nesting depth of index lists, and rebuild the instance from those on demand.
+
+This is used both by the :class:`~deep_qa.data.indexed_dataset_cache.IndexedDatasetCache`, to store
+indexed datasets on disk, and by :class:`~deep_qa.data.dataset.CompactIndexedDataset`, to keep
+indexed datasets in memory.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+import numpy
+
+from .instances.instance import IndexedInstance
+
+
+class RaggedReference:
+    """
+    A placeholder left in an instance skeleton, pointing at row ``row`` of the ragged arrays with
+    nesting depth ``depth``.
+    """
+    def __init__(self, depth: int, row: int):
+        self.depth = depth
+        self.row = row
+
+
+class RaggedArrayBuilder:
+    """
+    Accumulates nested lists of indices with a fixed nesting depth into a flat list of values and
+    one list of offsets per nesting level.  Call :func:`compact` every so often to move what we've
+    accumulated so far into numpy arrays, so the python lists never get big.
+    """
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.values = []
+        self.offsets = [[0] for _ in range(depth)]
+        # What we've moved out of ``values`` and ``offsets`` in :func:`compact`, in order.  The
+        # offsets are always positions in the whole (not the compacted) list of values or items.
+        self._value_arrays = []
+        self._offset_arrays = [[] for _ in range(depth)]
+        self._num_compacted_values = 0
+        self._num_compacted_offsets = [0] * depth
+
+    def append(self, value: List) -> int:
+        self._append(value, 0)
+        return self._num_compacted_offsets[0] + len(self.offsets[0]) - 2
+
+    def _append(self, value: List, level: int):
+        if level == self.depth - 1:
+            self.values.extend(value)
+            self.offsets[level].append(self._num_compacted_values + len(self.values))
+        else:
+            for item in value:
+                self._append(item, level + 1)
+            self.offsets[level].append(self._num_compacted_offsets[level + 1] + len(self.offsets[level + 1]) - 1)
+
+    def compact(self):
+        """
+        Converts the values and offsets we've accumulated since the last call into numpy arrays.
+        """
+        if self.values:
+            self._value_arrays.append(to_index_array(self.values))
+            self._num_compacted_values += len(self.values)
+            self.values = []
+        for level, offsets in enumerate(self.offsets):
+            # We keep the last offset, which is where the next item starts.
+            if len(offsets) > 1:
+                self._offset_arrays[level].append(to_index_array(offsets[:-1]))
+                self._num_compacted_offsets[level] += len(offsets) - 1
+                self.offsets[level] = offsets[-1:]
+
+    def build(self) -> 'RaggedArrays':
+        """
+        Converts what we've accumulated into numpy arrays.
+        """
+        values = _concatenate(self._value_arrays + [to_index_array(self.values)])
+        offsets = [_concatenate(arrays + [to_index_array(level_offsets)])
+                   for arrays, level_offsets in zip(self._offset_arrays, self.offsets)]
+        return RaggedArrays(values, offsets)
+
+
+class RaggedArrays:
+    """
+    The read side of :class:`RaggedArrayBuilder`, over (possibly memory-mapped) numpy arrays.
+    """
+    def __init__(self, values: numpy.ndarray, offsets: List[numpy.ndarray]):
+        self.values = values
+        self.offsets = offsets
+        self.depth = len(offsets)
+
+    def row(self, index: int) -> List:
+        """
+        Returns row ``index`` as (nested) python lists, just as it was given to
+        :func:`RaggedArrayBuilder.append`.
+        """
+        return self._items(0, index, index + 1)[0]
+
+    def get_memory_usage(self) -> int:
+        """
+        Returns the number of bytes used by the arrays.
+        """
+        return self.values.nbytes + sum(offsets.nbytes for offsets in self.offsets)
+
+    def _items(self, level: int, begin: int, end: int) -> List:
+        # Everything below a contiguous range of items is itself contiguous, so we only need one
+        # slice per level, and we do the splitting with plain python lists.
+        bounds = self.offsets[level][begin:end + 1].tolist()
+        start = bounds[0]
+        if level == self.depth - 1:
+            children = self.values[start:bounds[-1]].tolist()
+        else:
+            children = self._items(level + 1, start, bounds[-1])
+        return [children[item_begin - start:item_end - start]
+                for item_begin, item_end in zip(bounds, bounds[1:])]
+
+
+def flatten_value(value, builders: Dict[int, RaggedArrayBuilder]):
+    """
+    Returns a skeleton of ``value`` (typically an ``IndexedInstance``), where every list of indices
+    has been appended to the builder in ``builders`` for its nesting depth (which we add if
+    necessary), and replaced with a :class:`RaggedReference`.  ``value`` is not modified.
+    """
+    # We leave empty lists in the skeleton; they're cheap, and they might be lists of instances.
+    depth = _ragged_depth(value) if value else None
+    if depth is not None:
+        if depth not in builders:
+            builders[depth] = RaggedArrayBuilder(depth)
+        return RaggedReference(depth, builders[depth].append(value))
+    if isinstance(value, IndexedInstance):
+        # We build the skeleton by copying the instance without calling ``__init__``.
+        skeleton = value.__class__.__new__(value.__class__)
+        skeleton.__dict__.update({name: flatten_value(attribute, builders)
+                                  for name, attribute in value.__dict__.items()})
+        return skeleton
+    if isinstance(value, (list, tuple)):
+        return value.__class__(flatten_value(item, builders) for item in value)
+    return value
+
+
+def flatten_chunks(chunks: Iterable[List]) -> Tuple[List, Dict[int, RaggedArrays]]:
+    """
+    Flattens every value in ``chunks`` with :func:`flatten_value`, returning the skeletons, in
+    order, and the arrays they refer to.  We move each chunk's indices into numpy arrays before
+    asking for the next chunk, so if ``chunks`` is a generator that makes (e.g., indexes) its
+    chunks on demand, we never hold more than about one chunk of indices as python lists.
+    """
+    builders = {}
+    skeletons = []
+    for chunk in chunks:
+        skeletons.extend(flatten_value(value, builders) for value in chunk)
+        for builder in builders.values():
+            builder.compact()
+    return skeletons, {depth: builder.build() for depth, builder in builders.items()}
+
+
+def restore_value(value, arrays: Dict[int, RaggedArrays]):
+    """
+    The inverse of :func:`flatten_value`: returns a copy of the skeleton ``value`` with every
+    :class:`RaggedReference` replaced by the corresponding row of ``arrays``.  The skeleton is not
+    modified, so it can be restored as many times as we want.
+    """
+    if isinstance(value, RaggedReference):
+        return arrays[value.depth].row(value.row)
+    if isinstance(value, IndexedInstance):
+        restored = value.__class__.__new__(value.__class__)
+        restored.__dict__.update({name: restore_value(attribute, arrays)
+                                  for name, attribute in value.__dict__.items()})
+        return restored
+    if isinstance(value, (list, tuple)):
+        return value.__class__(restore_value(item, arrays) for item in value)
+    return value
+
+
+def to_index_array(values: List[int]) -> numpy.ndarray:
+    """
+    Converts a list of indices to an ``int32`` array if they fit, and to an ``int64`` array
+    otherwise.
+    """
+    array = numpy.asarray(values, dtype='int64')
+    if array.size == 0 or (array.min() >= numpy.iinfo('int32').min and array.max() <= numpy.iinfo('int32').max):
+        array = array.astype('int32')
+    return array
+
+
+def _concatenate(arrays: List[numpy.ndarray]) -> numpy.ndarray:
+    # Arrays that fit in ``int32`` get upcast if any of the others didn't.
+    arrays = [array for array in arrays if array.size > 0] or arrays[-1:]
+    return arrays[0] if len(arrays) == 1 else numpy.concatenate(arrays)
+
+
+def _is_index(value) -> bool:
+    return isinstance(value, (int, numpy.integer)) and not isinstance(value, bool)
+
+
+def _ragged_depth(value) -> int:
+    """
+    If ``value`` is a (possibly nested) list whose leaves are all integers, all at the same depth,
+    we return that depth.  Empty lists are compatible with any depth.  Otherwise we return None.
+    """
+    if not isinstance(value, list):
+        return None
+    if not value:
+        return 1
+    if _is_index(value[0]):
+        return 1 if all(_is_index(item) for item in value) else None
+    child_depths = set()
+    for item in value:
+        if not isinstance(item, list):
+            return None
+        if item:
+            child_depths.add(_ragged_depth(item))
+    if not child_depths:
+        return 2
+    if len(child_depths) > 1 or None in child_depths:
+        return None
+    return child_depths.pop() + 1
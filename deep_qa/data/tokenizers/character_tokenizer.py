@@ -42,7 +42,7 @@ class CharacterTokenizer(Tokenizer):
     def index_text(self,
                    text: str,
                    data_indexer: DataIndexer) -> List:
-        return [data_indexer.get_word_index(char) for char in self.tokenize(text)]
+        return data_indexer.get_word_indices(self.tokenize(text))
 
     @overrides
     def embed_input(self,
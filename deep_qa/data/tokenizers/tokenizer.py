@@ -1,4 +1,4 @@
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Tuple
 
 from keras.layers import Layer
 from ..data_indexer import DataIndexer
@@ -26,6 +26,31 @@ class Tokenizer:
         """
         return {}
 
+    def get_cache_statistics(self) -> Dict[str, float]:  # pylint: disable=no-self-use
+        """
+        If this tokenizer caches tokenization results, returns statistics about that cache (hit and
+        miss counts, and the like), to help with tuning the cache size.
+        """
+        return {}
+
+    def close(self):
+        """
+        Releases any resources this tokenizer holds while it processes a lot of text, like the
+        worker processes of a parallel word splitter.  We call this when we're done reading data
+        for a while; the tokenizer still works afterwards, and starts its workers again if it needs
+        them.  The default implementation does nothing.
+        """
+        pass
+
+    def prepare_instances(self, instances: List) -> None:
+        """
+        Called with a chunk of ``TextInstances`` before they get indexed (or before we count their
+        words), so that tokenizers that can process many strings at once more efficiently than one
+        at a time can do that work up front, in a batch.  This must not change the results of any
+        later call to :func:`tokenize`.  By default this does nothing.
+        """
+        pass
+
     def tokenize(self, text: str) -> List[str]:
         """
         Actually splits the string into a sequence of tokens.  Note that this will only give you
@@ -158,3 +183,24 @@ class Tokenizer:
             if span_index == len(span_tokens):
                 return True
         return False
+
+
+def find_instance_strings(instances: List) -> Iterator[str]:
+    """
+    Yields all of the strings held by the given ``TextInstances`` (and by any instances they
+    contain, as with ``BackgroundInstance``), in order, so that they can be tokenized in a batch.
+    Strings that won't actually get tokenized (like labels) are harmless here; they just get put in
+    a cache.
+    """
+    for instance in instances:
+        yield from _find_strings(instance.__dict__.values())
+
+
+def _find_strings(values) -> Iterator[str]:
+    for value in values:
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            yield from _find_strings(value)
+        elif hasattr(value, 'to_indexed_instance'):
+            yield from _find_strings(value.__dict__.values())
@@ -4,7 +4,7 @@ from overrides import overrides
 from keras import backend as K
 from keras.layers import Concatenate, Layer
 
-from .tokenizer import Tokenizer
+from .tokenizer import Tokenizer, find_instance_strings
 from .word_processor import WordProcessor
 from ..data_indexer import DataIndexer
 from ...layers.backend import CollapseToBatch
@@ -35,6 +35,18 @@ class WordAndCharacterTokenizer(Tokenizer):
         self.word_processor = WordProcessor(params.pop('processor', {}))
         super(WordAndCharacterTokenizer, self).__init__(params)
 
+    @overrides
+    def get_cache_statistics(self) -> Dict[str, float]:
+        return self.word_processor.get_cache_statistics()
+
+    @overrides
+    def close(self):
+        self.word_processor.close()
+
+    @overrides
+    def prepare_instances(self, instances: List) -> None:
+        self.word_processor.warm_cache(find_instance_strings(instances))
+
     @overrides
     def tokenize(self, text: str) -> List[str]:
         return self.word_processor.get_tokens(text)
@@ -49,11 +61,10 @@ class WordAndCharacterTokenizer(Tokenizer):
     def index_text(self, text: str, data_indexer: DataIndexer) -> List:
         words = self.tokenize(text)
         arrays = []
-        for word in words:
-            word_index = data_indexer.get_word_index(word, namespace='words')
+        for word, word_index in zip(words, data_indexer.get_word_indices(words, namespace='words')):
             # TODO(matt): I'd be nice to keep the capitalization of the word in the character
             # representation.  Doing that would require pretty fancy logic here, though.
-            char_indices = [data_indexer.get_word_index(char, namespace='characters') for char in word]
+            char_indices = data_indexer.get_word_indices(word, namespace='characters')
             arrays.append([word_index] + char_indices)
         return arrays
 
@@ -1,6 +1,7 @@
-from typing import List
+from collections import OrderedDict
+from typing import Dict, Iterable, List
 
-from .word_splitter import word_splitters
+from .word_splitter import NoOpWordSplitter, word_splitters
 from .word_stemmer import word_stemmers
 from .word_filter import word_filters
 from ...common.params import Params
@@ -17,6 +18,10 @@ class WordProcessor:
         The string name of the ``WordSplitter`` of choice (see the options at the bottom of
         ``word_splitter.py``).
 
+    word_splitter_params: Dict[str, Any], default={}
+        Keyword arguments for the constructor of the ``WordSplitter``; for instance, the spaCy and
+        NLTK splitters take a ``num_processes`` argument for splitting large batches of sentences.
+
     word_filter: str, default="pass_through"
         The name of the ``WordFilter`` to use (see the options at the bottom of
         ``word_filter.py``).
@@ -24,18 +29,36 @@ class WordProcessor:
     word_stemmer: str, default="pass_through"
         The name of the ``WordStemmer`` to use (see the options at the bottom of
         ``word_stemmer.py``).
+
+    token_cache_size: int, default=100000
+        We keep a least-recently-used cache of this many strings and their tokens, so that text
+        that gets tokenized several times (e.g., once when fitting the vocabulary and again when
+        indexing, or repeated passages and answer options) only gets split, filtered and stemmed
+        once.  Set this to 0 to disable the cache.
     """
     def __init__(self, params: Params):
         word_splitter_choice = params.pop_choice('word_splitter', list(word_splitters.keys()),
                                                  default_to_first_choice=True)
-        self.word_splitter = word_splitters[word_splitter_choice]()
+        word_splitter_params = dict(params.pop('word_splitter_params', {}))
+        self.word_splitter = word_splitters[word_splitter_choice](**word_splitter_params)
         word_filter_choice = params.pop_choice('word_filter', list(word_filters.keys()),
                                                default_to_first_choice=True)
         self.word_filter = word_filters[word_filter_choice]()
         word_stemmer_choice = params.pop_choice('word_stemmer', list(word_stemmers.keys()),
                                                 default_to_first_choice=True)
         self.word_stemmer = word_stemmers[word_stemmer_choice]()
+        self.token_cache_size = params.pop('token_cache_size', 100000)
         params.assert_empty("WordProcessor")
+        self._token_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_prefills = 0
+
+    def __getstate__(self):
+        # There's no need to copy the cache around when sending this object to other processes.
+        state = dict(self.__dict__)
+        state['_token_cache'] = OrderedDict()
+        return state
 
     def get_tokens(self, sentence: str) -> List[str]:
         """
@@ -43,8 +66,80 @@ class WordProcessor:
 
         At a minimum, this uses a ``WordSplitter`` to split words into text.  It may also do
         stemming or stopword removal, depending on the parameters given to the constructor.
+
+        Results for string inputs are cached (see ``token_cache_size``); we always return a new
+        list, so callers are free to modify it.
         """
-        words = self.word_splitter.split_words(sentence)
+        if self.token_cache_size <= 0 or not isinstance(sentence, str):
+            return self._process(sentence)
+        tokens = self._token_cache.get(sentence)
+        if tokens is not None:
+            self.cache_hits += 1
+            self._token_cache.move_to_end(sentence)
+            return list(tokens)
+        self.cache_misses += 1
+        tokens = self._process(sentence)
+        self._token_cache[sentence] = tuple(tokens)
+        if len(self._token_cache) > self.token_cache_size:
+            self._token_cache.popitem(last=False)
+        return tokens
+
+    def warm_cache(self, sentences: Iterable[str]):
+        """
+        Tokenizes all of the given sentences that aren't already in the token cache, in a single
+        call to ``WordSplitter.split_words_batch``, and puts them in the cache.  Splitters like
+        spaCy's are much faster on batches than on individual sentences, so calling this before
+        calling :func:`get_tokens` on each of these sentences in turn saves a lot of time.  We only
+        ever warm the cache with at most ``token_cache_size`` sentences.  We count the sentences we
+        add here as ``token_cache_prefills``, not as misses, so the hit rate only reflects calls to
+        :func:`get_tokens`.
+        """
+        if self.token_cache_size <= 0 or isinstance(self.word_splitter, NoOpWordSplitter):
+            # The NoOpWordSplitter only works on pre-split text, so there's nothing to do.
+            return
+        new_sentences = OrderedDict()
+        for sentence in sentences:
+            if isinstance(sentence, str) and sentence not in self._token_cache:
+                new_sentences[sentence] = True
+                if len(new_sentences) >= self.token_cache_size:
+                    break
+        if not new_sentences:
+            return
+        new_sentences = list(new_sentences.keys())
+        for sentence, words in zip(new_sentences, self.word_splitter.split_words_batch(new_sentences)):
+            self.cache_prefills += 1
+            self._token_cache[sentence] = tuple(self._filter_and_stem(words))
+            if len(self._token_cache) > self.token_cache_size:
+                self._token_cache.popitem(last=False)
+
+    def get_cache_statistics(self) -> Dict[str, float]:
+        """
+        Returns hit and miss counts for the token cache (and for the stemmer's cache, if it has
+        one), so you can tell whether ``token_cache_size`` is big enough for your data, along with
+        the number of sentences :func:`warm_cache` added to the cache.
+        """
+        lookups = self.cache_hits + self.cache_misses
+        statistics = {
+                'token_cache_hits': self.cache_hits,
+                'token_cache_misses': self.cache_misses,
+                'token_cache_hit_rate': self.cache_hits / lookups if lookups else 0.0,
+                'token_cache_prefills': self.cache_prefills,
+                'token_cache_size': len(self._token_cache),
+                }
+        statistics.update(self.word_stemmer.get_cache_statistics())
+        return statistics
+
+    def close(self):
+        """
+        Releases the resources of our ``WordSplitter`` (like its worker processes, if it splits
+        batches in parallel).
+        """
+        self.word_splitter.close()
+
+    def _process(self, sentence: str) -> List[str]:
+        return self._filter_and_stem(self.word_splitter.split_words(sentence))
+
+    def _filter_and_stem(self, words: List[str]) -> List[str]:
         filtered_words = self.word_filter.filter_words(words)
         stemmed_words = [self.word_stemmer.stem_word(word) for word in filtered_words]
         return stemmed_words
@@ -1,5 +1,7 @@
 from collections import OrderedDict
-from typing import List
+from typing import Any, Dict, List
+import math
+import multiprocessing
 
 from overrides import overrides
 
@@ -14,6 +16,21 @@ class WordSplitter:
     def split_words(self, sentence: str) -> List[str]:
         raise NotImplementedError
 
+    def split_words_batch(self, sentences: List[str]) -> List[List[str]]:
+        """
+        Splits a batch of sentences, returning a list of tokens for each one.  The default
+        implementation just calls :func:`split_words` on each sentence; subclasses can override
+        this if they have a faster way of handling many sentences at once.
+        """
+        return [self.split_words(sentence) for sentence in sentences]
+
+    def close(self):
+        """
+        Releases any resources (like worker processes) this splitter started.  The default
+        implementation does nothing.
+        """
+        pass
+
 
 class SimpleWordSplitter(WordSplitter):
     """
@@ -29,6 +46,12 @@ class SimpleWordSplitter(WordSplitter):
         self.contractions |= set([x.replace("'", "’") for x in self.contractions])
         self.ending_punctuation = set(['"', "'", '.', ',', ';', ')', ']', '}', ':', '!', '?', '%', '”', "’"])
         self.beginning_punctuation = set(['"', "'", '(', '[', '{', '#', '$', '“', "‘"])
+        # Tuples, so we can check for all of these with a single call to ``str.startswith`` or
+        # ``str.endswith``.  Most words have no punctuation and no contractions, so this lets us
+        # skip all of the other processing in the common case.
+        self._contraction_suffixes = tuple(self.contractions)
+        self._beginning_punctuation_prefixes = tuple(self.beginning_punctuation)
+        self._ending_punctuation_suffixes = tuple(self.ending_punctuation)
 
     @overrides
     def split_words(self, sentence: str) -> List[str]:
@@ -44,69 +67,163 @@ class SimpleWordSplitter(WordSplitter):
         list of tokens immediately.  When we strip it off the end, we have to save it to be added
         to after the word itself has been added.  Before stripping off any part of a token, we
         first check to be sure the token isn't in our list of special cases.
+
+        We keep track of the part of the field that's left using indices, instead of making a new
+        string every time we strip off a character, and we skip all of this for fields that don't
+        start or end with punctuation or end with a contraction, which is most of them.
         """
-        fields = sentence.lower().split()
         tokens = []
-        for field in fields:  # type: str
-            add_at_end = []
-            while self._can_split(field) and field[0] in self.beginning_punctuation:
-                tokens.append(field[0])
-                field = field[1:]
-            while self._can_split(field) and field[-1] in self.ending_punctuation:
-                add_at_end.insert(0, field[-1])
-                field = field[:-1]
-
-            # There could (rarely) be several contractions in a word, but we check contractions
-            # sequentially, in a random order.  If we've removed one, we need to check again to be
-            # sure there aren't others.
-            remove_contractions = True
-            while remove_contractions:
-                remove_contractions = False
-                for contraction in self.contractions:
-                    if self._can_split(field) and field.endswith(contraction):
-                        field = field[:-len(contraction)]
-                        add_at_end.insert(0, contraction)
-                        remove_contractions = True
-            if field:
+        for field in sentence.lower().split():  # type: str
+            if not (field.startswith(self._beginning_punctuation_prefixes) or
+                    field.endswith(self._ending_punctuation_suffixes) or
+                    field.endswith(self._contraction_suffixes)):
                 tokens.append(field)
-            tokens.extend(add_at_end)
+                continue
+            start = 0
+            end = len(field)
+            while start < end and field[start] in self.beginning_punctuation and \
+                    field[start:end] not in self.special_cases:
+                tokens.append(field[start])
+                start += 1
+            punctuation_end = end
+            while start < end and field[end - 1] in self.ending_punctuation and \
+                    field[start:end] not in self.special_cases:
+                end -= 1
+            word = field[start:end]
+
+            # There could (rarely) be several contractions in a word.  No contraction is a suffix
+            # of another one, so at most one of them can match at a time, and the order in which
+            # we check them doesn't matter.
+            contractions = []
+            while self._can_split(word) and word.endswith(self._contraction_suffixes):
+                contraction = next(contraction for contraction in self._contraction_suffixes
+                                   if word.endswith(contraction))
+                contractions.append(contraction)
+                word = word[:-len(contraction)]
+            if word:
+                tokens.append(word)
+            tokens.extend(reversed(contractions))
+            tokens.extend(field[end:punctuation_end])
         return tokens
 
     def _can_split(self, token: str):
         return token and token not in self.special_cases
 
 
-class NltkWordSplitter(WordSplitter):
+class _ParallelWordSplitter(WordSplitter):
+    """
+    A base class for ``WordSplitters`` that can split large batches of sentences in a pool of
+    ``num_processes`` worker processes, each of which constructs its own ``WordSplitter`` from
+    ``worker_kwargs`` (so we never have to send things like spaCy models between processes).  We
+    start the pool the first time we get a large enough batch, and keep it for later batches, so
+    each worker only constructs its splitter once, however many chunks of a corpus we split, until
+    you call :func:`close` (the ``TextTrainer`` does that when it's done reading data).
+
+    Daemonic processes (like the workers that index a dataset in parallel) can't start processes
+    of their own, so in those we always split serially.
+    """
+    def __init__(self, num_processes: int, worker_kwargs: Dict[str, Any]):
+        self.num_processes = num_processes
+        self._worker_kwargs = worker_kwargs
+        self._pool = None
+
+    def __getstate__(self):
+        # Process pools can't be sent to other processes.
+        state = dict(self.__dict__)
+        state['_pool'] = None
+        return state
+
+    @overrides
+    def close(self):
+        """
+        Stops the worker processes, if we started any.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _should_split_in_pool(self, sentences: List[str]) -> bool:
+        return (self.num_processes > 1
+                and not multiprocessing.current_process().daemon
+                and len(sentences) >= _MIN_SENTENCES_PER_PROCESS * self.num_processes)
+
+    def _split_words_in_pool(self, sentences: List[str]) -> List[List[str]]:
+        """
+        Splits ``sentences`` in our pool of workers, returning results in the same order as
+        ``sentences``.
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.num_processes,
+                                              initializer=_initialize_splitting_worker,
+                                              initargs=(self.__class__, self._worker_kwargs))
+        chunk_size = math.ceil(len(sentences) / (self.num_processes * 4))
+        chunks = [sentences[start:start + chunk_size] for start in range(0, len(sentences), chunk_size)]
+        return [words for chunk in self._pool.imap(_split_words_with_worker, chunks) for words in chunk]
+
+
+class NltkWordSplitter(_ParallelWordSplitter):
     """
     A tokenizer that uses nltk's word_tokenize method.
 
     I found that nltk is very slow, so I switched to using my own simple one, which is a good deal
     faster.  But I'm adding this one back so that there's consistency with older versions of the
     code, if you really want it.
+
+    Parameters
+    ----------
+    num_processes: int, optional (default=1)
+        If greater than one, :func:`split_words_batch` splits large batches using a pool of this
+        many processes.
     """
-    def __init__(self):
-        pass
+    def __init__(self, num_processes: int=1):
+        super(NltkWordSplitter, self).__init__(num_processes, {})
+        # Import is here because it's slow, and by default unnecessary.  We only do it once, though,
+        # not on every call to ``split_words``.
+        from nltk.tokenize import word_tokenize
+        self._word_tokenize = word_tokenize
 
     @overrides
     def split_words(self, sentence: str) -> List[str]:
-        # Import is here because it's slow, and by default unnecessary.
-        from nltk.tokenize import word_tokenize
-        return word_tokenize(sentence.lower())
+        return self._word_tokenize(sentence.lower())
 
+    @overrides
+    def split_words_batch(self, sentences: List[str]) -> List[List[str]]:
+        if self._should_split_in_pool(sentences):
+            return self._split_words_in_pool(sentences)
+        return [self._word_tokenize(sentence.lower()) for sentence in sentences]
 
-class SpacyWordSplitter(WordSplitter):
+
+class SpacyWordSplitter(_ParallelWordSplitter):
     """
     A tokenizer that uses spaCy's Tokenizer, which is much faster than the others.
+
+    Parameters
+    ----------
+    batch_size: int, optional (default=1000)
+        The batch size to use with spaCy's ``Tokenizer.pipe`` in :func:`split_words_batch`.
+    num_processes: int, optional (default=1)
+        If greater than one, :func:`split_words_batch` splits large batches using a pool of this
+        many processes, each of which loads its own copy of the spaCy model once.
     """
-    def __init__(self):
+    def __init__(self, batch_size: int=1000, num_processes: int=1):
+        super(SpacyWordSplitter, self).__init__(num_processes, {'batch_size': batch_size})
         # Import is here it's slow, and can be unnecessary.
         import spacy
         self.en_nlp = spacy.load('en')
+        self.batch_size = batch_size
 
     @overrides
     def split_words(self, sentence: str) -> List[str]:
         return [str(token.lower_) for token in self.en_nlp.tokenizer(sentence)]
 
+    @overrides
+    def split_words_batch(self, sentences: List[str]) -> List[List[str]]:
+        if self._should_split_in_pool(sentences):
+            return self._split_words_in_pool(sentences)
+        return [[str(token.lower_) for token in tokens]
+                for tokens in self.en_nlp.tokenizer.pipe(sentences, batch_size=self.batch_size)]
+
 
 class NoOpWordSplitter(WordSplitter):
     """
@@ -126,6 +243,22 @@ class NoOpWordSplitter(WordSplitter):
         return sentence
 
 
+# It's not worth starting a process pool for batches smaller than this many sentences per process.
+_MIN_SENTENCES_PER_PROCESS = 1000
+
+# The WordSplitter for this process, when it is a worker in a process pool.
+_worker_word_splitter = None  # pylint: disable=invalid-name
+
+
+def _initialize_splitting_worker(word_splitter_class, word_splitter_kwargs: Dict[str, Any]):
+    global _worker_word_splitter  # pylint: disable=global-statement,invalid-name
+    _worker_word_splitter = word_splitter_class(**word_splitter_kwargs)
+
+
+def _split_words_with_worker(sentences: List[str]) -> List[List[str]]:
+    return _worker_word_splitter.split_words_batch(sentences)
+
+
 word_splitters = OrderedDict()  # pylint: disable=invalid-name
 word_splitters['simple'] = SimpleWordSplitter
 word_splitters['nltk'] = NltkWordSplitter
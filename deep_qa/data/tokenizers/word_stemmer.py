@@ -1,4 +1,5 @@
 from collections import OrderedDict
+from typing import Dict
 
 from nltk.stem import PorterStemmer as NltkPorterStemmer
 from overrides import overrides
@@ -18,6 +19,12 @@ class WordStemmer:
         """Converts a word to its lemma"""
         raise NotImplementedError
 
+    def get_cache_statistics(self) -> Dict[str, float]:  # pylint: disable=no-self-use
+        """
+        If this stemmer caches its results, returns hit and miss counts for that cache.
+        """
+        return {}
+
 
 class PassThroughWordStemmer(WordStemmer):
     """
@@ -30,14 +37,34 @@ class PassThroughWordStemmer(WordStemmer):
 
 class PorterStemmer(WordStemmer):
     """
-    Uses NLTK's PorterStemmer to stem words.
+    Uses NLTK's PorterStemmer to stem words.  Stemming is slow and deterministic, and there are
+    far fewer word types than word tokens, so we memoize the result for each word type.
     """
     def __init__(self):
         self.stemmer = NltkPorterStemmer()
+        self._stem_cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     @overrides
     def stem_word(self, word: str) -> str:
-        return self.stemmer.stem(word)
+        stem = self._stem_cache.get(word)
+        if stem is not None:
+            self.cache_hits += 1
+            return stem
+        self.cache_misses += 1
+        stem = self.stemmer.stem(word)
+        self._stem_cache[word] = stem
+        return stem
+
+    @overrides
+    def get_cache_statistics(self) -> Dict[str, float]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+                'stem_cache_hits': self.cache_hits,
+                'stem_cache_misses': self.cache_misses,
+                'stem_cache_hit_rate': self.cache_hits / lookups if lookups else 0.0,
+                }
 
 
 word_stemmers = OrderedDict()  # pylint: disable=invalid-name
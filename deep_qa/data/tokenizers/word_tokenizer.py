@@ -3,7 +3,7 @@ from typing import Callable, Dict, List, Tuple
 from overrides import overrides
 from keras.layers import Layer
 
-from .tokenizer import Tokenizer
+from .tokenizer import Tokenizer, find_instance_strings
 from .word_processor import WordProcessor
 from ..data_indexer import DataIndexer
 from ...common.params import Params
@@ -31,6 +31,18 @@ class WordTokenizer(Tokenizer):
         self.word_processor = WordProcessor(params.pop('processor', {}))
         super(WordTokenizer, self).__init__(params)
 
+    @overrides
+    def get_cache_statistics(self) -> Dict[str, float]:
+        return self.word_processor.get_cache_statistics()
+
+    @overrides
+    def close(self):
+        self.word_processor.close()
+
+    @overrides
+    def prepare_instances(self, instances: List) -> None:
+        self.word_processor.warm_cache(find_instance_strings(instances))
+
     @overrides
     def tokenize(self, text: str) -> List[str]:
         return self.word_processor.get_tokens(text)
@@ -41,7 +53,7 @@ class WordTokenizer(Tokenizer):
 
     @overrides
     def index_text(self, text: str, data_indexer: DataIndexer) -> List:
-        return [data_indexer.get_word_index(word, namespace='words') for word in self.tokenize(text)]
+        return data_indexer.get_word_indices(self.tokenize(text), namespace='words')
 
     @overrides
     def embed_input(self,
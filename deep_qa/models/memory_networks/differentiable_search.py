@@ -70,7 +70,7 @@ class DifferentiableSearchMemoryNetwork(MemoryNetwork):
         self.instance_index = {}  # type: Dict[int, str]
 
     @overrides
-    def load_model(self, epoch: int=None):
+    def load_model(self, epoch: int=None, for_inference: bool=False):
         """
         Other than loading the model (which we leave to the super class), we also initialize the
         LSH, assuming that if you're loading a model you probably want access to search over the
@@ -79,7 +79,7 @@ class DifferentiableSearchMemoryNetwork(MemoryNetwork):
         We can either load a saved LSH, or re-initialize it with a new corpus, depending on
         self.load_saved_lsh.
         """
-        super(DifferentiableSearchMemoryNetwork, self).load_model(epoch)
+        super(DifferentiableSearchMemoryNetwork, self).load_model(epoch, for_inference)
         if self.load_saved_lsh:
             lsh_file = open("%s_lsh.pkl" % self.model_prefix, "rb")
             sentence_index_file = open("%s_index.pkl" % self.model_prefix, "rb")
@@ -135,8 +135,8 @@ class MemoryNetwork(TextTrainer):
         self.entailment_model = None
 
     @overrides
-    def load_dataset_from_files(self, files: List[str]):
-        dataset = super(MemoryNetwork, self).load_dataset_from_files(files)
+    def load_dataset_from_files(self, files: List[str], max_instances: int=None):
+        dataset = super(MemoryNetwork, self).load_dataset_from_files(files, max_instances)
         return read_background_from_file(dataset, files[1], self._background_instance_type())
 
     @overrides
@@ -103,8 +103,11 @@ class MultipleTrueFalseMemoryNetwork(MemoryNetwork):
         return TimeDistributed(base_combiner, name="timedist_%s" % base_combiner.name)
 
     @overrides
-    def load_dataset_from_files(self, files: List[str]):
-        dataset = super(MultipleTrueFalseMemoryNetwork, self).load_dataset_from_files(files)
+    def load_dataset_from_files(self, files: List[str], max_instances: int=None):
+        # Each question is made up of four consecutive true/false instances in the file.
+        max_true_false_instances = max_instances * 4 if max_instances is not None else None
+        dataset = super(MultipleTrueFalseMemoryNetwork, self).load_dataset_from_files(files,
+                                                                                      max_true_false_instances)
         return convert_dataset_to_multiple_true_false(dataset)
 
     @classmethod
@@ -41,8 +41,8 @@ class MultipleChoiceTupleEntailmentModel(TextTrainer):
         return TupleInstance
 
     @overrides
-    def load_dataset_from_files(self, files: List[str]):
-        dataset = super(MultipleChoiceTupleEntailmentModel, self).load_dataset_from_files(files)
+    def load_dataset_from_files(self, files: List[str], max_instances: int=None):
+        dataset = super(MultipleChoiceTupleEntailmentModel, self).load_dataset_from_files(files, max_instances)
         return read_background_from_file(dataset, files[1], self._background_instance_type())
 
     @classmethod
@@ -1,8 +1,11 @@
-from typing import List, Tuple, Union
+from typing import Any, Dict, List, Tuple, Union
+import json
 import sys
 import logging
+import multiprocessing
 import shutil
 import os
+import tempfile
 
 import random
 import pyhocon
@@ -112,7 +115,27 @@ def run_model(param_path: str, model_class=None):
         raise ConfigurationError("The supplied model does not have enough training inputs.")
 
 
-def load_model(param_path: str, model_class=None):
+def _construct_model(param_path: str, model_class=None):
+    """
+    Reads a parameter file and constructs (but doesn't build, train or load) the model it
+    specifies.
+    """
+    param_dict = pyhocon.ConfigFactory.parse_file(param_path)
+    params = Params(replace_none(param_dict))
+    prepare_environment(params)
+
+    from deep_qa.models import concrete_models
+    if model_class is None:
+        model_type = params.pop_choice('model_class', concrete_models.keys())
+        model_class = concrete_models[model_type]
+    else:
+        if params.pop('model_class', None) is not None:
+            raise ConfigurationError("You have specified a local model class and passed a model_class argument"
+                                     "in the json specification. These options are mutually exclusive.")
+    return model_class(params)
+
+
+def load_model(param_path: str, model_class=None, for_inference: bool=False):
     """
     Loads and returns a model.
 
@@ -123,30 +146,133 @@ def load_model(param_path: str, model_class=None):
     model_class: DeepQaModel, optional (default=None)
         This option is useful if you have implemented a new model
         class which is not one of the ones implemented in this library.
+    for_inference: bool, optional (default=False)
+        If ``True``, we only build what the model needs to make predictions, skipping the loss,
+        metrics and optimizer (see :func:`~deep_qa.training.trainer.Trainer.load_model`).  The
+        model loads faster and uses less memory, but can't be trained or evaluated.
 
     Returns
     -------
     A ``DeepQaModel`` instance.
     """
     logger.info("Loading model from parameter file: %s", param_path)
-    param_dict = pyhocon.ConfigFactory.parse_file(param_path)
-    params = Params(replace_none(param_dict))
-    prepare_environment(params)
-
-    from deep_qa.models import concrete_models
-    if model_class is None:
-        model_type = params.pop_choice('model_class', concrete_models.keys())
-        model_class = concrete_models[model_type]
-    else:
-        if params.pop('model_class', None) is not None:
-            raise ConfigurationError("You have specified a local model class and passed a model_class argument"
-                                     "in the json specification. These options are mutually exclusive.")
-    model = model_class(params)
-    model.load_model()
+    model = _construct_model(param_path, model_class)
+    model.load_model(for_inference=for_inference)
     return model
 
 
-def score_dataset(param_path: str, dataset_files: List[str], model_class=None):
+def serve_model(param_path: str,
+                host: str='127.0.0.1',
+                port: int=8000,
+                unix_socket: str=None,
+                max_batch_size: int=None,
+                max_latency: float=0.01,
+                model_class=None):
+    """
+    Loads a model and serves its predictions over HTTP until interrupted, batching concurrent
+    requests together.  See :class:`~deep_qa.serving.inference_server.InferenceServer` for the
+    endpoints, and :class:`~deep_qa.serving.inference_batcher.InferenceBatcher` for how we batch.
+
+    Parameters
+    ----------
+    param_path: str, required
+        A json file specifying a DeepQaModel.
+    host: str, optional (default='127.0.0.1')
+        The address to listen on.
+    port: int, optional (default=8000)
+        The port to listen on.
+    unix_socket: str, optional (default=None)
+        If given, we listen on this UNIX socket instead of ``host:port``.
+    max_batch_size: int, optional (default=None)
+        The largest batch we run; defaults to the model's ``batch_size``.
+    max_latency: float, optional (default=0.01)
+        How many seconds a request can wait for others to batch with before we run it anyway.
+    model_class: DeepQaModel, optional (default=None)
+        This option is useful if you have implemented a new model class which
+        is not one of the ones implemented in this library.
+    """
+    from deep_qa.serving import InferenceBatcher, InferenceServer
+    model = load_model(param_path, model_class=model_class, for_inference=True)
+    batcher = InferenceBatcher(model, Params({'max_batch_size': max_batch_size, 'max_latency': max_latency}))
+    InferenceServer(batcher).serve_forever(host, port, unix_socket)
+
+
+def calibrate_memory_usage(param_path: str, output_path: str=None, model_class=None) -> int:
+    """
+    Calibrates the ``adaptive_memory_usage_constant`` of the model's ``DataGenerator`` for a given
+    memory budget, by running a few probe training steps (see
+    :class:`~deep_qa.data.memory_calibration.MemoryCalibrator`), and writes a copy of the parameter
+    file with the constant filled in (and without the ``memory_calibration`` parameters), so you
+    don't have to calibrate again until you change the model or the hardware.
+
+    Parameters
+    ----------
+    param_path: str, required
+        A json file specifying a DeepQaModel, whose ``data_generator`` parameters have
+        ``adaptive_batch_sizes`` and ``memory_calibration`` set.
+    output_path: str, optional (default=None)
+        Where to write the calibrated parameter file.  If this is ``None``, we write it next to
+        ``param_path``, with ``_calibrated.json`` replacing the extension.  Note that we write the
+        file as json, so any comments in ``param_path`` won't be in the copy.
+    model_class: DeepQaModel, optional (default=None)
+        This option is useful if you have implemented a new model class which
+        is not one of the ones implemented in this library.
+
+    Returns
+    -------
+    The calibrated ``adaptive_memory_usage_constant``.
+    """
+    model = _construct_model(param_path, model_class)
+    constant = model.calibrate_memory_usage()
+
+    calibrated_params = pyhocon.ConfigFactory.parse_file(param_path)
+    calibrated_params['data_generator'].pop('memory_calibration')
+    calibrated_params.put('data_generator.adaptive_memory_usage_constant', constant)
+    if output_path is None:
+        output_path = os.path.splitext(param_path)[0] + "_calibrated.json"
+    with open(output_path, 'w') as output_file:
+        output_file.write(pyhocon.HOCONConverter.to_json(calibrated_params))
+    logger.info("Wrote adaptive_memory_usage_constant = %d to %s", constant, output_path)
+    return constant
+
+
+def analyze_padding(param_path: str,
+                    dataset_files: List[str]=None,
+                    output_path: str=None,
+                    model_class=None) -> Dict[str, Any]:
+    """
+    Compares how much padding fixed, sorted and adaptive batching produce on a dataset, and
+    estimates the relative cost of an epoch with each, without building or training the model.
+    See :func:`~deep_qa.data.padding_analysis.analyze_padding`, and
+    :func:`~deep_qa.data.padding_analysis.format_padding_analysis` for printing the results.
+
+    Parameters
+    ----------
+    param_path: str, required
+        A json file specifying a DeepQaModel with a ``data_generator``.  We simulate batches with
+        the model's ``batch_size``, and the ``padding_noise``, ``adaptive_memory_usage_constant``
+        and ``maximum_batch_size`` of its ``data_generator``.
+    dataset_files: List[str], optional (default=None)
+        The dataset to analyze.  If this is ``None``, we use the model's ``train_files``.
+    output_path: str, optional (default=None)
+        If given, we also write the results to this file, as json.
+    model_class: DeepQaModel, optional (default=None)
+        This option is useful if you have implemented a new model class which
+        is not one of the ones implemented in this library.
+
+    Returns
+    -------
+    The results of :func:`~deep_qa.data.padding_analysis.analyze_padding`.
+    """
+    model = _construct_model(param_path, model_class)
+    analysis = model.analyze_padding(dataset_files)
+    if output_path is not None:
+        with open(output_path, 'w') as output_file:
+            json.dump(analysis, output_file, indent=2, sort_keys=True)
+    return analysis
+
+
+def score_dataset(param_path: str, dataset_files: List[str], model_class=None, predictions_file: str=None):
     """
     Loads a model from a saved parameter path and scores a dataset with it, returning the
     predictions.
@@ -161,6 +287,9 @@ def score_dataset(param_path: str, dataset_files: List[str], model_class=None):
     model_class: DeepQaModel, optional (default=None)
         This option is useful if you have implemented a new model class which
         is not one of the ones implemented in this library.
+    predictions_file: str, optional (default=None)
+        If given, we stream the predictions to ``.npy`` files with this prefix instead of keeping
+        them in memory (see :func:`~deep_qa.training.trainer.Trainer.score_dataset`).
 
     Returns
     -------
@@ -171,9 +300,9 @@ def score_dataset(param_path: str, dataset_files: List[str], model_class=None):
         The labels on the dataset, as read by the model.  We return this so you can compute
         whatever metrics you want, if the data was labeled.
     """
-    model = load_model(param_path, model_class=model_class)
+    model = load_model(param_path, model_class=model_class, for_inference=True)
     dataset = model.load_dataset_from_files(dataset_files)
-    return model.score_dataset(dataset)
+    return model.score_dataset(dataset, predictions_file=predictions_file)
 
 
 def evaluate_model(param_path: str, dataset_files: List[str]=None, model_class=None):
@@ -204,12 +333,19 @@ def evaluate_model(param_path: str, dataset_files: List[str]=None, model_class=N
 
 def score_dataset_with_ensemble(param_paths: List[str],
                                 dataset_files: List[str],
-                                model_class=None) -> Tuple[numpy.array, numpy.array]:
+                                model_class=None,
+                                num_workers: int=1) -> Tuple[numpy.array, numpy.array]:
     """
     Loads all of the models specified in ``param_paths``, uses each of them to score the dataset
     specified by ``dataset_files``, and averages their scores, return an array of ensembled model
     predictions.
 
+    We read the dataset files once for each group of models that read them the same way (see
+    :func:`~deep_qa.training.trainer.Trainer.get_dataset_reading_key`), instead of once per model.
+    Each model streams its predictions to a temporary file (see
+    :func:`~deep_qa.training.trainer.Trainer.score_dataset`), and we add them to a running total
+    as each model finishes, so we only ever hold one set of predictions in memory.
+
     Parameters
     ----------
     param_paths: List[str]
@@ -221,6 +357,10 @@ def score_dataset_with_ensemble(param_paths: List[str],
     model_class: ``DeepQaModel``, optional (default=None)
         This option is useful if you have implemented a new model class which is not one of the
         ones implemented in this library.
+    num_workers: int, optional (default=1)
+        If greater than one, we score this many models at a time, each in its own (spawned)
+        process, with its own tensorflow session.  Each worker gets one copy of the datasets we
+        read.  If you're using GPUs, make sure this many models fit on them at once.
 
     Returns
     -------
@@ -234,20 +374,113 @@ def score_dataset_with_ensemble(param_paths: List[str],
         the labels is consistent across the models, though; if not, the whole idea of ensembling
         them this way is moot, anyway.
     """
-    models = [load_model(param_path, model_class) for param_path in param_paths]
-    predictions = []
+    if not param_paths:
+        raise ConfigurationError("An ensemble needs at least one model, but we got no parameter files")
+    datasets = {}
+    tasks = []
+    reading_keys = {}
+    for i, param_path in enumerate(param_paths):
+        if param_path in reading_keys:
+            # We've read the dataset for this model already.
+            tasks.append((i, param_path, reading_keys[param_path]))
+            continue
+        model = _construct_model(param_path, model_class)
+        reading_key = model.get_dataset_reading_key()
+        reading_key = json.dumps(reading_key, sort_keys=True) if reading_key is not None else param_path
+        reading_keys[param_path] = reading_key
+        if reading_key not in datasets:
+            logger.info("Reading dataset for model %d of %d", i + 1, len(param_paths))
+            datasets[reading_key] = model.load_dataset_from_files(dataset_files)
+        tasks.append((i, param_path, reading_key))
+    logger.info("Read %d dataset(s) for %d models", len(datasets), len(param_paths))
+
+    summed_predictions = None
     labels_to_return = None
-    for i, model in enumerate(models):
-        logger.info("Scoring model %d of %d", i + 1, len(models))
-        dataset = model.load_dataset_from_files(dataset_files)
-        model_predictions, labels = model.score_dataset(dataset)
-        predictions.append(model_predictions)
-        if labels_to_return is None:
-            labels_to_return = labels
+    with tempfile.TemporaryDirectory() as predictions_directory:
+        if num_workers > 1:
+            pool = multiprocessing.get_context('spawn').Pool(num_workers,
+                                                             initializer=_initialize_ensemble_worker,
+                                                             initargs=(datasets, model_class,
+                                                                       predictions_directory, True))
+            results = pool.imap_unordered(_score_with_ensemble_worker, tasks)
+        else:
+            pool = None
+            _initialize_ensemble_worker(datasets, model_class, predictions_directory, False)
+            results = map(_score_with_ensemble_worker, tasks)
+        try:
+            for num_scored, (i, is_list, prediction_files, labels) in enumerate(results):
+                logger.info("Scored model %d (%d of %d done)", i + 1, num_scored + 1, len(param_paths))
+                model_predictions = [numpy.load(filename, mmap_mode='r') for filename in prediction_files]
+                if summed_predictions is None:
+                    summed_predictions = [numpy.array(predictions) for predictions in model_predictions]
+                else:
+                    for total, predictions in zip(summed_predictions, model_predictions):
+                        if total.shape != predictions.shape:
+                            raise ConfigurationError("Models in an ensemble must give predictions of the "
+                                                     "same shape, but got %s and %s from %s" %
+                                                     (total.shape, predictions.shape, param_paths[i]))
+                        total += predictions
+                del model_predictions
+                for filename in prediction_files:
+                    os.remove(filename)
+                if i == 0:
+                    labels_to_return = labels
+        finally:
+            if pool is not None:
+                pool.terminate()
+            else:
+                # The worker state holds on to the datasets, which we don't need anymore.
+                _ensemble_worker_state.clear()
     logger.info("Averaging model predictions")
-    all_predictions = numpy.stack(predictions)
-    averaged = numpy.mean(all_predictions, axis=0)
-    return averaged, labels_to_return
+    for total in summed_predictions:
+        total /= len(param_paths)
+    return (summed_predictions if is_list else summed_predictions[0]), labels_to_return
+
+
+# The state each ensemble scoring worker needs, set by ``_initialize_ensemble_worker``.
+_ensemble_worker_state = {}  # pylint: disable=invalid-name
+
+
+def _initialize_ensemble_worker(datasets,
+                                model_class,
+                                predictions_directory: str,
+                                in_worker_process: bool):
+    _ensemble_worker_state['datasets'] = datasets
+    _ensemble_worker_state['model_class'] = model_class
+    _ensemble_worker_state['predictions_directory'] = predictions_directory
+    _ensemble_worker_state['in_worker_process'] = in_worker_process
+
+
+def _score_with_ensemble_worker(task: Tuple[int, str, str]):
+    """
+    Scores the shared dataset with one model of an ensemble, writing the predictions to files in
+    the predictions directory, and returns the model's index, whether it has several outputs, the
+    prediction files, and (for the first model) the labels.
+
+    In a worker process, we clear the Keras session when we're done, so the graphs of the models
+    the process has scored don't pile up.  When we score in the caller's process, we build each
+    model in a graph and session of its own instead, so we leave the caller's session (and any
+    models in it) alone.
+    """
+    import tensorflow
+    from keras import backend as K
+    if _ensemble_worker_state['in_worker_process']:
+        result = _score_with_ensemble_model(*task)
+        K.clear_session()
+        return result
+    graph = tensorflow.Graph()
+    with graph.as_default(), tensorflow.Session(graph=graph):
+        return _score_with_ensemble_model(*task)
+
+
+def _score_with_ensemble_model(i: int, param_path: str, reading_key: str):
+    model = load_model(param_path, _ensemble_worker_state['model_class'], for_inference=True)
+    predictions_file = os.path.join(_ensemble_worker_state['predictions_directory'], 'model_%d' % i)
+    predictions, labels = model.score_dataset(_ensemble_worker_state['datasets'][reading_key],
+                                              predictions_file=predictions_file)
+    is_list = isinstance(predictions, (list, tuple))
+    prediction_files = [array.filename for array in (predictions if is_list else [predictions])]
+    return i, is_list, prediction_files, labels if i == 0 else None
 
 
 def compute_accuracy(predictions: numpy.array, labels: numpy.array):
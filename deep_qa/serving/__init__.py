@@ -0,0 +1,2 @@
+from .inference_batcher import InferenceBatcher
+from .inference_server import InferenceServer
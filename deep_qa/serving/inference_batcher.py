@@ -0,0 +1,202 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+from typing import Any, Dict, List, Union
+
+import numpy
+import tensorflow
+
+from ..common.params import Params
+from ..data.dataset import IndexedDataset
+from ..data.instances.instance import Instance
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class InferenceBatcher:
+    """
+    Keeps a trained ``TextTrainer`` loaded and makes predictions for instances that arrive one at
+    a time (e.g., from concurrent requests to an
+    :class:`~deep_qa.serving.inference_server.InferenceServer`), grouping them into batches.
+
+    This is an asyncio API: you ``await`` :func:`predict` (or :func:`predict_instances`), and the
+    batcher collects the instances that arrive close together, sorts them by padding length (using
+    the model's :func:`~deep_qa.training.TextTrainer.get_instance_sorting_keys`), and runs full
+    batches of similar lengths right away.  Instances that don't fill a batch wait at most
+    ``max_latency`` seconds for others to arrive before we run them anyway.  The model (and the
+    reading and indexing of each instance) runs in a background thread, so the event loop keeps
+    accepting requests while a batch is running.
+
+    Parameters
+    ----------
+    model: TextTrainer
+        A loaded model (see :func:`~deep_qa.run.load_model`).
+    max_batch_size: int, optional (default=None)
+        The most instances we put in one batch.  If ``None``, we use the model's ``batch_size``.
+    max_latency: float, optional (default=0.01)
+        How long, in seconds, an instance can wait for a batch to fill up before we run it in a
+        smaller batch.  Larger values give bigger batches (better throughput) at the cost of
+        latency when there aren't many concurrent requests.
+    """
+    def __init__(self, model, params: Params):
+        self.model = model
+        self.max_batch_size = params.pop('max_batch_size', None) or model.batch_size
+        self.max_latency = params.pop('max_latency', 0.01)
+        params.assert_empty("InferenceBatcher")
+        # The model runs in a different thread than the one that loaded it, and tensorflow's
+        # default graph is thread-local.
+        self._graph = tensorflow.get_default_graph()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = []
+        self._new_request = None
+        self._batch_task = None
+        self._sorting_keys = model.get_instance_sorting_keys()
+
+        self.num_requests = 0
+        self.num_batches = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+        self.total_latency = 0.0
+        self.max_latency_seen = 0.0
+
+    def read_instance(self, raw_instance: Union[str, Dict[str, Any]]) -> Instance:
+        """
+        Makes an instance of the model's instance type from a line in the format of its
+        ``read_from_line``, or from a dictionary of arguments to its constructor.
+        """
+        # pylint: disable=protected-access
+        instance_type = self.model._instance_type()
+        if isinstance(raw_instance, dict):
+            return instance_type(**raw_instance)
+        return instance_type.read_from_line(raw_instance)
+
+    async def predict(self, raw_instance: Union[str, Dict[str, Any], Instance]):
+        """
+        Returns the model's predictions for one instance (given as anything
+        :func:`read_instance` accepts, or as an ``Instance``): a numpy array, or a list of them if
+        the model has several outputs.  With dynamic padding, the predictions are padded to the
+        lengths of the batch the instance ran in.
+        """
+        loop = asyncio.get_event_loop()
+        # Tokenizing and indexing can take a while for long passages, so we do it in the model's
+        # thread, like the batches themselves, instead of blocking the event loop.  Having a single
+        # thread also means the tokenizer's cache only ever gets used from one thread.
+        sort_key, indexed_instance = await loop.run_in_executor(self._executor, self._index_instance,
+                                                                raw_instance)
+        future = loop.create_future()
+        self._ensure_started(loop)
+        self._pending.append((sort_key, indexed_instance, future, time.time()))
+        self.num_requests += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+        self._new_request.set()
+        return await future
+
+    async def predict_instances(self, raw_instances: List[Union[str, Dict[str, Any], Instance]]):
+        """
+        Like :func:`predict`, for several instances at once, which can end up in different batches.
+        """
+        return await asyncio.gather(*[self.predict(raw_instance) for raw_instance in raw_instances])
+
+    def _index_instance(self, raw_instance: Union[str, Dict[str, Any], Instance]):
+        instance = raw_instance if isinstance(raw_instance, Instance) else self.read_instance(raw_instance)
+        indexed_instance = instance.to_indexed_instance(self.model.data_indexer)
+        # We don't need labels to predict, and a batch mixing labeled and unlabeled instances
+        # can't be collated.
+        indexed_instance.label = None
+        padding_lengths = indexed_instance.get_padding_lengths()
+        return [padding_lengths.get(key, 0) for key in self._sorting_keys], indexed_instance
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns the current queue depth and statistics about the batches we've run so far.
+        """
+        num_batched = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+                'queue_depth': len(self._pending),
+                'max_queue_depth': self.max_queue_depth,
+                'num_requests': self.num_requests,
+                'num_batches': self.num_batches,
+                'mean_batch_size': num_batched / self.num_batches if self.num_batches else 0.0,
+                'batch_sizes': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'mean_latency_seconds': self.total_latency / num_batched if num_batched else 0.0,
+                'max_latency_seconds': self.max_latency_seen,
+                }
+
+    def close(self):
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            self._batch_task = None
+        self._executor.shutdown(wait=False)
+
+    def _ensure_started(self, loop):
+        if self._batch_task is None:
+            self._new_request = asyncio.Event()
+            self._batch_task = loop.create_task(self._run_batches())
+
+    async def _run_batches(self):
+        while True:
+            if not self._pending:
+                await self._new_request.wait()
+            self._new_request.clear()
+            if not self._pending:
+                continue
+            deadline = min(arrival for _, _, _, arrival in self._pending) + self.max_latency
+            while len(self._pending) < self.max_batch_size and time.time() < deadline:
+                try:
+                    await asyncio.wait_for(self._new_request.wait(), deadline - time.time())
+                except asyncio.TimeoutError:
+                    break
+                self._new_request.clear()
+            for batch in self._take_batches(flush=time.time() >= deadline):
+                await self._run_batch(batch)
+
+    def _take_batches(self, flush: bool):
+        """
+        Sorts the pending instances by padding length and splits them into batches.  Unless
+        ``flush`` is ``True`` (because the oldest instance has waited long enough), we leave the
+        last batch in the queue if it isn't full, to give it a chance to fill up.
+        """
+        self._pending.sort(key=lambda pending: pending[0])
+        batches = [self._pending[start:start + self.max_batch_size]
+                   for start in range(0, len(self._pending), self.max_batch_size)]
+        if not flush and len(batches[-1]) < self.max_batch_size:
+            self._pending = batches.pop()
+        else:
+            self._pending = []
+        return batches
+
+    async def _run_batch(self, batch):
+        indexed_instances = [indexed_instance for _, indexed_instance, _, _ in batch]
+        futures = [future for _, _, future, _ in batch]
+        loop = asyncio.get_event_loop()
+        try:
+            predictions = await loop.run_in_executor(self._executor, self._predict, indexed_instances)
+        except Exception as error:  # pylint: disable=broad-except
+            logger.exception("Prediction failed for a batch of %d instances", len(batch))
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        self.num_batches += 1
+        self.batch_sizes[len(batch)] += 1
+        now = time.time()
+        for i, (_, _, future, arrival) in enumerate(batch):
+            self.total_latency += now - arrival
+            self.max_latency_seen = max(self.max_latency_seen, now - arrival)
+            if future.done():
+                # The caller went away (e.g., the request was cancelled).
+                continue
+            if isinstance(predictions, list):
+                future.set_result([output[i] for output in predictions])
+            else:
+                future.set_result(predictions[i])
+
+    def _predict(self, indexed_instances):
+        inputs, _ = IndexedDataset(indexed_instances).as_padded_training_data(self.model.get_padding_lengths())
+        with self._graph.as_default():
+            predictions = self.model.model.predict_on_batch(inputs)
+        if isinstance(predictions, (list, tuple)):
+            return [numpy.asarray(output) for output in predictions]
+        return numpy.asarray(predictions)
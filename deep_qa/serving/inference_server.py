@@ -0,0 +1,139 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy
+
+from .inference_batcher import InferenceBatcher
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+class InferenceServer:
+    """
+    A small HTTP server in front of an :class:`~deep_qa.serving.inference_batcher.InferenceBatcher`,
+    listening on a local TCP port or a UNIX socket.  It has two endpoints:
+
+    - ``POST /predict`` takes instances either as plain text, one instance per line in the format
+      the model's instance type reads with ``read_from_line``, or as JSON,
+      ``{"instances": [...]}``, where each instance is such a line or a dictionary of arguments to
+      the instance type's constructor.  It responds with ``{"predictions": [...]}``, one entry per
+      instance, in order.  Concurrent requests get batched together.
+    - ``GET /metrics`` responds with the batcher's metrics (queue depth, batch sizes, latency).
+
+    We only speak enough HTTP/1.1 for simple clients (e.g., ``curl`` or ``requests``): one request
+    per connection, with the body given by ``Content-Length``.
+    """
+    def __init__(self, batcher: InferenceBatcher):
+        self.batcher = batcher
+        self._server = None
+
+    async def start(self, host: str='127.0.0.1', port: int=8000, unix_socket: str=None):
+        """
+        Starts listening on ``host:port``, or on ``unix_socket`` if given.  Use
+        :func:`serve_forever` to run the server from synchronous code.
+        """
+        if unix_socket is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_socket)
+            logger.info("Serving predictions on %s", unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+            logger.info("Serving predictions on http://%s:%d", host, port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.batcher.close()
+
+    def serve_forever(self, host: str='127.0.0.1', port: int=8000, unix_socket: str=None):
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.start(host, port, unix_socket))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            loop.run_until_complete(self.stop())
+
+    async def handle_request(self, method: str, path: str, headers: Dict[str, str],
+                             body: bytes) -> Tuple[int, Dict[str, Any]]:
+        """
+        Returns the status code and the (JSON) response for one request.
+        """
+        path = path.split('?')[0]
+        if path == '/metrics':
+            if method != 'GET':
+                return 405, {'error': "Use GET for /metrics"}
+            return 200, self.batcher.get_metrics()
+        if path == '/predict':
+            if method != 'POST':
+                return 405, {'error': "Use POST for /predict"}
+            try:
+                raw_instances = self._read_instances(headers, body)
+                instances = [self.batcher.read_instance(raw_instance) for raw_instance in raw_instances]
+            except Exception as error:  # pylint: disable=broad-except
+                return 400, {'error': "Couldn't read instances: %s" % error}
+            try:
+                predictions = await self.batcher.predict_instances(instances)
+            except Exception as error:  # pylint: disable=broad-except
+                return 500, {'error': "Prediction failed: %s" % error}
+            return 200, {'predictions': [_to_json(prediction) for prediction in predictions]}
+        return 404, {'error': "Unknown path %s" % path}
+
+    @staticmethod
+    def _read_instances(headers: Dict[str, str], body: bytes) -> List[Any]:
+        text = body.decode('utf-8')
+        if 'json' in headers.get('content-type', '') or text.lstrip().startswith('{'):
+            request = json.loads(text)
+            if 'instances' not in request:
+                raise ValueError('expected a JSON object with an "instances" list')
+            return request['instances']
+        return [line for line in text.split('\n') if line.strip()]
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            status, response = await self._read_and_handle(reader)
+        except (ValueError, asyncio.IncompleteReadError) as error:
+            status, response = 400, {'error': "Malformed request: %s" % error}
+        except ConnectionError:
+            writer.close()
+            return
+        if status is not None:
+            response_body = json.dumps(response).encode('utf-8')
+            header = ("HTTP/1.1 %d %s\r\n"
+                      "Content-Type: application/json\r\n"
+                      "Content-Length: %d\r\n"
+                      "Connection: close\r\n\r\n" % (status, _REASONS[status], len(response_body)))
+            writer.write(header.encode('latin-1') + response_body)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        writer.close()
+
+    async def _read_and_handle(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        if not request_line:
+            return None, None
+        method, path = request_line.split(' ')[:2]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+        return await self.handle_request(method.upper(), path, headers, body)
+
+
+def _to_json(prediction):
+    if isinstance(prediction, list):
+        return [_to_json(output) for output in prediction]
+    return numpy.asarray(prediction).tolist()
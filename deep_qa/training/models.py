@@ -11,6 +11,7 @@ import tensorflow
 import numpy
 
 from .step import Step
+from .step_profiler import StepProfiler
 from ..common.params import Params, ConfigurationError
 from .train_utils import slice_batch
 
@@ -66,10 +67,23 @@ class DeepQaModel(Model):
         self.num_gpus = params.pop('num_gpus', 0)
         self.tensorboard_log = params.pop('tensorboard_log', None)
         self.tensorboard_frequency = params.pop('tensorboard_frequency', 0)
+        self.profile_steps = params.pop('profile_steps', None)
+        self.profile_dir = params.pop('profile_dir', None)
+        self.gradient_accumulation_steps = params.pop('gradient_accumulation_steps', 1)
         self.gradient_clipping = params.pop("gradient_clipping", None).as_dict()
         super(DeepQaModel, self).compile(**params.as_dict())
         self.optimizer = optimizer
 
+    def prepare_for_inference(self):
+        """
+        Use this instead of :func:`compile` for a model you only want predictions from.  Compiling
+        builds the loss, the metrics and placeholders for the targets, and the first call to
+        ``fit`` adds gradients, summaries and the optimizer's slot variables to the graph.  Here we
+        just build the predict function, so ``predict`` and ``predict_on_batch`` work, but ``fit``
+        and ``evaluate`` will fail until you call :func:`compile`.
+        """
+        self._make_predict_function()
+
     @overrides
     def _make_train_function(self):
         # pylint: disable=attribute-defined-outside-init
@@ -88,24 +102,23 @@ class DeepQaModel(Model):
             # Here we override Keras to use tensorflow optimizers directly.
             self.global_step = tensorflow.train.get_or_create_global_step()
             gradients = tensorflow.gradients(self.total_loss, self._collected_trainable_weights)
-            if self.gradient_clipping is not None:
-                # Don't pop from the gradient clipping dict here as
-                # if we call fit more than once we need it to still be there.
-                clip_type = self.gradient_clipping.get("type")
-                clip_value = self.gradient_clipping.get("value")
-                if clip_type == 'clip_by_norm':
-                    gradients, _ = tensorflow.clip_by_global_norm(gradients, clip_value)
-                elif clip_type == 'clip_by_value':
-                    gradients = [tensorflow.clip_by_value(x, -clip_value, clip_value) for x in gradients]
-                else:
-                    raise ConfigurationError("{} is not a supported type of gradient clipping.".format(clip_type))
+            accumulation_steps = getattr(self, 'gradient_accumulation_steps', 1)
+            if accumulation_steps > 1:
+                # We apply the gradients every `accumulation_steps` batches, instead of every batch.
+                accumulate_ops, gradients, reset_accumulators = self._accumulate_gradients(gradients)
+            gradients = self._clip_gradients(gradients)
 
             zipped_grads_with_weights = zip(gradients, self._collected_trainable_weights)
             # pylint: disable=no-member
             training_updates = self.optimizer.apply_gradients(zipped_grads_with_weights,
                                                               global_step=self.global_step)
             # pylint: enable=no-member
-            updates = self.updates + [training_updates]
+            if accumulation_steps > 1:
+                updates = self.updates + accumulate_ops
+                accumulation_updates = [reset_accumulators(training_updates)]
+            else:
+                updates = self.updates + [training_updates]
+                accumulation_updates = None
             outputs = [self.total_loss] + self.metrics_tensors
             # Gets loss and metrics. Updates weights at each call.
 
@@ -115,7 +128,84 @@ class DeepQaModel(Model):
                 train_summary_writer = None
 
             self.train_function = Step(inputs, outputs, self.global_step, train_summary_writer,
-                                       self.tensorboard_frequency, updates=updates)
+                                       self.tensorboard_frequency, updates=updates,
+                                       profiler=self._get_step_profiler(),
+                                       accumulation_steps=accumulation_steps,
+                                       accumulation_updates=accumulation_updates)
+
+    def _clip_gradients(self, gradients):
+        """
+        Clips ``gradients`` as ``gradient_clipping`` (passed to :func:`compile`) says to.
+        """
+        if self.gradient_clipping is None:
+            return gradients
+        # Don't pop from the gradient clipping dict here as
+        # if we call fit more than once we need it to still be there.
+        clip_type = self.gradient_clipping.get("type")
+        clip_value = self.gradient_clipping.get("value")
+        if clip_type == 'clip_by_norm':
+            gradients, _ = tensorflow.clip_by_global_norm(gradients, clip_value)
+        elif clip_type == 'clip_by_value':
+            gradients = [tensorflow.clip_by_value(x, -clip_value, clip_value) for x in gradients]
+        else:
+            raise ConfigurationError("{} is not a supported type of gradient clipping.".format(clip_type))
+        return gradients
+
+    def _accumulate_gradients(self, gradients):
+        """
+        Sets up gradient accumulation over ``gradient_accumulation_steps`` batches.  We keep a
+        (non-trainable) accumulator variable for each weight, and return:
+
+        - the ops that add one batch's ``gradients`` to the accumulators (using ``scatter_add`` for
+          sparse gradients, like the ones of embedding matrices);
+        - the mean of the accumulated gradients, read after those ops, to clip and apply in place
+          of ``gradients``.  The mean of the gradients of ``k`` batches of ``b`` instances is the
+          gradient of one batch of ``k * b`` instances (as long as the batches have the same size),
+          so we clip it the same way;
+        - a function that takes the op that applies the gradients, and returns an op that resets
+          the accumulators after it.
+
+        The accumulators take as much memory as the weights, but the activations (which dominate
+        memory for models like BiDAF) only ever get computed for one batch at a time.
+        """
+        accumulation_steps = self.gradient_accumulation_steps
+        accumulators = []
+        accumulate_ops = []
+        with tensorflow.name_scope('gradient_accumulation'):
+            for weight, gradient in zip(self._collected_trainable_weights, gradients):
+                if gradient is None:
+                    accumulators.append(None)
+                    continue
+                initial_value = tensorflow.zeros(weight.get_shape(), dtype=weight.dtype.base_dtype)
+                accumulator = tensorflow.Variable(initial_value, trainable=False, name='accumulator')
+                accumulators.append(accumulator)
+                if isinstance(gradient, tensorflow.IndexedSlices):
+                    accumulate_ops.append(tensorflow.scatter_add(accumulator, gradient.indices, gradient.values))
+                else:
+                    accumulate_ops.append(tensorflow.assign_add(accumulator, gradient))
+            with tensorflow.control_dependencies(accumulate_ops):
+                # read_value() makes a new read of the variable, which has to wait for the updates.
+                mean_gradients = [None if accumulator is None else accumulator.read_value() / accumulation_steps
+                                  for accumulator in accumulators]
+
+        # We keep these, so memory calibration can restore them after its probe steps.
+        self.gradient_accumulators = [accumulator for accumulator in accumulators if accumulator is not None]
+
+        def reset_accumulators(apply_gradients_op):
+            with tensorflow.control_dependencies([apply_gradients_op]):
+                return tensorflow.group(*[tensorflow.assign(accumulator, tensorflow.zeros_like(accumulator))
+                                          for accumulator in self.gradient_accumulators])
+        return accumulate_ops, mean_gradients, reset_accumulators
+
+    def _get_step_profiler(self):
+        """
+        Returns a :class:`~deep_qa.training.step_profiler.StepProfiler` for the training function,
+        if ``profile_steps`` was passed to :func:`compile`, and ``None`` otherwise.
+        """
+        if getattr(self, 'profile_steps', None) is None:
+            return None
+        layer_types = {layer.name: layer.__class__.__name__ for layer in self.layers}
+        return StepProfiler(self.profile_steps, self.profile_dir, layer_types)
 
     @overrides
     def _make_test_function(self):
@@ -118,11 +118,13 @@ def compile_parallel_model(model_builder: Callable[[], DeepQaModel],
 
     # Add the multi-gpu update operation.
     updates += [train_operation]
+    profiler = primary_model._get_step_profiler()  # pylint: disable=protected-access
     # Gets loss and metrics. Updates weights at each call.
     primary_model.train_function = Step(inputs,
                                         [train_loss] + merged_metrics,
                                         global_step,
                                         summary_writer=train_summary_writer,
                                         summary_frequency=primary_model.tensorboard_frequency,
-                                        updates=updates)
+                                        updates=updates,
+                                        profiler=profiler)
     return primary_model
@@ -0,0 +1,121 @@
+"""
+Code for reassembling model outputs that were computed batch by batch, in some other order than
+the dataset's (e.g., sorted by padding length), into arrays in the dataset's order.
+"""
+import logging
+import os
+import tempfile
+from typing import List, Union
+
+import numpy
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class PredictionAccumulator:
+    """
+    Collects per-batch arrays (a model's predictions, or a batch's labels), each together with the
+    indices of the instances in the batch, and puts them back together in instance order with
+    :func:`finish`.
+
+    Batches with dynamic padding have different shapes, so we pad every batch with zeros up to the
+    largest shape we saw, which is the shape we'd have gotten from padding the whole dataset at
+    once.  The arrays can be a single numpy array per batch or a list of them (for models with
+    several outputs), as long as every batch has the same structure.
+
+    Parameters
+    ----------
+    num_instances: int
+        The number of instances in the dataset.
+    output_prefix: str, optional (default=None)
+        If given, we don't keep the batches in memory.  Instead we append each batch to a
+        temporary file as it comes in, and :func:`finish` copies them into memory-mapped ``.npy``
+        files, one batch at a time, returning the memory-mapped arrays.  A single output goes in
+        ``[output_prefix].npy``, and output ``i`` of several in ``[output_prefix]_[i].npy``.
+    """
+    def __init__(self, num_instances: int, output_prefix: str=None):
+        self.num_instances = num_instances
+        self.output_prefix = output_prefix
+        self._is_list = None
+        self._shapes = None
+        self._dtypes = None
+        self._num_added = 0
+        self._num_batches = 0
+        self._batches = []
+        self._spill_file = None
+        if output_prefix is not None:
+            directory = os.path.dirname(os.path.abspath(output_prefix))
+            os.makedirs(directory, exist_ok=True)
+            self._spill_file = tempfile.TemporaryFile(dir=directory)
+
+    def add(self, indices: List[int], arrays: Union[numpy.ndarray, List[numpy.ndarray]]):
+        """
+        Adds the arrays for the instances at ``indices`` (the first dimension of each array).
+        ``arrays`` can be ``None`` (e.g., labels for unlabeled data), as long as it's always
+        ``None``.
+        """
+        if self._is_list is None:
+            self._is_list = isinstance(arrays, (list, tuple))
+        if arrays is None:
+            return
+        arrays = list(arrays) if self._is_list else [arrays]
+        if self._shapes is None:
+            self._shapes = [list(array.shape[1:]) for array in arrays]
+            self._dtypes = [array.dtype for array in arrays]
+        for shape, array in zip(self._shapes, arrays):
+            for dimension, size in enumerate(array.shape[1:]):
+                shape[dimension] = max(shape[dimension], size)
+        self._num_added += len(indices)
+        self._num_batches += 1
+        if self._spill_file is None:
+            self._batches.append((indices, arrays))
+        else:
+            numpy.save(self._spill_file, numpy.asarray(indices, dtype='int64'))
+            for array in arrays:
+                numpy.save(self._spill_file, array)
+
+    def finish(self) -> Union[numpy.ndarray, List[numpy.ndarray]]:
+        """
+        Returns the accumulated arrays in instance order (or ``None``, if we only ever got
+        ``None``).
+        """
+        if self._shapes is None:
+            if self._spill_file is not None:
+                self._spill_file.close()
+            return None
+        if self._num_added != self.num_instances:
+            logger.warning("Got outputs for %d instances, but expected %d", self._num_added, self.num_instances)
+        num_outputs = len(self._shapes)
+        shapes = [tuple([self.num_instances] + shape) for shape in self._shapes]
+        if self._spill_file is None:
+            results = [numpy.zeros(shape, dtype=dtype) for shape, dtype in zip(shapes, self._dtypes)]
+            # We pop the batches as we go, so we don't hold two copies of everything.
+            self._batches.reverse()
+            while self._batches:
+                indices, arrays = self._batches.pop()
+                for result, array in zip(results, arrays):
+                    _assign_padded(result, indices, array)
+        else:
+            filenames = [self._get_output_filename(i, num_outputs) for i in range(num_outputs)]
+            results = [numpy.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=shape)
+                       for filename, shape, dtype in zip(filenames, shapes, self._dtypes)]
+            self._spill_file.seek(0)
+            for _ in range(self._num_batches):
+                indices = numpy.load(self._spill_file)
+                for result in results:
+                    _assign_padded(result, indices, numpy.load(self._spill_file))
+            self._spill_file.close()
+            for result in results:
+                result.flush()
+            del results
+            results = [numpy.load(filename, mmap_mode='r') for filename in filenames]
+        return results if self._is_list else results[0]
+
+    def _get_output_filename(self, output_index: int, num_outputs: int) -> str:
+        if num_outputs == 1:
+            return self.output_prefix + '.npy'
+        return '%s_%d.npy' % (self.output_prefix, output_index)
+
+
+def _assign_padded(result: numpy.ndarray, indices, array: numpy.ndarray):
+    result[(numpy.asarray(indices),) + tuple(slice(0, size) for size in array.shape[1:])] = array
@@ -5,6 +5,8 @@ import tensorflow
 import numpy
 import keras.backend as K
 
+from .step_profiler import StepProfiler
+
 
 class Step:
     """
@@ -15,6 +17,14 @@ class Step:
     inputs: Feed placeholders to the computation graph.
     outputs: Output tensors to fetch.
     updates: Additional update ops to be run at function call.
+    profiler: If given, a :class:`~deep_qa.training.step_profiler.StepProfiler` which decides
+        which steps we run with full tracing, and records their ``RunMetadata``.
+    accumulation_steps: If greater than one, we only run ``accumulation_updates`` on every
+        ``accumulation_steps``-th call, after the ``updates`` of that call.  This is how we do
+        gradient accumulation: the ``updates`` add each batch's gradients to accumulators, and the
+        ``accumulation_updates`` apply and reset them.
+    accumulation_updates: Update ops to run every ``accumulation_steps`` calls.  These have to have
+        control dependencies on the ``updates`` they need to run after.
     """
     def __init__(self,
                  inputs: List,
@@ -22,7 +32,10 @@ class Step:
                  global_step: tensorflow.Variable,
                  summary_writer: tensorflow.summary.FileWriter=None,
                  summary_frequency: int=10,
-                 updates=None):
+                 updates=None,
+                 profiler: StepProfiler=None,
+                 accumulation_steps: int=1,
+                 accumulation_updates=None):
 
         updates = updates or []
         if not isinstance(inputs, (list, tuple)):
@@ -39,6 +52,9 @@ class Step:
         self.summary_writer = summary_writer
         self.summary_frequency = summary_frequency
         self.global_step = global_step
+        self.profiler = profiler
+        self.accumulation_steps = accumulation_steps
+        self.num_calls = 0
 
         self.summary_operation = tensorflow.summary.merge_all()
 
@@ -52,11 +68,22 @@ class Step:
                     # assumed already an op
                     updates_ops.append(update)
             self.updates_op = tensorflow.group(*updates_ops)
+        if accumulation_updates:
+            self.accumulation_updates_op = tensorflow.group(*accumulation_updates)
+        else:
+            self.accumulation_updates_op = None
 
     def __call__(self, inputs):
 
         current_step = K.eval(self.global_step)
-        run_summary = ((self.summary_frequency > 0)
+        self.num_calls += 1
+        # When we accumulate gradients, the global step only counts the calls that apply them, and
+        # those are the only calls we write summaries for or trace.
+        applies_accumulation = (self.accumulation_updates_op is not None
+                                and self.num_calls % self.accumulation_steps == 0)
+        is_full_step = self.accumulation_updates_op is None or applies_accumulation
+        run_summary = (is_full_step
+                       and (self.summary_frequency > 0)
                        and (current_step % self.summary_frequency == 0)
                        and (self.summary_writer is not None))
 
@@ -72,11 +99,22 @@ class Step:
             feed_dict[tensor] = value
 
         fetches = self.outputs + [self.updates_op]
+        if applies_accumulation:
+            fetches += [self.accumulation_updates_op]
         if run_summary:
             fetches += [self.summary_operation]
 
         session = K.get_session()
-        returned_fetches = session.run(fetches, feed_dict=feed_dict)
+        if is_full_step and self.profiler is not None and self.profiler.should_trace(current_step):
+            run_options = tensorflow.RunOptions(trace_level=tensorflow.RunOptions.FULL_TRACE)
+            run_metadata = tensorflow.RunMetadata()
+            returned_fetches = session.run(fetches, feed_dict=feed_dict,
+                                           options=run_options, run_metadata=run_metadata)
+            self.profiler.record(current_step, run_metadata)
+            if self.summary_writer is not None:
+                self.summary_writer.add_run_metadata(run_metadata, "step_%d" % current_step, current_step)
+        else:
+            returned_fetches = session.run(fetches, feed_dict=feed_dict)
         if run_summary:
             self.summary_writer.add_summary(returned_fetches[-1], current_step)
             self.summary_writer.flush()
@@ -0,0 +1,156 @@
+"""
+Code for tracing a few training steps with tensorflow's ``RunMetadata``, to find out where the time
+in a step goes.  For each traced step we write a timeline in Chrome's trace format, which you can
+open at ``chrome://tracing``, and we add up the time of the ops in each Keras layer, so you can see
+which layers (a ``MatrixAttention``, a ``WeightedSum``, an encoder) are hot without reading the
+timeline op by op.
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, List, Union
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+#: Ops with no Keras layer in their name scope (the optimizer's updates, summaries, feeding
+#: inputs, ...) get added up under their top-level name scope, with this as their layer type.
+NO_LAYER = "(no layer)"
+
+
+class StepProfiler:
+    """
+    Decides which training steps to trace, and records the ``RunMetadata`` of those steps (see the
+    module documentation).  :class:`~deep_qa.training.step.Step` asks :func:`should_trace` before
+    each step, and passes the step's ``RunMetadata`` to :func:`record` if it traced it.
+
+    After the last traced step, we log the layers that took the most time, and write the totals
+    for each layer to ``layer_times.json`` in ``output_dir``.  Note that the times are the sums of
+    the times of each op, and tensorflow runs independent ops in parallel (on CPU, using
+    ``inter_op_parallelism_threads``), so they can add up to more than the wall time of a step.
+
+    Parameters
+    ----------
+    steps: int or List[int]
+        The (global, zero-based) training step to trace, or a list of ``[first, last]`` steps to
+        trace (inclusive).  The first step includes some one-time setup, so you probably don't want
+        to trace it.
+    output_dir: str
+        Where to write the timelines (``timeline_step=[step].json``) and ``layer_times.json``.
+    layer_types: Dict[str, str], optional (default=None)
+        The type of each layer in the model, by layer name, so we can report the type of each
+        layer along with its name.  Keras puts the ops of each layer in a name scope with the
+        layer's name.
+    """
+    def __init__(self,
+                 steps: Union[int, List[int]],
+                 output_dir: str,
+                 layer_types: Dict[str, str]=None):
+        if isinstance(steps, int):
+            steps = [steps, steps]
+        self.first_step, self.last_step = steps
+        self.output_dir = output_dir
+        self.layer_types = layer_types or {}
+        self.num_traced_steps = 0
+        self.layer_times = defaultdict(lambda: defaultdict(float))  # type: Dict[str, Dict[str, float]]
+
+    def should_trace(self, step: int) -> bool:
+        return self.first_step <= step <= self.last_step
+
+    def record(self, step: int, run_metadata):
+        """
+        Writes the timeline of a traced step, and adds the time of its ops to the layer totals.
+        ``run_metadata`` is the ``tensorflow.RunMetadata`` the step was run with.
+        """
+        # We import this here, because it's not part of tensorflow's public API.
+        from tensorflow.python.client import timeline
+        os.makedirs(self.output_dir, exist_ok=True)
+        trace = timeline.Timeline(run_metadata.step_stats).generate_chrome_trace_format()
+        trace_file = os.path.join(self.output_dir, "timeline_step=%d.json" % step)
+        with open(trace_file, 'w') as output_file:
+            output_file.write(trace)
+        logger.info("Wrote the timeline of step %d to %s", step, trace_file)
+        self.add_step_stats(run_metadata.step_stats)
+        if step >= self.last_step:
+            self.finish()
+
+    def add_step_stats(self, step_stats):
+        """
+        Adds the time of each op in a step (a ``tensorflow.StepStats``) to the layer totals.
+        """
+        for layer_name, times in attribute_op_times(step_stats, self.layer_types).items():
+            for key, value in times.items():
+                self.layer_times[layer_name][key] += value
+        self.num_traced_steps += 1
+
+    def get_layer_times(self) -> List[Dict[str, Union[str, float]]]:
+        """
+        Returns the time of the ops in each layer, averaged over the traced steps, in
+        milliseconds, from the most time to the least.  Each entry has the layer's ``name``,
+        ``type``, and ``forward_ms``, ``backward_ms`` (the layer's gradient ops) and ``total_ms``.
+        """
+        num_steps = max(self.num_traced_steps, 1)
+        layer_times = []
+        for name, times in self.layer_times.items():
+            forward_ms = times['forward_micros'] / num_steps / 1000
+            backward_ms = times['backward_micros'] / num_steps / 1000
+            layer_times.append({'name': name,
+                                'type': self.layer_types.get(name, NO_LAYER),
+                                'forward_ms': forward_ms,
+                                'backward_ms': backward_ms,
+                                'total_ms': forward_ms + backward_ms})
+        layer_times.sort(key=lambda times: -times['total_ms'])
+        return layer_times
+
+    def finish(self, num_layers_to_log: int=15):
+        layer_times = self.get_layer_times()
+        total_ms = sum(times['total_ms'] for times in layer_times) or 1.0
+        lines = ["%-36s %-28s %12s %12s %8s" % ("layer", "type", "forward ms", "backward ms", "share")]
+        for times in layer_times[:num_layers_to_log]:
+            lines.append("%-36s %-28s %12.2f %12.2f %7.1f%%" % (times['name'], times['type'], times['forward_ms'],
+                                                               times['backward_ms'],
+                                                               100 * times['total_ms'] / total_ms))
+        logger.info("Op time per layer, averaged over %d traced steps:\n%s", self.num_traced_steps,
+                    "\n".join(lines))
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, "layer_times.json"), 'w') as output_file:
+            json.dump(layer_times, output_file, indent=2)
+
+
+def attribute_op_times(step_stats, layer_types: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+    """
+    Adds up the time (in microseconds) of the ops in ``step_stats`` by the layer they belong to,
+    which is the top-level name scope of the op (``matrix_attention_1/...``), or the one after
+    ``gradients/`` for the ops that compute the layer's gradients, which we count separately, as
+    ``backward_micros`` (the rest are ``forward_micros``).  Ops in name scopes that aren't in
+    ``layer_types`` get added up by their top-level name scope.
+    """
+    times = defaultdict(lambda: defaultdict(float))
+    for device_stats in step_stats.dev_stats:
+        # On a GPU, tensorflow also reports the ops of all streams together, which would count
+        # them twice.
+        if 'stream:all' in device_stats.device:
+            continue
+        for node_stats in device_stats.node_stats:
+            scopes = node_stats.node_name.split('/')
+            direction = 'forward_micros'
+            if scopes[0] == 'gradients' and len(scopes) > 1:
+                scopes = scopes[1:]
+                direction = 'backward_micros'
+            layer_name = scopes[0].split(':')[0]
+            times[layer_name][direction] += node_stats.all_end_rel_micros
+    if not layer_types:
+        return times
+    # Some layers (like the ``TimeDistributed`` wrapper) call other layers inside their own name
+    # scope, so we attribute the time to the outermost layer.  Name scopes that only differ in a
+    # suffix tensorflow added to make them unique (``_1``) belong to the same layer.
+    attributed = defaultdict(lambda: defaultdict(float))
+    for scope, scope_times in times.items():
+        layer_name = scope
+        if scope not in layer_types:
+            base_name = scope.rsplit('_', 1)[0]
+            if base_name in layer_types and scope[len(base_name) + 1:].isdigit():
+                layer_name = base_name
+        for key, value in scope_times.items():
+            attributed[layer_name][key] += value
+    return attributed
@@ -1,6 +1,7 @@
 from copy import deepcopy
 from typing import Any, Dict, List, Tuple
 import logging
+import os
 
 import dill as pickle
 from keras import backend as K
@@ -17,6 +18,7 @@ from ..data.embeddings import PretrainedEmbeddings
 from ..data.instances import Instance, TextInstance
 from ..layers import TimeDistributedEmbedding
 from ..layers.encoders import encoders, set_regularization_params, seq2seq_encoders
+from .prediction_accumulator import PredictionAccumulator
 from .trainer import Trainer
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -83,6 +85,21 @@ class TextTrainer(Trainer):
     tokenizer: Dict[str, Any], optional (default={})
         Which tokenizer to use for ``TextInstances``.  See
         :mod:``deep_qa.data.tokenizers.tokenizer`` for more information.
+    num_indexing_workers: int, optional (default=1)
+        If greater than one, we tokenize and index datasets using a pool of this many processes
+        (see :func:`~deep_qa.data.dataset.TextDataset.to_indexed_dataset`).  The result is the same
+        as indexing in a single process, just faster on machines with several cores.  We also use
+        this many processes to count words when fitting the vocabulary.
+    data_indexer: Dict[str, Any], optional (default={})
+        Parameters that control how we fit the vocabulary to the training data.  Currently the
+        allowed keys are ``min_count`` and ``max_vocab_size``, which get passed to
+        :func:`~deep_qa.data.data_indexer.DataIndexer.fit_word_dictionary`, and ``hashing``, a
+        dictionary from namespaces (e.g., ``"words"``) to ``{"num_buckets": int,
+        "num_exact_words": int}``, which makes those namespaces hashed (see
+        :func:`~deep_qa.data.data_indexer.DataIndexer.set_hashing`).  Hashing keeps the vocabulary
+        (and so the embedding matrix) a fixed size however large the data is, and if every
+        namespace is hashed with no exact words (the default ``num_exact_words``), we skip fitting
+        the vocabulary altogether, saving a pass over the training data.
     encoder: Dict[str, Dict[str, Any]], optional (default={'default': {}})
         These parameters specify the kind of encoder used to encode any word sequence input.  An
         encoder takes a sequence of vectors and returns a single vector.
@@ -121,6 +138,9 @@ class TextTrainer(Trainer):
         self.num_word_characters = params.pop('num_word_characters', None)
 
         tokenizer_params = params.pop('tokenizer', {})
+        # We keep a copy of the tokenizer parameters, as they change how data gets indexed, and so
+        # are part of the key for the indexed dataset cache.
+        self.tokenizer_params = deepcopy(tokenizer_params.as_dict())
         tokenizer_choice = tokenizer_params.pop_choice('type', list(tokenizers.keys()),
                                                        default_to_first_choice=True)
         self.tokenizer = tokenizers[tokenizer_choice](tokenizer_params)
@@ -129,6 +149,12 @@ class TextTrainer(Trainer):
         # a class variable on TextInstance so that _all_ TextInstance objects use the setting that
         # we read here.
         TextInstance.tokenizer = self.tokenizer
+        self.num_indexing_workers = params.pop('num_indexing_workers', 1)
+        data_indexer_params = params.pop('data_indexer', {})
+        self.vocab_min_count = data_indexer_params.pop('min_count', 1)
+        self.max_vocab_size = data_indexer_params.pop('max_vocab_size', None)
+        self.vocab_hashing = data_indexer_params.pop('hashing', {}).as_dict()
+        data_indexer_params.assert_empty('data_indexer')
 
         self.encoder_params = params.pop('encoder', {'default': {}})
         fallback_choices = ['crash', 'use default encoder', 'use default params']
@@ -145,6 +171,8 @@ class TextTrainer(Trainer):
 
         self.name = "TextTrainer"
         self.data_indexer = DataIndexer()
+        for namespace, hashing_params in self.vocab_hashing.items():
+            self.data_indexer.set_hashing(namespace, **hashing_params)
 
         # These keep track of which names you've used to get embeddings and encoders, so that we
         # reuse layers that you want to reuse.
@@ -162,55 +190,108 @@ class TextTrainer(Trainer):
         if self.data_generator is not None:
             return self.data_generator.create_generator(dataset)
         else:
-            dataset.pad_instances(self.get_padding_lengths())
-            return dataset.as_training_data()
+            return dataset.as_padded_training_data(self.get_padding_lengths(), verbose=True)
 
     @overrides
-    def load_dataset_from_files(self, files: List[str]):
+    def load_dataset_from_files(self, files: List[str], max_instances: int=None):
         """
         This method assumes you have a TextDataset that can be read from a single file.  If you
         have something more complicated, you'll need to override this method (though, a solver that
         has background information could call this method, then do additional processing on the
         rest of the list, for instance).
         """
-        return TextDataset.read_from_file(files[0], self._instance_type())
+        return TextDataset.read_from_file(files[0], self._instance_type(), max_instances)
 
     @overrides
-    def score_dataset(self, dataset: TextDataset):
+    def score_dataset(self, dataset: TextDataset, predictions_file: str=None):
         """
         See the superclass docs (:func:`Trainer.score_dataset`) for usage info.  Just a note here
-        that we `do not` use data generators for this method, even if you've said elsewhere that
-        you want to use them, so that we can easily return the labels for the data.  This means
-        that we'll do whole-dataset padding, and this could be slow.  We could probably fix this,
-        but it's good enough for now.
+        that we score the dataset in batches from
+        :func:`~deep_qa.data.data_generator.DataGenerator.create_scoring_batches`, so if you're
+        using a data generator with dynamic padding, instances are grouped into batches of similar
+        lengths, and each batch is only padded as much as it needs to be.  Without a data
+        generator, we use batches of ``batch_size`` instances, in order.  Either way, we put the
+        predictions and labels back in the order of the instances in ``dataset``, padding them to
+        the largest batch's shape.
         """
         # TODO(matt): for some reason the reference to the super class docs above isn't getting
         # linked properly.  I'm guessing it's because of an indexing issue in sphinx, but I
         # couldn't figure it out.  Once that works, it can be changed to "See :func:`the superclass
         # docs <Trainer.score_dataset>` for usage info").
-        indexed_dataset = dataset.to_indexed_dataset(self.data_indexer)
-        # Because we're not using data generators here, we need to save and hide
-        # `self.data_generator`.  TODO(matt): it _should_ be as easy as iterating over the data
-        # again to pull out the labels, so we can still use data generators, but I'm waiting on
-        # implementing that.
-        data_generator = self.data_generator
-        self.data_generator = None
-        inputs, labels = self.create_data_arrays(indexed_dataset)
-        predictions = self.model.predict(inputs)
-        self.data_generator = data_generator
-        return predictions, labels
+        indexed_dataset = dataset.to_indexed_dataset(**self._dataset_indexing_kwargs())
+        self._release_data_resources()
+        data_generator = self.data_generator or DataGenerator(self, Params({}))
+        num_instances = len(indexed_dataset.instances)
+        predictions = PredictionAccumulator(num_instances, predictions_file)
+        labels = PredictionAccumulator(num_instances)
+        try:
+            for indices, (inputs, batch_labels) in data_generator.create_scoring_batches(indexed_dataset):
+                predictions.add(indices, self.model.predict_on_batch(inputs))
+                labels.add(indices, batch_labels)
+        finally:
+            data_generator.close()
+        return predictions.finish(), labels.finish()
 
     @overrides
     def set_model_state_from_dataset(self, dataset: TextDataset):
+        if dataset.instances and not self.data_indexer.needs_fitting(dataset.instances[0].words().keys()):
+            logger.info("All namespaces are hashed; not fitting the data indexer word dictionary.")
+            return
         logger.info("Fitting data indexer word dictionary.")
-        self.data_indexer.fit_word_dictionary(dataset)
+        self.data_indexer.fit_word_dictionary(dataset,
+                                              min_count=self.vocab_min_count,
+                                              max_vocab_size=self.max_vocab_size,
+                                              num_workers=self.num_indexing_workers)
 
     @overrides
     def set_model_state_from_indexed_dataset(self, dataset: IndexedDataset):
         self._set_padding_lengths(dataset.padding_lengths())
+        # By now we've tokenized the training data (at least) twice, so this is a good time to
+        # see how well the tokenizer's cache is doing.
+        cache_statistics = self.tokenizer.get_cache_statistics()
+        if cache_statistics:
+            logger.info("Tokenizer cache statistics: %s", cache_statistics)
 
     def _dataset_indexing_kwargs(self) -> Dict[str, Any]:
-        return {'data_indexer': self.data_indexer}
+        return {'data_indexer': self.data_indexer, 'num_workers': self.num_indexing_workers}
+
+    @overrides
+    def _release_data_resources(self):
+        # A tokenizer that splits words in parallel keeps its worker processes around until we
+        # close it.
+        self.tokenizer.close()
+
+    @overrides
+    def get_dataset_reading_key(self) -> Dict[str, Any]:
+        # The trainer class is here because subclasses can change how data files get read (e.g.,
+        # by adding background information).  Instances get tokenized with whatever tokenizer is
+        # set on ``TextInstance``, so we only share datasets between models that tokenize the same
+        # way.
+        trainer_class = self.__class__
+        instance_type = self._instance_type()
+        return {
+                'trainer': trainer_class.__module__ + '.' + trainer_class.__name__,
+                'instance_type': instance_type.__module__ + '.' + instance_type.__name__,
+                'tokenizer': self.tokenizer_params,
+                }
+
+    @overrides
+    def _get_indexed_dataset_cache_key_fields(self) -> Dict[str, Any]:
+        return {
+                **self.get_dataset_reading_key(),
+                'data_indexer': self.data_indexer.get_fingerprint(),
+                'vocabulary': {'min_count': self.vocab_min_count,
+                               'max_vocab_size': self.max_vocab_size,
+                               'hashing': self.vocab_hashing},
+                }
+
+    @overrides
+    def _get_cached_model_state(self) -> Any:
+        return self.data_indexer
+
+    @overrides
+    def _set_model_state_from_cache(self, model_state: Any):
+        self.data_indexer = model_state
 
     @overrides
     def _set_params_from_model(self):
@@ -219,16 +300,19 @@ class TextTrainer(Trainer):
     @overrides
     def _save_auxiliary_files(self):
         super(TextTrainer, self)._save_auxiliary_files()
-        data_indexer_file = open("%s_data_indexer.pkl" % self.model_prefix, "wb")
-        pickle.dump(self.data_indexer, data_indexer_file)
-        data_indexer_file.close()
+        self.data_indexer.save("%s_data_indexer.vocab" % self.model_prefix)
 
     @overrides
     def _load_auxiliary_files(self):
         super(TextTrainer, self)._load_auxiliary_files()
-        data_indexer_file = open("%s_data_indexer.pkl" % self.model_prefix, "rb")
-        self.data_indexer = pickle.load(data_indexer_file)
-        data_indexer_file.close()
+        data_indexer_filename = "%s_data_indexer.vocab" % self.model_prefix
+        if os.path.exists(data_indexer_filename):
+            self.data_indexer = DataIndexer.load(data_indexer_filename)
+        else:
+            # Models saved by older versions pickled their DataIndexer.
+            data_indexer_file = open("%s_data_indexer.pkl" % self.model_prefix, "rb")
+            self.data_indexer = pickle.load(data_indexer_file)
+            data_indexer_file.close()
 
     @overrides
     def _overall_debug_output(self, output_dict: Dict[str, numpy.array]) -> str:
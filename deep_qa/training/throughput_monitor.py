@@ -0,0 +1,155 @@
+import json
+import logging
+import time
+from typing import Any, Dict
+
+from keras.callbacks import Callback
+import tensorflow
+
+from ..data.data_generator import DataWaitStatistics
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class ThroughputMonitor(Callback):
+    """
+    A Keras callback that measures training throughput, and how much of the training time is
+    spent waiting for data, every ``log_frequency`` steps and at the end of every epoch.  For each
+    of these windows we compute:
+
+    - ``instances_per_second``, and ``tokens_per_second`` if we're training from a
+      ``DataGenerator``;
+    - ``step_seconds``: the time spent in ``train_on_batch`` calls (mostly the session step);
+    - ``data_wait_seconds`` and ``data_wait_fraction``: the time between one step finishing and
+      the next starting, which is the time the training loop waited for Keras' queue of batches
+      (we don't count the time between epochs, which includes validation);
+    - ``padding_fraction``: the fraction of the padded positions in the batches that are padding,
+      if we're training from a ``DataGenerator``.
+
+    The ``DataGenerator`` counts tokens when it hands out batches, and Keras reads a few batches
+    ahead of training, so the token counts in each window are off by up to Keras' queue size.
+
+    We log each window, write it as a line of JSON to ``metrics_file`` if given, and add it to
+    tensorboard if the model writes tensorboard summaries (i.e., if ``tensorboard_log`` is set), as
+    ``throughput/[metric]`` (every ``log_frequency`` steps) and ``throughput_per_epoch/[metric]``.
+
+    Parameters
+    ----------
+    log_frequency: int, optional (default=0)
+        How often, in training steps, to record metrics.  If zero, we only record them at the end
+        of each epoch.
+    metrics_file: str, optional (default=None)
+        A file to append the metrics to, one JSON object per line.
+    data_statistics: DataWaitStatistics, optional (default=None)
+        The statistics of the ``DataGenerator`` generating the training data, for counting
+        tokens and padding.
+    """
+    def __init__(self,
+                 log_frequency: int=0,
+                 metrics_file: str=None,
+                 data_statistics: DataWaitStatistics=None):
+        super(ThroughputMonitor, self).__init__()
+        self.log_frequency = log_frequency
+        self.metrics_file = metrics_file
+        self.data_statistics = data_statistics
+        self.num_steps = 0
+        self._epoch = 0
+        self._output_file = None
+        self._batch_start = None
+        self._last_batch_end = None
+        self._step_window = None
+        self._epoch_window = None
+
+    def on_train_begin(self, logs=None):
+        if self.metrics_file is not None:
+            self._output_file = open(self.metrics_file, 'a')
+
+    def on_train_end(self, logs=None):
+        if self._output_file is not None:
+            self._output_file.close()
+            self._output_file = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch = epoch
+        self._last_batch_end = None
+        self._epoch_window = _ThroughputWindow(self.data_statistics)
+        self._step_window = _ThroughputWindow(self.data_statistics)
+
+    def on_batch_begin(self, batch, logs=None):
+        self._batch_start = time.time()
+        if self._last_batch_end is not None:
+            wait_time = self._batch_start - self._last_batch_end
+            self._step_window.data_wait_seconds += wait_time
+            self._epoch_window.data_wait_seconds += wait_time
+
+    def on_batch_end(self, batch, logs=None):
+        self._last_batch_end = time.time()
+        step_time = self._last_batch_end - self._batch_start
+        batch_size = (logs or {}).get('size', 0)
+        for window in [self._step_window, self._epoch_window]:
+            window.num_batches += 1
+            window.num_instances += batch_size
+            window.step_seconds += step_time
+        self.num_steps += 1
+        if self.log_frequency > 0 and self.num_steps % self.log_frequency == 0:
+            self._record('throughput', self._step_window.get_metrics())
+            self._step_window = _ThroughputWindow(self.data_statistics)
+
+    def on_epoch_end(self, epoch, logs=None):
+        metrics = self._epoch_window.get_metrics()
+        logger.info("Epoch %d throughput: %.1f instances/sec, %.1f%% of the time waiting for data",
+                    epoch + 1, metrics['instances_per_second'], 100 * metrics['data_wait_fraction'])
+        self._record('throughput_per_epoch', metrics)
+
+    def _record(self, name: str, metrics: Dict[str, Any]):
+        logger.debug("%s at step %d: %s", name, self.num_steps, metrics)
+        if self._output_file is not None:
+            record = dict(metrics, type=name, epoch=self._epoch, step=self.num_steps, time=time.time())
+            self._output_file.write(json.dumps(record, sort_keys=True) + "\n")
+            self._output_file.flush()
+        # The model's training function writes the tensorboard summaries, if there are any; see
+        # ``DeepQaModel._make_train_function``.
+        model = getattr(self, 'model', None)
+        summary_writer = getattr(getattr(model, 'train_function', None), 'summary_writer', None)
+        if summary_writer is not None:
+            values = [tensorflow.Summary.Value(tag="%s/%s" % (name, key), simple_value=value)
+                      for key, value in sorted(metrics.items())]
+            summary_writer.add_summary(tensorflow.Summary(value=values), self.num_steps)
+            summary_writer.flush()
+
+
+class _ThroughputWindow:
+    """
+    Totals for the steps since some point in training.
+    """
+    def __init__(self, data_statistics: DataWaitStatistics):
+        self.data_statistics = data_statistics
+        self.start_time = time.time()
+        self.num_batches = 0
+        self.num_instances = 0
+        self.step_seconds = 0.0
+        self.data_wait_seconds = 0.0
+        self.start_tokens = self.start_padded_tokens = 0
+        if data_statistics is not None:
+            self.start_tokens = data_statistics.num_tokens
+            self.start_padded_tokens = data_statistics.num_padded_tokens
+
+    def get_metrics(self) -> Dict[str, float]:
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        total_seconds = self.step_seconds + self.data_wait_seconds
+        metrics = {
+                'num_batches': self.num_batches,
+                'num_instances': self.num_instances,
+                'elapsed_seconds': elapsed,
+                'instances_per_second': self.num_instances / elapsed,
+                'step_seconds': self.step_seconds,
+                'data_wait_seconds': self.data_wait_seconds,
+                'data_wait_fraction': self.data_wait_seconds / total_seconds if total_seconds > 0 else 0.0,
+                }
+        if self.data_statistics is not None:
+            num_tokens = self.data_statistics.num_tokens - self.start_tokens
+            num_padded_tokens = self.data_statistics.num_padded_tokens - self.start_padded_tokens
+            metrics['num_tokens'] = num_tokens
+            metrics['tokens_per_second'] = num_tokens / elapsed
+            metrics['padding_fraction'] = 1.0 - num_tokens / num_padded_tokens if num_padded_tokens > 0 else 0.0
+        return metrics
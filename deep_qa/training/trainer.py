@@ -1,18 +1,23 @@
 import logging
 import os
+import time
 from typing import Any, Dict, List, Tuple
 
 import numpy
+from keras import backend as K
 from keras.models import model_from_json
 from keras.callbacks import CallbackList, EarlyStopping, LambdaCallback, ModelCheckpoint
 
 from ..common.checks import ConfigurationError
 from ..common.params import Params
 from ..data.dataset import Dataset, IndexedDataset
+from ..data.indexed_dataset_cache import IndexedDatasetCache
+from ..data.padding_analysis import analyze_padding
 from ..data.instances.instance import Instance
 from ..layers.wrappers import OutputMask
 from .models import DeepQaModel
 from .optimizers import optimizer_from_params
+from .throughput_monitor import ThroughputMonitor
 from .multi_gpu import compile_parallel_model
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -50,13 +55,24 @@ class Trainer:
         The files containing the data that should be used for evaluation.  The default of None
         means to just not perform test set evaluation.
     max_training_instances: int, optional (default=None)
-        Upper limit on the number of training instances.  If this is set, and we get more than
-        this, we will truncate the data.  Mostly useful for testing things out on small datasets
-        before running them on large datasets.
+        Upper limit on the number of training instances.  If this is set, we stop reading the
+        training data once we have this many instances.  Mostly useful for testing things out on
+        small datasets before running them on large datasets.
     max_validation_instances: int, optional (default=None)
         Upper limit on the number of validation instances, analogous to ``max_training_instances``.
     max_test_instances: int, optional (default=None)
         Upper limit on the number of test instances, analogous to ``max_training_instances``.
+    indexed_dataset_cache_dir: str, optional (default=None)
+        If given, we store indexed datasets in a persistent
+        :class:`~deep_qa.data.indexed_dataset_cache.IndexedDatasetCache` in this directory, and
+        re-use them whenever we see the same data files with the same indexing configuration
+        (including the same vocabulary), skipping tokenization and indexing entirely.  See
+        :func:`~Trainer._get_indexed_dataset_cache_key_fields()` for how a model opts in to this.
+    compact_indexed_datasets: bool, optional (default=False)
+        If ``True``, we keep indexed datasets in a
+        :class:`~deep_qa.data.dataset.CompactIndexedDataset`, which stores word and character
+        indices in flat numpy arrays instead of python lists, using much less memory for large
+        datasets.  When loading from an indexed dataset cache, the arrays are memory-mapped.
     train_steps_per_epoch: int, optional (default=None)
         If :func:`~Trainer.create_data_arrays` returns a generator instead of actual arrays, how
         many steps should we run from this generator before declaring an "epoch" finished?  The
@@ -79,6 +95,14 @@ class Trainer:
         chunked into fewer overall batches.
     batch_size: int, optional (default=32)
         Batch size to use when training.
+    gradient_accumulation_steps: int, optional (default=1)
+        If greater than one, we add up the gradients of this many batches, and apply their mean
+        (clipped as ``gradient_clipping`` says) once, instead of updating the weights after every
+        batch.  This trains like a batch size of ``batch_size * gradient_accumulation_steps``
+        (exactly so, if all batches have the same size), but the memory for activations only
+        scales with ``batch_size``, so you can keep the effective batch size a model was tuned with
+        on a machine that can't fit it.  The global training step (used for ``profile_steps`` and
+        tensorboard) counts weight updates, not batches.  Not supported with ``num_gpus > 1``.
     num_epochs: int, optional (default=20)
         Number of training epochs.
     validation_split: float, optional (default=0.1)
@@ -116,6 +140,25 @@ class Trainer:
         Tensorboard histogram frequency: note that activating the tensorboard histgram (frequency >
         0) can drastically increase model training time.  Please set frequency with consideration
         to desired runtime.
+    throughput_log_frequency: int, optional (default=0)
+        If positive, we measure training throughput (instances and tokens per second), how much of
+        the training time is spent waiting for data, and how much of each batch is padding, and
+        record these every this many steps, as well as at the end of each epoch.  See
+        :class:`~deep_qa.training.throughput_monitor.ThroughputMonitor`.  The metrics go to
+        ``tensorboard_log``, if it's set, and to ``throughput_metrics_file``.
+    throughput_metrics_file: str, optional (default=None)
+        If set, we append the throughput metrics to this file, one JSON object per line.  Setting
+        this also turns on the per-epoch throughput metrics, even if ``throughput_log_frequency``
+        is zero.
+    profile_steps: int or List[int], optional (default=None)
+        If set, we run this (global, zero-based) training step, or the steps from ``[first,
+        last]`` (inclusive), with full tensorflow tracing, write a Chrome trace of each of them
+        (which you can open at ``chrome://tracing``), and log how much of the op time went to each
+        layer of the model.  See :class:`~deep_qa.training.step_profiler.StepProfiler`.  Tracing
+        slows these steps down, so don't read throughput numbers from them.
+    profile_dir: str, optional (default=None)
+        Where to write the traces and per-layer times.  Defaults to
+        ``[model_serialization_prefix]_profile``.
     debug: Dict[str, Any], optional (default={})
         This should be a dict, containing the following keys:
 
@@ -142,6 +185,11 @@ class Trainer:
         self.max_training_instances = params.pop('max_training_instances', None)
         self.max_validation_instances = params.pop('max_validation_instances', None)
         self.max_test_instances = params.pop('max_test_instances', None)
+        indexed_dataset_cache_dir = params.pop('indexed_dataset_cache_dir', None)
+        self.indexed_dataset_cache = None
+        if indexed_dataset_cache_dir is not None:
+            self.indexed_dataset_cache = IndexedDatasetCache(indexed_dataset_cache_dir)
+        self.compact_indexed_datasets = params.pop('compact_indexed_datasets', False)
 
         # Data generator parameters.
         self.train_steps_per_epoch = params.pop('train_steps_per_epoch', None)
@@ -159,6 +207,9 @@ class Trainer:
         self.num_gpus = params.pop("num_gpus", 1)
         self.validation_split = params.pop('validation_split', 0.1)
         self.batch_size = params.pop('batch_size', 32)
+        self.gradient_accumulation_steps = params.pop('gradient_accumulation_steps', 1)
+        if self.gradient_accumulation_steps > 1 and self.num_gpus > 1:
+            raise ConfigurationError("Gradient accumulation isn't supported with multiple GPUs")
 
         # If you've got more than one gpu, we make a mega batch, which then
         # gets split across the number of gpus you have.
@@ -177,6 +228,14 @@ class Trainer:
         # Debugging / logging / misc parameters.
         self.tensorboard_log = params.pop('tensorboard_log', None)
         self.tensorboard_frequency = params.pop('tensorboard_frequency', 0)
+        self.throughput_log_frequency = params.pop('throughput_log_frequency', 0)
+        self.throughput_metrics_file = params.pop('throughput_metrics_file', None)
+        self.profile_steps = params.pop('profile_steps', None)
+        self.profile_dir = params.pop('profile_dir', None)
+        if self.profile_steps is not None and self.profile_dir is None:
+            if self.model_prefix is None:
+                raise ConfigurationError("profile_steps needs a profile_dir or a model_serialization_prefix")
+            self.profile_dir = self.model_prefix + "_profile"
         self.debug_params = params.pop('debug', {})
         self.show_summary_with_masking = params.pop('show_summary_with_masking_info', False)
 
@@ -211,6 +270,10 @@ class Trainer:
         self.debug_dataset = None
         self.debug_arrays = None
 
+        # The statistics of the DataGenerator generating the training data, if there is one, for
+        # the ThroughputMonitor.
+        self.training_data_statistics = None
+
     ################
     # Public methods
     ################
@@ -252,13 +315,11 @@ class Trainer:
             ``model.fit(x, y)`` or ``model.evaluate(x, y)`` methods
         """
         logger.info("Loading data from %s", str(data_files))
-        dataset = self.load_dataset_from_files(data_files)
+        dataset = self.load_dataset_from_files(data_files, max_instances)
         if max_instances is not None:
             logger.info("Truncating the dataset to %d instances", max_instances)
             dataset = dataset.truncate(max_instances)
-        logger.info("Indexing dataset")
-        indexing_kwargs = self._dataset_indexing_kwargs()
-        indexed_dataset = dataset.to_indexed_dataset(**indexing_kwargs)
+        indexed_dataset = self.__index_dataset(dataset, data_files, max_instances)
         data_arrays = self.create_data_arrays(indexed_dataset)
         return (dataset, data_arrays)
 
@@ -274,19 +335,21 @@ class Trainer:
         # First we need to prepare the data that we'll use for training.  For the training data, we
         # might need to update model state based on this dataset, so we handle it differently than
         # we do the validation and training data.
-        self.training_dataset = self.load_dataset_from_files(self.train_files)
-        if self.max_training_instances:
-            self.training_dataset = self.training_dataset.truncate(self.max_training_instances)
-        if self.update_model_state_with_training_data:
-            self.set_model_state_from_dataset(self.training_dataset)
-        logger.info("Indexing training data")
-        indexing_kwargs = self._dataset_indexing_kwargs()
-        indexed_training_dataset = self.training_dataset.to_indexed_dataset(**indexing_kwargs)
-        if self.update_model_state_with_training_data:
-            self.set_model_state_from_indexed_dataset(indexed_training_dataset)
+        indexed_training_dataset = self.__load_indexed_training_dataset()
+
+        # Then we build the model and compile it.  We do this before we batch the data, because
+        # the DataGenerator might need the model to calibrate its batch sizes.
+        self.__build_and_compile_model()
+        # pylint: disable=no-member
+        if self._uses_data_generators() and self.data_generator.needs_memory_calibration():
+            self.data_generator.calibrate_memory_usage(self.model, indexed_training_dataset)
+        # pylint: enable=no-member
+
         self.training_arrays = self.create_data_arrays(indexed_training_dataset)
         if self._uses_data_generators():
             self.train_steps_per_epoch = self.data_generator.last_num_batches  # pylint: disable=no-member
+            # Creating the validation generator replaces these, so we grab them now.
+            self.training_data_statistics = self.data_generator.last_wait_statistics  # pylint: disable=no-member
 
         if self.validation_files:
             self.validation_dataset, self.validation_arrays = self.load_data_arrays(self.validation_files,
@@ -294,20 +357,6 @@ class Trainer:
         if self._uses_data_generators():
             self.validation_steps = self.data_generator.last_num_batches  # pylint: disable=no-member
 
-        # Then we build the model and compile it.
-        logger.info("Building the model")
-        if self.num_gpus <= 1:
-            self.model = self._build_model()
-            self.model.compile(self.__compile_kwargs())
-        else:
-            if self._uses_data_generators():
-                # TODO(Mark): Remove this once we support dynamic padding + batching.
-                raise ConfigurationError("Multi-gpu training is currently only supported for"
-                                         "training without a DataGenerator, as it does not "
-                                         "support adaptive or dynamic batching. Remove these"
-                                         "from your configuration file to proceed.")
-            self.model = compile_parallel_model(self._build_model, self.__compile_kwargs())
-
         self.model.summary(show_masks=self.show_summary_with_masking)
 
         if self.debug_params:
@@ -329,6 +378,7 @@ class Trainer:
                 # file names.
                 self.debug_dataset, self.debug_arrays = self.load_data_arrays(debug_data)
             self.debug_model = self.__build_debug_model(debug_layer_names, debug_masks)
+        self._release_data_resources()
 
         # Now we actually train the model using various Keras callbacks to control training.
         callbacks = self._get_callbacks()
@@ -354,7 +404,12 @@ class Trainer:
             kwargs['steps_per_epoch'] = self.train_steps_per_epoch
             if self.validation_arrays is not None and self._uses_data_generators():
                 kwargs['validation_steps'] = self.validation_steps
-            history = self.model.fit_generator(self.training_arrays, **kwargs)
+            try:
+                history = self.model.fit_generator(self.training_arrays, **kwargs)
+            finally:
+                # Keras doesn't close the generators when it's done with them, so we stop any
+                # workers they have here.
+                self.data_generator.close()  # pylint: disable=no-member
 
         # After finishing training, we save the best weights and
         # any auxillary files, such as the model config.
@@ -367,13 +422,67 @@ class Trainer:
         if self.test_files:
             self.evaluate_model(self.test_files, self.max_test_instances)
 
-    def load_model(self, epoch: int=None):
+    def calibrate_memory_usage(self) -> int:
+        """
+        Loads the training data and builds the model, just like :func:`train`, then calibrates the
+        ``adaptive_memory_usage_constant`` of our ``DataGenerator`` (see
+        :class:`~deep_qa.data.memory_calibration.MemoryCalibrator`) and returns it, without
+        training.  Your data generator parameters must include ``memory_calibration``.
+        """
+        # pylint: disable=no-member
+        if not self._uses_data_generators() or self.data_generator.memory_calibrator is None:
+            raise ConfigurationError("Memory calibration needs a data generator with memory_calibration "
+                                     "parameters")
+        indexed_training_dataset = self.__load_indexed_training_dataset()
+        self._release_data_resources()
+        self.__build_and_compile_model()
+        constant = self.data_generator.calibrate_memory_usage(self.model, indexed_training_dataset)
+        # pylint: enable=no-member
+        return constant
+
+    def analyze_padding(self, dataset_files: List[str]=None) -> Dict[str, Any]:
+        """
+        Loads the training data (or ``dataset_files``, if given) just like :func:`train`, and
+        simulates batching it with fixed, sorted and adaptive batches, using the batch size and
+        the ``padding_noise``, ``adaptive_memory_usage_constant`` and ``maximum_batch_size`` of our
+        ``DataGenerator``, without building the model.  See
+        :func:`~deep_qa.data.padding_analysis.analyze_padding` for what we return.
+
+        This leaves the model unfit for training: we load the data as if we were using dynamic
+        padding, so that the only padding lengths the model sets are the limits from its
+        parameters.
+        """
+        # pylint: disable=no-member
+        if not self._uses_data_generators():
+            raise ConfigurationError("Padding analysis needs a data generator (add \"data_generator\": {} "
+                                     "to your parameters)")
+        data_generator = self.data_generator
+        data_generator.dynamic_padding = True
+        # pylint: enable=no-member
+        if dataset_files is not None:
+            self.train_files = dataset_files
+        indexed_dataset = self.__load_indexed_training_dataset()
+        self._release_data_resources()
+        # The data generator's constant defaults to False, not None.
+        adaptive_memory_usage_constant = data_generator.adaptive_memory_usage_constant or None
+        return analyze_padding(self, indexed_dataset,
+                               padding_noise=data_generator.padding_noise,
+                               adaptive_memory_usage_constant=adaptive_memory_usage_constant,
+                               maximum_batch_size=data_generator.maximum_batch_size)
+
+    def load_model(self, epoch: int=None, for_inference: bool=False):
         """
         Loads a serialized model, using the ``model_serialization_prefix`` that was passed to the
         constructor.  If epoch is not None, we try to load the model from that epoch.  If epoch is
         not given, we load the best saved model.
+
+        If ``for_inference`` is ``True``, we don't compile the model, building only its predict
+        function (see :func:`~deep_qa.training.models.DeepQaModel.prepare_for_inference`).  This
+        is faster and uses less memory, and it's all you need for ``score_dataset`` or
+        ``predict``, but you can't train or evaluate the model afterwards.
         """
         logger.info("Loading serialized model")
+        start_time = time.time()
         # Loading serialized model
         model_config_file = open("%s_config.json" % self.model_prefix)
         model_config_json = model_config_file.read()
@@ -389,20 +498,30 @@ class Trainer:
         self.model.summary(show_masks=self.show_summary_with_masking)
         self._load_auxiliary_files()
         self._set_params_from_model()
-        self.model.compile(self.__compile_kwargs())
+        if for_inference:
+            self.model.prepare_for_inference()
+        else:
+            self.model.compile(self.__compile_kwargs())
         self.update_model_state_with_training_data = False
+        logger.info("Loaded the model %sin %.2f seconds; the graph has %d operations",
+                    "for inference " if for_inference else "", time.time() - start_time,
+                    len(K.get_session().graph.get_operations()))
 
     def evaluate_model(self, data_files: List[str], max_instances: int=None):
         # We call self.load_model() first, to be sure that we load the best model we have, if we've
         # trained for a while.
         self.load_model()
         _, arrays = self.load_data_arrays(data_files, max_instances)
+        self._release_data_resources()
         logger.info("Evaluting model on the test set.")
         if not self._uses_data_generators():
             scores = self.model.evaluate(arrays[0], arrays[1])
         else:
             steps = self.data_generator.last_num_batches  # pylint: disable=no-member
-            scores = self.model.evaluate_generator(arrays, steps)
+            try:
+                scores = self.model.evaluate_generator(arrays, steps)
+            finally:
+                self.data_generator.close()  # pylint: disable=no-member
         for idx, metric in enumerate(self.model.metrics_names):
             print("{}: {}".format(metric, scores[idx]))
 
@@ -412,7 +531,7 @@ class Trainer:
     # Abstract methods - you MUST override these
     ##################
 
-    def score_dataset(self, dataset: Dataset) -> Tuple[numpy.array, numpy.array]:
+    def score_dataset(self, dataset: Dataset, predictions_file: str=None) -> Tuple[numpy.array, numpy.array]:
         """
         Takes a ``Dataset``, indexes it, and returns the output of evaluating the model on all
         instances, and labels for the instances from the data, if they were given. The specifics of
@@ -422,6 +541,11 @@ class Trainer:
         ----------
         dataset: Dataset
             A ``Dataset`` read by `:func:`~Trainer.load_dataset_from_files()`.
+        predictions_file: str, optional (default=None)
+            If given, we write the predictions to disk as we compute them, instead of keeping them
+            in memory, and return read-only memory-mapped arrays.  This is a prefix: a single
+            output goes in ``[predictions_file].npy``, and output ``i`` of a model with several
+            outputs in ``[predictions_file]_[i].npy``.
 
         Returns
         -------
@@ -437,11 +561,15 @@ class Trainer:
         """
         raise NotImplementedError
 
-    def load_dataset_from_files(self, files: List[str]) -> Dataset:
+    def load_dataset_from_files(self, files: List[str], max_instances: int=None) -> Dataset:
         """
         Given a list of file inputs, load a raw dataset from the files.  This is a list because
         some datasets are specified in more than one file (e.g., a file containing the instances,
         and a file containing background information about those instances).
+
+        If ``max_instances`` is given, you should stop reading once you have that many instances,
+        so that we don't pay for reading data we're going to throw away.  We still truncate the
+        returned dataset to ``max_instances`` afterwards, so this is just an optimization.
         """
         raise NotImplementedError
 
@@ -520,6 +648,55 @@ class Trainer:
     # Protected methods - you CAN override these, if you want
     ###################
 
+    def get_dataset_reading_key(self) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable description of how this model reads data files into a
+        ``Dataset``, such that two models with the same key can share one ``Dataset`` read from the
+        same files (e.g., when scoring with an ensemble, see
+        :func:`~deep_qa.run.score_dataset_with_ensemble`).  The default implementation returns
+        ``None``, which means the ``Dataset`` can't be shared.
+        """
+        return None
+
+    def _get_indexed_dataset_cache_key_fields(self) -> Dict[str, Any]:
+        """
+        If ``indexed_dataset_cache_dir`` is set, we look up indexed datasets in the cache using the
+        contents of the data files, along with whatever this method returns.  It must be a
+        JSON-serializable dictionary containing everything that could change how the data files
+        get turned into an ``IndexedDataset`` - the instance type, tokenizer settings, a
+        fingerprint of the vocabulary, and so on.  Any model state that indexing depends on and
+        that could be modified by indexing must also be returned by
+        :func:`~Trainer._get_cached_model_state()`.
+
+        The default implementation returns ``None``, which disables caching for this model.
+        """
+        return None
+
+    def _get_cached_model_state(self) -> Any:
+        """
+        Returns (picklable) model state that should be stored in the indexed dataset cache
+        alongside an ``IndexedDataset``, so that a cache hit can restore the state that
+        :func:`~Trainer.set_model_state_from_dataset()` and the indexing itself would have set
+        (e.g., the vocabulary of a ``TextTrainer``).  This is called after indexing.
+        """
+        return None
+
+    def _set_model_state_from_cache(self, model_state: Any):
+        """
+        The inverse of :func:`~Trainer._get_cached_model_state()`, called on a cache hit instead of
+        :func:`~Trainer.set_model_state_from_dataset()`.
+        """
+        pass
+
+    def _release_data_resources(self):
+        """
+        Called when we're done reading and indexing data for a while (before we start fitting the
+        model, and after we've loaded data to evaluate it on), so you can release resources you
+        only need for that, like worker processes.  They should start again if you need them
+        later.  The default implementation does nothing.
+        """
+        pass
+
     def _get_callbacks(self):
         """
          Returns a set of Callbacks which are used to perform various functions within Keras' .fit method.
@@ -535,6 +712,11 @@ class Trainer:
                                          on_epoch_end=lambda epoch, logs: self._post_epoch_hook(epoch))
         callbacks = [early_stop, model_callbacks]
 
+        if self.throughput_log_frequency > 0 or self.throughput_metrics_file is not None:
+            callbacks.append(ThroughputMonitor(self.throughput_log_frequency,
+                                               self.throughput_metrics_file,
+                                               self.training_data_statistics))
+
         if self.debug_params:
             debug_callback = LambdaCallback(on_epoch_end=lambda epoch, logs:
                                             self.__debug(self.debug_params["layer_names"],
@@ -646,6 +828,70 @@ class Trainer:
     # consider making them protected instead.
     #################
 
+    def __index_dataset(self,
+                        dataset: Dataset,
+                        data_files: List[str],
+                        max_instances: int=None,
+                        update_model_state: bool=False) -> IndexedDataset:
+        """
+        Indexes ``dataset`` (which was read from ``data_files`` and truncated to ``max_instances``),
+        first setting model state from it if ``update_model_state`` is ``True``.  If we have an
+        indexed dataset cache, and this model supports caching, we try to get the indexed dataset
+        (and the resulting model state) from the cache first, and save it to the cache otherwise.
+        """
+        cache_key = None
+        if self.indexed_dataset_cache is not None:
+            key_fields = self._get_indexed_dataset_cache_key_fields()
+            if key_fields is not None:
+                key_fields = dict(key_fields)
+                key_fields['max_instances'] = max_instances
+                key_fields['update_model_state'] = update_model_state
+                cache_key = IndexedDatasetCache.get_key(data_files, key_fields)
+                cached = self.indexed_dataset_cache.load(cache_key, compact=self.compact_indexed_datasets)
+                if cached is not None:
+                    indexed_dataset, model_state = cached
+                    self._set_model_state_from_cache(model_state)
+                    return indexed_dataset
+
+        if update_model_state:
+            self.set_model_state_from_dataset(dataset)
+        logger.info("Indexing dataset")
+        indexing_kwargs = self._dataset_indexing_kwargs()
+        if self.compact_indexed_datasets:
+            # This builds the compact arrays as we index, instead of compacting a list-based
+            # dataset afterwards, so we never hold the whole dataset as python lists.
+            indexing_kwargs['compact'] = True
+        indexed_dataset = dataset.to_indexed_dataset(**indexing_kwargs)
+        if cache_key is not None:
+            self.indexed_dataset_cache.save(cache_key, indexed_dataset, self._get_cached_model_state())
+        return indexed_dataset
+
+    def __load_indexed_training_dataset(self) -> IndexedDataset:
+        self.training_dataset = self.load_dataset_from_files(self.train_files, self.max_training_instances)
+        if self.max_training_instances:
+            self.training_dataset = self.training_dataset.truncate(self.max_training_instances)
+        indexed_training_dataset = self.__index_dataset(self.training_dataset,
+                                                        self.train_files,
+                                                        self.max_training_instances,
+                                                        self.update_model_state_with_training_data)
+        if self.update_model_state_with_training_data:
+            self.set_model_state_from_indexed_dataset(indexed_training_dataset)
+        return indexed_training_dataset
+
+    def __build_and_compile_model(self):
+        logger.info("Building the model")
+        if self.num_gpus <= 1:
+            self.model = self._build_model()
+            self.model.compile(self.__compile_kwargs())
+        else:
+            if self._uses_data_generators():
+                # TODO(Mark): Remove this once we support dynamic padding + batching.
+                raise ConfigurationError("Multi-gpu training is currently only supported for"
+                                         "training without a DataGenerator, as it does not "
+                                         "support adaptive or dynamic batching. Remove these"
+                                         "from your configuration file to proceed.")
+            self.model = compile_parallel_model(self._build_model, self.__compile_kwargs())
+
     def __save_best_model(self):
         """
         Copies the weights from the best epoch to a final weight file.
@@ -721,7 +967,10 @@ class Trainer:
         return Params({
                 'tensorboard_log': self.tensorboard_log,
                 'tensorboard_frequency': self.tensorboard_frequency,
+                'profile_steps': self.profile_steps,
+                'profile_dir': self.profile_dir,
                 'gradient_clipping': self.gradient_clipping,
+                'gradient_accumulation_steps': self.gradient_accumulation_steps,
                 'loss': self.loss,
                 'optimizer': self.optimizer,
                 'metrics': self.metrics,
@@ -0,0 +1,41 @@
+"""
+Compares how much padding fixed, sorted (``dynamic_padding``) and adaptive
+(``adaptive_batch_sizes``) batching produce on a dataset, and estimates the relative cost of an
+epoch with each, so you can choose ``DataGenerator`` settings without training anything.  See
+:func:`~deep_qa.data.padding_analysis.analyze_padding`.
+
+Example::
+
+    python scripts/analyze_padding.py model_params.json
+    python scripts/analyze_padding.py model_params.json --dataset_files dev.tsv --output padding.json
+"""
+import argparse
+import logging
+import os
+import sys
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa import analyze_padding
+from deep_qa.common.checks import ensure_pythonhashseed_set
+from deep_qa.data.padding_analysis import format_padding_analysis
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Compares the padding of different batching strategies")
+    argparser.add_argument('param_file', type=str, help='the parameter file of a model with a data_generator')
+    argparser.add_argument('--dataset_files', type=str, nargs='+', default=None,
+                           help="the dataset to analyze (default: the model's train_files)")
+    argparser.add_argument('--output', type=str, default=None, help='also write the results to this JSON file')
+    args = argparser.parse_args()
+    analysis = analyze_padding(args.param_file, args.dataset_files, args.output)
+    print(format_padding_analysis(analysis))
+
+
+if __name__ == "__main__":
+    ensure_pythonhashseed_set()
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.INFO)
+    main()
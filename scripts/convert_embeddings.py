@@ -0,0 +1,39 @@
+"""
+Converts a gzipped text embedding file (e.g., GloVe) into a memory-mapped
+:class:`~deep_qa.data.embedding_store.EmbeddingStore`.  Models do this automatically the first time
+they use an embedding file, writing the store next to it; this script lets you do it ahead of time,
+or put the store somewhere else (e.g., when the embedding file is on a read-only filesystem).  You
+can use the store directory anywhere you'd give a ``pretrained_file``.
+
+Example::
+
+    python scripts/convert_embeddings.py glove.840B.300d.txt.gz
+    python scripts/convert_embeddings.py glove.840B.300d.txt.gz /local/glove.840B.300d.store
+"""
+import argparse
+import logging
+import os
+import sys
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa.data.embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Converts an embedding file into an embedding store")
+    argparser.add_argument('embeddings_file', type=str, help='gzipped text embedding file')
+    argparser.add_argument('store_directory', type=str, nargs='?', default=None,
+                           help='where to write the store (default: [embeddings_file].store)')
+    args = argparser.parse_args()
+    store_directory = args.store_directory or args.embeddings_file + '.store'
+    store = EmbeddingStore.convert(args.embeddings_file, store_directory)
+    logger.info("Wrote %d vectors of dimension %d to %s", len(store), store.embedding_dim, store_directory)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.INFO)
+    main()
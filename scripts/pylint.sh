@@ -1,4 +1,4 @@
 set -e
 echo 'Starting pylint checks'
-pylint -d locally-disabled,locally-enabled -f colorized deep_qa tests scripts/*.py
+pylint -d locally-disabled,locally-enabled -f colorized deep_qa tests scripts/*.py benchmarks/*.py
 echo -e "pylint checks passed\n"
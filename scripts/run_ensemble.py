@@ -11,15 +11,24 @@ logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
 def main():
-    usage = 'USAGE: run_ensemble.py [param_file]+ -- [data_file]+'
+    usage = 'USAGE: run_ensemble.py [--num_workers N] [param_file]+ -- [data_file]+'
+    args = sys.argv[1:]
+    num_workers = 1
+    if args and args[0] == '--num_workers':
+        try:
+            num_workers = int(args[1])
+        except (IndexError, ValueError):
+            print(usage)
+            sys.exit(-1)
+        args = args[2:]
     try:
-        separator_index = sys.argv.index('--')
+        separator_index = args.index('--')
     except ValueError:
         print(usage)
         sys.exit(-1)
-    param_files = sys.argv[1:separator_index]
-    dataset_files = sys.argv[separator_index + 1:]
-    predictions, labels = score_dataset_with_ensemble(param_files, dataset_files)
+    param_files = args[:separator_index]
+    dataset_files = args[separator_index + 1:]
+    predictions, labels = score_dataset_with_ensemble(param_files, dataset_files, num_workers=num_workers)
     compute_accuracy(predictions, labels)
 
 
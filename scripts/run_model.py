@@ -4,14 +4,14 @@ import sys
 
 # pylint: disable=wrong-import-position
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from deep_qa import run_model, evaluate_model
+from deep_qa import calibrate_memory_usage, run_model, evaluate_model
 from deep_qa.common.checks import ensure_pythonhashseed_set
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
 def main():
-    usage = 'USAGE: run_model.py [param_file] [train|test]'
+    usage = 'USAGE: run_model.py [param_file] [train|test|calibrate] [calibrated_param_file]'
     if len(sys.argv) == 2:
         run_model(sys.argv[1])
     elif len(sys.argv) == 3:
@@ -20,9 +20,13 @@ def main():
             run_model(sys.argv[1])
         elif mode == 'test':
             evaluate_model(sys.argv[1])
+        elif mode == 'calibrate':
+            calibrate_memory_usage(sys.argv[1])
         else:
             print(usage)
             sys.exit(-1)
+    elif len(sys.argv) == 4 and sys.argv[2] == 'calibrate':
+        calibrate_memory_usage(sys.argv[1], sys.argv[3])
     else:
         print(usage)
         sys.exit(-1)
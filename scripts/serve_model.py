@@ -0,0 +1,43 @@
+"""
+Loads a trained model and serves its predictions over HTTP (see
+:class:`~deep_qa.serving.inference_server.InferenceServer`), batching concurrent requests together.
+
+Example::
+
+    python scripts/serve_model.py model_params.json --port 8000
+    curl -X POST --data-binary @instances.tsv http://127.0.0.1:8000/predict
+    curl http://127.0.0.1:8000/metrics
+"""
+import argparse
+import logging
+import os
+import sys
+
+# pylint: disable=wrong-import-position
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from deep_qa import serve_model
+from deep_qa.common.checks import ensure_pythonhashseed_set
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Serves a trained model's predictions over HTTP")
+    argparser.add_argument('param_file', type=str, help='the parameter file the model was trained with')
+    argparser.add_argument('--host', type=str, default='127.0.0.1')
+    argparser.add_argument('--port', type=int, default=8000)
+    argparser.add_argument('--unix_socket', type=str, default=None,
+                           help='listen on this UNIX socket instead of host:port')
+    argparser.add_argument('--max_batch_size', type=int, default=None,
+                           help="largest batch to run (default: the model's batch_size)")
+    argparser.add_argument('--max_latency', type=float, default=0.01,
+                           help='seconds a request waits for others to batch with')
+    args = argparser.parse_args()
+    serve_model(args.param_file, args.host, args.port, args.unix_socket, args.max_batch_size, args.max_latency)
+
+
+if __name__ == "__main__":
+    ensure_pythonhashseed_set()
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                        level=logging.INFO)
+    main()
@@ -13,10 +13,34 @@ from numpy.testing import assert_allclose
 
 from deep_qa.common.checks import log_keras_version_info
 from deep_qa.common.params import Params
+from deep_qa.data.tokenizers.word_splitter import SimpleWordSplitter, _ParallelWordSplitter
 from deep_qa.models.memory_networks.memory_network import MemoryNetwork
 from deep_qa.models.multiple_choice_qa.multiple_true_false_similarity import MultipleTrueFalseSimilarity
 
 
+class ParallelSimpleWordSplitter(_ParallelWordSplitter):
+    """
+    The simple word splitter, but splitting large batches in a pool of processes like the nltk and
+    spaCy splitters do, so we can test parallel splitting without loading their models.  We keep
+    every pool we start in ``pools``.
+    """
+    def __init__(self, num_processes: int=1):
+        super(ParallelSimpleWordSplitter, self).__init__(num_processes, {})
+        self.simple_word_splitter = SimpleWordSplitter()
+        self.pools = []
+
+    def split_words(self, sentence):
+        return self.simple_word_splitter.split_words(sentence)
+
+    def split_words_batch(self, sentences):
+        if self._should_split_in_pool(sentences):
+            words = self._split_words_in_pool(sentences)
+            if self._pool not in self.pools:
+                self.pools.append(self._pool)
+            return words
+        return self.simple_word_splitter.split_words_batch(sentences)
+
+
 class DeepQaTestCase(TestCase):  # pylint: disable=too-many-public-methods
     TEST_DIR = './TMP_TEST/'
     TRAIN_FILE = TEST_DIR + 'train_file'
@@ -1,8 +1,12 @@
 # pylint: disable=no-self-use,invalid-name
+import multiprocessing
+import random
+
 import numpy
 
 from deep_qa.common.params import Params
 from deep_qa.data import DataGenerator, IndexedDataset
+from deep_qa.data.dataset import CompactIndexedDataset
 from ..common.test_case import DeepQaTestCase
 
 
@@ -84,6 +88,23 @@ class TestDataGenerator(DeepQaTestCase):
         assert self.as_list(one_epoch_arrays[2][0]) == [7, 2, 1]
         assert self.as_list(one_epoch_arrays[3][0]) == [8, 9, 5, 6]
 
+    def test_compact_datasets_give_the_same_batches(self):
+        params = Params({
+                'padding_noise': 0.0,
+                'dynamic_padding': True,
+                'adaptive_batch_sizes': True,
+                'adaptive_memory_usage_constant': 130,
+                })
+        generator = DataGenerator(self.text_trainer, params)
+        batches = generator.create_generator(CompactIndexedDataset(self.instances))
+        assert generator.last_num_batches == 4
+        one_epoch_arrays = [next(batches) for _ in range(4)]
+        one_epoch_arrays.sort(key=lambda x: x[0][0])
+        assert self.as_list(one_epoch_arrays[0][0]) == [0, 4]
+        assert self.as_list(one_epoch_arrays[1][0]) == [3]
+        assert self.as_list(one_epoch_arrays[2][0]) == [7, 2, 1]
+        assert self.as_list(one_epoch_arrays[3][0]) == [8, 9, 5, 6]
+
     def test_sort_every_batch_actually_adds_noise_every_batch(self):
         # We're just going to get two epoch's worth of batches, and make sure that they're
         # different.
@@ -103,6 +124,67 @@ class TestDataGenerator(DeepQaTestCase):
         second_epoch = [self.as_list(x[0]) for x in second_epoch_arrays]
         assert first_epoch != second_epoch
 
+    def test_generator_does_not_copy_or_modify_the_dataset(self):
+        params = Params({
+                'padding_noise': 0.8,
+                'sort_every_epoch': True,
+                'dynamic_padding': True,
+                })
+        generator = DataGenerator(self.text_trainer, params)
+        dataset = IndexedDataset(list(self.instances))
+        batches = generator.create_generator(dataset)
+        seen_indices = []
+        for _ in range(generator.last_num_batches):
+            seen_indices.extend(self.as_list(next(batches)[0]))
+        assert sorted(seen_indices) == list(range(10))
+        for _ in range(10):
+            next(batches)
+        assert len(dataset.instances) == len(self.instances)
+        assert all(instance is original for instance, original in zip(dataset.instances, self.instances))
+
+    def get_epochs_of_batches(self, params, num_epochs):
+        random.seed(1337)
+        numpy.random.seed(1337)
+        generator = DataGenerator(self.text_trainer, Params(params))
+        batches = generator.create_generator(IndexedDataset(self.instances))
+        return [self.as_list(next(batches)[0]) for _ in range(4 * num_epochs)], generator
+
+    def test_prefetching_gives_the_same_batches_in_the_same_order(self):
+        params = {'padding_noise': 0.5, 'sort_every_epoch': True, 'dynamic_padding': True}
+        expected, _ = self.get_epochs_of_batches(dict(params), 3)
+        threaded, _ = self.get_epochs_of_batches(dict(params, prefetch_batches=3), 3)
+        assert threaded == expected
+        multiprocess, _ = self.get_epochs_of_batches(dict(params, prefetch_batches=5, num_workers=2), 3)
+        assert multiprocess == expected
+
+    def test_close_stops_the_prefetching_workers(self):
+        params = {'padding_noise': 0.0, 'prefetch_batches': 2, 'num_workers': 2}
+        existing_processes = set(multiprocessing.active_children())
+        generator = DataGenerator(self.text_trainer, Params(params))
+        batches = generator.create_generator(IndexedDataset(self.instances))
+        next(batches)
+        workers = set(multiprocessing.active_children()) - existing_processes
+        assert len(workers) == 2
+        generator.close()
+        assert not any(worker.is_alive() for worker in workers)
+        # The generator is still around (as it is after Keras is done with it), but closing the
+        # data generator again is fine.
+        generator.close()
+        del batches
+
+    def test_generator_records_data_wait_statistics(self):
+        params = {'padding_noise': 0.0, 'dynamic_padding': True, 'prefetch_batches': 2}
+        _, generator = self.get_epochs_of_batches(params, 2)
+        metrics = generator.last_wait_statistics.get_metrics()
+        assert metrics['num_batches'] == 8
+        assert generator.last_wait_statistics.num_epochs == 2
+        assert metrics['data_wait_seconds'] >= 0.0
+        assert 0.0 <= metrics['data_wait_fraction'] <= 1.0
+        # Two epochs over all ten instances, whose lengths add up to 40 + 22 + 22 tokens.
+        assert metrics['num_instances'] == 20
+        assert metrics['num_tokens'] == 2 * 84
+        assert 0.0 < metrics['padding_fraction'] < 1.0
+
     def test_maximum_batch_size_is_actually_a_maximum(self):
         params = Params({
                 'padding_noise': 0.0,
@@ -125,6 +207,18 @@ class TestDataGenerator(DeepQaTestCase):
         assert self.as_list(one_epoch_arrays[5][0]) == [7]
         assert self.as_list(one_epoch_arrays[6][0]) == [8, 9]
 
+    def test_scoring_batches_are_sorted_and_cover_the_dataset_once(self):
+        params = {'padding_noise': 0.5, 'dynamic_padding': True}
+        generator = DataGenerator(self.text_trainer, Params(dict(params)))
+        batches = list(generator.create_scoring_batches(IndexedDataset(self.instances)))
+        assert generator.last_num_batches == 4
+        assert [indices for indices, _ in batches] == [[8, 9, 5], [6, 7, 2], [1, 0, 4], [3]]
+        for indices, (inputs, _) in batches:
+            assert self.as_list(inputs) == indices
+        prefetching = DataGenerator(self.text_trainer, Params(dict(params, prefetch_batches=3)))
+        prefetched = list(prefetching.create_scoring_batches(IndexedDataset(self.instances)))
+        assert [indices for indices, _ in prefetched] == [indices for indices, _ in batches]
+
     def as_list(self, array):
         return list(numpy.squeeze(array, axis=-1))
 
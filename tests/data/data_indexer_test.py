@@ -1,5 +1,11 @@
 # pylint: disable=no-self-use,invalid-name
 import codecs
+import json
+import pickle
+
+import pytest
+
+from deep_qa.common.checks import ConfigurationError
 
 from deep_qa.data.data_indexer import DataIndexer
 from deep_qa.data.dataset import TextDataset
@@ -22,6 +28,27 @@ class TestDataIndexer(DeepQaTestCase):
         assert 'b' in data_indexer.words_in_index()
         assert 'c' in data_indexer.words_in_index()
 
+    def test_fit_word_dictionary_respects_max_vocab_size(self):
+        instance = TextClassificationInstance("a a a b b c c c d", True)
+        dataset = TextDataset([instance])
+        data_indexer = DataIndexer()
+        data_indexer.fit_word_dictionary(dataset, max_vocab_size=2)
+        assert list(data_indexer.words_in_index()) == ['@@PADDING@@', '@@UNKOWN@@', 'a', 'c']
+
+        data_indexer = DataIndexer()
+        data_indexer.fit_word_dictionary(dataset, max_vocab_size={'characters': 1})
+        assert len(data_indexer.words_in_index()) == 6
+
+    def test_fit_word_dictionary_with_workers_gives_same_indices(self):
+        instances = [TextClassificationInstance("sentence %d has words %d" % (i, i % 7), True)
+                     for i in range(40)]
+        dataset = TextDataset(instances)
+        serial_indexer = DataIndexer()
+        serial_indexer.fit_word_dictionary(dataset, min_count=2)
+        parallel_indexer = DataIndexer()
+        parallel_indexer.fit_word_dictionary(dataset, min_count=2, num_workers=2)
+        assert serial_indexer.word_indices == parallel_indexer.word_indices
+
     def test_add_word_to_index_gives_consistent_results(self):
         data_indexer = DataIndexer()
         initial_vocab_size = data_indexer.get_vocab_size()
@@ -98,3 +125,102 @@ class TestDataIndexer(DeepQaTestCase):
         assert data_indexer.get_word_from_index(4) == "a"
         assert data_indexer.get_word_from_index(5) == "word"
         assert data_indexer.get_word_from_index(6) == "another"
+
+    def test_get_fingerprint_changes_with_vocabulary(self):
+        data_indexer = DataIndexer()
+        fingerprint = data_indexer.get_fingerprint()
+        assert fingerprint == DataIndexer().get_fingerprint()
+        data_indexer.add_word_to_index("word")
+        assert data_indexer.get_fingerprint() != fingerprint
+
+    def test_get_word_indices_matches_get_word_index(self):
+        data_indexer = DataIndexer()
+        data_indexer.add_word_to_index("a")
+        data_indexer.add_word_to_index("b")
+        data_indexer.add_word_to_index("c", namespace='characters')
+        # pylint: disable=protected-access
+        words = ["b", "unseen", "a", data_indexer._oov_token, data_indexer._padding_token]
+        for namespace in ['words', 'characters']:
+            expected = [data_indexer.get_word_index(word, namespace) for word in words]
+            assert data_indexer.get_word_indices(words, namespace) == expected
+        assert data_indexer.get_word_indices("cab", namespace='characters') == [2, 1, 1]
+
+    def test_save_and_load_round_trip(self):
+        # pylint: disable=protected-access
+        vocab_filename = self.TEST_DIR + 'vocab_file'
+        with codecs.open(vocab_filename, 'w', 'utf-8') as vocab_file:
+            vocab_file.write('<UNK>\na\nword\n')
+        data_indexer = DataIndexer()
+        data_indexer.set_from_file(vocab_filename, oov_token="<UNK>")
+        data_indexer.add_word_to_index("\u00e9t\u00e9", namespace='words')
+        data_indexer.add_word_to_index("line\nbreak", namespace='characters')
+        data_indexer.finalize()
+        data_indexer.save(self.TEST_DIR + 'data_indexer.vocab')
+        loaded = DataIndexer.load(self.TEST_DIR + 'data_indexer.vocab')
+        # We only build the word-to-index dictionaries when we need them.
+        assert loaded.get_vocab_size() == 5
+        assert loaded._unindexed_namespaces == {'words', 'characters'}
+        assert loaded.get_fingerprint() == data_indexer.get_fingerprint()
+        assert loaded.word_indices == data_indexer.word_indices
+        assert loaded.reverse_word_indices == data_indexer.reverse_word_indices
+        assert loaded._oov_token == "<UNK>"
+        assert loaded.get_word_indices(["word", "unseen", "\u00e9t\u00e9"]) == [3, 1, 4]
+        assert loaded.get_word_from_index(2, namespace='characters') == "line\nbreak"
+        # Namespaces we haven't seen still get the padding and OOV tokens.
+        assert loaded.get_word_index("x", namespace='tags') == 1
+
+    def test_load_checks_the_format_version(self):
+        filename = self.TEST_DIR + 'data_indexer.vocab'
+        DataIndexer().save(filename)
+        with open(filename, 'rb') as saved_file:
+            header = json.loads(saved_file.readline().decode('utf-8'))
+            rest = saved_file.read()
+        header['version'] += 1
+        with open(filename, 'wb') as saved_file:
+            saved_file.write(json.dumps(header).encode('utf-8') + b'\n' + rest)
+        with pytest.raises(ConfigurationError):
+            DataIndexer.load(filename)
+
+    def test_unpickling_converts_old_reverse_indices(self):
+        data_indexer = DataIndexer()
+        data_indexer.add_word_to_index("word")
+        state = data_indexer.__getstate__()
+        state['reverse_word_indices'] = {'words': {0: "@@PADDING@@", 1: "@@UNKOWN@@", 2: "word"}}
+        old_indexer = DataIndexer.__new__(DataIndexer)
+        old_indexer.__setstate__(state)
+        assert old_indexer.reverse_word_indices == data_indexer.reverse_word_indices
+        unpickled = pickle.loads(pickle.dumps(data_indexer))
+        assert unpickled.get_word_from_index(2) == "word"
+        assert unpickled.add_word_to_index("other") == 3
+
+    def test_hashed_namespaces_map_unknown_words_to_buckets(self):
+        data_indexer = DataIndexer()
+        data_indexer.set_hashing('words', num_buckets=10, num_exact_words=2)
+        dataset = TextDataset([TextClassificationInstance("a a a b b c d", True)])
+        assert data_indexer.needs_fitting(['words'])
+        data_indexer.fit_word_dictionary(dataset)
+        assert data_indexer.get_vocab_size() == 14
+        assert data_indexer.get_word_indices(["a", "b"]) == [2, 3]
+        bucket = data_indexer.get_word_index("c")
+        assert 4 <= bucket < 14
+        assert data_indexer.get_word_indices(["c", "d"]) == [bucket, data_indexer.get_word_index("d")]
+        assert data_indexer.get_word_from_index(bucket) == "@@HASH_BUCKET_%d@@" % (bucket - 4)
+        # The exact words are full, so new words stay hashed.
+        assert data_indexer.add_word_to_index("e") == data_indexer.get_word_index("e")
+        data_indexer.save(self.TEST_DIR + 'data_indexer.vocab')
+        loaded = DataIndexer.load(self.TEST_DIR + 'data_indexer.vocab')
+        assert loaded.get_word_indices(["a", "b", "c"]) == [2, 3, bucket]
+        assert loaded.get_fingerprint() == data_indexer.get_fingerprint()
+        assert pickle.loads(pickle.dumps(data_indexer)).get_word_index("c") == bucket
+
+    def test_hashed_namespaces_without_exact_words_need_no_fitting(self):
+        data_indexer = DataIndexer()
+        data_indexer.set_hashing('words', num_buckets=5)
+        assert not data_indexer.needs_fitting(['words'])
+        assert data_indexer.needs_fitting(['words', 'characters'])
+        assert data_indexer.get_vocab_size() == 7
+        assert data_indexer.get_word_index("anything") in range(2, 7)
+        assert data_indexer.get_word_index("@@PADDING@@") == 0
+        data_indexer.add_word_to_index("word", namespace='characters')
+        with pytest.raises(ConfigurationError):
+            data_indexer.set_hashing('characters', num_buckets=5)
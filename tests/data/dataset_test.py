@@ -1,7 +1,24 @@
 # pylint: disable=no-self-use,invalid-name
-from deep_qa.data.dataset import Dataset, TextDataset
+import bz2
+import gzip
+import lzma
+
+from unittest import mock
+
+import numpy
+from numpy.testing import assert_array_equal
+import pytest
+
+from deep_qa.common.params import Params
+from deep_qa.data.data_indexer import DataIndexer
+from deep_qa.data.dataset import CompactIndexedDataset, Dataset, IndexedDataset, TextDataset
+from deep_qa.data.instances.multiple_choice_qa import IndexedQuestionAnswerInstance
+from deep_qa.data.instances.text_classification.text_classification_instance import IndexedTextClassificationInstance
 from deep_qa.data.instances.text_classification.text_classification_instance import TextClassificationInstance
-from ..common.test_case import DeepQaTestCase
+from deep_qa.data.instances.instance import TextInstance
+from deep_qa.data.instances.wrappers import IndexedBackgroundInstance
+from deep_qa.data.tokenizers.word_tokenizer import WordTokenizer
+from ..common.test_case import DeepQaTestCase, ParallelSimpleWordSplitter
 
 
 class TestDataset:
@@ -15,6 +32,84 @@ class TestDataset:
 
 
 class TestTextDataset(DeepQaTestCase):
+    def test_to_indexed_dataset_with_workers_matches_serial_indexing(self):
+        instances = [TextClassificationInstance("sentence %d with some words" % i, i % 2 == 0, i)
+                     for i in range(50)]
+        dataset = TextDataset(instances)
+        data_indexer = DataIndexer()
+        data_indexer.fit_word_dictionary(TextDataset(instances[:25]))
+        serial_dataset = dataset.to_indexed_dataset(data_indexer)
+        parallel_dataset = dataset.to_indexed_dataset(data_indexer, num_workers=2)
+        assert len(parallel_dataset.instances) == len(serial_dataset.instances)
+        for parallel, serial in zip(parallel_dataset.instances, serial_dataset.instances):
+            assert parallel.__dict__ == serial.__dict__
+
+    def test_to_indexed_dataset_can_compact_while_indexing(self):
+        instances = [TextClassificationInstance("sentence %d with some words" % i, i % 2 == 0, i)
+                     for i in range(50)]
+        dataset = TextDataset(instances)
+        data_indexer = DataIndexer()
+        data_indexer.fit_word_dictionary(TextDataset(instances[:25]))
+        expected_dataset = dataset.to_indexed_dataset(data_indexer)
+        # Small chunks, so we compact several times while indexing serially.
+        with mock.patch('deep_qa.data.dataset.TOKENIZATION_CHUNK_SIZE', 7):
+            serial_dataset = dataset.to_indexed_dataset(data_indexer, compact=True)
+        parallel_dataset = dataset.to_indexed_dataset(data_indexer, num_workers=2, compact=True)
+        for compact_dataset in [serial_dataset, parallel_dataset]:
+            assert isinstance(compact_dataset, CompactIndexedDataset)
+            assert len(compact_dataset.instances) == len(expected_dataset.instances)
+            for compact, expected in zip(compact_dataset.instances, expected_dataset.instances):
+                assert compact.__dict__ == expected.__dict__
+            assert compact_dataset.padding_lengths() == expected_dataset.padding_lengths()
+
+    def test_to_indexed_dataset_with_workers_and_a_parallel_word_splitter(self):
+        instances = [TextClassificationInstance("sentence %d with some words" % i, i % 2 == 0, i)
+                     for i in range(50)]
+        dataset = TextDataset(instances)
+        serial_data_indexer = DataIndexer()
+        serial_data_indexer.fit_word_dictionary(dataset)
+        serial_dataset = dataset.to_indexed_dataset(serial_data_indexer)
+
+        tokenizer = WordTokenizer(Params({}))
+        word_splitter = ParallelSimpleWordSplitter(num_processes=2)
+        tokenizer.word_processor.word_splitter = word_splitter
+        original_tokenizer = TextInstance.tokenizer
+        TextInstance.tokenizer = tokenizer
+        # We make the splitter's pool worth using for small batches, and start it here, so the
+        # indexing workers get a splitter that has a pool, and has to split serially anyway,
+        # because the workers are daemonic.
+        with mock.patch('deep_qa.data.tokenizers.word_splitter._MIN_SENTENCES_PER_PROCESS', 1):
+            try:
+                word_splitter.split_words_batch(["some words", "more words"])
+                assert len(word_splitter.pools) == 1
+                data_indexer = DataIndexer()
+                data_indexer.fit_word_dictionary(dataset, num_workers=2)
+                parallel_dataset = dataset.to_indexed_dataset(data_indexer, num_workers=2)
+            finally:
+                TextInstance.tokenizer = original_tokenizer
+                word_splitter.close()
+        assert data_indexer.word_indices == serial_data_indexer.word_indices
+        for parallel, serial in zip(parallel_dataset.instances, serial_dataset.instances):
+            assert parallel.__dict__ == serial.__dict__
+
+    def test_to_indexed_dataset_with_workers_handles_repeated_vocabulary_lines(self):
+        vocab_file = self.TEST_DIR + 'vocab'
+        with open(vocab_file, 'w') as vocab:
+            vocab.write("@@UNKNOWN@@\nsentence\nwith\nsome\nsome\nwords\n")
+        instances = [TextClassificationInstance("sentence %d with some words" % i, i % 2 == 0, i)
+                     for i in range(20)]
+        dataset = TextDataset(instances)
+        serial_data_indexer = DataIndexer()
+        serial_data_indexer.set_from_file(vocab_file)
+        serial_dataset = dataset.to_indexed_dataset(serial_data_indexer)
+        parallel_data_indexer = DataIndexer()
+        parallel_data_indexer.set_from_file(vocab_file)
+        parallel_dataset = dataset.to_indexed_dataset(parallel_data_indexer, num_workers=2)
+        assert parallel_data_indexer.reverse_word_indices == serial_data_indexer.reverse_word_indices
+        assert parallel_data_indexer.word_indices == serial_data_indexer.word_indices
+        for parallel, serial in zip(parallel_dataset.instances, serial_dataset.instances):
+            assert parallel.__dict__ == serial.__dict__
+
     def test_read_from_file_with_no_default_label(self):
         filename = self.TEST_DIR + 'test_dataset_file'
         with open(filename, 'w') as datafile:
@@ -35,3 +130,140 @@ class TestTextDataset(DeepQaTestCase):
         assert instance.index == 3
         assert instance.text == "instance3"
         assert instance.label is None
+
+    def test_read_from_file_stops_at_max_instances(self):
+        filename = self.TEST_DIR + 'test_dataset_file'
+        with open(filename, 'w') as datafile:
+            datafile.write("1\tinstance1\t0\n")
+            datafile.write("2\tinstance2\t1\n")
+            datafile.write("3\tinstance3\n")
+        dataset = TextDataset.read_from_file(filename, TextClassificationInstance, max_instances=2)
+        assert [instance.index for instance in dataset.instances] == [1, 2]
+
+    def test_read_from_file_handles_compressed_files(self):
+        lines = "1\tinstance1\t0\n2\tinstance2\t1\n".encode('utf-8')
+        for extension, opener in [('.gz', gzip.open), ('.bz2', bz2.open), ('.xz', lzma.open)]:
+            filename = self.TEST_DIR + 'test_dataset_file' + extension
+            with opener(filename, 'wb') as datafile:
+                datafile.write(lines)
+            dataset = TextDataset.read_from_file(filename, TextClassificationInstance)
+            assert [instance.text for instance in dataset.instances] == ["instance1", "instance2"]
+            assert [instance.label for instance in dataset.instances] == [False, True]
+
+
+class TestIndexedDataset:
+    def test_padding_length_matrix_covers_the_union_of_keys(self):
+        instances = [IndexedTextClassificationInstance([1, 2, 3], True),
+                     IndexedQuestionAnswerInstance([1, 2], [[2, 3], [4], [5, 6, 7]], 1)]
+        keys, matrix = IndexedDataset(instances).get_padding_length_matrix()
+        assert keys == ['num_sentence_words', 'answer_length', 'num_options']
+        assert_array_equal(matrix, [[3, 0, 0], [2, 3, 3]])
+
+    def test_sort_by_padding_keeps_the_matrix_in_sync(self):
+        instances = [IndexedTextClassificationInstance([1, 2, 3], True),
+                     IndexedTextClassificationInstance([1], False),
+                     IndexedTextClassificationInstance([1, 2], True)]
+        dataset = IndexedDataset(instances)
+        dataset.sort_by_padding(['num_sentence_words'])
+        assert [len(instance.word_indices) for instance in dataset.instances] == [1, 2, 3]
+        assert_array_equal(dataset.get_padding_length_matrix()[1], [[1], [2], [3]])
+        assert dataset.select([0, 1]).padding_lengths() == {'num_sentence_words': 2}
+
+    def test_pad_instances_resets_the_matrix(self):
+        dataset = IndexedDataset([IndexedTextClassificationInstance([1, 2, 3], True),
+                                  IndexedTextClassificationInstance([1], False)])
+        assert dataset.padding_lengths() == {'num_sentence_words': 3}
+        dataset.pad_instances({'num_sentence_words': 5})
+        assert dataset.instance_padding_lengths() == [{'num_sentence_words': 5}] * 2
+
+
+class TestCompactIndexedDataset:
+    @staticmethod
+    def get_instances():
+        return [IndexedTextClassificationInstance([[1, 2], [3], []], True, 0),
+                IndexedTextClassificationInstance([[4, 5, 6]], False, 1),
+                IndexedTextClassificationInstance([[7], [8], [9], [10]], True, 2),
+                IndexedTextClassificationInstance([[11, 12], [13, 14]], False, 3)]
+
+    def test_instances_are_rebuilt_from_arrays(self):
+        instances = self.get_instances()
+        dataset = CompactIndexedDataset(instances)
+        assert len(dataset.instances) == 4
+        for compact, original in zip(dataset.instances, instances):
+            assert compact.__dict__ == original.__dict__
+        assert dataset.instances[1:3][1].word_indices == [[7], [8], [9], [10]]
+
+    def test_from_chunks_matches_compacting_all_instances_at_once(self):
+        instances = self.get_instances()
+        dataset = CompactIndexedDataset(instances)
+        chunked_dataset = CompactIndexedDataset.from_chunks([instances[:1], [], instances[1:3], instances[3:]])
+        for chunked, original in zip(chunked_dataset.instances, instances):
+            assert chunked.__dict__ == original.__dict__
+        assert chunked_dataset.instance_padding_lengths() == dataset.instance_padding_lengths()
+        # pylint: disable=protected-access
+        assert chunked_dataset._arrays.keys() == dataset._arrays.keys()
+        for depth, arrays in dataset._arrays.items():
+            assert_array_equal(chunked_dataset._arrays[depth].values, arrays.values)
+            for chunked_offsets, offsets in zip(chunked_dataset._arrays[depth].offsets, arrays.offsets):
+                assert_array_equal(chunked_offsets, offsets)
+
+    def test_rebuilt_instances_are_independent(self):
+        dataset = CompactIndexedDataset(self.get_instances())
+        instance = dataset.instances[0]
+        instance.pad({'num_sentence_words': 5, 'num_word_characters': 1})
+        assert dataset.instances[0].word_indices == [[1, 2], [3], []]
+
+    def test_handles_nested_instances(self):
+        background = [IndexedTextClassificationInstance([2, 3, 4], None),
+                      IndexedTextClassificationInstance([4, 5], None)]
+        instances = [IndexedBackgroundInstance(IndexedTextClassificationInstance([1, 2], True), background),
+                     IndexedQuestionAnswerInstance([1, 2], [[2, 3], [4], [5, 6, 7]], 1, 3)]
+        dataset = CompactIndexedDataset(instances)
+        assert dataset.instances[0].indexed_instance.word_indices == [1, 2]
+        assert [instance.word_indices for instance in dataset.instances[0].background_instances] == \
+                [[2, 3, 4], [4, 5]]
+        assert dataset.instances[1].__dict__ == instances[1].__dict__
+
+    def test_padding_lengths_and_sorting_match_indexed_dataset(self):
+        compact_dataset = CompactIndexedDataset(self.get_instances())
+        indexed_dataset = IndexedDataset(self.get_instances())
+        assert compact_dataset.padding_lengths() == indexed_dataset.padding_lengths()
+        assert compact_dataset.instance_padding_lengths() == indexed_dataset.instance_padding_lengths()
+        compact_dataset.sort_by_padding(['num_sentence_words', 'num_word_characters'])
+        indexed_dataset.sort_by_padding(['num_sentence_words', 'num_word_characters'])
+        assert [instance.index for instance in compact_dataset.instances] == [1, 3, 0, 2]
+        assert [instance.index for instance in indexed_dataset.instances] == [1, 3, 0, 2]
+
+    def test_select_and_as_padded_training_data_match_indexed_dataset(self):
+        compact_dataset = CompactIndexedDataset(self.get_instances())
+        indexed_dataset = IndexedDataset(self.get_instances())
+        compact_batch = compact_dataset.select([2, 0])
+        indexed_batch = indexed_dataset.select([2, 0])
+        assert compact_batch.__class__ == IndexedDataset
+        compact_inputs, compact_labels = compact_batch.as_padded_training_data()
+        indexed_inputs, indexed_labels = indexed_batch.as_padded_training_data()
+        assert_array_equal(compact_inputs, indexed_inputs)
+        assert_array_equal(compact_labels, indexed_labels)
+
+    def test_get_padding_sort_order_does_not_modify_dataset(self):
+        compact_dataset = CompactIndexedDataset(self.get_instances())
+        indexed_dataset = IndexedDataset(self.get_instances())
+        sorting_keys = ['num_sentence_words', 'num_word_characters']
+        assert compact_dataset.get_padding_sort_order(sorting_keys) == [1, 3, 0, 2]
+        assert indexed_dataset.get_padding_sort_order(sorting_keys) == [1, 3, 0, 2]
+        assert [instance.index for instance in compact_dataset.instances] == [0, 1, 2, 3]
+        assert [instance.index for instance in indexed_dataset.instances] == [0, 1, 2, 3]
+
+    def test_truncate_and_merge(self):
+        dataset = CompactIndexedDataset(self.get_instances())
+        truncated = dataset.truncate(2)
+        assert [instance.index for instance in truncated.instances] == [0, 1]
+        assert truncated.padding_lengths() == {'num_sentence_words': 3, 'num_word_characters': 3}
+        merged = truncated.merge(dataset)
+        assert [instance.index for instance in merged.instances] == [0, 1, 0, 1, 2, 3]
+
+    def test_pad_instances_raises(self):
+        dataset = CompactIndexedDataset(self.get_instances())
+        with pytest.raises(RuntimeError):
+            dataset.pad_instances()
+        assert numpy.asarray(dataset.as_padded_training_data()[0]).shape == (4, 4, 3)
@@ -0,0 +1,51 @@
+# pylint: disable=no-self-use,invalid-name
+import gzip
+import os
+
+import numpy
+import pytest
+
+from deep_qa.common.checks import ConfigurationError
+from deep_qa.data.embedding_store import EmbeddingStore
+from ..common.test_case import DeepQaTestCase
+
+
+class TestEmbeddingStore(DeepQaTestCase):
+    def write_embeddings(self, lines):
+        embeddings_filename = self.TEST_DIR + "embeddings.gz"
+        with gzip.open(embeddings_filename, 'wb') as embeddings_file:
+            for line in lines:
+                embeddings_file.write((line + "\n").encode('utf-8'))
+        return embeddings_filename
+
+    def test_convert_and_look_up_vectors(self):
+        embeddings_filename = self.write_embeddings(["word 1.0 2.3 -1.0",
+                                                     "été 0.1 0.4 -4.0",
+                                                     "bad 0.1 0.4",
+                                                     "word 5.0 5.0 5.0",
+                                                     "other 0.0 3.5 0.5"])
+        store = EmbeddingStore.convert(embeddings_filename, self.TEST_DIR + "store")
+        assert len(store) == 4
+        assert store.embedding_dim == 3
+        assert store.vector_min == -4.0
+        assert store.vector_max == 5.0
+        assert store.get_rows(["other", "missing", "word", "été"]).tolist() == [3, -1, 0, 1]
+        assert store.get_word(3) == "other"
+        vectors, found = store.get_vectors(["été", "missing"])
+        assert found.tolist() == [True, False]
+        assert numpy.allclose(vectors, [[0.1, 0.4, -4.0], [0.0, 0.0, 0.0]])
+        assert isinstance(EmbeddingStore(self.TEST_DIR + "store").vectors, numpy.memmap)
+
+    def test_convert_crashes_on_a_header(self):
+        embeddings_filename = self.write_embeddings(["dimensionality 3", "word 1.0 2.3 -1.0"])
+        with pytest.raises(ConfigurationError):
+            EmbeddingStore.convert(embeddings_filename, self.TEST_DIR + "store")
+
+    def test_from_file_reconverts_changed_files(self):
+        embeddings_filename = self.write_embeddings(["word 1.0 2.3 -1.0"])
+        store = EmbeddingStore.from_file(embeddings_filename)
+        assert store.directory == embeddings_filename + ".store"
+        assert os.path.exists(os.path.join(store.directory, 'vectors.npy'))
+        assert EmbeddingStore.from_file(store.directory).embedding_dim == 3
+        self.write_embeddings(["word 1.0 2.3 -1.0 3.1"])
+        assert EmbeddingStore.from_file(embeddings_filename).embedding_dim == 4
@@ -0,0 +1,101 @@
+# pylint: disable=no-self-use,invalid-name
+import codecs
+from unittest import mock
+
+import numpy
+
+from deep_qa.common.params import Params
+from deep_qa.data.dataset import CompactIndexedDataset, IndexedDataset, TextDataset
+from deep_qa.data.indexed_dataset_cache import IndexedDatasetCache
+# pylint: disable=line-too-long
+from deep_qa.data.instances.text_classification.text_classification_instance import IndexedTextClassificationInstance
+# pylint: enable=line-too-long
+from deep_qa.data.instances.multiple_choice_qa.question_answer_instance import IndexedQuestionAnswerInstance
+from deep_qa.data.instances.wrappers.background_instance import IndexedBackgroundInstance
+from deep_qa.models.text_classification import ClassificationModel
+from ..common.test_case import DeepQaTestCase
+
+
+class TestIndexedDatasetCache(DeepQaTestCase):
+    def setUp(self):
+        super(TestIndexedDatasetCache, self).setUp()
+        self.cache = IndexedDatasetCache(self.TEST_DIR + 'cache')
+        self.data_file = self.TEST_DIR + 'cache_data_file'
+        with codecs.open(self.data_file, 'w', 'utf-8') as data_file:
+            data_file.write("1\tinstance1\t0\n")
+
+    def test_get_key_depends_on_file_contents_and_key_fields(self):
+        key = IndexedDatasetCache.get_key([self.data_file], {'tokenizer': {'type': 'words'}})
+        assert key == IndexedDatasetCache.get_key([self.data_file], {'tokenizer': {'type': 'words'}})
+        assert key != IndexedDatasetCache.get_key([self.data_file], {'tokenizer': {'type': 'characters'}})
+        with codecs.open(self.data_file, 'a', 'utf-8') as data_file:
+            data_file.write("2\tinstance2\t1\n")
+        assert key != IndexedDatasetCache.get_key([self.data_file], {'tokenizer': {'type': 'words'}})
+
+    def test_load_returns_none_on_a_miss(self):
+        assert self.cache.load('missing key') is None
+
+    def test_save_and_load_round_trips_instances(self):
+        instances = [IndexedTextClassificationInstance([1, 2, 3], True, 0),
+                     IndexedTextClassificationInstance([[1, 2], [3], []], False, 1),
+                     IndexedTextClassificationInstance([4], None, 2),
+                     IndexedQuestionAnswerInstance([1, 2], [[2, 3], [4], [5, 6, 7]], 1, 3)]
+        self.cache.save('key', IndexedDataset(instances), {'some': 'state'})
+        loaded_dataset, state = self.cache.load('key')
+        assert state == {'some': 'state'}
+        assert len(loaded_dataset.instances) == 4
+        for loaded, original in zip(loaded_dataset.instances, instances):
+            assert loaded.__class__ == original.__class__
+            assert loaded.__dict__ == original.__dict__
+
+    def test_load_can_return_a_compact_dataset(self):
+        instances = [IndexedTextClassificationInstance([[1, 2], [3]], True, 0),
+                     IndexedTextClassificationInstance([[4]], False, 1)]
+        self.cache.save('key', IndexedDataset(instances))
+        loaded_dataset, _ = self.cache.load('key', compact=True)
+        assert isinstance(loaded_dataset, CompactIndexedDataset)
+        assert loaded_dataset.padding_lengths() == {'num_sentence_words': 2, 'num_word_characters': 2}
+        for loaded, original in zip(loaded_dataset.instances, instances):
+            assert loaded.__dict__ == original.__dict__
+
+    def test_save_stores_indices_in_flat_arrays(self):
+        instances = [IndexedTextClassificationInstance([1, 2, 3], True),
+                     IndexedTextClassificationInstance([4, 5], False)]
+        self.cache.save('key', IndexedDataset(instances))
+        values = numpy.load(self.TEST_DIR + 'cache/key/depth_1_values.npy')
+        offsets = numpy.load(self.TEST_DIR + 'cache/key/depth_1_offsets_0.npy')
+        assert values.dtype == numpy.int32
+        assert values.tolist() == [1, 2, 3, 4, 5]
+        assert offsets.tolist() == [0, 3, 5]
+
+    def test_save_and_load_handles_background_instances(self):
+        background_instances = [IndexedTextClassificationInstance([2, 3, 4], None),
+                                IndexedTextClassificationInstance([4, 5], None)]
+        instance = IndexedBackgroundInstance(IndexedTextClassificationInstance([1, 2], True),
+                                             background_instances)
+        self.cache.save('key', IndexedDataset([instance]))
+        IndexedBackgroundInstance.contained_instance_type = None
+        IndexedBackgroundInstance.background_instance_type = None
+        loaded_dataset, _ = self.cache.load('key')
+        loaded = loaded_dataset.instances[0]
+        assert loaded.indexed_instance.word_indices == [1, 2]
+        assert [background.word_indices for background in loaded.background_instances] == [[2, 3, 4], [4, 5]]
+        assert IndexedBackgroundInstance.contained_instance_type == IndexedTextClassificationInstance
+        assert IndexedBackgroundInstance.background_instance_type == IndexedTextClassificationInstance
+
+    def test_trainer_reuses_cached_datasets(self):
+        self.write_true_false_model_files()
+        args = Params({'indexed_dataset_cache_dir': self.TEST_DIR + 'trainer_cache'})
+        model = self.get_model(ClassificationModel, args)
+        dataset = model.load_dataset_from_files(model.train_files)
+        model.set_model_state_from_dataset(dataset)
+        _, arrays = model.load_data_arrays(model.validation_files)
+
+        args = Params({'indexed_dataset_cache_dir': self.TEST_DIR + 'trainer_cache'})
+        model = self.get_model(ClassificationModel, args)
+        model.set_model_state_from_dataset(dataset)
+        with mock.patch.object(TextDataset, 'to_indexed_dataset') as to_indexed_dataset:
+            _, cached_arrays = model.load_data_arrays(model.validation_files)
+            assert not to_indexed_dataset.called
+        numpy.testing.assert_array_equal(arrays[0], cached_arrays[0])
+        numpy.testing.assert_array_equal(arrays[1], cached_arrays[1])
@@ -0,0 +1,303 @@
+# pylint: disable=no-self-use,invalid-name
+from copy import deepcopy
+
+import numpy
+from numpy.testing import assert_array_equal
+
+from deep_qa.data.dataset import IndexedDataset
+from deep_qa.data.instances.collation import ArrayField, OneHotField, RaggedField, collate_instances
+from deep_qa.data.instances.entailment import IndexedSentencePairInstance
+from deep_qa.data.instances.language_modeling import IndexedSentenceInstance
+from deep_qa.data.instances.multiple_choice_qa import IndexedBabiInstance
+from deep_qa.data.instances.multiple_choice_qa import IndexedMultipleTrueFalseInstance
+from deep_qa.data.instances.multiple_choice_qa import IndexedQuestionAnswerInstance
+from deep_qa.data.instances.multiple_choice_qa import IndexedTupleInferenceInstance
+from deep_qa.data.instances.multiple_choice_qa.graph_align_instance import IndexedGraphAlignInstance
+from deep_qa.data.instances.reading_comprehension import IndexedCharacterSpanInstance
+from deep_qa.data.instances.reading_comprehension import IndexedMcQuestionPassageInstance
+from deep_qa.data.instances.reading_comprehension import IndexedQuestionPassageInstance
+from deep_qa.data.instances.sentence_selection import IndexedSentenceSelectionInstance
+from deep_qa.data.instances.sequence_tagging import IndexedTaggingInstance
+from deep_qa.data.instances.sequence_tagging.verb_semantics_instance import IndexedVerbSemanticsInstance
+from deep_qa.data.instances.text_classification import IndexedLogicalFormInstance
+from deep_qa.data.instances.text_classification import IndexedTextClassificationInstance
+from deep_qa.data.instances.text_classification import IndexedTupleInstance
+from deep_qa.data.instances.wrappers import IndexedBackgroundInstance
+from deep_qa.data.instances.instance import IndexedInstance
+
+
+class TestRaggedField:
+    def test_collate_pads_and_truncates_like_pad_sequence_to_length(self):
+        fields = [RaggedField([1, 2, 3, 4], ['num_words'], truncate_from_right=True),
+                  RaggedField([5], ['num_words'], truncate_from_right=True)]
+        array = RaggedField.collate(fields, {'num_words': 3})
+        assert_array_equal(array, [[2, 3, 4], [0, 0, 5]])
+        fields = [RaggedField([1, 2, 3, 4], ['num_words'], truncate_from_right=False),
+                  RaggedField([5], ['num_words'], truncate_from_right=False)]
+        array = RaggedField.collate(fields, {'num_words': 3})
+        assert_array_equal(array, [[1, 2, 3], [5, 0, 0]])
+
+    def test_collate_handles_word_characters(self):
+        fields = [RaggedField([[1, 2, 3], [4]], ['num_words'], word_sequence=True),
+                  RaggedField([[5, 6]], ['num_words'], word_sequence=True)]
+        array = RaggedField.collate(fields, {'num_words': 2, 'num_word_characters': 2})
+        assert array.shape == (2, 2, 2)
+        assert_array_equal(array, [[[1, 2], [4, 0]], [[0, 0], [5, 6]]])
+
+    def test_stack_adds_a_padded_dimension(self):
+        options = [RaggedField([1, 2], ['num_option_words'], truncate_from_right=False),
+                   RaggedField([3], ['num_option_words'], truncate_from_right=False)]
+        field = RaggedField.stack(options, 'num_options', truncate_from_right=False)
+        array = RaggedField.collate([field], {'num_options': 3, 'num_option_words': 2})
+        assert_array_equal(array, [[[1, 2], [3, 0], [0, 0]]])
+
+    def test_collate_uses_padding_value(self):
+        fields = [RaggedField([7], ['num_words'], truncate_from_right=False, padding_value=2)]
+        array = RaggedField.collate(fields, {'num_words': 3})
+        assert_array_equal(array, [[7, 2, 2]])
+
+
+class TestOtherFields:
+    def test_one_hot_field_uses_padding_lengths(self):
+        array = OneHotField.collate([OneHotField([1], 'num_options'), OneHotField([0], 'num_options')],
+                                    {'num_options': 3})
+        assert_array_equal(array, [[0, 1, 0], [1, 0, 0]])
+
+    def test_array_field_stacks_values(self):
+        array = ArrayField.collate([ArrayField([1, 2]), ArrayField([3, 4])], {})
+        assert_array_equal(array, [[1, 2], [3, 4]])
+
+
+class TestCollateInstances:
+    @staticmethod
+    def pad_and_stack(instances, padding_lengths):
+        instances = deepcopy(instances)
+        dataset = IndexedDataset(instances)
+        dataset.pad_instances(padding_lengths)
+        return dataset.as_training_data()
+
+    @staticmethod
+    def assert_same_arrays(expected, actual):
+        if isinstance(expected, list):
+            assert len(expected) == len(actual)
+            for expected_array, actual_array in zip(expected, actual):
+                assert_array_equal(expected_array, actual_array)
+        else:
+            assert_array_equal(expected, actual)
+
+    def check_matches_padding(self, instances, padding_lengths):
+        original = deepcopy(instances)
+        expected_inputs, expected_labels = self.pad_and_stack(instances, padding_lengths)
+        inputs, labels = collate_instances(instances, padding_lengths)
+        self.assert_same_arrays(expected_inputs, inputs)
+        self.assert_same_arrays(expected_labels, labels)
+        for instance, original_instance in zip(instances, original):
+            self.assert_same_instance(original_instance, instance)
+
+    def assert_same_instance(self, expected, actual):
+        # Wrapper instances hold other instances, which only compare equal by identity.
+        if isinstance(expected, IndexedInstance):
+            assert type(expected) == type(actual)  # pylint: disable=unidiomatic-typecheck
+            self.assert_same_instance(expected.__dict__, actual.__dict__)
+        elif isinstance(expected, dict):
+            assert expected.keys() == actual.keys()
+            for key in expected:
+                self.assert_same_instance(expected[key], actual[key])
+        elif isinstance(expected, (list, tuple)):
+            assert len(expected) == len(actual)
+            for expected_item, actual_item in zip(expected, actual):
+                self.assert_same_instance(expected_item, actual_item)
+        else:
+            assert expected == actual
+
+    def test_text_classification_matches_padding(self):
+        instances = [IndexedTextClassificationInstance([1, 2, 3, 4], True),
+                     IndexedTextClassificationInstance([5, 6], False)]
+        self.check_matches_padding(instances, {'num_sentence_words': 3})
+        self.check_matches_padding(instances, {'num_sentence_words': 6})
+
+    def test_question_answer_matches_padding(self):
+        instances = [IndexedQuestionAnswerInstance([1, 2, 3], [[2, 3], [4], [5, 6, 7]], 1),
+                     IndexedQuestionAnswerInstance([4], [[1, 2]], 0)]
+        self.check_matches_padding(instances, {'num_sentence_words': 2,
+                                               'answer_length': 2,
+                                               'num_options': 3})
+
+    def test_character_span_with_characters_matches_padding(self):
+        instances = [IndexedCharacterSpanInstance([[1, 2], [3]], [[4, 5, 6], [7], [8, 9]], (0, 2)),
+                     IndexedCharacterSpanInstance([[2]], [[3, 4]], (0, 0))]
+        self.check_matches_padding(instances, {'num_question_words': 2,
+                                               'num_passage_words': 3,
+                                               'num_word_characters': 2})
+
+    def test_babi_matches_padding(self):
+        instances = [IndexedBabiInstance([1, 2, 3], [[2, 3], [4], [5, 6, 7]], 1),
+                     IndexedBabiInstance([4], [[1, 2]], 0)]
+        self.check_matches_padding(instances, {'num_sentence_words': 2,
+                                               'answer_length': 2,
+                                               'num_options': 3})
+
+    def test_tuple_inference_matches_padding(self):
+        answers = [[[[1, 2], [3]], [[4], [5, 6, 7]]],
+                   [[[8], [9, 10]]]]
+        background = [[[1], [2, 3]], [[4, 5, 6], [7]], [[8], []]]
+        instances = [IndexedTupleInferenceInstance(answers, background, 0),
+                     IndexedTupleInferenceInstance([[[[2], [3]]]], [[[4], [5]]], 0)]
+        self.check_matches_padding(instances, {'num_options': 3,
+                                               'num_question_tuples': 1,
+                                               'num_background_tuples': 2,
+                                               'num_slots': 3,
+                                               'num_sentence_words': 2})
+        self.check_matches_padding(instances, {'num_options': 2,
+                                               'num_question_tuples': 3,
+                                               'num_background_tuples': 4,
+                                               'num_slots': 2,
+                                               'num_sentence_words': 3})
+
+    def test_tuple_inference_with_characters_matches_padding(self):
+        answers = [[[[[1, 2], [3]], [[4]]]], [[[[5, 6, 7]], [[8], [9]]]]]
+        background = [[[[1], [2, 3]], [[4, 5]]]]
+        instances = [IndexedTupleInferenceInstance(answers, background, 1)]
+        self.check_matches_padding(instances, {'num_options': 2,
+                                               'num_question_tuples': 1,
+                                               'num_background_tuples': 2,
+                                               'num_slots': 2,
+                                               'num_sentence_words': 2,
+                                               'num_word_characters': 2})
+
+    def test_graph_align_matches_padding(self):
+        answers = [[[[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]], [[0.7, 0.8]]],
+                   [[[0.9, 1.0]]]]
+        instances = [IndexedGraphAlignInstance(answers, 1),
+                     IndexedGraphAlignInstance([[[[0.5, 0.25]]]], 0)]
+        self.check_matches_padding(instances, {'num_options': 3,
+                                               'num_graphlets': 2,
+                                               'num_alignments': 2,
+                                               'num_features': 3})
+
+    def test_background_matches_padding(self):
+        instance = IndexedTextClassificationInstance([1, 2, 3], True)
+        background = [IndexedTextClassificationInstance([4, 5], None),
+                      IndexedTextClassificationInstance([6], None),
+                      IndexedTextClassificationInstance([7, 8, 9, 10], None)]
+        instances = [IndexedBackgroundInstance(instance, background),
+                     IndexedBackgroundInstance(IndexedTextClassificationInstance([2], False), [])]
+        self.check_matches_padding(instances, {'num_sentence_words': 3, 'background_sentences': 2})
+        self.check_matches_padding(instances, {'num_sentence_words': 5, 'background_sentences': 4})
+
+    def test_background_with_multiple_inputs_matches_padding(self):
+        instance = IndexedQuestionPassageInstance([1, 2], [3, 4, 5], [1, 0])
+        background = [IndexedTextClassificationInstance([4, 5], None)]
+        instances = [IndexedBackgroundInstance(instance, background)]
+        self.check_matches_padding(instances, {'num_question_words': 3,
+                                               'num_passage_words': 2,
+                                               'num_sentence_words': 3,
+                                               'background_sentences': 2})
+
+    def test_multiple_true_false_matches_padding(self):
+        options = [IndexedTextClassificationInstance([1, 2, 3], True),
+                   IndexedTextClassificationInstance([4], False)]
+        instances = [IndexedMultipleTrueFalseInstance(options, 0),
+                     IndexedMultipleTrueFalseInstance([IndexedTextClassificationInstance([5, 6], True)], 0)]
+        self.check_matches_padding(instances, {'num_options': 3, 'num_sentence_words': 2})
+
+    def test_multiple_true_false_with_multiple_inputs_matches_padding(self):
+        options = [IndexedQuestionPassageInstance([1, 2], [3, 4, 5], [1, 0]),
+                   IndexedQuestionPassageInstance([6], [7], [0, 1])]
+        instances = [IndexedMultipleTrueFalseInstance(options, 1)]
+        self.check_matches_padding(instances, {'num_options': 3,
+                                               'num_question_words': 1,
+                                               'num_passage_words': 2})
+
+    def test_tagging_matches_padding(self):
+        instances = [IndexedTaggingInstance([1, 2, 3, 4], [2, 3, 4, 5]),
+                     IndexedTaggingInstance([6, 7], [1, 0])]
+        self.check_matches_padding(instances, {'num_sentence_words': 3})
+        self.check_matches_padding(instances, {'num_sentence_words': 5})
+
+    def test_verb_semantics_matches_padding(self):
+        instances = [IndexedVerbSemanticsInstance([1, 2, 3], [0, 1, 0], [1, 0, 0],
+                                                  ([0, 1], [[1, 0], [0, 1], [1, 0]])),
+                     IndexedVerbSemanticsInstance([4], [1], [0], ([1, 0], [[0, 1]]))]
+        self.check_matches_padding(instances, {'num_sentence_words': 2})
+        self.check_matches_padding(instances, {'num_sentence_words': 4})
+
+    def test_sentence_pair_matches_padding(self):
+        instances = [IndexedSentencePairInstance([1, 2, 3], [4, 5], [0, 1]),
+                     IndexedSentencePairInstance([6], [7, 8, 9, 10], [1, 0])]
+        self.check_matches_padding(instances, {'num_sentence_words': 3})
+
+    def test_sentence_pair_with_characters_matches_padding(self):
+        instances = [IndexedSentencePairInstance([[1, 2], [3]], [[4, 5, 6]], [0, 1]),
+                     IndexedSentencePairInstance([[7]], [[8], [9, 10]], [1, 0])]
+        self.check_matches_padding(instances, {'num_sentence_words': 2, 'num_word_characters': 2})
+
+    def test_question_passage_matches_padding(self):
+        instances = [IndexedQuestionPassageInstance([1, 2, 3], [4, 5, 6, 7], [0, 1, 0, 0]),
+                     IndexedQuestionPassageInstance([8], [9, 10], [0, 0, 1, 0])]
+        self.check_matches_padding(instances, {'num_question_words': 2, 'num_passage_words': 3})
+
+    def test_mc_question_passage_matches_padding(self):
+        instances = [IndexedMcQuestionPassageInstance([1, 2, 3], [4, 5, 6, 7], [[1, 2], [3], [4, 5, 6]], 2),
+                     IndexedMcQuestionPassageInstance([8], [9, 10], [[1]], 0)]
+        self.check_matches_padding(instances, {'num_question_words': 2,
+                                               'num_passage_words': 3,
+                                               'num_options': 3,
+                                               'num_option_words': 2})
+
+    def test_mc_question_passage_with_characters_matches_padding(self):
+        instances = [IndexedMcQuestionPassageInstance([[1, 2, 3]], [[4], [5, 6]], [[[1, 2]], [[3], [4]]], 1)]
+        self.check_matches_padding(instances, {'num_question_words': 2,
+                                               'num_passage_words': 1,
+                                               'num_options': 2,
+                                               'num_option_words': 2,
+                                               'num_word_characters': 2})
+
+    def test_sentence_selection_matches_padding(self):
+        instances = [IndexedSentenceSelectionInstance([1, 2, 3], [[1, 2], [3], [4, 5, 6]], [2]),
+                     IndexedSentenceSelectionInstance([4], [[7]], [0])]
+        self.check_matches_padding(instances, {'num_question_words': 2,
+                                               'num_sentences': 3,
+                                               'num_sentence_words': 2})
+
+    def test_logical_form_matches_padding(self):
+        instances = [IndexedLogicalFormInstance([1, 2, 3], [0, 0, 1, 0, 1], True),
+                     IndexedLogicalFormInstance([4], [0], False)]
+        self.check_matches_padding(instances, {'num_sentence_words': 2, 'transition_length': 3})
+        self.check_matches_padding(instances, {'num_sentence_words': 4, 'transition_length': 6})
+
+    def test_tuple_matches_padding(self):
+        instances = [IndexedTupleInstance([[1, 2], [3], [4, 5, 6], [7]], True),
+                     IndexedTupleInstance([[8]], False)]
+        self.check_matches_padding(instances, {'num_slots': 3, 'num_sentence_words': 2})
+        self.check_matches_padding(instances, {'num_slots': 5, 'num_sentence_words': 4})
+
+    def test_sentence_matches_padding(self):
+        instances = [IndexedSentenceInstance([1, 2, 3, 4], [2, 3, 4, 5]),
+                     IndexedSentenceInstance([6, 7], [7, 8])]
+        self.check_matches_padding(instances, {'num_sentence_words': 3})
+
+    def test_returns_none_for_instances_without_fields(self):
+        class UndescribedInstance(IndexedInstance):
+            pass
+        assert collate_instances([UndescribedInstance(None)], {}) is None
+
+    def test_as_padded_training_data_falls_back_to_padding(self):
+        class PaddedInstance(IndexedInstance):
+            def __init__(self, indices):
+                super(PaddedInstance, self).__init__(None)
+                self.indices = indices
+
+            def get_padding_lengths(self):
+                return {'num_sentence_words': len(self.indices)}
+
+            def pad(self, padding_lengths):
+                self.indices = self.pad_word_sequence(self.indices, padding_lengths)
+
+            def as_training_data(self):
+                return numpy.asarray(self.indices, dtype='int32'), None
+
+        instances = [PaddedInstance([1, 2]), PaddedInstance([3])]
+        inputs, _ = IndexedDataset(instances).as_padded_training_data()
+        assert_array_equal(inputs, [[1, 2], [0, 3]])
+        assert instances[1].indices == [3]
@@ -0,0 +1,127 @@
+# pylint: disable=no-self-use,invalid-name
+from unittest import mock
+
+from keras import backend as K
+from keras.layers import Dense, Embedding, GlobalMaxPooling1D, Input
+from numpy.testing import assert_allclose
+import pytest
+import tensorflow
+
+from deep_qa.common.checks import ConfigurationError
+from deep_qa.common.params import Params
+from deep_qa.data import DataGenerator, IndexedDataset
+from deep_qa.data.instances.text_classification import IndexedTextClassificationInstance
+from deep_qa.data.memory_calibration import MemoryCalibrator, fit_memory_usage_constant, get_peak_process_memory
+from deep_qa.data.memory_calibration import get_training_state_variables
+from deep_qa.training.models import DeepQaModel
+from deep_qa.training.optimizers import optimizer_from_params
+from ..common.test_case import DeepQaTestCase
+
+
+class FakeTextTrainer:
+    batch_size = 2
+
+    @staticmethod
+    def get_instance_sorting_keys():
+        return ['num_sentence_words']
+
+    @staticmethod
+    def get_padding_lengths():
+        return {'num_sentence_words': None}
+
+    @staticmethod
+    def get_padding_memory_scaling(padding_lengths):
+        return padding_lengths['num_sentence_words']
+
+
+def build_model():
+    word_input = Input(shape=(None,), dtype='int32')
+    embedded_words = Embedding(input_dim=3, output_dim=4)(word_input)
+    output = Dense(2, activation='softmax')(GlobalMaxPooling1D()(embedded_words))
+    model = DeepQaModel(inputs=word_input, outputs=output)
+    model.compile(Params({
+            'optimizer': optimizer_from_params('adam'),
+            'loss': 'categorical_crossentropy',
+            }))
+    return model
+
+
+def get_dataset():
+    return IndexedDataset([IndexedTextClassificationInstance([1] * length, True)
+                           for length in [3, 10, 5, 2, 10, 7]])
+
+
+class TestMemoryCalibration(DeepQaTestCase):
+    def test_fit_memory_usage_constant_solves_for_the_budget(self):
+        scalings = [100, 200, 400]
+        memory_usages = [1000 + 10 * scaling for scaling in scalings]
+        assert fit_memory_usage_constant(scalings, memory_usages, 6000) == 500
+
+    def test_fit_memory_usage_constant_checks_its_inputs(self):
+        with pytest.raises(ConfigurationError):
+            fit_memory_usage_constant([100], [2000], 6000)
+        with pytest.raises(ConfigurationError):
+            fit_memory_usage_constant([100, 200], [2000, 2000], 6000)
+        with pytest.raises(ConfigurationError):
+            fit_memory_usage_constant([100, 200], [2000, 3000], 500)
+
+    def test_get_peak_process_memory_is_positive(self):
+        assert get_peak_process_memory() > 0
+
+    def test_calibrate_probes_the_largest_instances_and_restores_the_model(self):
+        model = build_model()
+        # One step first, so the optimizer's slots and the global step aren't at their initial values.
+        dataset = get_dataset()
+        model.train_on_batch(*dataset.as_padded_training_data(FakeTextTrainer.get_padding_lengths()))
+        training_variables = get_training_state_variables(model)
+        weights = model.get_weights()
+        training_values = K.batch_get_value(training_variables)
+        num_calls = model.train_function.num_calls
+
+        # We pretend the model uses 1000 bytes, plus 10 bytes per padded word in the last batch it
+        # trained on.
+        batch_sizes = []
+        memory_usage = [0]
+        train_on_batch = model.train_on_batch
+        def fake_train_on_batch(inputs, labels):
+            batch_sizes.append(inputs.shape[0])
+            memory_usage[0] = 1000 + 10 * inputs.size
+            return train_on_batch(inputs, labels)
+        calibrator = MemoryCalibrator(Params({'memory_budget': 1, 'batch_sizes': [1, 2, 4, 8], 'num_steps': 1}))
+        # That's a lot less than a megabyte, so we make the budget 1500 bytes.
+        calibrator.memory_budget = 1500
+        with mock.patch.object(model, 'train_on_batch', fake_train_on_batch), \
+                mock.patch('deep_qa.data.memory_calibration.get_peak_process_memory', lambda: memory_usage[0]):
+            constant = calibrator.calibrate(FakeTextTrainer(), model, dataset)
+        # The biggest instances have 10 words, so the model uses 1000 + 10 * 10 * batch_size bytes,
+        # and we stop probing after batch size 8 goes over budget.
+        assert batch_sizes == [1, 1, 2, 4, 8]
+        assert constant == 50
+        # The probes trained the model, but we put the weights, the optimizer's slots and the
+        # global step back.
+        for weight, expected_weight in zip(model.get_weights(), weights):
+            assert_allclose(weight, expected_weight)
+        # Adam's two slots for each of the three weights, its beta powers (if this version of
+        # tensorflow reports them), and the global step.
+        assert len(training_variables) >= 7
+        for value, expected_value in zip(K.batch_get_value(training_variables), training_values):
+            assert_allclose(value, expected_value)
+        assert K.get_value(tensorflow.train.get_or_create_global_step()) == 1
+        assert model.train_function.num_calls == num_calls
+
+    def test_data_generator_uses_calibrated_constant(self):
+        params = Params({
+                'dynamic_padding': True,
+                'adaptive_batch_sizes': True,
+                'padding_noise': 0.0,
+                'memory_calibration': {'memory_budget': 1},
+                })
+        generator = DataGenerator(FakeTextTrainer(), params)
+        assert generator.needs_memory_calibration()
+        with mock.patch.object(MemoryCalibrator, 'calibrate', return_value=20):
+            assert generator.calibrate_memory_usage(mock.Mock(), get_dataset()) == 20
+        assert not generator.needs_memory_calibration()
+        generator.create_generator(get_dataset())
+        # Sorted, the lengths are [2, 3, 5, 7, 10, 10], and we keep batch size times the longest
+        # length at most 20.
+        assert generator.last_num_batches == 3
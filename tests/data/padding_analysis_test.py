@@ -0,0 +1,52 @@
+# pylint: disable=no-self-use,invalid-name
+from deep_qa.data import IndexedDataset
+from deep_qa.data.padding_analysis import analyze_padding, format_padding_analysis
+from ..common.test_case import DeepQaTestCase
+from .data_generator_test import FakeInstance, FakeTextTrainer
+
+
+class TestPaddingAnalysis(DeepQaTestCase):
+    def setUp(self):
+        super(TestPaddingAnalysis, self).setUp()
+        self.text_trainer = FakeTextTrainer()
+        self.dataset = IndexedDataset([
+                FakeInstance(0, 5, 3, 2),
+                FakeInstance(1, 4, 3, 2),
+                FakeInstance(2, 4, 1, 2),
+                FakeInstance(3, 9, 3, 2),
+                FakeInstance(4, 8, 3, 2),
+                FakeInstance(5, 2, 1, 2),
+                FakeInstance(6, 3, 3, 2),
+                FakeInstance(7, 3, 3, 3),
+                FakeInstance(8, 1, 1, 2),
+                FakeInstance(9, 1, 1, 3),
+                ])
+
+    def test_analysis_compares_padding_of_each_strategy(self):
+        analysis = analyze_padding(self.text_trainer, self.dataset)
+        assert analysis['histograms']['a']['max'] == 9
+        assert sum(analysis['histograms']['a']['counts']) == 10
+        strategies = analysis['strategies']
+        assert sorted(strategies.keys()) == ['adaptive', 'fixed', 'sorted']
+        for result in strategies.values():
+            assert result['num_tokens'] == 40 + 22 + 22
+        # Fixed batches pad every instance to (9, 3, 3).
+        assert strategies['fixed']['num_batches'] == 4
+        assert strategies['fixed']['num_padded_tokens'] == 10 * (9 + 3 + 3)
+        assert strategies['fixed']['relative_cost'] == 1.0
+        assert strategies['sorted']['num_padded_tokens'] < strategies['fixed']['num_padded_tokens']
+        assert strategies['sorted']['relative_cost'] < 1.0
+        # By default, each adaptive batch gets the memory of one full fixed batch (3 * 9 * 3 * 3).
+        adaptive = strategies['adaptive']
+        assert adaptive['estimated_cost'] <= adaptive['num_batches'] * 3 * 9 * 3 * 3
+        assert adaptive['mean_batch_size'] > strategies['sorted']['mean_batch_size']
+        assert 'adaptive' in format_padding_analysis(analysis)
+
+    def test_analysis_respects_padding_lengths_set_by_the_model(self):
+        self.text_trainer.a_length = 4
+        analysis = analyze_padding(self.text_trainer, self.dataset)
+        fixed = analysis['strategies']['fixed']
+        # Instances longer than 4 get truncated, so they have fewer tokens.
+        assert fixed['num_tokens'] == 30 + 22 + 22
+        assert fixed['num_padded_tokens'] == 10 * (4 + 3 + 3)
+        assert analysis['strategies']['sorted']['num_tokens'] == 30 + 22 + 22
@@ -1,5 +1,8 @@
 # pylint: disable=no-self-use,invalid-name
 
+from deep_qa.data.instances.text_classification.text_classification_instance import TextClassificationInstance
+from deep_qa.data.instances.wrappers.background_instance import BackgroundInstance
+from deep_qa.data.tokenizers.tokenizer import find_instance_strings
 from deep_qa.data.tokenizers.word_tokenizer import WordTokenizer
 from deep_qa.common.params import Params
 
@@ -20,3 +23,18 @@ class TestTokenizer:
         # "Lenox Hill Hospital in New York."
         token_span = self.tokenizer.char_span_to_token_span(self.passage, (91, 123))
         assert token_span == (22, 29)
+
+    def test_find_instance_strings_finds_strings_in_contained_instances(self):
+        instance = BackgroundInstance(TextClassificationInstance("a sentence", True),
+                                      [TextClassificationInstance("background one", None),
+                                       TextClassificationInstance("background two", None)])
+        strings = list(find_instance_strings([instance]))
+        assert strings == ["a sentence", "background one", "background two"]
+
+    def test_prepare_instances_does_not_change_tokenization(self):
+        instance = TextClassificationInstance(self.passage, True)
+        tokenizer = WordTokenizer(Params({}))
+        tokenizer.prepare_instances([instance])
+        assert tokenizer.get_cache_statistics()['token_cache_prefills'] == 1
+        assert tokenizer.tokenize(self.passage) == self.tokenizer.tokenize(self.passage)
+        assert tokenizer.get_cache_statistics()['token_cache_hits'] == 1
@@ -18,3 +18,37 @@ class TestWordProcessor:
         expected_tokens = ["sentenc", "ha", "crazi", "punctuat"]
         tokens = word_processor.get_tokens(sentence)
         assert tokens == expected_tokens
+
+    def test_caches_tokens(self):
+        word_processor = WordProcessor(Params({'word_stemmer': 'porter'}))
+        tokens = word_processor.get_tokens("the sentences are sentences")
+        tokens.append("modified")
+        assert word_processor.get_tokens("the sentences are sentences") == ["the", "sentenc", "are", "sentenc"]
+        statistics = word_processor.get_cache_statistics()
+        assert statistics['token_cache_hits'] == 1
+        assert statistics['token_cache_misses'] == 1
+        assert statistics['token_cache_hit_rate'] == 0.5
+        assert statistics['stem_cache_hits'] == 1
+        assert statistics['stem_cache_misses'] == 3
+
+    def test_token_cache_is_bounded(self):
+        word_processor = WordProcessor(Params({'token_cache_size': 2}))
+        for sentence in ["a", "b", "c", "a"]:
+            word_processor.get_tokens(sentence)
+        statistics = word_processor.get_cache_statistics()
+        assert statistics['token_cache_size'] == 2
+        assert statistics['token_cache_misses'] == 4
+
+    def test_warm_cache_matches_get_tokens(self):
+        sentences = ["this (sentence) has 'crazy' \"punctuation\".", "the sentences are sentences", "a"]
+        word_processor = WordProcessor(Params({'word_stemmer': 'porter', 'word_filter': 'stopwords'}))
+        expected_tokens = [word_processor.get_tokens(sentence) for sentence in sentences]
+        word_processor = WordProcessor(Params({'word_stemmer': 'porter', 'word_filter': 'stopwords'}))
+        word_processor.warm_cache(sentences + sentences)
+        assert word_processor.get_cache_statistics()['token_cache_prefills'] == 3
+        assert [word_processor.get_tokens(sentence) for sentence in sentences] == expected_tokens
+        statistics = word_processor.get_cache_statistics()
+        # Warming the cache doesn't count as a miss, so every lookup after it is a hit.
+        assert statistics['token_cache_hits'] == 3
+        assert statistics['token_cache_misses'] == 0
+        assert statistics['token_cache_hit_rate'] == 1.0
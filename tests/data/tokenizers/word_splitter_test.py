@@ -1,4 +1,6 @@
-# pylint: disable=no-self-use,invalid-name
+# pylint: disable=no-self-use,invalid-name,protected-access
+import random
+from unittest import mock
 
 from deep_qa.data.tokenizers.word_splitter import SimpleWordSplitter
 from deep_qa.data.tokenizers.word_splitter import SpacyWordSplitter
@@ -39,6 +41,52 @@ class TestSimpleWordSplitter:
         tokens = self.word_splitter.split_words(sentence)
         assert tokens == expected_tokens
 
+    def test_split_words_batch_matches_split_words(self):
+        sentences = ["mr. and mrs. jones, etc., went to the store", "wouldn't've", ""]
+        expected_tokens = [self.word_splitter.split_words(sentence) for sentence in sentences]
+        assert self.word_splitter.split_words_batch(sentences) == expected_tokens
+
+    def test_tokenize_matches_reference_implementation_on_large_corpus(self):
+        # We build a lot of random "sentences" out of pieces that exercise all of the special
+        # handling in the splitter, and check the output against a straightforward (but slow)
+        # implementation of the same rules.
+        pieces = ['word', 'a', 'don', 'mr.', 'mrs.', 'e.g.', 'etc.', 'al.', 'c.f.', "n't", "'s", "’s",
+                  "'ve", "'re", "’re", "'ll", "'d", "'m", '"', "'", '(', ')', '.', ',', '[', ']', '“',
+                  '”', '‘', '’', '$', '%', '#', '?', 'Mr.', "N'T"]
+        random.seed(13370)
+        for _ in range(20000):
+            fields = [''.join(random.choice(pieces) for _ in range(random.randint(1, 5)))
+                      for _ in range(random.randint(1, 8))]
+            sentence = ' '.join(fields)
+            expected_tokens = self._reference_split_words(sentence)
+            assert self.word_splitter.split_words(sentence) == expected_tokens, sentence
+
+    def _reference_split_words(self, sentence):
+        splitter = self.word_splitter
+        def can_split(token):
+            return token and token not in splitter.special_cases
+        tokens = []
+        for field in sentence.lower().split():
+            add_at_end = []
+            while can_split(field) and field[0] in splitter.beginning_punctuation:
+                tokens.append(field[0])
+                field = field[1:]
+            while can_split(field) and field[-1] in splitter.ending_punctuation:
+                add_at_end.insert(0, field[-1])
+                field = field[:-1]
+            remove_contractions = True
+            while remove_contractions:
+                remove_contractions = False
+                for contraction in splitter.contractions:
+                    if can_split(field) and field.endswith(contraction):
+                        field = field[:-len(contraction)]
+                        add_at_end.insert(0, contraction)
+                        remove_contractions = True
+            if field:
+                tokens.append(field)
+            tokens.extend(add_at_end)
+        return tokens
+
 
 class TestSpacyWordSplitter:
     word_splitter = SpacyWordSplitter()
@@ -76,3 +124,22 @@ class TestSpacyWordSplitter:
                            "e.g.", ",", "the", "store"]
         tokens = self.word_splitter.split_words(sentence)
         assert tokens == expected_tokens
+
+    def test_split_words_batch_reuses_its_pool_across_chunks(self):
+        sentences = ["Mr. and Mrs. Jones, etc., went to, e.g., the store", "wouldn't've", "",
+                     "the jones' house", "it ain't joe's problem; would've been yesterday"] * 4
+        expected_tokens = [self.word_splitter.split_words(sentence) for sentence in sentences]
+        word_splitter = SpacyWordSplitter(num_processes=2)
+        # We make the pool worth using for these small chunks, and split the sentences in two
+        # chunks, the way we do when indexing a large dataset.
+        with mock.patch('deep_qa.data.tokenizers.word_splitter._MIN_SENTENCES_PER_PROCESS', 2):
+            try:
+                tokens = word_splitter.split_words_batch(sentences[:10])
+                pool = word_splitter._pool
+                assert pool is not None
+                tokens.extend(word_splitter.split_words_batch(sentences[10:]))
+                assert word_splitter._pool is pool
+            finally:
+                word_splitter.close()
+        assert tokens == expected_tokens
+        assert word_splitter._pool is None
@@ -4,7 +4,9 @@ import os
 
 import numpy
 from numpy.testing import assert_almost_equal
+import pytest
 
+from deep_qa.common.checks import ConfigurationError
 from deep_qa.models.text_classification import ClassificationModel
 from deep_qa.run import run_model, load_model, evaluate_model
 from deep_qa.run import score_dataset, score_dataset_with_ensemble
@@ -32,6 +34,16 @@ class TestRun(DeepQaTestCase):
         loaded_model = load_model(self.param_path)
         assert loaded_model.can_train()
 
+    def test_load_model_for_inference_gives_the_same_predictions(self):
+        run_model(self.param_path)
+        loaded_model = load_model(self.param_path)
+        dataset = loaded_model.load_dataset_from_files([self.TEST_FILE])
+        predictions, _ = loaded_model.score_dataset(dataset)
+        inference_model = load_model(self.param_path, for_inference=True)
+        assert not hasattr(inference_model.model, 'total_loss')
+        inference_predictions, _ = inference_model.score_dataset(dataset)
+        assert_almost_equal(predictions, inference_predictions)
+
     def test_score_dataset_does_not_crash(self):
         run_model(self.param_path)
         score_dataset(self.param_path, [self.TEST_FILE])
@@ -48,6 +60,36 @@ class TestRun(DeepQaTestCase):
         ensembled_predictions, _ = score_dataset_with_ensemble([self.param_path], [self.TEST_FILE])
         assert_almost_equal(predictions, ensembled_predictions)
 
+    def test_score_dataset_with_ensemble_of_copies_averages_to_the_same_predictions(self):
+        run_model(self.param_path)
+        predictions, labels = score_dataset(self.param_path, [self.TEST_FILE])
+        ensembled_predictions, ensembled_labels = score_dataset_with_ensemble([self.param_path] * 3,
+                                                                              [self.TEST_FILE])
+        assert_almost_equal(predictions, ensembled_predictions, decimal=5)
+        assert_almost_equal(labels, ensembled_labels)
+
+    def test_score_dataset_with_ensemble_in_worker_processes_matches_scoring_serially(self):
+        run_model(self.param_path)
+        serial_predictions, serial_labels = score_dataset_with_ensemble([self.param_path] * 3,
+                                                                        [self.TEST_FILE])
+        predictions, labels = score_dataset_with_ensemble([self.param_path] * 3, [self.TEST_FILE],
+                                                          num_workers=2)
+        assert_almost_equal(predictions, serial_predictions, decimal=5)
+        assert_almost_equal(labels, serial_labels)
+
+    def test_score_dataset_with_ensemble_leaves_the_callers_models_usable(self):
+        run_model(self.param_path)
+        model = load_model(self.param_path)
+        dataset = model.load_dataset_from_files([self.TEST_FILE])
+        predictions, _ = model.score_dataset(dataset)
+        score_dataset_with_ensemble([self.param_path] * 2, [self.TEST_FILE])
+        predictions_after_ensemble, _ = model.score_dataset(dataset)
+        assert_almost_equal(predictions, predictions_after_ensemble)
+
+    def test_score_dataset_with_ensemble_needs_models(self):
+        with pytest.raises(ConfigurationError):
+            score_dataset_with_ensemble([], [self.TEST_FILE])
+
     def test_compute_accuracy_computes_a_correct_metric(self):
         predictions = numpy.asarray([[.5, .5, .6], [.1, .4, .0]])
         labels = numpy.asarray([[1, 0, 0], [0, 1, 0]])
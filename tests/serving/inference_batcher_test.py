@@ -0,0 +1,85 @@
+# pylint: disable=no-self-use,invalid-name,protected-access
+import asyncio
+
+import numpy
+
+from deep_qa.common.params import Params
+from deep_qa.data.data_indexer import DataIndexer
+from deep_qa.data.instances.text_classification.text_classification_instance import TextClassificationInstance
+from deep_qa.serving import InferenceBatcher
+from ..common.test_case import DeepQaTestCase
+
+
+class FakeKerasModel:
+    def __init__(self):
+        self.batch_shapes = []
+
+    def predict_on_batch(self, inputs):
+        self.batch_shapes.append(inputs.shape)
+        return numpy.sum(inputs > 0, axis=1)
+
+
+class FakeModel:
+    """
+    Just enough of a ``TextTrainer`` for the batcher: the predictions are the number of (non-padding)
+    words in each instance.
+    """
+    batch_size = 2
+
+    def __init__(self):
+        self.data_indexer = DataIndexer()
+        for word in ["a", "b", "c", "d"]:
+            self.data_indexer.add_word_to_index(word)
+        self.model = FakeKerasModel()
+
+    def _instance_type(self):  # pylint: disable=no-self-use
+        return TextClassificationInstance
+
+    def get_instance_sorting_keys(self):  # pylint: disable=no-self-use
+        return ['num_sentence_words']
+
+    def get_padding_lengths(self):  # pylint: disable=no-self-use
+        return {'num_sentence_words': None}
+
+
+def run_and_close(batcher, coroutine):
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            batcher.close()
+            await asyncio.sleep(0)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+class TestInferenceBatcher(DeepQaTestCase):
+
+    def test_concurrent_requests_are_batched_by_length(self):
+        model = FakeModel()
+        batcher = InferenceBatcher(model, Params({'max_latency': 0.5}))
+        lines = ["a b c d", "a", "a b c", "b"]
+        predictions = run_and_close(batcher, batcher.predict_instances(lines))
+        assert [prediction.tolist() for prediction in predictions] == [4, 1, 3, 1]
+        # The two short instances went together, then the two long ones, without waiting for the
+        # deadline because both batches were full.
+        assert model.model.batch_shapes == [(2, 1), (2, 4)]
+        metrics = batcher.get_metrics()
+        assert metrics['num_requests'] == 4
+        assert metrics['num_batches'] == 2
+        assert metrics['batch_sizes'] == {'2': 2}
+        assert metrics['max_queue_depth'] == 4
+        assert metrics['queue_depth'] == 0
+        assert metrics['max_latency_seconds'] < 0.5
+
+    def test_partial_batches_run_after_the_deadline(self):
+        model = FakeModel()
+        batcher = InferenceBatcher(model, Params({'max_batch_size': 4, 'max_latency': 0.01}))
+        prediction = run_and_close(batcher, batcher.predict({'text': "a b", 'label': None}))
+        assert prediction.tolist() == 2
+        assert batcher.get_metrics()['batch_sizes'] == {'1': 1}
@@ -0,0 +1,43 @@
+# pylint: disable=no-self-use,invalid-name
+import asyncio
+import json
+
+from deep_qa.common.params import Params
+from deep_qa.serving import InferenceBatcher, InferenceServer
+from .inference_batcher_test import FakeModel, run_and_close
+from ..common.test_case import DeepQaTestCase
+
+
+class TestInferenceServer(DeepQaTestCase):
+    def test_predict_and_metrics_over_a_unix_socket(self):
+        socket_path = self.TEST_DIR + "server.sock"
+        server = InferenceServer(InferenceBatcher(FakeModel(), Params({})))
+
+        async def request(method, path, body=b"", content_type="text/plain"):
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            writer.write(("%s %s HTTP/1.1\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n"
+                          % (method, path, content_type, len(body))).encode('latin-1') + body)
+            response = await reader.read()
+            writer.close()
+            head, _, response_body = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(response_body.decode('utf-8'))
+
+        async def run():
+            await server.start(unix_socket=socket_path)
+            try:
+                text_response = await request("POST", "/predict", b"a b c\na\n")
+                json_body = json.dumps({'instances': ["b c", {'text': "d", 'label': True}]}).encode('utf-8')
+                json_response = await request("POST", "/predict", json_body, "application/json")
+                bad_response = await request("POST", "/predict", b'{"other": 1}', "application/json")
+                metrics_response = await request("GET", "/metrics")
+            finally:
+                await server.stop()
+            return text_response, json_response, bad_response, metrics_response
+
+        responses = run_and_close(server.batcher, run())
+        text_response, json_response, bad_response, metrics_response = responses
+        assert text_response == (200, {'predictions': [3, 1]})
+        assert json_response == (200, {'predictions': [2, 1]})
+        assert bad_response[0] == 400
+        assert metrics_response[0] == 200
+        assert metrics_response[1]['num_requests'] == 4
@@ -0,0 +1,43 @@
+# pylint: disable=no-self-use,invalid-name
+import numpy
+from numpy.testing import assert_allclose
+from keras.layers import Dense, Embedding, Flatten, Input
+
+from deep_qa.common.params import Params
+from deep_qa.training.models import DeepQaModel
+from deep_qa.training.optimizers import optimizer_from_params
+from ..common.test_case import DeepQaTestCase
+
+
+class TestDeepQaModel(DeepQaTestCase):
+    def build_model(self, gradient_accumulation_steps: int):
+        word_input = Input(shape=(3,), dtype='int32')
+        # The embedding gives us sparse gradients, which we accumulate differently.
+        embedded_words = Embedding(input_dim=5, output_dim=4)(word_input)
+        output = Dense(2, activation='softmax')(Flatten()(embedded_words))
+        model = DeepQaModel(inputs=word_input, outputs=output)
+        model.compile(Params({
+                'optimizer': optimizer_from_params(Params({'type': 'sgd', 'learning_rate': 0.5})),
+                'loss': 'categorical_crossentropy',
+                # A small value, so that clipping actually changes the gradients.
+                'gradient_clipping': {'type': 'clip_by_norm', 'value': 0.1},
+                'gradient_accumulation_steps': gradient_accumulation_steps,
+                }))
+        return model
+
+    def test_gradient_accumulation_matches_one_large_batch(self):
+        inputs = numpy.asarray([[1, 2, 3], [4, 1, 0], [2, 2, 1], [0, 3, 4]])
+        labels = numpy.asarray([[1, 0], [0, 1], [0, 1], [1, 0]])
+        large_batch_model = self.build_model(1)
+        accumulating_model = self.build_model(2)
+        accumulating_model.set_weights(large_batch_model.get_weights())
+        for _ in range(2):
+            weights_before = accumulating_model.get_weights()
+            accumulating_model.train_on_batch(inputs[:2], labels[:2])
+            # The first batch only accumulates gradients.
+            for weight, weight_before in zip(accumulating_model.get_weights(), weights_before):
+                assert_allclose(weight, weight_before)
+            accumulating_model.train_on_batch(inputs[2:], labels[2:])
+            large_batch_model.train_on_batch(inputs, labels)
+            for weight, expected_weight in zip(accumulating_model.get_weights(), large_batch_model.get_weights()):
+                assert_allclose(weight, expected_weight, rtol=1e-5, atol=1e-6)
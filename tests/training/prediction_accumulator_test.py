@@ -0,0 +1,38 @@
+# pylint: disable=no-self-use,invalid-name
+import os
+
+import numpy
+
+from deep_qa.training.prediction_accumulator import PredictionAccumulator
+from ..common.test_case import DeepQaTestCase
+
+
+class TestPredictionAccumulator(DeepQaTestCase):
+    def add_batches(self, accumulator):
+        accumulator.add([2, 0], [numpy.asarray([[2, 2], [0, 0]]), numpy.asarray([2, 0])])
+        accumulator.add([1], [numpy.asarray([[1, 1, 1]]), numpy.asarray([1])])
+
+    def test_finish_restores_instance_order_and_pads(self):
+        accumulator = PredictionAccumulator(3)
+        self.add_batches(accumulator)
+        padded, flat = accumulator.finish()
+        assert padded.tolist() == [[0, 0, 0], [1, 1, 1], [2, 2, 0]]
+        assert flat.tolist() == [0, 1, 2]
+
+    def test_finish_can_stream_to_disk(self):
+        accumulator = PredictionAccumulator(3, self.TEST_DIR + 'predictions')
+        self.add_batches(accumulator)
+        padded, flat = accumulator.finish()
+        assert isinstance(padded, numpy.memmap)
+        assert padded.tolist() == [[0, 0, 0], [1, 1, 1], [2, 2, 0]]
+        assert numpy.load(self.TEST_DIR + 'predictions_1.npy').tolist() == [0, 1, 2]
+        assert flat.tolist() == [0, 1, 2]
+        single = PredictionAccumulator(1, self.TEST_DIR + 'single')
+        single.add([0], numpy.asarray([[0.5]]))
+        assert single.finish().tolist() == [[0.5]]
+        assert os.path.exists(self.TEST_DIR + 'single.npy')
+
+    def test_finish_returns_none_without_arrays(self):
+        accumulator = PredictionAccumulator(2)
+        accumulator.add([0, 1], None)
+        assert accumulator.finish() is None
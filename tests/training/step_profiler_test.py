@@ -0,0 +1,52 @@
+# pylint: disable=no-self-use,invalid-name
+import json
+import os
+from types import SimpleNamespace
+
+from deep_qa.training.step_profiler import NO_LAYER, StepProfiler, attribute_op_times
+from ..common.test_case import DeepQaTestCase
+
+
+def fake_step_stats(op_times, device="/job:localhost/replica:0/task:0/cpu:0"):
+    node_stats = [SimpleNamespace(node_name=name, all_end_rel_micros=micros) for name, micros in op_times]
+    return SimpleNamespace(dev_stats=[SimpleNamespace(device=device, node_stats=node_stats)])
+
+
+class TestStepProfiler(DeepQaTestCase):
+    layer_types = {'matrix_attention': 'MatrixAttention', 'encoder': 'BiGRU'}
+    op_times = [('matrix_attention/MatMul', 300),
+                ('matrix_attention/Softmax', 100),
+                ('gradients/matrix_attention/MatMul_grad/MatMul', 500),
+                ('encoder/while/Exit', 50),
+                ('encoder_1/while/Exit', 50),
+                ('Adam/update_encoder/ApplyAdam', 20),
+                ('_SOURCE', 1)]
+
+    def test_attribute_op_times_groups_ops_by_layer(self):
+        times = attribute_op_times(fake_step_stats(self.op_times), self.layer_types)
+        assert times['matrix_attention']['forward_micros'] == 400
+        assert times['matrix_attention']['backward_micros'] == 500
+        # A second call of the same layer gets a uniquified name scope.
+        assert times['encoder']['forward_micros'] == 100
+        assert times['Adam']['forward_micros'] == 20
+        assert '_SOURCE' in times
+
+    def test_attribute_op_times_skips_aggregated_gpu_streams(self):
+        step_stats = fake_step_stats(self.op_times, device="/gpu:0/stream:all")
+        assert not attribute_op_times(step_stats, self.layer_types)
+
+    def test_profiler_averages_layer_times_over_steps(self):
+        profiler = StepProfiler([3, 4], self.TEST_DIR + 'profile', self.layer_types)
+        assert not profiler.should_trace(2)
+        assert profiler.should_trace(3) and profiler.should_trace(4)
+        assert not profiler.should_trace(5)
+        profiler.add_step_stats(fake_step_stats(self.op_times))
+        profiler.add_step_stats(fake_step_stats(self.op_times))
+        layer_times = profiler.get_layer_times()
+        assert layer_times[0] == {'name': 'matrix_attention', 'type': 'MatrixAttention',
+                                  'forward_ms': 0.4, 'backward_ms': 0.5, 'total_ms': 0.9}
+        optimizer_times = [times for times in layer_times if times['name'] == 'Adam'][0]
+        assert optimizer_times['type'] == NO_LAYER
+        profiler.finish()
+        with open(os.path.join(self.TEST_DIR, 'profile', 'layer_times.json')) as layer_times_file:
+            assert json.load(layer_times_file) == layer_times
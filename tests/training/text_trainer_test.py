@@ -1,4 +1,6 @@
-# pylint: disable=no-self-use,invalid-name
+# pylint: disable=no-self-use,invalid-name,protected-access
+import json
+import os
 from unittest import mock
 
 import numpy
@@ -7,7 +9,7 @@ from deep_qa.common.params import Params, pop_choice
 from deep_qa.layers.encoders import encoders
 from deep_qa.models.text_classification import ClassificationModel
 from deep_qa.models.multiple_choice_qa import QuestionAnswerSimilarity
-from ..common.test_case import DeepQaTestCase
+from ..common.test_case import DeepQaTestCase, ParallelSimpleWordSplitter
 
 
 class TestTextTrainer(DeepQaTestCase):
@@ -161,6 +163,37 @@ class TestTextTrainer(DeepQaTestCase):
         self.write_true_false_model_files()
         self.ensure_model_trains_and_loads(ClassificationModel, args)
 
+    def test_profile_steps_writes_traces_and_layer_times(self):
+        self.write_true_false_model_files()
+        args = Params({
+                'batch_size': 2,
+                'profile_steps': [1, 2],
+                'profile_dir': self.TEST_DIR + 'profile',
+                })
+        model = self.get_model(ClassificationModel, args)
+        model.train()
+        assert not os.path.exists(self.TEST_DIR + 'profile/timeline_step=0.json')
+        with open(self.TEST_DIR + 'profile/timeline_step=1.json') as trace_file:
+            assert 'traceEvents' in json.load(trace_file)
+        with open(self.TEST_DIR + 'profile/layer_times.json') as layer_times_file:
+            layer_times = json.load(layer_times_file)
+        layer_types = {layer.name: layer.__class__.__name__ for layer in model.model.layers}
+        assert any(times['name'] in layer_types and times['backward_ms'] > 0 for times in layer_times)
+
+    def test_train_shuts_down_the_word_splitting_pool(self):
+        self.write_true_false_model_files()
+        model = self.get_model(ClassificationModel, Params({'batch_size': 2}))
+        word_splitter = ParallelSimpleWordSplitter(num_processes=2)
+        model.tokenizer.word_processor.word_splitter = word_splitter
+        with mock.patch('deep_qa.data.tokenizers.word_splitter._MIN_SENTENCES_PER_PROCESS', 1):
+            model.train()
+        # Reading the training and validation data started a pool, and we shut it down before we
+        # started fitting the model.
+        assert word_splitter.pools
+        assert word_splitter._pool is None
+        for pool in word_splitter.pools:
+            assert not any(worker.is_alive() for worker in pool._pool)
+
     def test_pretrained_embeddings_works_correctly(self):
         self.write_true_false_model_files()
         self.write_pretrained_vector_files()
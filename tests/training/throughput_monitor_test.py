@@ -0,0 +1,53 @@
+# pylint: disable=no-self-use,invalid-name,protected-access
+import json
+
+from deep_qa.data.data_generator import DataWaitStatistics
+from deep_qa.training.throughput_monitor import ThroughputMonitor
+from ..common.test_case import DeepQaTestCase
+
+
+class TestThroughputMonitor(DeepQaTestCase):
+    def run_epoch(self, monitor, statistics, epoch, num_batches):
+        monitor.on_epoch_begin(epoch)
+        for batch in range(num_batches):
+            statistics.record_batch(4, 30, 40)
+            monitor.on_batch_begin(batch)
+            monitor.on_batch_end(batch, {'size': 4})
+        monitor.on_epoch_end(epoch)
+
+    def test_monitor_writes_step_and_epoch_metrics(self):
+        metrics_file = self.TEST_DIR + 'throughput.jsonl'
+        statistics = DataWaitStatistics()
+        monitor = ThroughputMonitor(log_frequency=2, metrics_file=metrics_file, data_statistics=statistics)
+        monitor.on_train_begin()
+        self.run_epoch(monitor, statistics, 0, 5)
+        self.run_epoch(monitor, statistics, 1, 3)
+        monitor.on_train_end()
+        with open(metrics_file) as records_file:
+            records = [json.loads(line) for line in records_file]
+        assert [(record['type'], record['step']) for record in records] == [
+                ('throughput', 2), ('throughput', 4), ('throughput_per_epoch', 5),
+                ('throughput', 6), ('throughput', 8), ('throughput_per_epoch', 8)]
+        assert records[0]['num_batches'] == 2
+        assert records[0]['num_instances'] == 8
+        assert records[0]['num_tokens'] == 60
+        assert records[0]['padding_fraction'] == 0.25
+        epoch_record = records[2]
+        assert epoch_record['epoch'] == 0
+        assert epoch_record['num_instances'] == 20
+        assert epoch_record['num_tokens'] == 150
+        assert 0.0 <= epoch_record['data_wait_fraction'] <= 1.0
+        # The first step of the second epoch starts a new window.
+        assert records[3]['num_batches'] == 1
+
+    def test_monitor_works_without_data_statistics(self):
+        monitor = ThroughputMonitor(log_frequency=0)
+        monitor.on_train_begin()
+        monitor.on_epoch_begin(0)
+        monitor.on_batch_begin(0)
+        monitor.on_batch_end(0, {'size': 3})
+        metrics = monitor._epoch_window.get_metrics()
+        monitor.on_epoch_end(0)
+        monitor.on_train_end()
+        assert metrics['num_instances'] == 3
+        assert 'tokens_per_second' not in metrics